@@ -0,0 +1,63 @@
+import random
+import time
+from typing import Final, List, Tuple, Callable
+import utils
+from domain.file import File
+from domain.fileLayout import FileLayout
+
+"""
+Compares the lookups of the files which hold a 16KB block: the linear scan over all the files, done by TorrentDiskLoader and
+TorrentSaver before the FileLayout index, against the binary search of FileLayout, for torrents with many small files.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_FileLayout.py
+"""
+FILE_COUNTS: Final[List[int]] = [1000, 10000, 50000]
+AVERAGE_FILE_LENGTH: Final[int] = 64 * 1024
+LOOKUP_COUNT: Final[int] = 2000
+
+
+"""The lookup done by TorrentDiskLoader.__getFilesWhichContainEntity before the FileLayout index"""
+def getFileSectionsLegacy(files: List[File], entityStartOffset: int, entityLength: int) -> List[Tuple[File, int, int]]:
+    entityEndOffset: int = entityStartOffset + entityLength
+    fileListWithOffsets: List[Tuple[File, int, int]] = []
+    currentFileStartOffset: int = 0
+    for file in files:
+        currentFileEndOffset: int = currentFileStartOffset + file.length
+        if entityStartOffset < currentFileStartOffset and currentFileEndOffset <= entityEndOffset:
+            fileListWithOffsets.append((file, 0, file.length))
+        elif currentFileStartOffset <= entityStartOffset < currentFileEndOffset:
+            if currentFileStartOffset < entityEndOffset <= currentFileEndOffset:
+                fileListWithOffsets.append((file, entityStartOffset - currentFileStartOffset, entityLength))
+            else:
+                fileListWithOffsets.append((file, entityStartOffset - currentFileStartOffset, currentFileEndOffset - entityStartOffset))
+        elif currentFileStartOffset < entityEndOffset <= currentFileEndOffset:
+            fileListWithOffsets.append((file, 0, entityEndOffset - currentFileStartOffset))
+        currentFileStartOffset = currentFileEndOffset
+    return fileListWithOffsets
+
+
+"""
+@:return the number of lookups per second
+"""
+def measure(getFileSections: Callable[[int, int], List[Tuple[File, int, int]]], blockStartOffsets: List[int]) -> float:
+    startTime: float = time.perf_counter()
+    for blockStartOffset in blockStartOffsets:
+        getFileSections(blockStartOffset, utils.BLOCK_REQUEST_SIZE)
+    return len(blockStartOffsets) / (time.perf_counter() - startTime)
+
+
+def main() -> None:
+    randomGenerator: random.Random = random.Random(0)
+    for fileCount in FILE_COUNTS:
+        files: List[File] = [File(f"file{fileIndex}", randomGenerator.randrange(2 * AVERAGE_FILE_LENGTH)) for fileIndex in range(fileCount)]
+        fileLayout: FileLayout = FileLayout(files)
+        blockStartOffsets: List[int] = [randomGenerator.randrange(fileLayout.totalLength - utils.BLOCK_REQUEST_SIZE) for _ in range(LOOKUP_COUNT)]
+        for blockStartOffset in blockStartOffsets[:100]:
+            assert fileLayout.getFileSections(blockStartOffset, utils.BLOCK_REQUEST_SIZE) == \
+                   getFileSectionsLegacy(files, blockStartOffset, utils.BLOCK_REQUEST_SIZE)
+        print(f"{fileCount} files:")
+        print(f"    linear scan: {measure(lambda startOffset, length: getFileSectionsLegacy(files, startOffset, length), blockStartOffsets):,.0f} lookups/s")
+        print(f"    FileLayout: {measure(fileLayout.getFileSections, blockStartOffsets):,.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
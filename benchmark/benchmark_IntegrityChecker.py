@@ -0,0 +1,85 @@
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import Final, List
+from bencode3 import bencode
+from service.fileHandleCache import FileHandleCache
+from service.torrentDiskIntegrityChecker import TorrentDiskIntegrityChecker
+from service.torrentDiskLoader import TorrentDiskLoader
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+
+"""
+Compares the integrity check of a complete torrent done one piece at a time (each piece read by the disk loader, then hashed), as it
+used to be, with the checker, which reads runs of pieces with large sequential reads and hashes them on several threads.
+The files are written once and stay in the page cache, so this measures the reading and hashing, not the disk; on a cold cache,
+the sequential reads and the read-ahead hints matter more.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_IntegrityChecker.py [directory]
+"""
+MEGABYTE: Final[int] = 1024 * 1024
+FILE_LENGTHS: Final[List[int]] = [300 * MEGABYTE, 7 * MEGABYTE + 12345, 205 * MEGABYTE]
+PIECE_LENGTH: Final[int] = 256 * 1024
+MAX_OPEN_FILE_COUNT: Final[int] = 4
+
+
+def createTorrent(directory: str) -> TorrentMetaInfoScanner:
+    pieceHashes: List[bytes] = []
+    pendingData: bytes = b""
+    for fileIndex, fileLength in enumerate(FILE_LENGTHS):
+        with open(os.path.join(directory, "torrent", f"file{fileIndex}"), "wb") as contentFile:
+            for chunkStartOffset in range(0, fileLength, 4 * MEGABYTE):
+                chunk: bytes = os.urandom(min(4 * MEGABYTE, fileLength - chunkStartOffset))
+                contentFile.write(chunk)
+                pendingData += chunk
+                while len(pendingData) >= PIECE_LENGTH:
+                    pieceHashes.append(hashlib.sha1(pendingData[: PIECE_LENGTH]).digest())
+                    pendingData = pendingData[PIECE_LENGTH:]
+    if pendingData:
+        pieceHashes.append(hashlib.sha1(pendingData).digest())
+    info: dict = {"name": "torrent", "piece length": PIECE_LENGTH, "pieces": b"".join(pieceHashes),
+                  "files": [{"path": [f"file{fileIndex}"], "length": fileLength} for fileIndex, fileLength in enumerate(FILE_LENGTHS)]}
+    torrentFilePath: str = os.path.join(directory, "benchmark.torrent")
+    with open(torrentFilePath, "wb") as torrentFile:
+        torrentFile.write(bencode({"announce": "http://localhost/announce", "announce-list": [], "info": info}))
+    return TorrentMetaInfoScanner(torrentFilePath, directory)
+
+
+"""
+@:return the throughput, in MB/s
+"""
+def measurePieceByPieceCheck(scanner: TorrentMetaInfoScanner) -> float:
+    storage: FileHandleCache = FileHandleCache(MAX_OPEN_FILE_COUNT)
+    torrentDiskLoader: TorrentDiskLoader = TorrentDiskLoader(scanner, storage)
+    startTime: float = time.perf_counter()
+    results: List[bool] = [hashlib.sha1(torrentDiskLoader.getDataForPiece(pieceIndex)).digest() == scanner.getPieceHash(pieceIndex)
+                           for pieceIndex in range(scanner.pieceCount)]
+    elapsedTime: float = time.perf_counter() - startTime
+    storage.closeAllFiles()
+    assert all(results)
+    return sum(FILE_LENGTHS) / MEGABYTE / elapsedTime
+
+
+def measureChecker(scanner: TorrentMetaInfoScanner, threadCount: int) -> float:
+    storage: FileHandleCache = FileHandleCache(MAX_OPEN_FILE_COUNT)
+    startTime: float = time.perf_counter()
+    results: List[bool] = TorrentDiskIntegrityChecker(scanner, storage, threadCount).getPiecesWrittenOnDisk()
+    elapsedTime: float = time.perf_counter() - startTime
+    storage.closeAllFiles()
+    assert all(results)
+    return sum(FILE_LENGTHS) / MEGABYTE / elapsedTime
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory(dir=sys.argv[1] if len(sys.argv) > 1 else None) as directory:
+        os.makedirs(os.path.join(directory, "torrent"))
+        scanner: TorrentMetaInfoScanner = createTorrent(directory)
+        print(f"{scanner.pieceCount} pieces of {PIECE_LENGTH // 1024}KB in {len(FILE_LENGTHS)} files ({sum(FILE_LENGTHS) // MEGABYTE}MB), "
+              f"{os.cpu_count()} processors")
+        print(f"    piece by piece: {measurePieceByPieceCheck(scanner):.0f}MB/s")
+        for threadCount in sorted({1, 2, 4, os.cpu_count() or 1}):
+            print(f"    checker, {threadCount} thread(s): {measureChecker(scanner, threadCount):.0f}MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+import socket
+import time
+from asyncio import StreamReader
+from typing import Final, Callable, Awaitable
+import utils
+from domain.message.pieceMessage import PieceMessage
+from service.messageWithLengthAndIDFactory import MessageWithLengthAndIDFactory
+from service.peerConnection import PeerConnection
+
+"""
+Compares the peer wire readers by the number of PIECE megabytes they frame and decode per second of CPU time.
+The sending peer runs in a separate process, so only the reader is charged for CPU time.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_PeerConnection.py
+"""
+LOCALHOST: Final[str] = "127.0.0.1"
+PIECE_MESSAGE_COUNT: Final[int] = 20000  # ~312MB of blocks
+MEGABYTE: Final[int] = 1024 * 1024
+
+
+def sendPieceMessages(listeningSocket: socket.socket) -> None:
+    pieceMessage: bytes = PieceMessage(0, 0, bytes(utils.BLOCK_REQUEST_SIZE)).getMessageContent()
+    connection, _ = listeningSocket.accept()
+    with connection:
+        connection.sendall(bytes(utils.HANDSHAKE_MESSAGE_LENGTH))
+        for _ in range(PIECE_MESSAGE_COUNT):
+            connection.sendall(pieceMessage)
+
+
+"""The reading loop used by ProcessSingleTorrent before the PeerConnection framing layer"""
+async def attemptToReadBytesLegacy(reader: StreamReader, byteCount: int) -> bytes:
+    payload: bytes = b""
+    while len(payload) < byteCount:
+        newSequence: bytes = await reader.read(byteCount - len(payload))
+        if not newSequence:
+            raise ConnectionError("Error when trying to read message")
+        payload += newSequence
+    return payload
+
+
+async def readWithStreamReader(port: int) -> int:
+    receivedBlockBytes: int = 0
+    reader, writer = await asyncio.open_connection(LOCALHOST, port)
+    await attemptToReadBytesLegacy(reader, utils.HANDSHAKE_MESSAGE_LENGTH)
+    for _ in range(PIECE_MESSAGE_COUNT):
+        lengthPrefix: bytes = await attemptToReadBytesLegacy(reader, 4)
+        await attemptToReadBytesLegacy(reader, utils.MESSAGE_ID_LENGTH)
+        payload: bytes = await attemptToReadBytesLegacy(reader, utils.convert4ByteBigEndianToInteger(lengthPrefix) - utils.MESSAGE_ID_LENGTH)
+        pieceIndex, beginOffset, block = payload[:4], payload[4:8], payload[8:]  # the slicing done by the old PieceMessage
+        receivedBlockBytes += len(block)
+    writer.close()
+    return receivedBlockBytes
+
+
+async def readWithPeerConnection(port: int) -> int:
+    receivedMessages: asyncio.Queue[PieceMessage] = asyncio.Queue()
+    receivedBlockBytes: int = 0
+    _, connection = await asyncio.get_running_loop().create_connection(
+        lambda: PeerConnection(lambda messageID, payload: receivedMessages.put_nowait(MessageWithLengthAndIDFactory.getMessageFromIDAndPayload(messageID, payload))),
+        LOCALHOST, port)
+    await connection.receiveHandshake()
+    for _ in range(PIECE_MESSAGE_COUNT):
+        message: PieceMessage = await receivedMessages.get()
+        receivedBlockBytes += len(message.block)
+    connection.close()
+    return receivedBlockBytes
+
+
+"""
+@:return the number of block megabytes read per second of CPU time
+"""
+def measure(reader: Callable[[int], Awaitable[int]]) -> float:
+    listeningSocket: socket.socket = socket.create_server((LOCALHOST, 0))
+    sender: multiprocessing.Process = multiprocessing.Process(target=sendPieceMessages, args=(listeningSocket,))
+    sender.start()
+
+    startCPUTime: float = time.process_time()
+    receivedBlockBytes: int = asyncio.run(reader(listeningSocket.getsockname()[1]))
+    CPUTime: float = time.process_time() - startCPUTime
+
+    sender.join()
+    listeningSocket.close()
+    return receivedBlockBytes / MEGABYTE / CPUTime
+
+
+def main() -> None:
+    print(f"StreamReader (legacy): {measure(readWithStreamReader):.1f} MB/s per core")
+    print(f"PeerConnection: {measure(readWithPeerConnection):.1f} MB/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import random
+import statistics
+import time
+from asyncio import Future
+from typing import Final, List, Tuple, Callable, Awaitable
+import utils
+from domain.piece import Piece
+from service.pieceGenerator import PieceGenerator
+from service.pieceHasher import PieceHasher
+
+"""
+Measures the lag of the event loop and the hashing throughput while complete pieces of 4, 8 and 16MB are verified, either on the
+event loop (as receivePieceMessage did before the PieceHasher) or on the PieceHasher threads.
+The lag is how late a task which wakes up every millisecond is woken up, i.e. how long the peer connections would be stalled.
+The blocks of every piece are written in random order beforehand, so (almost) the whole piece is left for the final hash.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_PieceHasher.py
+"""
+MEGABYTE: Final[int] = 1024 * 1024
+PIECE_LENGTHS: Final[List[int]] = [4 * MEGABYTE, 8 * MEGABYTE, 16 * MEGABYTE]
+TOTAL_LENGTH: Final[int] = 128 * MEGABYTE  # hashed for every piece length
+HASHING_THREAD_COUNT: Final[int] = 2
+HASHING_QUEUE_LENGTH: Final[int] = 8
+TICK_IN_SECONDS: Final[float] = 0.001
+
+
+def createCompletePieces(pieceLength: int) -> List[Piece]:
+    pieceCount: int = TOTAL_LENGTH // pieceLength
+    pieceGenerator: PieceGenerator = PieceGenerator(pieceCount, pieceLength, pieceLength)
+    blockData: bytes = os.urandom(utils.BLOCK_REQUEST_SIZE)
+    pieces: List[Piece] = []
+    for pieceIndex in range(pieceCount):
+        piece: Piece = pieceGenerator.generatePiece(pieceIndex, bytearray(pieceLength))
+        for block in random.sample(piece.blocks, len(piece.blocks)):
+            piece.writeDataToBlock(block.beginOffset, blockData)
+        pieces.append(piece)
+    return pieces
+
+
+async def hashOnEventLoop(pieces: List[Piece]) -> None:
+    for piece in pieces:
+        piece.finishInfoHash()
+        await asyncio.sleep(0)  # the next piece message
+
+
+async def hashOnPieceHasher(pieces: List[Piece]) -> None:
+    pieceHasher: PieceHasher = PieceHasher(HASHING_THREAD_COUNT, HASHING_QUEUE_LENGTH)
+    infoHashes: List[Future[bytes]] = []
+    for piece in pieces:
+        infoHashes.append(await pieceHasher.submitPiece(piece))
+        await asyncio.sleep(0)
+    await asyncio.gather(*infoHashes)
+    pieceHasher.shutdown()
+
+
+"""
+@:return the time in seconds which the hashing took, along with the lags (in seconds) of the ticking task during that time
+"""
+async def measure(hashPieces: Callable[[List[Piece]], Awaitable[None]], pieces: List[Piece]) -> Tuple[float, List[float]]:
+    lags: List[float] = []
+    isHashingDone: bool = False
+
+    async def tick() -> None:
+        while not isHashingDone:
+            expectedWakeUpTime: float = time.perf_counter() + TICK_IN_SECONDS
+            await asyncio.sleep(TICK_IN_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - expectedWakeUpTime))
+
+    ticker: asyncio.Task = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    startTime: float = time.perf_counter()
+    await hashPieces(pieces)
+    elapsedTime: float = time.perf_counter() - startTime
+    isHashingDone = True
+    await ticker
+    return elapsedTime, lags
+
+
+async def main() -> None:
+    for pieceLength in PIECE_LENGTHS:
+        print(f"{pieceLength // MEGABYTE}MB pieces, {TOTAL_LENGTH // pieceLength} pieces:")
+        for name, hashPieces in [("on the event loop", hashOnEventLoop), (f"PieceHasher, {HASHING_THREAD_COUNT} threads", hashOnPieceHasher)]:
+            elapsedTime, lags = await measure(hashPieces, createCompletePieces(pieceLength))
+            print(f"    {name}: {TOTAL_LENGTH / MEGABYTE / elapsedTime:.0f}MB/s, loop lag median {statistics.median(lags) * 1000:.2f}ms, "
+                  f"max {max(lags) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Final, List
+from service.fileHandleCache import FileHandleCache
+from service.torrentSaver import TorrentSaver
+
+"""
+Compares the sequential read throughput of a file which was written piece by piece, in random order (as a download does), after
+being allocated with each of the allocation modes of TorrentSaver. With none, the file system allocates the blocks in the order in
+which the pieces arrive, which fragments the file on disk.
+The page cache is dropped (with posix_fadvise) before reading, so the reads hit the disk; run it on the disk of the downloads,
+since the differences do not show on tmpfs or on an SSD with a small file.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_Preallocation.py [directory]
+"""
+MEGABYTE: Final[int] = 1024 * 1024
+FILE_LENGTH: Final[int] = 512 * MEGABYTE
+PIECE_LENGTH: Final[int] = 256 * 1024
+READ_LENGTH: Final[int] = 4 * MEGABYTE
+ALLOCATION_MODES: Final[List[str]] = [TorrentSaver.NO_ALLOCATION, TorrentSaver.SPARSE_ALLOCATION, TorrentSaver.FULL_ALLOCATION]
+
+
+def dropFromPageCache(path: str) -> None:
+    if hasattr(os, "posix_fadvise"):
+        fileDescriptor: int = os.open(path, os.O_RDONLY)
+        os.fsync(fileDescriptor)
+        os.posix_fadvise(fileDescriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fileDescriptor)
+
+
+"""
+@:return the time it took to write the file, in seconds
+"""
+def writeInRandomOrder(fileHandleCache: FileHandleCache, path: str, allocationMode: str) -> float:
+    pieceData: memoryview = memoryview(os.urandom(PIECE_LENGTH))
+    pieceIndices: List[int] = list(range(FILE_LENGTH // PIECE_LENGTH))
+    random.Random(0).shuffle(pieceIndices)
+    startTime: float = time.perf_counter()
+    if allocationMode != TorrentSaver.NO_ALLOCATION:
+        fileHandleCache.allocateFile(path, FILE_LENGTH, allocationMode == TorrentSaver.SPARSE_ALLOCATION)
+    for pieceIndex in pieceIndices:
+        fileHandleCache.writeFileSectionVector(path, pieceIndex * PIECE_LENGTH, [pieceData], FILE_LENGTH)
+    fileHandleCache.closeFiles([path])
+    dropFromPageCache(path)
+    return time.perf_counter() - startTime
+
+
+"""
+@:return the sequential read throughput, in MB/s
+"""
+def readSequentially(fileHandleCache: FileHandleCache, path: str) -> float:
+    startTime: float = time.perf_counter()
+    for fileOffset in range(0, FILE_LENGTH, READ_LENGTH):
+        fileHandleCache.readFileSection(path, fileOffset, READ_LENGTH)
+    return FILE_LENGTH / MEGABYTE / (time.perf_counter() - startTime)
+
+
+def main() -> None:
+    directory: str = sys.argv[1] if len(sys.argv) > 1 else tempfile.gettempdir()
+    fileHandleCache: FileHandleCache = FileHandleCache(1)
+    print(f"{FILE_LENGTH // MEGABYTE}MB file, {PIECE_LENGTH // 1024}KB pieces written in random order, in {directory}:")
+    for allocationMode in ALLOCATION_MODES:
+        path: str = os.path.join(directory, f"benchmark_Preallocation_{allocationMode}")
+        try:
+            writeTime: float = writeInRandomOrder(fileHandleCache, path, allocationMode)
+            readThroughput: float = readSequentially(fileHandleCache, path)
+            print(f"    {allocationMode}: written in {writeTime:.2f}s, read sequentially at {readThroughput:.0f}MB/s")
+        finally:
+            fileHandleCache.closeAllFiles()
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
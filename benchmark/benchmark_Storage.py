@@ -0,0 +1,67 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Final, List, Tuple
+import utils
+from domain.message.pieceMessage import PieceMessage
+from service.fileHandleCache import FileHandleCache
+from service.mmapStorage import MmapStorage
+from service.storage import Storage
+
+"""
+Compares the storage backends on a seeding workload: blocks are read from random pieces of a complete file and turned into piece
+messages, as the uploader does. The file backend makes a pread (and a copy) for every block, while the mmap backend hands out a view
+over the mapping, which is only copied once, into the message.
+The file is written once and stays in the page cache, so this measures the cost of the reads themselves, not the disk.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_Storage.py [directory]
+"""
+MEGABYTE: Final[int] = 1024 * 1024
+FILE_LENGTH: Final[int] = 256 * MEGABYTE
+PIECE_LENGTH: Final[int] = 256 * 1024
+BLOCK_COUNT: Final[int] = 200_000
+MAX_OPEN_FILE_COUNT: Final[int] = 4
+
+
+def writeFile(path: str) -> None:
+    with open(path, "wb") as file:
+        for _ in range(FILE_LENGTH // MEGABYTE):
+            file.write(os.urandom(MEGABYTE))
+
+
+"""
+@:return the blocks which are requested, as (piece index, offset in the piece), in the order in which they are requested
+"""
+def generateRequests() -> List[Tuple[int, int]]:
+    randomGenerator: random.Random = random.Random(0)
+    return [(randomGenerator.randrange(FILE_LENGTH // PIECE_LENGTH),
+             randomGenerator.randrange(PIECE_LENGTH // utils.BLOCK_REQUEST_SIZE) * utils.BLOCK_REQUEST_SIZE) for _ in range(BLOCK_COUNT)]
+
+
+"""
+@:return the upload throughput, in MB/s
+"""
+def measureSeeding(storage: Storage, path: str, requests: List[Tuple[int, int]]) -> float:
+    startTime: float = time.perf_counter()
+    for pieceIndex, beginOffset in requests:
+        block: bytes | memoryview = storage.readFileSection(path, pieceIndex * PIECE_LENGTH + beginOffset, utils.BLOCK_REQUEST_SIZE)
+        PieceMessage(pieceIndex, beginOffset, block).getMessageContent()
+    elapsedTime: float = time.perf_counter() - startTime
+    storage.closeAllFiles()
+    return BLOCK_COUNT * utils.BLOCK_REQUEST_SIZE / MEGABYTE / elapsedTime
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory(dir=sys.argv[1] if len(sys.argv) > 1 else None) as directory:
+        path: str = os.path.join(directory, "content")
+        writeFile(path)
+        requests: List[Tuple[int, int]] = generateRequests()
+        print(f"{BLOCK_COUNT} random blocks of {utils.BLOCK_REQUEST_SIZE // 1024}KB from a {FILE_LENGTH // MEGABYTE}MB file")
+        for storage in [FileHandleCache(MAX_OPEN_FILE_COUNT), MmapStorage(MAX_OPEN_FILE_COUNT)]:
+            measureSeeding(storage, path, requests[: BLOCK_COUNT // 10])  # warms up the page cache and the mapping
+            print(f"    {type(storage).__name__}: {measureSeeding(storage, path, requests):.0f}MB/s")
+
+
+if __name__ == "__main__":
+    main()
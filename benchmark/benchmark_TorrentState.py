@@ -0,0 +1,87 @@
+import math
+import time
+import tracemalloc
+from typing import Final, List, Tuple, Callable
+from bitarray import bitarray
+import utils
+from domain.block import Block
+from domain.peer import Peer
+from domain.piece import Piece
+from service.pieceBufferPool import PieceBufferPool
+from service.piecePicker import PiecePicker
+from service.torrentState import TorrentState
+
+"""
+Measures the memory and the startup time of the download state for synthetic torrents of 1GB, 100GB and 1TB.
+The legacy state (a Piece and a Block object for every 16KB, generated up front) is only measured for 1GB, since for the larger
+torrents it would need several GB of memory.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_TorrentState.py
+"""
+GIGABYTE: Final[int] = 1024 ** 3
+MEGABYTE: Final[int] = 1024 ** 2
+# (name, total size, piece length); the piece lengths follow the usual choices of torrent creators for these sizes
+TORRENT_SIZES: Final[List[Tuple[str, int, int]]] = [("1GB", GIGABYTE, MEGABYTE // 4), ("100GB", 100 * GIGABYTE, 4 * MEGABYTE),
+                                                    ("1TB", 1024 * GIGABYTE, 16 * MEGABYTE)]
+LEGACY_SIZE_LIMIT: Final[int] = GIGABYTE
+
+
+"""The piece generation done by PieceGenerator before the compact torrent state"""
+def generateLegacyPieces(totalSize: int, pieceLength: int) -> List[Piece]:
+    pieceCount: int = math.ceil(totalSize / pieceLength)
+    finalPieceLength: int = totalSize - (pieceCount - 1) * pieceLength
+    pieceList: List[Piece] = []
+    for pieceIndex in range(pieceCount):
+        currentPieceLength: int = finalPieceLength if pieceIndex == pieceCount - 1 else pieceLength
+        blockCount: int = math.ceil(currentPieceLength / utils.BLOCK_REQUEST_SIZE)
+        pieceList.append(Piece(pieceIndex, [Block(pieceIndex, blockIndex * utils.BLOCK_REQUEST_SIZE,
+                                                  min(utils.BLOCK_REQUEST_SIZE, currentPieceLength - blockIndex * utils.BLOCK_REQUEST_SIZE))
+                                            for blockIndex in range(blockCount)], bytearray()))
+    return pieceList
+
+
+"""
+Creates the download state, as done when a torrent is added, and lets a seed connect
+@:return the objects which make up the state, so that they stay alive while the memory is measured
+"""
+def createCompactState(totalSize: int, pieceLength: int) -> Tuple[TorrentState, PiecePicker]:
+    pieceCount: int = math.ceil(totalSize / pieceLength)
+    torrentState: TorrentState = TorrentState(pieceCount, pieceLength, totalSize - (pieceCount - 1) * pieceLength,
+                                              PieceBufferPool(pieceLength, 1))
+    torrentState.setDownloadedPieces([False] * pieceCount)
+    piecePicker: PiecePicker = PiecePicker(torrentState)
+    piecePicker.setDownloadedPieces(torrentState.downloadedPieces)
+    seed: Peer = Peer(1, 1)
+    seed.availablePieces.extend(bitarray(pieceCount))
+    seed.availablePieces.setall(True)
+    piecePicker.addPeerPieces(seed)
+    piecePicker.pickBlock(seed.availablePieces)
+    return torrentState, piecePicker
+
+
+"""
+@:return the startup time in seconds and the memory taken by the created objects, in MB
+"""
+def measure(createState: Callable[[], object]) -> Tuple[float, float]:
+    tracemalloc.start()
+    startTime: float = time.perf_counter()
+    state: object = createState()
+    startupTime: float = time.perf_counter() - startTime
+    memory: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del state
+    return startupTime, memory / MEGABYTE
+
+
+def main() -> None:
+    for name, totalSize, pieceLength in TORRENT_SIZES:
+        pieceCount: int = math.ceil(totalSize / pieceLength)
+        print(f"{name}: {pieceCount} pieces of {pieceLength // 1024}KB, {math.ceil(totalSize / utils.BLOCK_REQUEST_SIZE)} blocks")
+        if totalSize <= LEGACY_SIZE_LIMIT:
+            startupTime, memory = measure(lambda: generateLegacyPieces(totalSize, pieceLength))
+            print(f"    legacy (all Piece and Block objects): {startupTime:.3f}s, {memory:.1f}MB")
+        startupTime, memory = measure(lambda: createCompactState(totalSize, pieceLength))
+        print(f"    compact torrent state: {startupTime:.3f}s, {memory:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
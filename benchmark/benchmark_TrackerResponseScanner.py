@@ -0,0 +1,79 @@
+import random
+import time
+from typing import Final, List, Tuple, Callable, Any
+from bencode3 import bdecode, bencode
+from domain.peer import Peer
+from domain.peerTable import PeerTable
+from service.trackerResponseScanner import TrackerResponseScanner
+
+"""
+Compares the parsing of tracker responses with many compact peers: the byte by byte decoding done by TrackerResponseScanner before
+the PeerTable, which created a Peer object for every peer, against the decoding of all the peers at once into a PeerTable.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_TrackerResponseScanner.py
+"""
+PEER_COUNTS: Final[List[int]] = [1000, 10000, 50000]
+REPETITIONS: Final[int] = 5
+PEERS_PART_HEADER: Final[bytes] = b"5:peers"
+
+
+"""The decoding done by TrackerResponseScanner.__computePeersBinaryModel before the PeerTable"""
+def computePeersBinaryModelLegacy(peersPart: bytearray) -> List[Peer]:
+    peerAddressList: List[Peer] = []
+    currentIndex: int = len(PEERS_PART_HEADER)
+    peersByteCount: int = 0
+    while 48 <= peersPart[currentIndex] <= 57:
+        peersByteCount = peersByteCount * 10 + peersPart[currentIndex] - 48
+        currentIndex += 1
+    currentIndex += 1
+    for _ in range(peersByteCount // 6):
+        currentIP = peersPart[currentIndex] * 256**3 + peersPart[currentIndex + 1] * 256**2 + peersPart[currentIndex + 2] * 256 + peersPart[currentIndex + 3]
+        currentPort = peersPart[currentIndex + 4] * 256 + peersPart[currentIndex + 5]
+        peerAddressList.append(Peer(currentIP, currentPort))
+        currentIndex += 6
+    return peerAddressList
+
+
+"""The parsing done by TrackerResponseScanner.__scanTrackerResponseBinaryModel before the PeerTable"""
+def scanTrackerResponseLegacy(responseBytes: bytes) -> Tuple[dict, List[Peer]]:
+    responseAsByteArray: bytearray = bytearray(responseBytes)
+    peersPartStartingPosition: int = responseAsByteArray.find(PEERS_PART_HEADER)
+    peersPart: bytearray = responseAsByteArray[peersPartStartingPosition: -1]
+    nonPeersPart: dict = bdecode(responseAsByteArray.replace(peersPart, b""))
+    return nonPeersPart, computePeersBinaryModelLegacy(peersPart)
+
+
+"""
+@:return the number of seconds a parsing takes, the best out of a few
+"""
+def measure(scanTrackerResponse: Callable[[bytes], Any], responseBytes: bytes) -> float:
+    bestTime: float = float("inf")
+    for _ in range(REPETITIONS):
+        startTime: float = time.perf_counter()
+        scanTrackerResponse(responseBytes)
+        bestTime = min(bestTime, time.perf_counter() - startTime)
+    return bestTime
+
+
+def main() -> None:
+    randomGenerator: random.Random = random.Random(0)
+    for peerCount in PEER_COUNTS:
+        compactPeers: bytes = randomGenerator.randbytes(6 * peerCount)
+        compactIPv6Peers: bytes = randomGenerator.randbytes(18 * peerCount)
+        responseBytes: bytes = bencode({"interval": 1800, "min interval": 900, "peers": compactPeers})
+        _, legacyPeers = scanTrackerResponseLegacy(responseBytes)
+        _, peerTable = TrackerResponseScanner.scanTrackerResponse(responseBytes)
+        assert list(peerTable) == legacyPeers
+        print(f"{peerCount} peers:")
+        print(f"    byte by byte, a Peer for each: {measure(scanTrackerResponseLegacy, responseBytes) * 1000:.2f} ms")
+        print(f"    PeerTable: {measure(TrackerResponseScanner.scanTrackerResponse, responseBytes) * 1000:.2f} ms")
+        print(f"    PeerTable, then a Peer for each: "
+              f"{measure(lambda response: list(TrackerResponseScanner.scanTrackerResponse(response)[1]), responseBytes) * 1000:.2f} ms")
+        dualStackResponseBytes: bytes = bencode({"interval": 1800, "peers": compactPeers, "peers6": compactIPv6Peers})
+        assert len(TrackerResponseScanner.scanTrackerResponse(dualStackResponseBytes)[1]) == 2 * peerCount
+        print(f"    PeerTable, with as many IPv6 peers (peers6): {measure(TrackerResponseScanner.scanTrackerResponse, dualStackResponseBytes) * 1000:.2f} ms")
+        mergeTime: float = measure(lambda response: PeerTable.merge([peerTable, TrackerResponseScanner.scanTrackerResponse(response)[1]]), responseBytes)
+        print(f"    PeerTable, merged with the same peers from another tracker: {mergeTime * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
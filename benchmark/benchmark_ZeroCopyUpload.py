@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from typing import Final, List, Tuple
+import utils
+from domain.message.pieceMessage import PieceMessage
+from service.fileHandleCache import FileHandleCache
+from service.peerConnection import PeerConnection
+
+"""
+Compares the seeding throughput per core of the buffered upload path (the block is read into memory and joined with the header of
+its PIECE message) and of the zero-copy path (the header is written, then the block goes from the file to the socket with
+sendfile). The leecher runs in a separate process, so only the seeder is charged for CPU time; the file stays in the page cache.
+Run from the repository root: PYTHONPATH=src python benchmark/benchmark_ZeroCopyUpload.py [directory]
+"""
+LOCALHOST: Final[str] = "127.0.0.1"
+MEGABYTE: Final[int] = 1024 * 1024
+FILE_LENGTH: Final[int] = 256 * MEGABYTE
+BLOCK_COUNT: Final[int] = 40000  # ~625MB of blocks
+
+
+def receiveAll(listeningSocket: socket.socket) -> None:
+    connection, _ = listeningSocket.accept()
+    with connection:
+        connection.sendall(bytes(utils.HANDSHAKE_MESSAGE_LENGTH))
+        while connection.recv(1024 * 1024):
+            pass
+
+
+async def sendBuffered(connection: PeerConnection, fileHandleCache: FileHandleCache, path: str, fileOffset: int) -> None:
+    block: bytes = fileHandleCache.readFileSection(path, fileOffset, utils.BLOCK_REQUEST_SIZE)
+    connection.write(PieceMessage(0, 0, block).getMessageContent())
+    await connection.drain()
+
+
+async def sendZeroCopy(connection: PeerConnection, fileHandleCache: FileHandleCache, path: str, fileOffset: int) -> None:
+    await connection.sendFileSection(PieceMessage.createMessageHeader(0, 0, utils.BLOCK_REQUEST_SIZE), fileHandleCache, path, fileOffset,
+                                     utils.BLOCK_REQUEST_SIZE)
+
+
+"""
+@:return the megabytes of blocks sent per second of CPU time, and per second of wall time
+"""
+async def measure(sendBlock, path: str, fileOffsets: List[int]) -> Tuple[float, float]:
+    listeningSocket: socket.socket = socket.create_server((LOCALHOST, 0))
+    leecher: multiprocessing.Process = multiprocessing.Process(target=receiveAll, args=(listeningSocket,))
+    leecher.start()
+    _, connection = await asyncio.get_running_loop().create_connection(lambda: PeerConnection(lambda messageID, payload: None),
+                                                                       LOCALHOST, listeningSocket.getsockname()[1])
+    await connection.receiveHandshake()
+    fileHandleCache: FileHandleCache = FileHandleCache(1)
+    startCPUTime, startTime = time.process_time(), time.perf_counter()
+    for fileOffset in fileOffsets:
+        await sendBlock(connection, fileHandleCache, path, fileOffset)
+    cpuTime, elapsedTime = time.process_time() - startCPUTime, time.perf_counter() - startTime
+    connection.close()
+    await connection.waitClosed()
+    leecher.join()
+    listeningSocket.close()
+    fileHandleCache.closeAllFiles()
+    sentMegabytes: float = len(fileOffsets) * utils.BLOCK_REQUEST_SIZE / MEGABYTE
+    return sentMegabytes / cpuTime, sentMegabytes / elapsedTime
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory(dir=sys.argv[1] if len(sys.argv) > 1 else None) as directory:
+        path: str = os.path.join(directory, "content")
+        with open(path, "wb") as file:
+            for _ in range(FILE_LENGTH // MEGABYTE):
+                file.write(os.urandom(MEGABYTE))
+        randomGenerator: random.Random = random.Random(0)
+        fileOffsets: List[int] = [randomGenerator.randrange(FILE_LENGTH // utils.BLOCK_REQUEST_SIZE) * utils.BLOCK_REQUEST_SIZE
+                                  for _ in range(BLOCK_COUNT)]
+        print(f"{BLOCK_COUNT} random blocks of {utils.BLOCK_REQUEST_SIZE // 1024}KB over a local connection")
+        for name, sendBlock in [("buffered", sendBuffered), ("zero-copy (sendfile)", sendZeroCopy)]:
+            perCoreThroughput, throughput = await measure(sendBlock, path, fileOffsets)
+            print(f"    {name}: {perCoreThroughput:.0f}MB/s per core, {throughput:.0f}MB/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,15 @@
 class Block:
+    """
+    The position of a block inside its piece, along with its download state; the data of the block is kept by its piece
+    """
     def __init__(self, pieceIndex: int, beginOffset: int, length: int):
         self.__pieceIndex: int = pieceIndex
         self.__beginOffset: int = beginOffset
         self.__length: int = length
-        self.__data: bytes = b""
         self.__isComplete: bool = False
 
-    def clear(self) -> None:
-        self.__data = None
-
-    def writeData(self, data: bytes) -> None:
-        self.__data = data
-        if len(data) == self.__length:
-            self.__isComplete = True
+    def markAsComplete(self) -> None:
+        self.__isComplete = True
 
     @property
     def pieceIndex(self) -> int:
@@ -26,10 +23,6 @@ class Block:
     def length(self) -> int:
         return self.__length
 
-    @property
-    def data(self) -> bytes:
-        return self.__data
-
     @property
     def isComplete(self) -> bool:
         return self.__isComplete
@@ -37,9 +30,10 @@ class Block:
     def __str__(self) -> str:
         return f"Block starting at {self.__beginOffset} of length {self.__length} inside piece {self.__pieceIndex}"
 
+    # the position of the block determines it, the download state is not compared
     def __eq__(self, other) -> bool:
         return isinstance(other, Block) and self.__pieceIndex == other.pieceIndex and self.__beginOffset == other.beginOffset \
-               and self.__length == other.length and self.__data == other.data
+               and self.__length == other.length
 
     def __hash__(self) -> int:
-        return hash((self.__pieceIndex, self.__beginOffset, self.__length, self.__data))
+        return hash((self.__pieceIndex, self.__beginOffset, self.__length))
@@ -0,0 +1,130 @@
+import os
+import threading
+from typing import Final, List
+
+
+class FileHandle:
+    """
+    An open file, shared by all the reads and writes made to it. Positional I/O (pread / pwrite) is used, so that the users of the
+    handle do not depend on (or change) a file position; where it is not available (i.e. on Windows), the seek and the read / write
+    are done together under a lock
+    """
+    BINARY_MODE_FLAG: Final[int] = getattr(os, "O_BINARY", 0)  # only defined (and needed) on Windows
+    HAS_POSITIONAL_IO: Final[bool] = hasattr(os, "pread") and hasattr(os, "pwrite")
+    HAS_VECTORED_IO: Final[bool] = hasattr(os, "pwritev")
+    HAS_FALLOCATE: Final[bool] = hasattr(os, "posix_fallocate")
+    HAS_FADVISE: Final[bool] = hasattr(os, "posix_fadvise")
+    HAS_FDATASYNC: Final[bool] = hasattr(os, "fdatasync")
+
+    def __init__(self, path: str, isWritable: bool):
+        flags: int = os.O_RDWR | os.O_CREAT if isWritable else os.O_RDONLY
+        self.__path: str = path
+        self.__isWritable: bool = isWritable
+        self.__fileDescriptor: int = os.open(path, flags | self.BINARY_MODE_FLAG)
+        self.__positionLock: threading.Lock = threading.Lock()
+        self.userCount: int = 0  # the reads and writes in progress; the handle can only be closed when there are none
+        self.isClosing: bool = False  # the handle will be closed as soon as it is no longer used
+
+    """
+    @:return the data read, which is shorter than requested only if the end of the file was reached
+    """
+    def read(self, fileOffset: int, length: int) -> bytes:
+        if self.HAS_POSITIONAL_IO:
+            return os.pread(self.__fileDescriptor, length, fileOffset)
+        with self.__positionLock:
+            os.lseek(self.__fileDescriptor, fileOffset, os.SEEK_SET)
+            return os.read(self.__fileDescriptor, length)
+
+    """
+    @:return the number of bytes written
+    """
+    def write(self, fileOffset: int, data: bytes | memoryview) -> int:
+        if self.HAS_POSITIONAL_IO:
+            return os.pwrite(self.__fileDescriptor, data, fileOffset)
+        with self.__positionLock:
+            os.lseek(self.__fileDescriptor, fileOffset, os.SEEK_SET)
+            return os.write(self.__fileDescriptor, data)
+
+    """
+    Writes several buffers one after another, with as few system calls as possible (a single pwritev, unless it writes partially)
+    @:raise OSError - if the data cannot be written
+    """
+    def writeVector(self, fileOffset: int, buffers: List[memoryview]) -> None:
+        buffers = list(buffers)
+        bufferIndex: int = 0  # the buffers before it were written entirely
+        while bufferIndex < len(buffers):
+            writtenByteCount: int
+            if self.HAS_VECTORED_IO:
+                writtenByteCount = os.pwritev(self.__fileDescriptor, buffers[bufferIndex:], fileOffset)
+            else:
+                writtenByteCount = self.write(fileOffset, buffers[bufferIndex])
+            if writtenByteCount == 0:
+                raise OSError(f"Could not write to {self.__path}")
+            fileOffset += writtenByteCount
+            while bufferIndex < len(buffers) and writtenByteCount >= len(buffers[bufferIndex]):
+                writtenByteCount -= len(buffers[bufferIndex])
+                bufferIndex += 1
+            if writtenByteCount > 0:
+                buffers[bufferIndex] = buffers[bufferIndex][writtenByteCount:]
+
+    """
+    Gives the file its final length, if it is shorter; the space is not allocated (i.e. the file is sparse, where supported)
+    """
+    def resize(self, length: int) -> None:
+        if os.fstat(self.__fileDescriptor).st_size < length:
+            os.ftruncate(self.__fileDescriptor, length)
+
+    """
+    Allocates the disk space of the whole file up front, so that the file system can lay it out contiguously; where this is not
+    supported, the file is only resized
+    @:raise OSError - if there is not enough space
+    """
+    def allocate(self, length: int) -> None:
+        if self.HAS_FALLOCATE:
+            os.posix_fallocate(self.__fileDescriptor, 0, length)
+        else:
+            self.resize(length)
+
+    """
+    Lets the system read ahead more of the file, since it will be read sequentially; where this is not supported, nothing is done
+    """
+    def adviseSequentialRead(self) -> None:
+        if self.HAS_FADVISE:
+            os.posix_fadvise(self.__fileDescriptor, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    """
+    Lets the system start reading a section of the file into its page cache, without waiting for it; where this is not supported,
+    nothing is done
+    """
+    def adviseWillRead(self, fileOffset: int, length: int) -> None:
+        if self.HAS_FADVISE:
+            os.posix_fadvise(self.__fileDescriptor, fileOffset, length, os.POSIX_FADV_WILLNEED)
+
+    """
+    Waits until the data written to the file (by any handle) is on disk; only the metadata needed to read it back (e.g. the size)
+    is flushed along with it, where this is supported
+    """
+    def flush(self) -> None:
+        if self.HAS_FDATASYNC:
+            os.fdatasync(self.__fileDescriptor)
+        else:
+            os.fsync(self.__fileDescriptor)
+
+    def close(self) -> None:
+        os.close(self.__fileDescriptor)
+
+    @property
+    def fileDescriptor(self) -> int:
+        return self.__fileDescriptor
+
+    @property
+    def size(self) -> int:
+        return os.fstat(self.__fileDescriptor).st_size
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def isWritable(self) -> bool:
+        return self.__isWritable
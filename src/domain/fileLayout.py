@@ -0,0 +1,54 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+from domain.file import File
+
+
+class FileLayout:
+    """
+    The position of every file inside the content of a torrent (the files are laid out one after another), stored as the
+    cumulative end offsets of the files. A byte range of the content is resolved to the sections of the files which hold it
+    with a binary search, so the cost does not depend on the number of files in the torrent
+    """
+    def __init__(self, files: List[File]):
+        self.__files: List[File] = files
+        self.__fileEndOffsets: array = array("q")
+        fileEndOffset: int = 0
+        for file in files:
+            fileEndOffset += file.length
+            self.__fileEndOffsets.append(fileEndOffset)
+
+    """
+    Determines the file sections which hold a byte range of the content
+    @:param startOffset - the offset, inside the content of the torrent, at which the range starts
+    @:param length - the length of the range
+    @:return a list of tuples, in the order of the content, each of which contains:
+        file - a file which holds part of the range (empty files are skipped)
+        file offset - the position inside the file at which the section starts
+        section length - the length of the section
+    """
+    def getFileSections(self, startOffset: int, length: int) -> List[Tuple[File, int, int]]:
+        fileSections: List[Tuple[File, int, int]] = []
+        endOffset: int = min(startOffset + length, self.totalLength)
+        fileIndex: int = bisect_right(self.__fileEndOffsets, startOffset)  # the first file which ends after the start of the range
+        currentOffset: int = startOffset
+        while currentOffset < endOffset:
+            file: File = self.__files[fileIndex]
+            fileStartOffset: int = self.__fileEndOffsets[fileIndex] - file.length
+            sectionEndOffset: int = min(endOffset, self.__fileEndOffsets[fileIndex])
+            if sectionEndOffset > currentOffset:
+                fileSections.append((file, currentOffset - fileStartOffset, sectionEndOffset - currentOffset))
+                currentOffset = sectionEndOffset
+            fileIndex += 1
+        return fileSections
+
+    """
+    @:return the offset, inside the content of the torrent, at which a file starts, and the length of the file
+    """
+    def getFileRange(self, fileIndex: int) -> Tuple[int, int]:
+        fileLength: int = self.__files[fileIndex].length
+        return self.__fileEndOffsets[fileIndex] - fileLength, fileLength
+
+    @property
+    def totalLength(self) -> int:
+        return self.__fileEndOffsets[-1] if self.__fileEndOffsets else 0
@@ -0,0 +1,71 @@
+import mmap
+from typing import List
+from domain.fileHandle import FileHandle
+
+
+class MappedFile:
+    """
+    A file mapped in memory: reading returns a view over the mapping, and writing copies the data into it, so neither needs a
+    system call. The mapping is released when the last view over it is gone, so it is never closed explicitly.
+    A writable mapping must cover the section being written, so a file which is too short is extended first: at least doubled
+    (up to its final length), so that the writes past its end do not remap it every time
+    @:param minimumLength - the length which a writable mapping must have
+    @:param finalLength - the length the file will have once it is complete
+    @:param allocatesDiskSpace - True to allocate the disk space of the extension, False to leave it sparse. Writing into a mapped
+    page which has no disk space behind it (e.g. the disk is full) crashes the process instead of raising an error, which only the
+    full allocation rules out
+    """
+    def __init__(self, path: str, isWritable: bool, minimumLength: int = 0, finalLength: int = 0, allocatesDiskSpace: bool = False):
+        fileHandle: FileHandle = FileHandle(path, isWritable)
+        try:
+            currentLength: int = fileHandle.size
+            if isWritable and currentLength < minimumLength:
+                newLength: int = max(minimumLength, min(2 * currentLength, finalLength))
+                if allocatesDiskSpace:
+                    fileHandle.allocate(newLength)
+                else:
+                    fileHandle.resize(newLength)
+            self.__length: int = fileHandle.size
+            self.__mapping: mmap.mmap | None = None  # an empty file cannot be mapped
+            if self.__length > 0:
+                self.__mapping = mmap.mmap(fileHandle.fileDescriptor, self.__length, access=mmap.ACCESS_WRITE if isWritable else mmap.ACCESS_READ)
+        finally:
+            fileHandle.close()  # the mapping keeps its own reference to the file
+        self.__view: memoryview = memoryview(self.__mapping if self.__mapping is not None else b"")
+        self.__isWritable: bool = isWritable
+
+    """
+    @:return a view over the mapping, which is shorter than requested only if the end of the file was reached
+    """
+    def read(self, fileOffset: int, length: int) -> memoryview:
+        return self.__view[fileOffset: fileOffset + length]
+
+    """
+    Copies several buffers one after another into the mapping; the mapping must be long enough to hold them
+    """
+    def writeVector(self, fileOffset: int, buffers: List[memoryview]) -> None:
+        for buffer in buffers:
+            self.__view[fileOffset: fileOffset + len(buffer)] = buffer
+            fileOffset += len(buffer)
+
+    """
+    Lets the system read ahead more of the file, since it will be read sequentially; where this is not supported, nothing is done
+    """
+    def adviseSequentialRead(self) -> None:
+        if self.__mapping is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.__mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+    """
+    Writes the modified pages of the mapping to the file
+    """
+    def flush(self) -> None:
+        if self.__mapping is not None and self.__isWritable:
+            self.__mapping.flush()
+
+    @property
+    def length(self) -> int:
+        return self.__length
+
+    @property
+    def isWritable(self) -> bool:
+        return self.__isWritable
@@ -15,8 +15,8 @@ class BitfieldMessage(MessageWithLengthAndID):
     def getMessageContent(self) -> bytes:
         return super().getMessageContent() + self.__bitfield
 
-    def setMessagePropertiesFromPayload(self, payload: bytes) -> None:
-        self.__bitfield = payload
+    def setMessagePropertiesFromPayload(self, payload: bytes | memoryview) -> None:
+        self.__bitfield = bytes(payload)
 
     @property
     def bitfield(self) -> bytes:
@@ -9,8 +9,8 @@ class Message(ABC):  # ABC = abstract base class
 
     async def send(self, otherPeer: Peer) -> None:
         try:
-            otherPeer.streamWriter.write(self.getMessageContent())
-            await otherPeer.streamWriter.drain()
+            otherPeer.connection.write(self.getMessageContent())
+            await otherPeer.connection.drain()
         except Exception as e:
             pass  # TODO - log the exception
 
@@ -13,7 +13,7 @@ class MessageWithLengthAndID(Message):
         return self._lengthPrefix + self._messageID
 
     # same thing here - there are no properties to be set on choke / unchoke..
-    def setMessagePropertiesFromPayload(self, payload: bytes) -> None:
+    def setMessagePropertiesFromPayload(self, payload: bytes | memoryview) -> None:
         pass
 
     @property
@@ -9,20 +9,30 @@ class PieceMessage(MessageWithLengthAndID):
     BEGIN_OFFSET_LENGTH: Final[int] = 4  # bytes
     BASE_LENGTH_PREFIX: Final[int] = utils.MESSAGE_ID_LENGTH + PIECE_INDEX_LENGTH + BEGIN_OFFSET_LENGTH
 
-    def __init__(self, pieceIndex: int = 0, beginOffset: int = 0, block: bytes = b""):
+    def __init__(self, pieceIndex: int = 0, beginOffset: int = 0, block: bytes | memoryview = b""):
         # pieceIndex and beginOffset are 0-indexed
         super().__init__(self.BASE_LENGTH_PREFIX + len(block), self.MESSAGE_ID)
         self.__pieceIndex: bytes = utils.convertIntegerTo4ByteBigEndian(pieceIndex)
         self.__beginOffset: bytes = utils.convertIntegerTo4ByteBigEndian(beginOffset)
-        self.__block: bytes = block
+        self.__block: bytes | memoryview = block
+
+    """
+    The part of a PIECE message which precedes its block, for sending the block separately (e.g. straight from its file)
+    """
+    @staticmethod
+    def createMessageHeader(pieceIndex: int, beginOffset: int, blockLength: int) -> bytes:
+        return (utils.convertIntegerTo4ByteBigEndian(PieceMessage.BASE_LENGTH_PREFIX + blockLength) + utils.convertIntegerTo1Byte(PieceMessage.MESSAGE_ID)
+                + utils.convertIntegerTo4ByteBigEndian(pieceIndex) + utils.convertIntegerTo4ByteBigEndian(beginOffset))
 
     def getMessageContent(self) -> bytes:
         return super().getMessageContent() + self.__pieceIndex + self.__beginOffset + self.__block
 
-    def setMessagePropertiesFromPayload(self, payload: bytes) -> None:
-        self.__pieceIndex = payload[: self.PIECE_INDEX_LENGTH]
-        self.__beginOffset = payload[self.PIECE_INDEX_LENGTH: self.PIECE_INDEX_LENGTH + self.BEGIN_OFFSET_LENGTH]
-        self.__block = payload[self.PIECE_INDEX_LENGTH + self.BEGIN_OFFSET_LENGTH:]
+    # the block is kept as a view over the received payload, so that the data is not copied before being written to its piece
+    def setMessagePropertiesFromPayload(self, payload: bytes | memoryview) -> None:
+        payloadView: memoryview = memoryview(payload)
+        self.__pieceIndex = payloadView[: self.PIECE_INDEX_LENGTH].tobytes()
+        self.__beginOffset = payloadView[self.PIECE_INDEX_LENGTH: self.PIECE_INDEX_LENGTH + self.BEGIN_OFFSET_LENGTH].tobytes()
+        self.__block = payloadView[self.PIECE_INDEX_LENGTH + self.BEGIN_OFFSET_LENGTH:]
 
     @property
     def pieceIndex(self) -> bytes:
@@ -33,7 +43,7 @@ class PieceMessage(MessageWithLengthAndID):
         return self.__beginOffset
 
     @property
-    def block(self) -> bytes:
+    def block(self) -> bytes | memoryview:
         return self.__block
 
     def __str__(self) -> str:
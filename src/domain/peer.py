@@ -1,24 +1,27 @@
-from asyncio import StreamReader, StreamWriter
-from typing import List
+from typing import Set, TYPE_CHECKING
 from bitarray import bitarray
 import utils
 from domain.block import Block
+from domain.peerTransferStatistics import PeerTransferStatistics
+
+if TYPE_CHECKING:
+    from service.peerConnection import PeerConnection
 
 
 class Peer:
-    def __init__(self, IP: int = 0, port: int = 0):
+    def __init__(self, IP: int = 0, port: int = 0, isIPv6: bool = False):
         # IP + port uniquely determine the peer (for example, __eq__ won't check choking / interested, same for __hash__)
         self.__IP: int = IP
         self.__port: int = port
+        self.__isIPv6: bool = isIPv6
         self.__amChokingIt: bool = True
         self.__isChokingMe: bool = True
         self.__amInterestedInIt: bool = False
         self.__isInterestedInMe: bool = False
         self.__availablePieces: bitarray = bitarray()
-        self.__streamReader: StreamReader | None = None
-        self.__streamWriter: StreamWriter | None = None
-        self.__blocksRequestedFromPeer: List[Block] = []
-        self.__blocksRequestedByPeer: List[Block] = []
+        self.__connection: 'PeerConnection | None' = None
+        self.__blocksRequestedByPeer: Set[Block] = set()
+        self.__transferStatistics: PeerTransferStatistics = PeerTransferStatistics()
 
     @property
     def IP(self) -> int:
@@ -28,6 +31,10 @@ class Peer:
     def port(self) -> int:
         return self.__port
 
+    @property
+    def isIPv6(self) -> bool:
+        return self.__isIPv6
+
     @property
     def amChokingIt(self) -> bool:
         return self.__amChokingIt
@@ -69,47 +76,40 @@ class Peer:
         self.__availablePieces = newValue
 
     @property
-    def streamReader(self) -> StreamReader:
-        return self.__streamReader
-
-    @streamReader.setter
-    def streamReader(self, newReader: StreamReader) -> None:
-        self.__streamReader = newReader
-
-    @property
-    def streamWriter(self) -> StreamWriter:
-        return self.__streamWriter
+    def connection(self) -> 'PeerConnection':
+        return self.__connection
 
-    @streamWriter.setter
-    def streamWriter(self, newWriter: StreamWriter) -> None:
-        self.__streamWriter = newWriter
+    @connection.setter
+    def connection(self, newConnection: 'PeerConnection') -> None:
+        self.__connection = newConnection
 
     @property
-    def blocksRequestedFromPeer(self) -> List[Block]:
-        return self.__blocksRequestedFromPeer
+    def blocksRequestedByPeer(self) -> Set[Block]:
+        return self.__blocksRequestedByPeer
 
     @property
-    def blocksRequestedByPeer(self) -> List[Block]:
-        return self.__blocksRequestedByPeer
+    def transferStatistics(self) -> PeerTransferStatistics:
+        return self.__transferStatistics
 
     async def closeConnection(self) -> None:
         if self.hasActiveConnection():
             try:
-                await utils.closeConnection((self.__streamReader, self.__streamWriter))
+                self.__connection.close()
+                await self.__connection.waitClosed()
             except Exception as e:
                 pass  # TODO - log the exception
-        self.__streamReader, self.__streamWriter = None, None
+        self.__connection = None
 
     def hasActiveConnection(self) -> bool:
-        return self.__streamReader is not None and self.__streamWriter is not None
+        return self.__connection is not None
 
     def __str__(self) -> str:
-        return utils.convertIPFromIntToString(self.__IP) + f""":{self.__port};
+        return utils.convertIPFromIntToString(self.__IP, self.__isIPv6) + f""":{self.__port};
             amChokingIt={self.__amChokingIt}; isChokingMe={self.__isChokingMe};
             amInterestedInIt={self.__amInterestedInIt}; isInterestedInMe={self.__isInterestedInMe};"""
 
     def __eq__(self, other):
-        return isinstance(other, Peer) and self.__IP == other.IP and self.__port == other.port
+        return isinstance(other, Peer) and self.__IP == other.IP and self.__port == other.port and self.__isIPv6 == other.isIPv6
 
     def __hash__(self):
-        return hash((self.__IP, self.__port))
+        return hash((self.__IP, self.__port, self.__isIPv6))
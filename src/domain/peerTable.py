@@ -0,0 +1,101 @@
+import sys
+from array import array
+from typing import Final, Iterator, Iterable, Tuple
+from domain.peer import Peer
+
+
+class PeerTable:
+    """
+    The addresses of the peers given by trackers, kept compact: the IPv4 addresses and all the ports in arrays of integers, and the
+    IPv6 addresses one after another in a byte array, rather than as a Peer object for each of them (a tracker can give thousands).
+    A compact peer list (BEP 23, or BEP 7 for IPv6) is decoded field by field, each field of all the peers at once with strided copies
+    (which run in C), instead of peer by peer. The Peer objects are only created when the table is iterated
+    """
+    IPV4_ADDRESS_LENGTH: Final[int] = 4
+    IPV6_ADDRESS_LENGTH: Final[int] = 16
+    PORT_LENGTH: Final[int] = 2
+    IPV4_ADDRESS_TYPE_CODE: Final[str] = next(typeCode for typeCode in "ILQ" if array(typeCode).itemsize == 4)
+    PORT_TYPE_CODE: Final[str] = "H"
+
+    def __init__(self):
+        self.__IPv4Addresses: array = array(self.IPV4_ADDRESS_TYPE_CODE)
+        self.__IPv4Ports: array = array(self.PORT_TYPE_CODE)
+        self.__IPv6Addresses: bytearray = bytearray()
+        self.__IPv6Ports: array = array(self.PORT_TYPE_CODE)
+
+    """
+    Splits a compact peer list into the addresses (one after another, as they are) and the ports; a trailing partial entry is ignored
+    @:param addressLength - the length of an address: 4 bytes for IPv4, 16 for IPv6
+    """
+    @staticmethod
+    def __splitCompactPeers(compactPeers: bytes, addressLength: int) -> Tuple[bytearray, array]:
+        entryLength: int = addressLength + PeerTable.PORT_LENGTH
+        peerCount: int = len(compactPeers) // entryLength
+        compactPeers = bytes(compactPeers[:peerCount * entryLength])
+        addresses: bytearray = bytearray(peerCount * addressLength)
+        for byteIndex in range(addressLength):
+            addresses[byteIndex::addressLength] = compactPeers[byteIndex::entryLength]
+        portBytes: bytearray = bytearray(peerCount * PeerTable.PORT_LENGTH)
+        for byteIndex in range(PeerTable.PORT_LENGTH):
+            portBytes[byteIndex::PeerTable.PORT_LENGTH] = compactPeers[addressLength + byteIndex::entryLength]
+        ports: array = array(PeerTable.PORT_TYPE_CODE, portBytes)
+        if sys.byteorder == "little":
+            ports.byteswap()  # they are big endian
+        return addresses, ports
+
+    """
+    @:param compactPeers - 6 bytes for each peer: the IPv4 address and the port, both big endian
+    """
+    def addCompactIPv4Peers(self, compactPeers: bytes) -> None:
+        addressBytes, ports = self.__splitCompactPeers(compactPeers, self.IPV4_ADDRESS_LENGTH)
+        addresses: array = array(self.IPV4_ADDRESS_TYPE_CODE, addressBytes)
+        if sys.byteorder == "little":
+            addresses.byteswap()
+        self.__IPv4Addresses.extend(addresses)
+        self.__IPv4Ports.extend(ports)
+
+    """
+    @:param compactPeers - 18 bytes for each peer: the IPv6 address and the port, both big endian
+    """
+    def addCompactIPv6Peers(self, compactPeers: bytes) -> None:
+        addresses, ports = self.__splitCompactPeers(compactPeers, self.IPV6_ADDRESS_LENGTH)
+        self.__IPv6Addresses.extend(addresses)
+        self.__IPv6Ports.extend(ports)
+
+    def addPeer(self, IP: int, port: int, isIPv6: bool) -> None:
+        if isIPv6:
+            self.__IPv6Addresses.extend(IP.to_bytes(self.IPV6_ADDRESS_LENGTH, "big"))
+            self.__IPv6Ports.append(port)
+        else:
+            self.__IPv4Addresses.append(IP)
+            self.__IPv4Ports.append(port)
+
+    """
+    @:return the addresses of the peers, as (IP, port, whether the IP is an IPv6 one), without creating Peer objects
+    """
+    def getAddresses(self) -> Iterator[Tuple[int, int, bool]]:
+        for IP, port in zip(self.__IPv4Addresses, self.__IPv4Ports):
+            yield IP, port, False
+        for peerIndex, port in enumerate(self.__IPv6Ports):
+            addressOffset: int = peerIndex * self.IPV6_ADDRESS_LENGTH
+            yield int.from_bytes(self.__IPv6Addresses[addressOffset: addressOffset + self.IPV6_ADDRESS_LENGTH], "big"), port, True
+
+    """
+    Puts together the peers of several tables (e.g. given by different trackers), each of them once, in the order they come
+    """
+    @staticmethod
+    def merge(peerTables: Iterable["PeerTable"]) -> "PeerTable":
+        peerTables = list(peerTables)
+        if len(peerTables) == 1:
+            return peerTables[0]
+        mergedPeerTable: PeerTable = PeerTable()
+        for IP, port, isIPv6 in dict.fromkeys(address for peerTable in peerTables for address in peerTable.getAddresses()):
+            mergedPeerTable.addPeer(IP, port, isIPv6)
+        return mergedPeerTable
+
+    def __iter__(self) -> Iterator[Peer]:
+        for IP, port, isIPv6 in self.getAddresses():
+            yield Peer(IP, port, isIPv6)
+
+    def __len__(self) -> int:
+        return len(self.__IPv4Ports) + len(self.__IPv6Ports)
@@ -0,0 +1,104 @@
+import math
+import time
+from typing import Final
+import utils
+
+
+class PeerTransferStatistics:
+    RATE_TIME_CONSTANT_IN_SECONDS: Final[float] = 2.0  # how fast the download rate estimate forgets old samples
+    ROUND_TRIP_TIME_SMOOTHING_FACTOR: Final[float] = 0.125
+    TARGET_QUEUE_TIME_IN_SECONDS: Final[float] = 1.0  # how much data (in time units) should be requested ahead
+    MIN_REQUEST_PIPELINE_DEPTH: Final[int] = 4  # blocks
+    MAX_REQUEST_PIPELINE_DEPTH: Final[int] = 512  # blocks, i.e. 8MB in flight per peer
+    SNUBBED_REQUEST_PIPELINE_DEPTH: Final[int] = 1  # a snubbed peer only gets a single request, to probe whether it recovered
+    ROUND_TRIP_TIME_VARIATION_SMOOTHING_FACTOR: Final[float] = 0.25
+    ROUND_TRIP_TIME_VARIATION_MULTIPLIER: Final[int] = 4
+    DEFAULT_REQUEST_TIMEOUT_IN_SECONDS: Final[float] = 30.0  # until the round-trip time of the peer is known
+    MIN_REQUEST_TIMEOUT_IN_SECONDS: Final[float] = 5.0
+    MAX_REQUEST_TIMEOUT_IN_SECONDS: Final[float] = 60.0
+
+    def __init__(self):
+        self.__downloadRate: float = 0.0  # bytes per second, as of __lastRateUpdateTime
+        self.__lastRateUpdateTime: float = time.monotonic()
+        self.__smoothedRoundTripTime: float | None = None  # seconds
+        self.__minRoundTripTime: float | None = None  # seconds
+        self.__roundTripTimeVariation: float = 0.0  # seconds
+        self.__lastBlockReceivedTime: float | None = None
+        self.__isSnubbed: bool = False
+
+    """
+    Decays the download rate estimate up to the given moment
+    """
+    def __decayDownloadRate(self, now: float) -> None:
+        elapsedTime: float = max(now - self.__lastRateUpdateTime, 0.0)
+        self.__downloadRate *= math.exp(-elapsedTime / self.RATE_TIME_CONSTANT_IN_SECONDS)
+        self.__lastRateUpdateTime = now
+
+    """
+    Updates the estimates after a requested block has been received from the peer
+    @:param byteCount - the size of the received block
+    @:param roundTripTime - the time between sending the request and receiving the block, in seconds
+    """
+    def registerBlockReceived(self, byteCount: int, roundTripTime: float | None) -> None:
+        now: float = time.monotonic()
+        self.__decayDownloadRate(now)
+        self.__downloadRate += byteCount / self.RATE_TIME_CONSTANT_IN_SECONDS
+        self.__lastBlockReceivedTime = now
+        self.__isSnubbed = False
+        if roundTripTime is None:
+            return
+        if self.__smoothedRoundTripTime is None:
+            self.__smoothedRoundTripTime = roundTripTime
+            self.__minRoundTripTime = roundTripTime
+            self.__roundTripTimeVariation = roundTripTime / 2
+            return
+        # same estimators as the TCP retransmission timer (RFC 6298)
+        self.__roundTripTimeVariation += self.ROUND_TRIP_TIME_VARIATION_SMOOTHING_FACTOR * \
+            (abs(roundTripTime - self.__smoothedRoundTripTime) - self.__roundTripTimeVariation)
+        self.__smoothedRoundTripTime += self.ROUND_TRIP_TIME_SMOOTHING_FACTOR * (roundTripTime - self.__smoothedRoundTripTime)
+        self.__minRoundTripTime = min(self.__minRoundTripTime, roundTripTime)
+
+    @property
+    def downloadRate(self) -> float:
+        self.__decayDownloadRate(time.monotonic())
+        return self.__downloadRate
+
+    @property
+    def smoothedRoundTripTime(self) -> float | None:
+        return self.__smoothedRoundTripTime
+
+    @property
+    def lastBlockReceivedTime(self) -> float | None:
+        return self.__lastBlockReceivedTime
+
+    """
+    A peer is snubbed when it stops sending data while it has requests from us; it stays snubbed until a block arrives
+    """
+    @property
+    def isSnubbed(self) -> bool:
+        return self.__isSnubbed
+
+    def markAsSnubbed(self) -> None:
+        self.__isSnubbed = True
+
+    """
+    How long a request to the peer can stay unanswered, based on the observed round-trip times of its requests
+    """
+    @property
+    def requestTimeout(self) -> float:
+        if self.__smoothedRoundTripTime is None:
+            return self.DEFAULT_REQUEST_TIMEOUT_IN_SECONDS
+        requestTimeout: float = self.__smoothedRoundTripTime + self.ROUND_TRIP_TIME_VARIATION_MULTIPLIER * self.__roundTripTimeVariation
+        return max(self.MIN_REQUEST_TIMEOUT_IN_SECONDS, min(self.MAX_REQUEST_TIMEOUT_IN_SECONDS, requestTimeout))
+
+    """
+    The number of requests that should be outstanding to the peer: enough to cover the bandwidth-delay product of the connection,
+    plus a queue which keeps the peer busy between our requests
+    """
+    @property
+    def requestPipelineDepth(self) -> int:
+        if self.__isSnubbed:
+            return self.SNUBBED_REQUEST_PIPELINE_DEPTH
+        baseRoundTripTime: float = self.__minRoundTripTime if self.__minRoundTripTime is not None else 0.0
+        bytesInFlight: float = self.downloadRate * (baseRoundTripTime + self.TARGET_QUEUE_TIME_IN_SECONDS)
+        return max(self.MIN_REQUEST_PIPELINE_DEPTH, min(self.MAX_REQUEST_PIPELINE_DEPTH, math.ceil(bytesInFlight / utils.BLOCK_REQUEST_SIZE)))
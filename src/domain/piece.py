@@ -1,34 +1,66 @@
 import hashlib
 from typing import List
+import utils
 from domain.block import Block
 
 
 class Piece:
-    def __init__(self, index: int, blocks: List[Block]):
+    """
+    The blocks of a piece are written straight into a buffer of the piece, at their offsets. The SHA-1 of the piece is computed
+    incrementally, as the blocks at the start of the piece are completed, so no copy of the piece is ever made.
+    At most one block is hashed per write, so that writing stays cheap; whatever is left is hashed by finishInfoHash
+    """
+    def __init__(self, index: int, blocks: List[Block], buffer: bytearray):
         self.__index: int = index
         self.__blocks: List[Block] = blocks
+        self.__length: int = sum(block.length for block in blocks)
+        self.__buffer: bytearray = buffer
+        self.__bufferView: memoryview = memoryview(buffer)
+        self.__completeBlockCount: int = sum(block.isComplete for block in blocks)
+        self.__hasher = hashlib.sha1()
+        self.__hashedBlockCount: int = 0  # the blocks at the start of the piece which were already added to the hash
 
     """
-    Clears all the blocks inside the current piece
+    Detaches the buffer of the piece (e.g. after the piece was written on disk), so that it can be reused for another piece
+    @:return the buffer
     """
-    def clear(self) -> None:
-        [block.clear() for block in self.__blocks]
+    def detachBuffer(self) -> bytearray:
+        buffer: bytearray = self.__buffer
+        self.__bufferView.release()
+        self.__buffer, self.__bufferView = bytearray(), memoryview(b"")
+        return buffer
 
     def getBlockStartingAtOffset(self, beginOffset: int) -> Block | None:
-        blockStartingAtOffset: List[Block] = [block for block in self.__blocks if block.beginOffset == beginOffset]
-        if len(blockStartingAtOffset) != 1:
+        blockIndex: int = beginOffset // utils.BLOCK_REQUEST_SIZE  # all the blocks, except maybe the last one, have the same size
+        if beginOffset < 0 or blockIndex >= len(self.__blocks) or self.__blocks[blockIndex].beginOffset != beginOffset:
             return None
-        return blockStartingAtOffset[0]
+        return self.__blocks[blockIndex]
+
+    """
+    Adds to the hash the complete blocks which follow the blocks hashed so far
+    @:param maxBlockCount - the maximum number of blocks to hash
+    """
+    def __hashCompleteBlocksInOrder(self, maxBlockCount: int) -> None:
+        lastBlockIndex: int = min(len(self.__blocks), self.__hashedBlockCount + maxBlockCount)
+        while self.__hashedBlockCount < lastBlockIndex and self.__blocks[self.__hashedBlockCount].isComplete:
+            block: Block = self.__blocks[self.__hashedBlockCount]
+            self.__hasher.update(self.__bufferView[block.beginOffset: block.beginOffset + block.length])
+            self.__hashedBlockCount += 1
 
     """
-    Writes data to a specific block inside the current piece
+    Writes data to a specific block inside the current piece; data which does not match the length of the block is ignored
     @:param beginOffset - the offset of the block we are writing to, zero-indexed
     @:param data - the data that is being written
     """
-    def writeDataToBlock(self, beginOffset: int, data: bytes) -> None:
+    def writeDataToBlock(self, beginOffset: int, data: bytes | memoryview) -> None:
         blockStartingAtOffset: Block | None = self.getBlockStartingAtOffset(beginOffset)
-        if blockStartingAtOffset is not None:
-            blockStartingAtOffset.writeData(data)
+        if blockStartingAtOffset is None or blockStartingAtOffset.isComplete or len(data) != blockStartingAtOffset.length:
+            return
+        self.__bufferView[beginOffset: beginOffset + len(data)] = data
+        blockStartingAtOffset.markAsComplete()
+        self.__completeBlockCount += 1
+        if blockStartingAtOffset is self.__blocks[self.__hashedBlockCount]:
+            self.__hashCompleteBlocksInOrder(1)
 
     @property
     def index(self) -> int:
@@ -39,21 +71,32 @@ class Piece:
         return self.__blocks
 
     @property
-    def data(self) -> bytes:
-        return b"".join([block.data for block in self.__blocks])
+    def length(self) -> int:
+        return self.__length
 
+    """
+    The content of the piece, as a view over its buffer (i.e. without copying it)
+    """
     @property
-    def infoHash(self) -> bytes:
-        return hashlib.sha1(self.data).digest()
+    def data(self) -> memoryview:
+        return self.__bufferView[: self.__length]
+
+    """
+    Hashes the blocks which were not hashed while being written. It can run on another thread, as long as the piece is complete
+    (no block can be written anymore)
+    @:return the SHA-1 of the piece
+    """
+    def finishInfoHash(self) -> bytes:
+        self.__hashCompleteBlocksInOrder(len(self.__blocks))
+        return self.__hasher.digest()
 
     @property
     def isDownloadComplete(self) -> bool:
-        return all([block.isComplete for block in self.__blocks])
+        return self.__completeBlockCount == len(self.__blocks)
 
     @property
     def isInProgress(self) -> bool:
-        isCompleteBlockList: List[bool] = [block.isComplete for block in self.__blocks]
-        return any(isCompleteBlockList) and not all(isCompleteBlockList)
+        return 0 < self.__completeBlockCount < len(self.__blocks)
 
     def __str__(self) -> str:
         return f"Piece {self.__index}, containing {len(self.__blocks)} blocks"
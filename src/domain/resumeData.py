@@ -0,0 +1,100 @@
+import hashlib
+import struct
+from typing import List, Tuple, Final
+from bitarray import bitarray
+
+
+class ResumeData:
+    """
+    What a torrent needs to resume without hashing its content again: the pieces which are verified and written on disk, the
+    size and modification time of every file when that was true (so that files changed since then can be detected), and the
+    complete blocks of the pieces in progress (which are only kept in memory while downloading, so their data is stored as well).
+    It is stored in a compact binary form, which ends with its own SHA-1, so that a damaged file is rejected instead of trusted
+    """
+    MAGIC: Final[bytes] = b"PTRD"
+    VERSION: Final[int] = 1
+    HEADER_FORMAT: Final[str] = "!4sH20sII"  # magic, version, info hash, piece count, file count
+    FILE_STATE_FORMAT: Final[str] = "!qq"  # size (-1 if the file does not exist), modification time in nanoseconds
+    PARTIAL_PIECE_FORMAT: Final[str] = "!III"  # piece index, block count, length of the data of the complete blocks
+    MISSING_FILE_SIZE: Final[int] = -1
+
+    """
+    @:param fileStates - (size, modification time in nanoseconds) of every file of the torrent, in order
+    @:param partialPieces - (piece index, which blocks are complete, the data of the complete blocks, one after another) of every
+    piece in progress
+    """
+    def __init__(self, infoHash: bytes, downloadedPieces: bitarray, fileStates: List[Tuple[int, int]],
+                 partialPieces: List[Tuple[int, bitarray, bytes]]):
+        self.__infoHash: bytes = infoHash
+        self.__downloadedPieces: bitarray = downloadedPieces
+        self.__fileStates: List[Tuple[int, int]] = fileStates
+        self.__partialPieces: List[Tuple[int, bitarray, bytes]] = partialPieces
+
+    def toBytes(self) -> bytes:
+        parts: List[bytes] = [struct.pack(self.HEADER_FORMAT, self.MAGIC, self.VERSION, self.__infoHash, len(self.__downloadedPieces),
+                                          len(self.__fileStates)), self.__downloadedPieces.tobytes()]
+        parts.extend(struct.pack(self.FILE_STATE_FORMAT, size, modificationTime) for size, modificationTime in self.__fileStates)
+        parts.append(struct.pack("!I", len(self.__partialPieces)))
+        for pieceIndex, completeBlocks, data in self.__partialPieces:
+            parts.extend([struct.pack(self.PARTIAL_PIECE_FORMAT, pieceIndex, len(completeBlocks), len(data)), completeBlocks.tobytes(), data])
+        content: bytes = b"".join(parts)
+        return content + hashlib.sha1(content).digest()
+
+    """
+    @:raise ValueError - if the data is damaged, or was written by another version
+    """
+    @staticmethod
+    def fromBytes(data: bytes) -> "ResumeData":
+        CHECKSUM_LENGTH: Final[int] = 20
+
+        content: memoryview = memoryview(data)[: -CHECKSUM_LENGTH]
+        if len(data) < CHECKSUM_LENGTH or hashlib.sha1(content).digest() != data[-CHECKSUM_LENGTH:]:
+            raise ValueError("The resume data is damaged")
+        try:
+            magic, version, infoHash, pieceCount, fileCount = struct.unpack_from(ResumeData.HEADER_FORMAT, content)
+            if magic != ResumeData.MAGIC or version != ResumeData.VERSION:
+                raise ValueError("Unknown resume data format")
+            position: int = struct.calcsize(ResumeData.HEADER_FORMAT)
+            downloadedPieces: bitarray = ResumeData.__readBitarray(content, position, pieceCount)
+            position += (pieceCount + 7) // 8
+            fileStates: List[Tuple[int, int]] = []
+            for _ in range(fileCount):
+                fileStates.append(struct.unpack_from(ResumeData.FILE_STATE_FORMAT, content, position))
+                position += struct.calcsize(ResumeData.FILE_STATE_FORMAT)
+            partialPieceCount: int = struct.unpack_from("!I", content, position)[0]
+            position += 4
+            partialPieces: List[Tuple[int, bitarray, bytes]] = []
+            for _ in range(partialPieceCount):
+                pieceIndex, blockCount, dataLength = struct.unpack_from(ResumeData.PARTIAL_PIECE_FORMAT, content, position)
+                position += struct.calcsize(ResumeData.PARTIAL_PIECE_FORMAT)
+                completeBlocks: bitarray = ResumeData.__readBitarray(content, position, blockCount)
+                position += (blockCount + 7) // 8
+                partialPieces.append((pieceIndex, completeBlocks, content[position: position + dataLength].tobytes()))
+                position += dataLength
+        except struct.error as error:
+            raise ValueError("The resume data is truncated") from error
+        return ResumeData(infoHash, downloadedPieces, fileStates, partialPieces)
+
+    @staticmethod
+    def __readBitarray(content: memoryview, position: int, bitCount: int) -> bitarray:
+        bits: bitarray = bitarray()
+        bits.frombytes(content[position: position + (bitCount + 7) // 8].tobytes())
+        if len(bits) < bitCount:
+            raise ValueError("The resume data is truncated")
+        return bits[: bitCount]
+
+    @property
+    def infoHash(self) -> bytes:
+        return self.__infoHash
+
+    @property
+    def downloadedPieces(self) -> bitarray:
+        return self.__downloadedPieces
+
+    @property
+    def fileStates(self) -> List[Tuple[int, int]]:
+        return self.__fileStates
+
+    @property
+    def partialPieces(self) -> List[Tuple[int, bitarray, bytes]]:
+        return self.__partialPieces
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Callable, Awaitable, Final
+from domain.peerTable import PeerTable
+from service.trackerConnection import TrackerConnection
+
+
+class AnnounceScheduler:
+    """
+    Announces a torrent to its trackers again and again, as often as they ask, so that the peers which leave are replaced by new ones.
+    When fewer peers than wanted are connected, the torrent is announced earlier, though never more often than the trackers allow.
+    An announce to trackers which do not answer is given up after a while (the UDP ones would otherwise be retried for hours), and
+    the next one is made at the usual time.
+    When the torrent stops, the trackers are told so, as long as they answer quickly enough
+    """
+    PERIODIC_ANNOUNCE_TIMEOUT_IN_SECONDS: Final[float] = 120.0
+    STOPPED_ANNOUNCE_TIMEOUT_IN_SECONDS: Final[float] = 5.0
+
+    """
+    @:param getConnectedPeerCount - gives the number of peers the torrent is connected to
+    @:param onPeersFound - called with the peers given by the trackers, after every announce
+    """
+    def __init__(self, trackerConnection: TrackerConnection, minConnectedPeerCount: int, getConnectedPeerCount: Callable[[], int],
+                 onPeersFound: Callable[[PeerTable], Awaitable[None]]):
+        self.__trackerConnection: TrackerConnection = trackerConnection
+        self.__minConnectedPeerCount: int = minConnectedPeerCount
+        self.__getConnectedPeerCount: Callable[[], int] = getConnectedPeerCount
+        self.__onPeersFound: Callable[[PeerTable], Awaitable[None]] = onPeersFound
+        self.__wakeUpEvent: asyncio.Event = asyncio.Event()
+        self.__lastAnnounceTime: float = 0.0
+        self.__announceTask: asyncio.Task | None = None
+
+    """
+    Starts announcing periodically; the first announce (with the "started" event) must have been made just before
+    """
+    def start(self) -> None:
+        if self.__announceTask is None:
+            self.__lastAnnounceTime = asyncio.get_running_loop().time()
+            self.__announceTask = asyncio.create_task(self.__announcePeriodically())
+
+    """
+    Makes the scheduler check whether an early announce is needed; called whenever a peer disconnects
+    """
+    def notifyPeerDisconnected(self) -> None:
+        self.__wakeUpEvent.set()
+
+    def __getNextAnnounceTime(self) -> float:
+        if self.__getConnectedPeerCount() < self.__minConnectedPeerCount:
+            return self.__lastAnnounceTime + self.__trackerConnection.minAnnounceInterval
+        return self.__lastAnnounceTime + self.__trackerConnection.announceInterval
+
+    async def __announcePeriodically(self) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            self.__wakeUpEvent.clear()
+            waitingTime: float = self.__getNextAnnounceTime() - loop.time()
+            if waitingTime > 0:
+                try:
+                    await asyncio.wait_for(self.__wakeUpEvent.wait(), timeout=waitingTime)
+                except asyncio.TimeoutError:
+                    pass
+                continue  # the time of the next announce is determined again, since the connected peers may have changed meanwhile
+            self.__lastAnnounceTime = loop.time()
+            try:
+                peerTable: PeerTable | None = await asyncio.wait_for(self.__trackerConnection.announce(),
+                                                                     timeout=self.PERIODIC_ANNOUNCE_TIMEOUT_IN_SECONDS)
+            except asyncio.TimeoutError:
+                continue
+            if peerTable:
+                await self.__onPeersFound(peerTable)
+
+    """
+    Stops announcing periodically, and tells the trackers that the torrent stopped (if the periodic announces were started)
+    """
+    async def stop(self) -> None:
+        if self.__announceTask is None:
+            return
+        self.__announceTask.cancel()
+        try:
+            await self.__announceTask
+        except asyncio.CancelledError:
+            pass
+        self.__announceTask = None
+        try:
+            await asyncio.wait_for(self.__trackerConnection.announce("stopped"), timeout=self.STOPPED_ANNOUNCE_TIMEOUT_IN_SECONDS)
+        except asyncio.TimeoutError:
+            pass  # the trackers will drop the torrent after a while anyway
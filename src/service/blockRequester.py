@@ -1,104 +1,314 @@
 import asyncio
-from typing import Final, List, Tuple
+import time
+from asyncio import TimerHandle
+from typing import Final, List, Tuple, Iterable, Dict
 from bitarray import bitarray
+import utils
 from domain.block import Block
 from domain.message.requestMessage import RequestMessage
 from domain.peer import Peer
-from domain.piece import Piece
+from service.cancelMessageBatcher import CancelMessageBatcher
+from service.piecePicker import PiecePicker
+from service.requestRegistry import RequestRegistry
+from service.sessionMetrics import SessionMetrics
+from service.torrentState import TorrentState
 
 
 class BlockRequester:
-    def __init__(self, pieces: List[Piece]):
+    SNUB_TIMEOUT_IN_SECONDS: Final[float] = 20.0  # a peer which sends nothing for this long, while it has our requests, is snubbing us
+    MAX_ENDGAME_REQUESTS_PER_BLOCK: Final[int] = 3  # how many peers a block can be requested from at the same time, in the endgame
+    FAST_PEER_PIECE_TIME_IN_SECONDS: Final[float] = 5.0  # the time within which a fast peer downloads a whole piece on its own
+
+    def __init__(self, torrentState: TorrentState, piecePicker: PiecePicker, requestRegistry: RequestRegistry, sessionMetrics: SessionMetrics,
+                 cancelMessageBatcher: CancelMessageBatcher):
         self.__peerList: List[Peer] = []
-        self.__pieces: List[Piece] = pieces
-        self.__currentPieceIndex: int = 0
-        self.__currentBlockIndex: int = 0
-        self.__downloadedPieces: bitarray = bitarray()
-        self.__requestedBlockCount: int = 0
+        self.__torrentState: TorrentState = torrentState
+        self.__piecePicker: PiecePicker = piecePicker
+        self.__requestRegistry: RequestRegistry = requestRegistry
+        self.__sessionMetrics: SessionMetrics = sessionMetrics
+        self.__cancelMessageBatcher: CancelMessageBatcher = cancelMessageBatcher
+        self.__isInEndgame: bool = False
+        # in the endgame, the blocks which can still be requested from one more peer, by the number of peers they are requested from
+        self.__endgameBlocksByRequestCount: List[Dict[Tuple[int, int], Block]] = []
         self.__isDownloadPaused: bool = False
-        
+        self.__uncheckedPieceCount: int = 0
+        self.__wakeUpEvent: asyncio.Event = asyncio.Event()
+        self.__requestTimeoutHandle: TimerHandle | None = None
+
     def setPeerList(self, peerList: List[Peer]) -> None:
         self.__peerList.clear()
         self.__peerList.extend(peerList)
+        self.wakeUp()
+
+    """
+    Makes the requester re-evaluate what can be requested; called whenever something which affects the requests changes
+    (a peer chokes / unchokes us, announces new pieces, sends a block, disconnects or a request times out)
+    """
+    def wakeUp(self) -> None:
+        self.__wakeUpEvent.set()
+
+    """
+    Marks a block whose request was dropped without an answer as no longer requested, so that it can be requested again
+    (unless it is still requested from another peer)
+    """
+    def releaseRequestedBlock(self, pieceIndex: int, beginOffset: int) -> None:
+        if not self.__requestRegistry.isBlockRequested(pieceIndex, beginOffset):
+            self.__piecePicker.releaseBlock(pieceIndex, beginOffset)
 
-    def decreaseRequestedBlockCount(self) -> None:
-        self.__requestedBlockCount -= 1
+    """
+    @:param partialPieces - the pieces which were in progress, as (piece index, which blocks are complete, the data of the complete blocks)
+    @:param uncheckedPieceIndices - the pieces which are still being checked on disk; they are not requested until their check
+    tells that they are missing (see markPieceAsChecked)
+    """
+    def setDownloadedPieces(self, piecesAlreadyWrittenOnDisk: List[bool], partialPieces: Iterable[Tuple[int, bitarray, bytes]] = (),
+                            uncheckedPieceIndices: Iterable[int] = ()) -> None:
+        self.__torrentState.setDownloadedPieces(piecesAlreadyWrittenOnDisk)
+        for pieceIndex, completeBlocks, data in partialPieces:
+            self.__torrentState.restorePiece(pieceIndex, completeBlocks, data)
+        piecesNotToRequest: bitarray = self.__torrentState.downloadedPieces.copy()
+        self.__uncheckedPieceCount = 0
+        for pieceIndex in uncheckedPieceIndices:
+            piecesNotToRequest[pieceIndex] = True
+            self.__uncheckedPieceCount += 1
+        self.__piecePicker.setDownloadedPieces(piecesNotToRequest)
 
-    def __isDownloaded(self) -> bool:
-        return all(self.__downloadedPieces)
+    """
+    Records the result of the check of a piece which was left out of the requests while it was being checked
+    @:param isWrittenOnDisk - True if the piece is already written on disk, False if it has to be downloaded
+    """
+    def markPieceAsChecked(self, pieceIndex: int, isWrittenOnDisk: bool) -> None:
+        self.__uncheckedPieceCount -= 1
+        if isWrittenOnDisk:
+            self.markPieceAsDownloaded(pieceIndex)
+        else:
+            self.__piecePicker.markPieceAsMissing(pieceIndex)
+            self.wakeUp()
 
-    def setDownloadedPieces(self, piecesAlreadyWrittenOnDisk: List[bool]) -> None:
-        self.__downloadedPieces.clear()
-        self.__downloadedPieces.extend(piecesAlreadyWrittenOnDisk)
+    @staticmethod
+    def __canRequestFromPeer(peer: Peer) -> bool:
+        return peer.hasActiveConnection() and not peer.isChokingMe and peer.amInterestedInIt
 
     """
-    Finds a peer which contains the current piece
-    @:return The peer which contains the piece, or None if there are no peers who own that piece
+    Tops up the queue of outstanding requests of a peer, up to the pipeline depth given by the peer's throughput and round-trip time
     """
-    def __getPeerWithCurrentPiece(self) -> Peer | None:
-        # Here we can implement some prioritization algorithms based on download speed (distant future tho)
-        # At the moment it gets the first available one
-        for peer in self.__peerList:
-            if peer.hasActiveConnection() and not peer.isChokingMe and peer.amInterestedInIt and peer.availablePieces[self.__currentPieceIndex]:
-                return peer
-
-    """
-    Finds the next available block that can be requested and the peer which owns it
-    @:return A tuple of the block and the peer which owns it
-    """
-    def __determineNextBlockToRequest(self) -> Tuple[Block, Peer] | None:
-        while self.__currentPieceIndex < len(self.__pieces):
-            piece: Piece = self.__pieces[self.__currentPieceIndex]
-            if not piece.isDownloadComplete:
-                peerWithCurrentPiece: Peer | None = self.__getPeerWithCurrentPiece()
-                if peerWithCurrentPiece is not None:
-                    while self.__currentBlockIndex < len(piece.blocks):
-                        block: Block = piece.blocks[self.__currentBlockIndex]
-                        self.__currentBlockIndex += 1
-                        if not block.isComplete and block not in peerWithCurrentPiece.blocksRequestedFromPeer:
-                            return block, peerWithCurrentPiece
-            self.__currentPieceIndex += 1
-            self.__currentBlockIndex = 0
-        self.__currentPieceIndex, self.__currentBlockIndex = 0, 0
-
-    async def __requestNextBlock(self) -> None:
-        BLOCK_INDEX_IN_TUPLE: Final[int] = 0
-        PEER_INDEX_IN_TUPLE: Final[int] = 1
-
-        blockAndPeer: Tuple[Block, Peer] | None = self.__determineNextBlockToRequest()
-        if blockAndPeer is None:
-            return
-        block: Block = blockAndPeer[BLOCK_INDEX_IN_TUPLE]
-        peer: Peer = blockAndPeer[PEER_INDEX_IN_TUPLE]
+    async def __fillRequestPipeline(self, peer: Peer) -> None:
+        fastPeer: Peer | None = peer if self.__isFastPeer(peer) else None
+        while self.__hasRoomForRequests(peer):
+            block: Block | None = self.__piecePicker.pickBlock(peer.availablePieces, fastPeer)
+            if block is None:
+                break
+            await self.__requestBlock(peer, block)
+        if self.__isInEndgame:
+            await self.__fillRequestPipelineInEndgame(peer)
 
+    """
+    A peer is fast if, at its estimated download rate, it downloads a whole piece within a few seconds; unlike its request pipeline,
+    which is clamped, the rate tells the peers apart whatever the piece length
+    """
+    def __isFastPeer(self, peer: Peer) -> bool:
+        if peer.transferStatistics.isSnubbed:
+            return False
+        pieceLength: int = self.__piecePicker.blockCountInPiece * utils.BLOCK_REQUEST_SIZE
+        return peer.transferStatistics.downloadRate * self.FAST_PEER_PIECE_TIME_IN_SECONDS >= pieceLength
+
+    def __hasRoomForRequests(self, peer: Peer) -> bool:
+        return self.__canRequestFromPeer(peer) and self.__requestRegistry.getRequestCount(peer) < peer.transferStatistics.requestPipelineDepth
+
+    async def __requestBlock(self, peer: Peer, block: Block) -> None:
+        # the request is registered before sending, because other requests can be issued while this one is being sent
+        self.__requestRegistry.addRequest(peer, block, time.monotonic())
+        if self.__isInEndgame:
+            self.__moveEndgameBlock(block, self.__requestRegistry.getBlockRequestCount(block.pieceIndex, block.beginOffset) - 1)
         await RequestMessage(block.pieceIndex, block.beginOffset, block.length).send(peer)
-        peer.blocksRequestedFromPeer.append(block)
-        self.__requestedBlockCount += 1
 
-    async def requestBlocks(self) -> bool:
-        INTERVAL_BETWEEN_REQUEST_MESSAGES: Final[float] = 0.015  # seconds => ~66 requests / second
-        MAX_REQUESTED_BLOCK_COUNT: Final[int] = 2400
+    """
+    The endgame starts once every remaining block is in flight; from then on, a slow peer would hold up the whole download,
+    so the blocks are also requested from other peers, and the first copy to arrive wins.
+    It ends as soon as some block is no longer requested (e.g. a piece failed its hash check, or a peer disconnected), since that
+    block is then requested the usual way
+    """
+    def __updateEndgameState(self) -> None:
+        isEndgame: bool = not self.__piecePicker.hasUnrequestedBlocks and self.__requestRegistry.getRequestedBlockCount() > 0 \
+            and self.__uncheckedPieceCount == 0  # the pieces being checked may still have to be downloaded
+        if isEndgame == self.__isInEndgame:
+            return
+        self.__isInEndgame = isEndgame
+        if not isEndgame:
+            self.__endgameBlocksByRequestCount.clear()
+            return
+        self.__endgameBlocksByRequestCount = [{} for _ in range(self.MAX_ENDGAME_REQUESTS_PER_BLOCK)]
+        for block, requestCount in self.__requestRegistry.getRequestedBlocks():
+            if requestCount < self.MAX_ENDGAME_REQUESTS_PER_BLOCK:
+                self.__endgameBlocksByRequestCount[requestCount][(block.pieceIndex, block.beginOffset)] = block
+        self.__sessionMetrics.markEndgameStarted()
+
+    """
+    Moves a block of the endgame to the bucket of its current number of requests, after it was requested from one more peer or one
+    less; the block is dropped once it is requested from as many peers as allowed, or from none
+    @:param previousRequestCount - the number of peers the block was requested from before the change
+    """
+    def __moveEndgameBlock(self, block: Block, previousRequestCount: int) -> None:
+        blockKey: Tuple[int, int] = (block.pieceIndex, block.beginOffset)
+        if 0 <= previousRequestCount < self.MAX_ENDGAME_REQUESTS_PER_BLOCK:
+            self.__endgameBlocksByRequestCount[previousRequestCount].pop(blockKey, None)
+        requestCount: int = self.__requestRegistry.getBlockRequestCount(block.pieceIndex, block.beginOffset)
+        if 0 < requestCount < self.MAX_ENDGAME_REQUESTS_PER_BLOCK and not block.isComplete:
+            self.__endgameBlocksByRequestCount[requestCount][blockKey] = block
+
+    """
+    Requests from the peer the blocks which are already in flight to other peers, starting with the blocks requested from
+    the fewest peers. Only as many blocks as the peer has room for are looked for, and the blocks which arrived in the meantime are
+    dropped from the buckets along the way
+    """
+    async def __fillRequestPipelineInEndgame(self, peer: Peer) -> None:
+        if not self.__hasRoomForRequests(peer):
+            return
+        roomForRequests: int = peer.transferStatistics.requestPipelineDepth - self.__requestRegistry.getRequestCount(peer)
+        chosenBlocks: List[Block] = []
+        for blocks in self.__endgameBlocksByRequestCount:
+            completeBlockKeys: List[Tuple[int, int]] = []
+            for blockKey, block in blocks.items():
+                if block.isComplete:
+                    completeBlockKeys.append(blockKey)
+                elif block.pieceIndex < len(peer.availablePieces) and peer.availablePieces[block.pieceIndex] \
+                        and not self.__requestRegistry.isBlockRequestedFromPeer(peer, block.pieceIndex, block.beginOffset):
+                    chosenBlocks.append(block)
+                    if len(chosenBlocks) == roomForRequests:
+                        break
+            for blockKey in completeBlockKeys:
+                del blocks[blockKey]
+            if len(chosenBlocks) == roomForRequests:
+                break
+        for block in chosenBlocks:
+            if not self.__hasRoomForRequests(peer) or not self.__isInEndgame:
+                return
+            if block.isComplete or not self.__requestRegistry.isBlockRequested(block.pieceIndex, block.beginOffset):
+                continue  # the block arrived while the previous requests were being sent
+            await self.__requestBlock(peer, block)
+            self.__sessionMetrics.addEndgameRequest()
+
+    """
+    Takes back all the requests made to a peer (e.g. it choked us or disconnected), so that they can be made to other peers
+    """
+    def releasePeerRequests(self, peer: Peer) -> None:
+        self.__reassignRequests(self.__requestRegistry.removePeerRequests(peer))
+
+    def __reassignRequests(self, blocks: List[Block]) -> None:
+        for block in blocks:
+            self.releaseRequestedBlock(block.pieceIndex, block.beginOffset)
+            if self.__isInEndgame:
+                self.__moveEndgameBlock(block, self.__requestRegistry.getBlockRequestCount(block.pieceIndex, block.beginOffset) + 1)
+        self.__sessionMetrics.addReassignedRequests(len(blocks))
+
+    """
+    @:return The moment after which a peer which sent nothing is considered to be snubbing us, or None if it has no requests
+    """
+    def __getSnubDeadline(self, peer: Peer) -> float | None:
+        oldestRequestTime: float | None = self.__requestRegistry.getOldestRequestTime(peer)
+        if oldestRequestTime is None:
+            return None
+        lastBlockReceivedTime: float | None = peer.transferStatistics.lastBlockReceivedTime
+        lastActivityTime: float = oldestRequestTime if lastBlockReceivedTime is None else max(oldestRequestTime, lastBlockReceivedTime)
+        return lastActivityTime + self.SNUB_TIMEOUT_IN_SECONDS
+
+    """
+    Takes back requests from a peer which is still connected and may still answer them; the peer is told to drop them, so that it does
+    not keep sending blocks which are requested from other peers
+    """
+    def __cancelRequests(self, peer: Peer, blocks: List[Block]) -> None:
+        for block in blocks:
+            self.__cancelMessageBatcher.addCancel(peer, block)
+        self.__reassignRequests(blocks)
+
+    """
+    Takes back the requests which are past their deadline (given by the round-trip time of each peer), all the requests made to
+    snubbing peers, as well as the requests made to peers which have disconnected
+    """
+    def __releaseExpiredRequests(self) -> None:
+        now: float = time.monotonic()
+        for peer in self.__peerList:
+            if not peer.hasActiveConnection():
+                self.releasePeerRequests(peer)
+                continue
+            snubDeadline: float | None = self.__getSnubDeadline(peer)
+            if snubDeadline is not None and snubDeadline <= now:
+                peer.transferStatistics.markAsSnubbed()
+                self.__cancelRequests(peer, self.__requestRegistry.removePeerRequests(peer))
+                continue
+            expiredBlocks: List[Block] = self.__requestRegistry.removeRequestsMadeBefore(peer, now - peer.transferStatistics.requestTimeout)
+            self.__sessionMetrics.addTimedOutRequests(len(expiredBlocks))
+            self.__cancelRequests(peer, expiredBlocks)
+
+    """
+    Schedules a wake-up for the moment when the next outstanding request expires, or the next peer becomes snubbed
+    """
+    def __scheduleRequestTimeout(self) -> None:
+        self.__cancelRequestTimeout()
+        deadlines: List[float] = []
+        for peer in self.__peerList:
+            oldestRequestTime: float | None = self.__requestRegistry.getOldestRequestTime(peer)
+            if oldestRequestTime is not None:
+                deadlines.append(min(oldestRequestTime + peer.transferStatistics.requestTimeout, self.__getSnubDeadline(peer)))
+        if deadlines:
+            timeUntilExpiry: float = min(deadlines) - time.monotonic()
+            self.__requestTimeoutHandle = asyncio.get_running_loop().call_later(max(timeUntilExpiry, 0.0), self.wakeUp)
+
+    def __cancelRequestTimeout(self) -> None:
+        if self.__requestTimeoutHandle is not None:
+            self.__requestTimeoutHandle.cancel()
+            self.__requestTimeoutHandle = None
 
+    """
+    Keeps the request pipelines of all the peers full until the download is either finished or paused.
+    Nothing is polled: between two rounds, the requester sleeps until it is woken up by an event
+    @:return True, if the download is finished, False if it was paused
+    """
+    async def requestBlocks(self) -> bool:
         while not self.__isDownloadPaused:
-            await asyncio.sleep(INTERVAL_BETWEEN_REQUEST_MESSAGES)
-            if self.__isDownloaded():
+            self.__wakeUpEvent.clear()
+            if self.__torrentState.isDownloaded:
+                self.__cancelRequestTimeout()
+                self.__sessionMetrics.markEndgameFinished()
                 return True
-            while self.__requestedBlockCount >= MAX_REQUESTED_BLOCK_COUNT:
-                await asyncio.sleep(INTERVAL_BETWEEN_REQUEST_MESSAGES)
-            await self.__requestNextBlock()
+            self.__releaseExpiredRequests()
+            self.__updateEndgameState()  # released requests end the endgame, so that their blocks are not requested in duplicate
+            # the fastest peers choose first, so that the rarest pieces go to the peers which download them the fastest
+            for peer in sorted(self.__peerList, key=lambda otherPeer: otherPeer.transferStatistics.downloadRate, reverse=True):
+                await self.__fillRequestPipeline(peer)
+            self.__updateEndgameState()
+            self.__scheduleRequestTimeout()
+            await self.__wakeUpEvent.wait()
+        self.__cancelRequestTimeout()
         return False
 
     @property
     def downloadedPieces(self) -> bitarray:
-        return self.__downloadedPieces
+        return self.__torrentState.downloadedPieces
 
     @property
     def isDownloadPaused(self) -> bool:
         return self.__isDownloadPaused
 
+    @property
+    def uncheckedPieceCount(self) -> int:
+        return self.__uncheckedPieceCount
+
     @isDownloadPaused.setter
     def isDownloadPaused(self, newValue: bool) -> None:
         self.__isDownloadPaused = newValue
+        self.wakeUp()
 
     def markPieceAsDownloaded(self, pieceIndex: int) -> None:
-        self.__downloadedPieces[pieceIndex] = True
+        self.__torrentState.markPieceAsDownloaded(pieceIndex)
+        self.__piecePicker.markPieceAsDownloaded(pieceIndex)
+        self.wakeUp()
+
+    def markPieceAsMissing(self, pieceIndex: int) -> None:
+        self.__torrentState.markPieceAsMissing(pieceIndex)
+        self.__piecePicker.markPieceAsMissing(pieceIndex)
+        self.wakeUp()
+
+    def markPieceAsFailed(self, pieceIndex: int) -> None:
+        self.__torrentState.markPieceAsFailed(pieceIndex)
+        self.__piecePicker.markPieceAsFailed(pieceIndex)
+        self.wakeUp()
@@ -0,0 +1,46 @@
+import asyncio
+from asyncio import Handle
+from typing import Dict, List
+from domain.block import Block
+from domain.message.cancelMessage import CancelMessage
+from domain.peer import Peer
+
+
+class CancelMessageBatcher:
+    """
+    Collects the CANCEL messages produced during an iteration of the event loop and sends them at the end of it,
+    with a single write per peer (in the endgame, one received block can cancel requests made to many peers, and many blocks
+    arrive in the same iteration).
+    The writes are not drained: the messages are tiny, and the transport buffers them
+    """
+    def __init__(self):
+        self.__pendingCancels: Dict[Peer, List[bytes]] = {}
+        self.__flushHandle: Handle | None = None
+
+    def addCancel(self, peer: Peer, block: Block) -> None:
+        self.__pendingCancels.setdefault(peer, []).append(CancelMessage(block.pieceIndex, block.beginOffset, block.length).getMessageContent())
+        if self.__flushHandle is None:
+            self.__flushHandle = asyncio.get_running_loop().call_soon(self.flush)
+
+    """
+    Drops the pending CANCEL messages of a peer whose connection was closed
+    """
+    def removePeer(self, peer: Peer) -> None:
+        self.__pendingCancels.pop(peer, None)
+
+    """
+    Sends all the pending CANCEL messages right away
+    """
+    def flush(self) -> None:
+        if self.__flushHandle is not None:
+            self.__flushHandle.cancel()
+            self.__flushHandle = None
+        pendingCancels: Dict[Peer, List[bytes]] = self.__pendingCancels
+        self.__pendingCancels = {}
+        for peer, messageContents in pendingCancels.items():
+            if not peer.hasActiveConnection():
+                continue
+            try:
+                peer.connection.write(b"".join(messageContents))
+            except Exception as e:
+                pass  # TODO - log the exception
@@ -1,79 +1,214 @@
-from typing import List
+import asyncio
+import time
+from asyncio import Future, Task
+from typing import List, Tuple, Iterable, Set
 from bitarray import bitarray
 import utils
 from domain.block import Block
+from domain.message.bitfieldMessage import BitfieldMessage
 from domain.message.cancelMessage import CancelMessage
+from domain.message.haveMessage import HaveMessage
 from domain.message.pieceMessage import PieceMessage
 from domain.message.requestMessage import RequestMessage
 from domain.peer import Peer
 from domain.piece import Piece
 from service.blockRequester import BlockRequester
-from service.pieceGenerator import PieceGenerator
+from service import settingsProcessor
+from service.cancelMessageBatcher import CancelMessageBatcher
+from service.pieceBufferPool import PieceBufferPool
+from service.pieceHasher import PieceHasher
+from service.piecePicker import PiecePicker
+from service.pieceReadCache import PieceReadCache
+from service.requestRegistry import RequestRegistry
+from service.resumeDataStore import ResumeDataStore
 from service.sessionMetrics import SessionMetrics
+from service.storage import Storage
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 from service.torrentSaver import TorrentSaver
+from service.torrentState import TorrentState
 from service.torrentUploader import TorrentUploader
 
 
 class DownloadSession:
-    def __init__(self, scanner: TorrentMetaInfoScanner):
+    """
+    While downloading, the resume data of the torrent is saved periodically, and once more when the session stops (after all the
+    verified pieces are written on disk)
+    """
+    def __init__(self, scanner: TorrentMetaInfoScanner, storage: Storage, resumeDataStore: ResumeDataStore):
         self.__scanner: TorrentMetaInfoScanner = scanner
-        self.__pieces: List[Piece] = PieceGenerator(scanner).generatePiecesWithBlocks()
+        self.__storage: Storage = storage
+        self.__resumeDataStore: ResumeDataStore = resumeDataStore
+        self.__isPieceStateKnown: bool = False  # no resume data is saved before the pieces already on disk are known (i.e. checked)
+        self.__stopped: asyncio.Event = asyncio.Event()
+        self.__resumeDataCheckpointTask: Task | None = None
+        self.__pieceBufferPool: PieceBufferPool = PieceBufferPool(scanner.regularPieceLength,
+                                                                  max(1, settingsProcessor.getPieceBufferMemory() // scanner.regularPieceLength))
+        self.__torrentState: TorrentState = TorrentState(scanner.pieceCount, scanner.regularPieceLength, scanner.finalPieceLength,
+                                                         self.__pieceBufferPool)
         self.__otherPeers: List[Peer] = []
-        self.__torrentSaver: TorrentSaver = TorrentSaver(scanner)
-        self.__torrentUploader: TorrentUploader = TorrentUploader(scanner)
         self.__sessionMetrics: SessionMetrics = SessionMetrics(scanner)
-        self.__blockRequester: BlockRequester = BlockRequester(self.__pieces)
+        self.__piecePicker: PiecePicker = PiecePicker(self.__torrentState)
+        self.__requestRegistry: RequestRegistry = RequestRegistry()
+        self.__cancelMessageBatcher: CancelMessageBatcher = CancelMessageBatcher()
+        self.__blockRequester: BlockRequester = BlockRequester(self.__torrentState, self.__piecePicker, self.__requestRegistry, self.__sessionMetrics,
+                                                               self.__cancelMessageBatcher)
+        # a saved piece frees its buffer, so the requester may be able to start a new piece
+        self.__torrentSaver: TorrentSaver = TorrentSaver(scanner, storage, self.__pieceBufferPool, self.__sessionMetrics,
+                                                         settingsProcessor.getDiskWriterThreadCount(), settingsProcessor.getDiskWriteQueueSize(),
+                                                         settingsProcessor.getStorageAllocationMode(), self.__blockRequester.wakeUp, self.__receivePieceWriteError)
+        pieceReadCache: PieceReadCache = PieceReadCache(settingsProcessor.getPieceReadCacheSize())
+        self.__torrentUploader: TorrentUploader = TorrentUploader(scanner, storage, pieceReadCache, self.__sessionMetrics,
+                                                                  settingsProcessor.isZeroCopyUploadEnabled(), self.__torrentSaver.getUnwrittenPieceData)
+        self.__pieceHasher: PieceHasher = PieceHasher(settingsProcessor.getHashingThreadCount(), settingsProcessor.getHashingQueueLength())
         self.__isUploadPaused: bool = False
+        self.__heldBackSenderTasks: Set[Task] = set()  # each resumes the reading from a peer, once there is room for its pieces
 
     def setPeerList(self, peerList: List[Peer]) -> None:
         self.__otherPeers.clear()
         self.__otherPeers.extend(peerList)
         self.__blockRequester.setPeerList(peerList)
 
-    def startDownload(self) -> None:
+    """
+    Starts the download, unless the files cannot be allocated (e.g. there is not enough free space), in which case the download is
+    paused, with the error in the metrics. The files are allocated on a worker thread, since a full allocation may have to write
+    every block of the files
+    """
+    async def startDownload(self) -> None:
+        try:
+            await asyncio.to_thread(self.__torrentSaver.allocateFiles)
+        except OSError as error:
+            self.__sessionMetrics.addDiskWriteError(error)
+            self.isDownloadPaused = True
         self.__torrentSaver.start()
         self.__sessionMetrics.start()
+        self.__resumeDataCheckpointTask = asyncio.create_task(self.__checkpointResumeData())
 
     def startJustUpload(self) -> None:
         self.__sessionMetrics.start()
         self.__sessionMetrics.setUploadStarted()
-        self.__sessionMetrics.addDownloadedBytes(self.__scanner.getTotalContentSize())
+        self.__sessionMetrics.addBytesAlreadyOnDisk(self.__scanner.getTotalContentSize())
 
     async def __afterTorrentDownloadFinishes(self) -> None:
         self.__sessionMetrics.setUploadStarted()
-        self.__torrentSaver.setDownloadComplete()
         self.__torrentUploader.start()
 
     """This can be called anytime"""
     async def stop(self) -> None:
         self.__sessionMetrics.stopTimer()
-        self.__torrentSaver.stop()
+        self.__stopped.set()
         self.__torrentUploader.stop()
+        self.__pieceHasher.shutdown()
+        for heldBackSenderTask in list(self.__heldBackSenderTasks):
+            heldBackSenderTask.cancel()
+        if self.__resumeDataCheckpointTask is not None:
+            await self.__resumeDataCheckpointTask  # a checkpoint being saved must not overwrite the final resume data
+        await self.__torrentSaver.stop()
+        await self.__saveResumeData()
+        self.__closeFiles()
         await self.__cancelAllRequests()
 
+    async def __checkpointResumeData(self) -> None:
+        checkpointInterval: float = settingsProcessor.getResumeDataCheckpointInterval()
+        while not self.__stopped.is_set():
+            try:
+                await asyncio.wait_for(self.__stopped.wait(), timeout=checkpointInterval)
+            except asyncio.TimeoutError:
+                await self.__saveResumeData()
+
     """
-    Sends CancelMessages to all peers to which a request has been made for a given block (excluding the peer which answered the request).
-    It also removes the block from the list of requested blocks for all peers (including the sender)
-    @:param pieceIndex - index of the piece to which the block belongs
-    @:param beginOffset - offset of the block inside its piece
-    @:param sender - the peer who answered the PieceRequest
+    Saves the pieces which are downloaded and written on disk, along with the complete blocks of the pieces in progress; the state
+    is taken on the event loop, then the files of the torrent are flushed and the resume data is written, on a worker thread.
+    A failure is only recorded, since the download itself is not affected
     """
-    async def __cancelRequestsToOtherPeers(self, pieceIndex: int, beginOffset: int, sender: Peer) -> None:
-        for otherPeer in self.__otherPeers:
-            for blockIndex in range(len(otherPeer.blocksRequestedFromPeer)):
-                if otherPeer.blocksRequestedFromPeer[blockIndex].pieceIndex == pieceIndex and otherPeer.blocksRequestedFromPeer[blockIndex].beginOffset == beginOffset:
-                    if otherPeer != sender:
-                        await CancelMessage(pieceIndex, beginOffset, otherPeer.blocksRequestedFromPeer[blockIndex].length).send(otherPeer)
-                    otherPeer.blocksRequestedFromPeer.pop(blockIndex)
-                    self.__blockRequester.decreaseRequestedBlockCount()
-                    break
+    async def __saveResumeData(self) -> None:
+        if not self.__isPieceStateKnown:
+            return
+        downloadedPieces: bitarray = self.__torrentState.downloadedPieces.copy()
+        for pieceIndex in self.__torrentSaver.unwrittenPieceIndices:
+            downloadedPieces[pieceIndex] = False
+        partialPieces: List[Tuple[int, bitarray, bytes]] = []
+        for piece in self.__torrentState.getPiecesInProgress():
+            partialPieces.append((piece.index, bitarray([block.isComplete for block in piece.blocks]),
+                                  b"".join(piece.data[block.beginOffset: block.beginOffset + block.length] for block in piece.blocks if block.isComplete)))
+        try:
+            await asyncio.to_thread(self.__flushFilesAndSaveResumeData, downloadedPieces, partialPieces)
+        except OSError as error:
+            self.__sessionMetrics.addDiskWriteError(error)
+
+    """
+    Flushes the files before the resume data is written, so that the pieces it records as downloaded are on disk even if the system
+    crashes right after; this runs on a worker thread
+    @:raise OSError - if the files cannot be flushed, or the resume data cannot be written
+    """
+    def __flushFilesAndSaveResumeData(self, downloadedPieces: bitarray, partialPieces: List[Tuple[int, bitarray, bytes]]) -> None:
+        self.__storage.flush([file.path for file in self.__scanner.files])
+        self.__resumeDataStore.save(downloadedPieces, partialPieces)
+
+    """
+    Closes the cached handles of the files of the torrent; any later read or write opens them again
+    """
+    def __closeFiles(self) -> None:
+        self.__storage.closeFiles(file.path for file in self.__scanner.files)
+
+    """
+    Cancels the requests made to all the other peers for a given block (the request made to the sender must already be removed).
+    The CancelMessages are sent in batches. It also removes the block from the outstanding requests
+    @:param block - the block which was received
+    """
+    def __cancelRequestsToOtherPeers(self, block: Block) -> None:
+        for otherPeer in self.__requestRegistry.removeBlockRequests(block.pieceIndex, block.beginOffset):
+            self.__cancelMessageBatcher.addCancel(otherPeer, block)
 
     async def __cancelAllRequests(self) -> None:
         for otherPeer in self.__otherPeers:
-            for block in otherPeer.blocksRequestedFromPeer:
-                await CancelMessage(block.pieceIndex, block.beginOffset, block.length).send(otherPeer)
-            otherPeer.blocksRequestedFromPeer.clear()
+            for block in self.__requestRegistry.removePeerRequests(otherPeer):
+                self.__cancelMessageBatcher.addCancel(otherPeer, block)
+                self.__blockRequester.releaseRequestedBlock(block.pieceIndex, block.beginOffset)
+        self.__cancelMessageBatcher.flush()
+
+    """
+    A choking peer discards all our requests, so they are made to other peers right away
+    """
+    def receiveChokeMessage(self, sender: Peer) -> None:
+        sender.isChokingMe = True
+        self.__blockRequester.releasePeerRequests(sender)
+        self.__blockRequester.wakeUp()
+
+    """
+    Wakes up the block requester after a change in the state of a peer (choking, available pieces, connection)
+    """
+    def notifyPeerStateChanged(self) -> None:
+        self.__blockRequester.wakeUp()
+
+    def receiveBitfieldMessage(self, message: BitfieldMessage, sender: Peer) -> None:
+        if not sender.hasActiveConnection():
+            return
+        self.__piecePicker.removePeerPieces(sender)
+        sender.availablePieces.clear()
+        sender.availablePieces.frombytes(message.bitfield)
+        self.__piecePicker.addPeerPieces(sender)
+        self.__blockRequester.wakeUp()
+
+    def receiveHaveMessage(self, message: HaveMessage, sender: Peer) -> None:
+        pieceIndex: int = utils.convert4ByteBigEndianToInteger(message.pieceIndex)
+        if pieceIndex >= self.__torrentState.pieceCount or not sender.hasActiveConnection():
+            return
+        if len(sender.availablePieces) < self.__torrentState.pieceCount:  # the peer had no pieces when the connection started, so it sent no bitfield
+            sender.availablePieces.extend([False] * (self.__torrentState.pieceCount - len(sender.availablePieces)))
+        if not sender.availablePieces[pieceIndex]:
+            sender.availablePieces[pieceIndex] = True
+            self.__piecePicker.addPeerPiece(sender, pieceIndex)
+            self.__blockRequester.wakeUp()
+
+    """
+    Forgets the pieces of a peer whose connection was closed, and releases its outstanding requests
+    """
+    def removePeer(self, peer: Peer) -> None:
+        self.__piecePicker.removePeerPieces(peer)
+        peer.availablePieces.clear()
+        self.__blockRequester.releasePeerRequests(peer)
+        self.__cancelMessageBatcher.removePeer(peer)
+        self.__blockRequester.wakeUp()
 
     async def requestBlocks(self) -> bool:
         isDownloadFinished: bool = await self.__blockRequester.requestBlocks()
@@ -84,53 +219,109 @@ class DownloadSession:
 
     async def receivePieceMessage(self, message: PieceMessage, sender: Peer) -> None:
         pieceIndex: int = utils.convert4ByteBigEndianToInteger(message.pieceIndex)
-        if pieceIndex >= len(self.__pieces) or pieceIndex < 0:
+        if pieceIndex >= self.__torrentState.pieceCount or pieceIndex < 0:
+            return
+        beginOffset: int = utils.convert4ByteBigEndianToInteger(message.beginOffset)
+        requestTime: float | None = self.__requestRegistry.removeRequest(sender, pieceIndex, beginOffset)
+        roundTripTime: float | None = None if requestTime is None else time.monotonic() - requestTime
+        sender.transferStatistics.registerBlockReceived(len(message.block), roundTripTime)
+        self.__blockRequester.wakeUp()  # the sender has room for another request
+        if self.__torrentState.isPieceDownloaded(pieceIndex):  # another peer was faster (e.g. in the endgame)
+            self.__sessionMetrics.addWastedBytes(len(message.block))
             return
-        piece: Piece = self.__pieces[pieceIndex]
-        if piece.isDownloadComplete:
+        piece: Piece | None = self.__torrentState.getPiece(pieceIndex)
+        if piece is None:  # the piece failed its hash check after the block was requested
+            self.__sessionMetrics.addWastedBytes(len(message.block))
             return
-        await self.__cancelRequestsToOtherPeers(utils.convert4ByteBigEndianToInteger(message.pieceIndex), utils.convert4ByteBigEndianToInteger(message.beginOffset), sender)
-        piece.writeDataToBlock(utils.convert4ByteBigEndianToInteger(message.beginOffset), message.block)
+        block: Block | None = piece.getBlockStartingAtOffset(beginOffset)
+        if block is None:
+            return
+        if block.isComplete:
+            self.__sessionMetrics.addWastedBytes(len(message.block))
+            return
+        self.__cancelRequestsToOtherPeers(block)
+        piece.writeDataToBlock(beginOffset, message.block)
+        self.__piecePicker.markBlockReceived(pieceIndex, beginOffset)
         self.__sessionMetrics.addDownloadedBytes(len(message.block))
         if not piece.isDownloadComplete:
             return
+        actualPieceHash: Future[bytes] = self.__pieceHasher.submitPiece(piece)
+        actualPieceHash.add_done_callback(lambda _: self.__finishPieceVerification(piece, actualPieceHash))
+        if not self.__pieceHasher.hasRoom or not self.__torrentSaver.hasRoomInQueue:
+            self.__holdBackSender(sender)
+
+    """
+    Stops reading from a peer which completed a piece while too many pieces wait for their hash check, or to be written on disk,
+    until there is room again in both queues; only that peer is held back (by TCP flow control), while the messages of the other
+    peers keep being handled
+    """
+    def __holdBackSender(self, sender: Peer) -> None:
+        sender.connection.pauseReading()
+        heldBackSenderTask: Task = asyncio.create_task(self.__resumeSenderWhenRoom(sender))
+        self.__heldBackSenderTasks.add(heldBackSenderTask)
+        heldBackSenderTask.add_done_callback(self.__heldBackSenderTasks.discard)
 
-        actualPieceHash: bytes = piece.infoHash
-        expectedPieceHash: bytes = self.__scanner.getPieceHash(pieceIndex)
-        if actualPieceHash == expectedPieceHash:
+    async def __resumeSenderWhenRoom(self, sender: Peer) -> None:
+        try:
+            while not self.__pieceHasher.hasRoom or not self.__torrentSaver.hasRoomInQueue:
+                await self.__pieceHasher.waitForRoom()
+                await self.__torrentSaver.waitForRoomInQueue()
+        finally:
+            sender.connection.resumeReading()
+
+    """
+    Saves a piece whose hash check passed, or discards it so that it is downloaded again
+    @:param piece - the complete piece
+    @:param actualPieceHash - the hash computed for the piece
+    """
+    def __finishPieceVerification(self, piece: Piece, actualPieceHash: Future[bytes]) -> None:
+        if actualPieceHash.cancelled() or self.__stopped.is_set():  # the session was stopped, so the piece is downloaded again next time
+            return
+        if actualPieceHash.exception() is not None:  # the piece is downloaded again; its buffer goes back to the pool
+            self.__blockRequester.markPieceAsFailed(piece.index)
+            return
+        expectedPieceHash: bytes = self.__scanner.getPieceHash(piece.index)
+        if actualPieceHash.result() == expectedPieceHash:
+            # until it is written, the piece is uploaded from its buffer, which goes back to the pool once written
             self.__torrentSaver.putPieceInQueue(piece)
             self.__blockRequester.markPieceAsDownloaded(piece.index)
         else:
-            # there's no need to re-request this - the piece will not be marked as complete, so it will be "caught" in the next search loop of the download session
-            piece.clear()
-        return
+            self.__blockRequester.markPieceAsFailed(piece.index)
+
+    """
+    A piece which could not be written on disk has to be downloaded again; the download is paused, since the error (e.g. a full
+    disk) most likely affects the next pieces as well
+    """
+    def __receivePieceWriteError(self, pieceIndex: int, error: OSError) -> None:
+        self.__sessionMetrics.addDiskWriteError(error)
+        self.__blockRequester.markPieceAsMissing(pieceIndex)
+        self.isDownloadPaused = True
 
     async def receiveRequestMessage(self, message: RequestMessage, sender: Peer) -> None:
         pieceIndex: int = utils.convert4ByteBigEndianToInteger(message.pieceIndex)
-        if pieceIndex >= len(self.__pieces) or pieceIndex < 0:
+        if pieceIndex >= self.__torrentState.pieceCount or pieceIndex < 0:
             return
         blockLength: int = utils.convert4ByteBigEndianToInteger(message.blockLength)
         if blockLength > utils.BLOCK_REQUEST_SIZE:
             return
-        blockWithoutData: Block | None = self.__pieces[pieceIndex].getBlockStartingAtOffset(utils.convert4ByteBigEndianToInteger(message.beginOffset))
+        blockWithoutData: Block | None = self.__torrentState.createBlock(pieceIndex, utils.convert4ByteBigEndianToInteger(message.beginOffset))
         if blockWithoutData is None:
             return
         if blockWithoutData not in sender.blocksRequestedByPeer:
-            sender.blocksRequestedByPeer.append(blockWithoutData)
+            sender.blocksRequestedByPeer.add(blockWithoutData)
             self.__torrentUploader.putBlockInQueue(blockWithoutData, sender)
 
     async def receiveCancelMessage(self, message: CancelMessage, sender: Peer) -> None:
         pieceIndex: int = utils.convert4ByteBigEndianToInteger(message.pieceIndex)
-        if pieceIndex >= len(self.__pieces) or pieceIndex < 0:
+        if pieceIndex >= self.__torrentState.pieceCount or pieceIndex < 0:
             return
         blockLength: int = utils.convert4ByteBigEndianToInteger(message.blockLength)
         if blockLength > utils.BLOCK_REQUEST_SIZE:
             return
-        blockWithoutData: Block | None = self.__pieces[pieceIndex].getBlockStartingAtOffset(utils.convert4ByteBigEndianToInteger(message.beginOffset))
+        blockWithoutData: Block | None = self.__torrentState.createBlock(pieceIndex, utils.convert4ByteBigEndianToInteger(message.beginOffset))
         if blockWithoutData is None:
             return
-        if blockWithoutData in sender.blocksRequestedByPeer:
-            sender.blocksRequestedByPeer.remove(blockWithoutData)
+        sender.blocksRequestedByPeer.discard(blockWithoutData)
 
     @property
     def sessionMetrics(self) -> SessionMetrics:
@@ -143,6 +334,8 @@ class DownloadSession:
     @isDownloadPaused.setter
     def isDownloadPaused(self, newValue: bool) -> None:
         self.__blockRequester.isDownloadPaused = newValue
+        if newValue:
+            self.__closeFiles()
 
     @property
     def isUploadPaused(self) -> bool:
@@ -151,6 +344,8 @@ class DownloadSession:
     @isUploadPaused.setter
     def isUploadPaused(self, newValue: bool) -> None:
         self.__isUploadPaused = newValue
+        if newValue:
+            self.__closeFiles()
 
     @property
     def downloadedPieces(self) -> bitarray:
@@ -158,4 +353,37 @@ class DownloadSession:
 
     @downloadedPieces.setter
     def downloadedPieces(self, newValue: List[bool]) -> None:
-        self.__blockRequester.setDownloadedPieces(newValue)
+        self.restorePieces(newValue, [], [])
+
+    """
+    The bytes of the pieces which are not downloaded yet
+    """
+    @property
+    def remainingBytes(self) -> int:
+        downloadedPieces: bitarray = self.downloadedPieces
+        totalSize: int = self.__scanner.getTotalContentSize()
+        downloadedBytes: int = downloadedPieces.count(1) * self.__scanner.regularPieceLength
+        if len(downloadedPieces) > 0 and downloadedPieces[-1]:  # the final piece may be shorter
+            downloadedBytes -= len(downloadedPieces) * self.__scanner.regularPieceLength - totalSize
+        return totalSize - downloadedBytes
+
+    """
+    Sets the pieces which are already downloaded, and starts again the pieces which were in progress (e.g. from the resume data)
+    @:param partialPieces - as (piece index, which blocks are complete, the data of the complete blocks)
+    @:param uncheckedPieceIndices - the pieces whose check on disk is still running; their results come through receiveCheckedPieces
+    """
+    def restorePieces(self, downloadedPieces: List[bool], partialPieces: Iterable[Tuple[int, bitarray, bytes]],
+                      uncheckedPieceIndices: List[int]) -> None:
+        self.__blockRequester.setDownloadedPieces(downloadedPieces, partialPieces, uncheckedPieceIndices)
+        self.__sessionMetrics.startIntegrityCheck(len(uncheckedPieceIndices))
+        self.__isPieceStateKnown = not uncheckedPieceIndices
+
+    """
+    Takes the results of the check of some pieces on disk: the pieces which are there count as downloaded, the others can be requested
+    @:param isWrittenOnDisk - for each piece, True if it is written on disk with the right content
+    """
+    def receiveCheckedPieces(self, pieceIndices: List[int], isWrittenOnDisk: List[bool]) -> None:
+        for pieceIndex, isPieceWrittenOnDisk in zip(pieceIndices, isWrittenOnDisk):
+            self.__blockRequester.markPieceAsChecked(pieceIndex, isPieceWrittenOnDisk)
+        self.__sessionMetrics.addCheckedPieces(len(pieceIndices))
+        self.__isPieceStateKnown = self.__blockRequester.uncheckedPieceCount == 0
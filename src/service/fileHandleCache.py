@@ -0,0 +1,219 @@
+import os
+import socket
+import threading
+from asyncio import Transport
+from collections import OrderedDict
+from typing import Iterable, Set, List, Final
+import utils
+from domain.fileHandle import FileHandle
+from service.storage import Storage
+
+
+class FileHandleCache(Storage):
+    """
+    Keeps the files of all the torrents open between reads and writes, instead of opening and closing a file for every piece
+    section and every uploaded block. At most a given number of files are kept open: when there are more, the least recently used
+    handles which are not in use are closed. It is shared by all the torrents, which run on different threads, so it is thread-safe.
+    A handle opened for reading is replaced by a writable one when the file is first written to
+    """
+    BACKEND_NAME: Final[str] = "file"
+    HAS_SENDFILE: Final[bool] = hasattr(os, "sendfile")
+    MAX_SEND_LENGTH: Final[int] = utils.BLOCK_REQUEST_SIZE  # the most which sendFileSection reads from disk on the event loop at once
+
+    def __init__(self, maxOpenFileCount: int):
+        self.__maxOpenFileCount: int = maxOpenFileCount
+        self.__fileHandles: OrderedDict[str, FileHandle] = OrderedDict()  # path -> handle, from the least to the most recently used
+        self.__lock: threading.Lock = threading.Lock()
+
+    """
+    Reads a section of a file
+    @:return the data read, which is shorter than requested only if the end of the file was reached
+    @:raise OSError - if the file cannot be opened or read
+    """
+    def readFileSection(self, path: str, fileOffset: int, length: int) -> bytes:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, False)
+        try:
+            return fileHandle.read(fileOffset, length)
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    """
+    Writes a section of a file; the file is created if it does not exist
+    @:return the number of bytes written
+    @:raise OSError - if the file cannot be opened or written
+    """
+    def writeFileSection(self, path: str, fileOffset: int, data: bytes | memoryview) -> int:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, True)
+        try:
+            return fileHandle.write(fileOffset, data)
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    """
+    Writes several buffers one after another, inside a file; the file is created if it does not exist, and grows with the writes
+    @:raise OSError - if the file cannot be opened or the data cannot be written entirely
+    """
+    def writeFileSectionVector(self, path: str, fileOffset: int, buffers: List[memoryview], fileLength: int) -> None:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, True)
+        try:
+            fileHandle.writeVector(fileOffset, buffers)
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    """
+    Creates a file with its final length, before any data is written to it
+    @:param isSparse - True to only set the length of the file, False to also allocate its disk space
+    @:raise OSError - if the file cannot be created or allocated
+    """
+    def allocateFile(self, path: str, length: int, isSparse: bool) -> None:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, True)
+        try:
+            if isSparse:
+                fileHandle.resize(length)
+            else:
+                fileHandle.allocate(length)
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    """
+    Sends a section of a file with sendfile, from the cached handle, which stays in use (so it cannot be evicted and closed) until
+    the section is handed to the transport. It is only done where positional I/O is available, since the handle is shared.
+    When the header leaves the transport at once, the section is first sent with a single sendfile call on the socket; whatever the
+    socket does not take right away is read with pread and left to the transport, which sends it when the socket is writable, so
+    that remainder does go through the memory of the process.
+    Both sendfile and pread run on the event loop, which they block while the section is read from disk if it is not in the page
+    cache; so only sections of up to a block are sent this way (the callers should have them read ahead with adviseWillRead), and
+    the longer ones are left to be read off the event loop
+    """
+    async def sendFileSection(self, path: str, fileOffset: int, length: int, header: bytes, transport: Transport) -> bool:
+        if not FileHandle.HAS_POSITIONAL_IO or length > self.MAX_SEND_LENGTH:
+            return False
+        try:
+            fileHandle: FileHandle = self.__acquireFileHandle(path, False)
+        except OSError:
+            return False
+        try:
+            if fileHandle.size < fileOffset + length:
+                return False
+            transport.write(header)
+            sentByteCount: int = 0
+            peerSocket: socket.socket | None = transport.get_extra_info("socket")
+            if self.HAS_SENDFILE and peerSocket is not None and transport.get_write_buffer_size() == 0:
+                try:
+                    sentByteCount = os.sendfile(peerSocket.fileno(), fileHandle.fileDescriptor, fileOffset, length)
+                except BlockingIOError:
+                    pass
+            if sentByteCount < length:
+                remainingData: bytes = fileHandle.read(fileOffset + sentByteCount, length - sentByteCount)
+                transport.write(remainingData)
+                sentByteCount += len(remainingData)
+            if sentByteCount != length:
+                raise ConnectionError(f"Only {sentByteCount} of {length} bytes were sent")
+            return True
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    def adviseWillRead(self, path: str, fileOffset: int, length: int) -> None:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, False)
+        try:
+            fileHandle.adviseWillRead(fileOffset, length)
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    def adviseSequentialRead(self, path: str) -> None:
+        fileHandle: FileHandle = self.__acquireFileHandle(path, False)
+        try:
+            fileHandle.adviseSequentialRead()
+        finally:
+            self.__releaseFileHandle(fileHandle)
+
+    """
+    Flushes the files through their cached handles, which stay in use meanwhile; a file without one (e.g. its handle was evicted
+    after the writes) is opened just for that, without being cached
+    """
+    def flush(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            with self.__lock:
+                fileHandle: FileHandle | None = self.__fileHandles.get(path)
+                if fileHandle is not None:
+                    fileHandle.userCount += 1
+            if fileHandle is not None:
+                try:
+                    fileHandle.flush()
+                finally:
+                    self.__releaseFileHandle(fileHandle)
+                continue
+            try:
+                fileHandle = FileHandle(path, False)
+            except FileNotFoundError:
+                continue
+            try:
+                fileHandle.flush()
+            finally:
+                fileHandle.close()
+
+    """
+    Closes the handles of some files (e.g. the files of a torrent which was paused or stopped); the handles which are in use
+    are closed as soon as they are released
+    """
+    def closeFiles(self, paths: Iterable[str]) -> None:
+        with self.__lock:
+            for path in paths:
+                fileHandle: FileHandle | None = self.__fileHandles.pop(path, None)
+                if fileHandle is not None:
+                    self.__closeWhenUnused(fileHandle)
+
+    def closeAllFiles(self) -> None:
+        with self.__lock:
+            for fileHandle in self.__fileHandles.values():
+                self.__closeWhenUnused(fileHandle)
+            self.__fileHandles.clear()
+
+    def __acquireFileHandle(self, path: str, isWritable: bool) -> FileHandle:
+        with self.__lock:
+            fileHandle: FileHandle | None = self.__fileHandles.get(path)
+            if fileHandle is not None and isWritable and not fileHandle.isWritable:
+                del self.__fileHandles[path]
+                self.__closeWhenUnused(fileHandle)
+                fileHandle = None
+            if fileHandle is None:
+                fileHandle = FileHandle(path, isWritable)
+                self.__fileHandles[path] = fileHandle
+            else:
+                self.__fileHandles.move_to_end(path)
+            fileHandle.userCount += 1
+            self.__evictLeastRecentlyUsed()
+            return fileHandle
+
+    def __releaseFileHandle(self, fileHandle: FileHandle) -> None:
+        with self.__lock:
+            fileHandle.userCount -= 1
+            if fileHandle.isClosing and fileHandle.userCount == 0:
+                fileHandle.close()
+            elif len(self.__fileHandles) > self.__maxOpenFileCount:  # every handle was in use when it was last evicted
+                self.__evictLeastRecentlyUsed()
+
+    """
+    Closes the least recently used handles which are not in use, until the limit of open files is respected
+    """
+    def __evictLeastRecentlyUsed(self) -> None:
+        if len(self.__fileHandles) <= self.__maxOpenFileCount:
+            return
+        evictedPaths: Set[str] = set()
+        for path, fileHandle in self.__fileHandles.items():
+            if len(self.__fileHandles) - len(evictedPaths) <= self.__maxOpenFileCount:
+                break
+            if fileHandle.userCount == 0:
+                evictedPaths.add(path)
+        for path in evictedPaths:
+            self.__fileHandles.pop(path).close()
+
+    def __closeWhenUnused(self, fileHandle: FileHandle) -> None:
+        if fileHandle.userCount == 0:
+            fileHandle.close()
+        else:
+            fileHandle.isClosing = True
+
+    @property
+    def openFileCount(self) -> int:
+        return len(self.__fileHandles)
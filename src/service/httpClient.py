@@ -0,0 +1,176 @@
+import asyncio
+import socket
+import ssl
+import time
+from asyncio import StreamReader, StreamWriter
+from typing import Dict, List, Tuple, Any, Final
+from urllib.parse import urlsplit, urlencode, quote, SplitResult
+
+
+class HttpClient:
+    """
+    A small HTTP/1.1 client on asyncio streams (GET requests only), so that talking to a tracker never blocks the event loop.
+    The connections are kept alive and reused by the next requests to the same server; a reused connection which the server closed
+    in the meantime is replaced by a new one, since a GET can safely be sent again. The addresses of the servers are cached for a while,
+    so that the periodic requests do not resolve them every time. Every request has its own timeout, covering all of it
+    """
+    DNS_CACHE_TIME_IN_SECONDS: Final[float] = 300.0
+    MAX_IDLE_CONNECTIONS_PER_SERVER: Final[int] = 2
+    HTTPS_SCHEME: Final[str] = "https"
+
+    def __init__(self):
+        self.__idleConnections: Dict[Tuple[str, str, int], List[Tuple[StreamReader, StreamWriter]]] = {}  # (scheme, host, port) -> connections
+        self.__resolvedAddresses: Dict[Tuple[str, int], Tuple[List[str], float]] = {}  # (host, port) -> (addresses, expiry time)
+        self.__sslContext: ssl.SSLContext | None = None
+        self.__openedConnectionCount: int = 0
+
+    """
+    @:param params - the parameters of the query, added to those already in the URL (bytes are percent-encoded as they are)
+    @:param timeout - the time the whole request may take, in seconds
+    @:return the status code and the body of the response
+    @:raise OSError - if the server cannot be reached, the connection fails, or the request times out (TimeoutError)
+    @:raise ValueError - if the response is not valid HTTP
+    """
+    async def get(self, url: str, params: Dict[str, Any], timeout: float) -> Tuple[int, bytes]:
+        return await asyncio.wait_for(self.__get(urlsplit(url), params), timeout)
+
+    async def __get(self, splitURL: SplitResult, params: Dict[str, Any]) -> Tuple[int, bytes]:
+        isHttps: bool = splitURL.scheme == self.HTTPS_SCHEME
+        host: str = splitURL.hostname or ""
+        port: int = splitURL.port or (443 if isHttps else 80)
+        query: str = "&".join(part for part in [splitURL.query, urlencode(params, quote_via=quote)] if part)
+        request: bytes = (f"GET {splitURL.path or '/'}{'?' + query if query else ''} HTTP/1.1\r\nHost: {splitURL.netloc}\r\n"
+                          f"Accept-Encoding: identity\r\nConnection: keep-alive\r\n\r\n").encode("latin-1")
+        serverKey: Tuple[str, str, int] = (splitURL.scheme, host, port)
+        idleConnection: Tuple[StreamReader, StreamWriter] | None = self.__takeIdleConnection(serverKey)
+        if idleConnection is not None:
+            try:
+                return await self.__exchange(serverKey, idleConnection, request)
+            except ConnectionError:
+                pass  # the server closed the connection while it was idle
+        return await self.__exchange(serverKey, await self.__openConnection(host, port, isHttps), request)
+
+    def __takeIdleConnection(self, serverKey: Tuple[str, str, int]) -> Tuple[StreamReader, StreamWriter] | None:
+        idleConnections: List[Tuple[StreamReader, StreamWriter]] = self.__idleConnections.get(serverKey, [])
+        while idleConnections:
+            reader, writer = idleConnections.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return None
+
+    """
+    @:return the addresses of a server, from the cache if they were resolved recently
+    @:raise OSError - if the host name cannot be resolved
+    """
+    async def __resolve(self, host: str, port: int) -> List[str]:
+        cachedAddresses: Tuple[List[str], float] | None = self.__resolvedAddresses.get((host, port))
+        if cachedAddresses is not None and cachedAddresses[1] > time.monotonic():
+            return cachedAddresses[0]
+        addressInfos: List[tuple] = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses: List[str] = list(dict.fromkeys(addressInfo[4][0] for addressInfo in addressInfos))  # without duplicates, in order
+        self.__resolvedAddresses[(host, port)] = (addresses, time.monotonic() + self.DNS_CACHE_TIME_IN_SECONDS)
+        return addresses
+
+    """
+    Connects to the first address of the server which accepts the connection
+    @:raise OSError - if no address accepts it
+    """
+    async def __openConnection(self, host: str, port: int, isHttps: bool) -> Tuple[StreamReader, StreamWriter]:
+        if isHttps and self.__sslContext is None:
+            self.__sslContext = ssl.create_default_context()
+        lastError: OSError = OSError(f"No address found for {host}")
+        for address in await self.__resolve(host, port):
+            try:
+                connection: Tuple[StreamReader, StreamWriter] = await asyncio.open_connection(
+                    address, port, ssl=self.__sslContext if isHttps else None, server_hostname=host if isHttps else None)
+                self.__openedConnectionCount += 1
+                return connection
+            except OSError as error:
+                lastError = error
+        self.__resolvedAddresses.pop((host, port), None)  # the server may have moved
+        raise lastError
+
+    """
+    Sends a request on a connection and reads the response; the connection is kept for the next requests if the server allows it,
+    and closed otherwise (or if anything fails)
+    """
+    async def __exchange(self, serverKey: Tuple[str, str, int], connection: Tuple[StreamReader, StreamWriter], request: bytes) -> Tuple[int, bytes]:
+        reader, writer = connection
+        try:
+            writer.write(request)
+            await writer.drain()
+            statusCode, headers, isKeptAlive = await self.__readResponseHead(reader)
+            body, isBodyDelimited = await self.__readBody(reader, headers)
+        except asyncio.IncompleteReadError as error:
+            writer.close()
+            raise ConnectionError("The connection was closed before the end of the response") from error
+        except BaseException:  # including the cancellation by the timeout, after which the state of the connection is unknown
+            writer.close()
+            raise
+        idleConnections: List[Tuple[StreamReader, StreamWriter]] = self.__idleConnections.setdefault(serverKey, [])
+        if isKeptAlive and isBodyDelimited and len(idleConnections) < self.MAX_IDLE_CONNECTIONS_PER_SERVER:
+            idleConnections.append(connection)
+        else:
+            writer.close()
+        return statusCode, body
+
+    """
+    @:return the status code, the headers (with lowercase names) and whether the server keeps the connection open
+    @:raise ValueError - if the status line is not valid
+    """
+    @staticmethod
+    async def __readResponseHead(reader: StreamReader) -> Tuple[int, Dict[str, str], bool]:
+        CONTINUE_STATUS_CODE: Final[int] = 100
+
+        while True:
+            headLines: List[str] = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            statusLineParts: List[str] = headLines[0].split(" ", 2)
+            if len(statusLineParts) < 2 or not statusLineParts[0].startswith("HTTP/") or not statusLineParts[1].isdigit():
+                raise ValueError(f"Invalid HTTP status line: {headLines[0]!r}")
+            if int(statusLineParts[1]) != CONTINUE_STATUS_CODE:
+                break
+        headers: Dict[str, str] = {}
+        for headerLine in headLines[1:]:
+            name, separator, value = headerLine.partition(":")
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+        connectionHeader: str = headers.get("connection", "").lower()
+        isKeptAlive: bool = connectionHeader == "keep-alive" if statusLineParts[0] == "HTTP/1.0" else connectionHeader != "close"
+        return int(statusLineParts[1]), headers, isKeptAlive
+
+    """
+    @:return the body, and whether its end was given by the response (by its length or chunks), rather than by closing the connection
+    """
+    @staticmethod
+    async def __readBody(reader: StreamReader, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks: List[bytes] = []
+            while True:
+                chunkLength: int = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if chunkLength == 0:
+                    break
+                chunks.append(await reader.readexactly(chunkLength))
+                await reader.readexactly(2)  # the CRLF after the chunk
+            while await reader.readuntil(b"\r\n") != b"\r\n":  # the trailer, which ends with an empty line
+                pass
+            return b"".join(chunks), True
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"])), True
+        return await reader.read(), False
+
+    """
+    Closes the idle connections
+    """
+    def close(self) -> None:
+        for idleConnections in self.__idleConnections.values():
+            for _, writer in idleConnections:
+                writer.close()
+        self.__idleConnections.clear()
+
+    """
+    The number of connections opened so far (a request made on a kept-alive connection opens none)
+    """
+    @property
+    def openedConnectionCount(self) -> int:
+        return self.__openedConnectionCount
@@ -1,4 +1,3 @@
-import utils
 from domain.message.bitfieldMessage import BitfieldMessage
 from domain.message.cancelMessage import CancelMessage
 from domain.message.chokeMessage import ChokeMessage
@@ -20,17 +19,17 @@ class MessageProcessor:
 
     def __bitfieldMessageAction(self, message: BitfieldMessage) -> None:
         # TODO - add validators for all messages
-        self.__sender.availablePieces.clear()
-        self.__sender.availablePieces.frombytes(message.bitfield)
+        self.__downloadSession.receiveBitfieldMessage(message, self.__sender)
 
     def __haveMessageAction(self, message: HaveMessage) -> None:
-        self.__sender.availablePieces[utils.convertByteToInteger(message.pieceIndex)] = 1
+        self.__downloadSession.receiveHaveMessage(message, self.__sender)
 
     def __chokeMessageAction(self) -> None:
-        self.__sender.isChokingMe = True
+        self.__downloadSession.receiveChokeMessage(self.__sender)
 
     def __unchokeMessageAction(self) -> None:
         self.__sender.isChokingMe = False
+        self.__downloadSession.notifyPeerStateChanged()
 
     async def __interestedMessageAction(self) -> None:
         self.__sender.isInterestedInMe = True
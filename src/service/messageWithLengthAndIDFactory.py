@@ -1,5 +1,4 @@
 from typing import Dict, Type
-import utils
 from domain.message.bitfieldMessage import BitfieldMessage
 from domain.message.cancelMessage import CancelMessage
 from domain.message.chokeMessage import ChokeMessage
@@ -14,7 +13,7 @@ from domain.message.unchokeMessage import UnchokeMessage
 
 class MessageWithLengthAndIDFactory:
     @staticmethod
-    def getMessageFromIDAndPayload(messageID: bytes, payload: bytes) -> MessageWithLengthAndID:
+    def getMessageFromIDAndPayload(messageID: int, payload: bytes | memoryview) -> MessageWithLengthAndID:
         IDToClassDictionary: Dict[int, Type[MessageWithLengthAndID]] = {
             ChokeMessage.MESSAGE_ID: ChokeMessage,
             UnchokeMessage.MESSAGE_ID: UnchokeMessage,
@@ -26,9 +25,8 @@ class MessageWithLengthAndIDFactory:
             PieceMessage.MESSAGE_ID: PieceMessage,
             CancelMessage.MESSAGE_ID: CancelMessage
         }
-        messageIDAsInt: int = utils.convertByteToInteger(messageID)
-        if messageIDAsInt not in IDToClassDictionary.keys():
+        if messageID not in IDToClassDictionary.keys():
             raise Exception("MessageID cannot be mapped to any message type")
-        message: MessageWithLengthAndID = IDToClassDictionary[messageIDAsInt]()
+        message: MessageWithLengthAndID = IDToClassDictionary[messageID]()
         message.setMessagePropertiesFromPayload(payload)
         return message
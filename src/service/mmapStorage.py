@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Final
+from domain.fileHandle import FileHandle
+from domain.mappedFile import MappedFile
+from service.storage import Storage
+
+
+class MmapStorage(Storage):
+    """
+    Maps the files of the torrents in memory: the pieces are copied into the mappings, and the reads (uploaded blocks and integrity
+    checks) are views over the mappings, so they need no system calls and no copies. At most a given number of files are kept mapped;
+    when there are more, the least recently used mappings are dropped.
+    A mapping is replaced when it has to be writable and is not, or when a write goes past its end (the file is extended first, with
+    its disk space allocated only under the full allocation mode).
+    It is shared by all the torrents, which run on different threads, so it is thread-safe
+    """
+    BACKEND_NAME: Final[str] = "mmap"
+
+    def __init__(self, maxMappedFileCount: int, allocatesDiskSpace: bool = False):
+        self.__maxMappedFileCount: int = maxMappedFileCount
+        self.__allocatesDiskSpace: bool = allocatesDiskSpace
+        self.__mappedFiles: OrderedDict[str, MappedFile] = OrderedDict()  # path -> mapping, from the least to the most recently used
+        self.__lock: threading.Lock = threading.Lock()
+
+    def readFileSection(self, path: str, fileOffset: int, length: int) -> memoryview:
+        return self.__getMappedFile(path, False, 0, 0).read(fileOffset, length)
+
+    def writeFileSectionVector(self, path: str, fileOffset: int, buffers: List[memoryview], fileLength: int) -> None:
+        self.__getMappedFile(path, True, fileOffset + sum(len(buffer) for buffer in buffers), fileLength).writeVector(fileOffset, buffers)
+
+    def allocateFile(self, path: str, length: int, isSparse: bool) -> None:
+        fileHandle: FileHandle = FileHandle(path, True)
+        try:
+            if isSparse:
+                fileHandle.resize(length)
+            else:
+                fileHandle.allocate(length)
+        finally:
+            fileHandle.close()
+        with self.__lock:
+            self.__mappedFiles.pop(path, None)  # the file may have grown since it was mapped
+
+    def adviseSequentialRead(self, path: str) -> None:
+        self.__getMappedFile(path, False, 0, 0).adviseSequentialRead()
+
+    """
+    Writes the modified pages of the mappings to the files, then waits until the files are on disk (the mappings which were dropped
+    left their pages to the system, so every file is flushed)
+    """
+    def flush(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            with self.__lock:
+                mappedFile: MappedFile | None = self.__mappedFiles.get(path)
+            if mappedFile is not None:
+                mappedFile.flush()
+            try:
+                fileHandle: FileHandle = FileHandle(path, False)
+            except FileNotFoundError:
+                continue
+            try:
+                fileHandle.flush()
+            finally:
+                fileHandle.close()
+
+    def closeFiles(self, paths: Iterable[str]) -> None:
+        with self.__lock:
+            for path in paths:
+                mappedFile: MappedFile | None = self.__mappedFiles.pop(path, None)
+                if mappedFile is not None:
+                    mappedFile.flush()
+
+    def closeAllFiles(self) -> None:
+        with self.__lock:
+            paths: List[str] = list(self.__mappedFiles)
+        self.closeFiles(paths)
+
+    """
+    @:param minimumLength - the length which a writable mapping must have
+    @:param finalLength - the length the file will have once it is complete (see MappedFile)
+    @:return the mapping of the file, created if there is no suitable one
+    """
+    def __getMappedFile(self, path: str, isWritable: bool, minimumLength: int, finalLength: int) -> MappedFile:
+        with self.__lock:
+            mappedFile: MappedFile | None = self.__mappedFiles.get(path)
+            if mappedFile is None or (isWritable and (not mappedFile.isWritable or mappedFile.length < minimumLength)):
+                mappedFile = MappedFile(path, isWritable, minimumLength, finalLength, self.__allocatesDiskSpace)
+                self.__mappedFiles[path] = mappedFile
+            self.__mappedFiles.move_to_end(path)
+            while len(self.__mappedFiles) > self.__maxMappedFileCount:
+                self.__mappedFiles.popitem(last=False)
+            return mappedFile
+
+    @property
+    def mappedFileCount(self) -> int:
+        return len(self.__mappedFiles)
@@ -0,0 +1,198 @@
+import asyncio
+from asyncio import BaseTransport, Future, Transport
+from typing import Final, Callable
+import utils
+from service.storage import Storage
+
+
+class PeerConnection(asyncio.BufferedProtocol):
+    """
+    Frames the peer wire protocol directly from the socket into preallocated buffers.
+    Short messages (and the handshake) are parsed from a single reusable receive buffer, while long payloads (PIECE messages,
+    large bitfields) are received straight into a buffer of their own, which is then handed over as a memoryview
+    """
+    LENGTH_PREFIX_LENGTH: Final[int] = 4  # bytes
+    MESSAGE_HEADER_LENGTH: Final[int] = LENGTH_PREFIX_LENGTH + utils.MESSAGE_ID_LENGTH
+    RECEIVE_BUFFER_SIZE: Final[int] = 65536  # bytes
+    DEDICATED_PAYLOAD_THRESHOLD: Final[int] = 1024  # bytes; longer payloads skip the receive buffer
+    MAX_MESSAGE_LENGTH: Final[int] = 2 ** 21  # bytes; larger length prefixes are considered protocol violations
+
+    def __init__(self, onMessageReceived: Callable[[int, bytes | memoryview], None]):
+        self.__onMessageReceived: Callable[[int, bytes | memoryview], None] = onMessageReceived
+        self.__transport: Transport | None = None
+        self.__receiveBuffer: bytearray = bytearray(self.RECEIVE_BUFFER_SIZE)
+        self.__receiveBufferView: memoryview = memoryview(self.__receiveBuffer)
+        self.__readPosition: int = 0  # start of the data which has not been parsed yet
+        self.__writePosition: int = 0  # end of the data received so far
+        self.__payloadView: memoryview | None = None  # dedicated buffer of the message currently being received
+        self.__payloadReceivedLength: int = 0
+        self.__payloadMessageID: int = 0
+        self.__isHandshakeReceived: bool = False
+        self.__handshakeFuture: Future[bytes] = asyncio.get_running_loop().create_future()
+        self.__closedFuture: Future[None] = asyncio.get_running_loop().create_future()
+        self.__canWrite: asyncio.Event = asyncio.Event()
+        self.__canWrite.set()
+        self.__readingPauseCount: int = 0  # the holders which asked for the reading to be paused, and did not resume it yet
+
+    def connection_made(self, transport: BaseTransport) -> None:
+        self.__transport = transport
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if not self.__handshakeFuture.done():
+            self.__handshakeFuture.set_exception(ConnectionError("Connection lost before the handshake was received"))
+        if not self.__closedFuture.done():
+            self.__closedFuture.set_result(None)
+        self.__canWrite.set()  # release the writers waiting in drain(); they will see the connection is closed
+
+    def pause_writing(self) -> None:
+        self.__canWrite.clear()
+
+    def resume_writing(self) -> None:
+        self.__canWrite.set()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self.__payloadView is not None:
+            return self.__payloadView[self.__payloadReceivedLength:]
+        return self.__receiveBufferView[self.__writePosition:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self.__payloadView is not None:
+            self.__payloadReceivedLength += nbytes
+            if self.__payloadReceivedLength == len(self.__payloadView):
+                self.__deliverDedicatedPayload()
+            return
+
+        self.__writePosition += nbytes
+        try:
+            self.__parseReceiveBuffer()
+        except ConnectionError:
+            self.close()
+
+    def eof_received(self) -> bool:
+        return False  # let the transport close itself
+
+    def __deliverDedicatedPayload(self) -> None:
+        payload: memoryview = self.__payloadView
+        self.__payloadView = None
+        self.__payloadReceivedLength = 0
+        self.__onMessageReceived(self.__payloadMessageID, payload)
+
+    """
+    Moves the unparsed data to the start of the receive buffer, so that there is always enough room for the next message header
+    """
+    def __compactReceiveBuffer(self) -> None:
+        unparsedLength: int = self.__writePosition - self.__readPosition
+        if unparsedLength == 0:
+            self.__readPosition, self.__writePosition = 0, 0
+        elif self.RECEIVE_BUFFER_SIZE - self.__writePosition < self.MESSAGE_HEADER_LENGTH + self.DEDICATED_PAYLOAD_THRESHOLD:
+            self.__receiveBufferView[: unparsedLength] = self.__receiveBufferView[self.__readPosition: self.__writePosition]
+            self.__readPosition, self.__writePosition = 0, unparsedLength
+
+    def __parseHandshake(self) -> None:
+        if self.__writePosition - self.__readPosition < utils.HANDSHAKE_MESSAGE_LENGTH:
+            return
+        handshakeEndPosition: int = self.__readPosition + utils.HANDSHAKE_MESSAGE_LENGTH
+        handshake: bytes = self.__receiveBufferView[self.__readPosition: handshakeEndPosition].tobytes()
+        self.__readPosition = handshakeEndPosition
+        self.__isHandshakeReceived = True
+        if not self.__handshakeFuture.done():
+            self.__handshakeFuture.set_result(handshake)
+
+    """
+    Switches to receiving the payload of the current message straight into a buffer of its own
+    @:param payloadLength - the length of the payload, excluding the message ID
+    """
+    def __startDedicatedPayload(self, messageID: int, payloadLength: int) -> None:
+        payloadStartPosition: int = self.__readPosition + self.MESSAGE_HEADER_LENGTH
+        alreadyReceivedLength: int = min(self.__writePosition - payloadStartPosition, payloadLength)
+
+        self.__payloadView = memoryview(bytearray(payloadLength))
+        self.__payloadView[: alreadyReceivedLength] = self.__receiveBufferView[payloadStartPosition: payloadStartPosition + alreadyReceivedLength]
+        self.__payloadReceivedLength = alreadyReceivedLength
+        self.__payloadMessageID = messageID
+        self.__readPosition = payloadStartPosition + alreadyReceivedLength
+        if alreadyReceivedLength == payloadLength:
+            self.__deliverDedicatedPayload()
+
+    def __parseReceiveBuffer(self) -> None:
+        if not self.__isHandshakeReceived:
+            self.__parseHandshake()
+
+        while self.__isHandshakeReceived and self.__payloadView is None:
+            availableLength: int = self.__writePosition - self.__readPosition
+            if availableLength < self.LENGTH_PREFIX_LENGTH:
+                break
+            lengthPrefixEndPosition: int = self.__readPosition + self.LENGTH_PREFIX_LENGTH
+            messageLength: int = utils.convert4ByteBigEndianToInteger(self.__receiveBufferView[self.__readPosition: lengthPrefixEndPosition])
+            if messageLength == 0:  # keep-alive
+                self.__readPosition = lengthPrefixEndPosition
+                continue
+            if messageLength > self.MAX_MESSAGE_LENGTH:
+                raise ConnectionError("Message length exceeds the maximum allowed length")
+            if availableLength < self.MESSAGE_HEADER_LENGTH:
+                break
+
+            messageID: int = self.__receiveBufferView[lengthPrefixEndPosition]
+            payloadLength: int = messageLength - utils.MESSAGE_ID_LENGTH
+            if payloadLength > self.DEDICATED_PAYLOAD_THRESHOLD:
+                self.__startDedicatedPayload(messageID, payloadLength)
+                continue
+            if availableLength < self.LENGTH_PREFIX_LENGTH + messageLength:
+                break
+
+            messageEndPosition: int = lengthPrefixEndPosition + messageLength
+            # short payloads are copied out, because the receive buffer is reused as soon as this call returns
+            payload: bytes = self.__receiveBufferView[lengthPrefixEndPosition + utils.MESSAGE_ID_LENGTH: messageEndPosition].tobytes()
+            self.__readPosition = messageEndPosition
+            self.__onMessageReceived(messageID, payload)
+
+        self.__compactReceiveBuffer()
+
+    async def receiveHandshake(self) -> bytes:
+        return await self.__handshakeFuture
+
+    def write(self, data: bytes | memoryview) -> None:
+        self.__transport.write(data)
+
+    async def drain(self) -> None:
+        if self.isClosed:
+            raise ConnectionResetError("Connection lost")
+        await self.__canWrite.wait()
+
+    """
+    Writes a header, followed by a section of a file which the storage sends straight to the socket, if it can; then waits
+    until the transport can take more data
+    @:return True if the header and the section were sent, False if nothing was written
+    """
+    async def sendFileSection(self, header: bytes, storage: Storage, path: str, fileOffset: int, length: int) -> bool:
+        if self.isClosed:
+            raise ConnectionResetError("Connection lost")
+        if not await storage.sendFileSection(path, fileOffset, length, header, self.__transport):
+            return False
+        await self.drain()
+        return True
+
+    """
+    Stops reading from the socket (the messages already received are still delivered), so that TCP flow control holds back the peer,
+    until every caller of this resumes the reading
+    """
+    def pauseReading(self) -> None:
+        self.__readingPauseCount += 1
+        if self.__readingPauseCount == 1 and not self.isClosed:
+            self.__transport.pause_reading()
+
+    def resumeReading(self) -> None:
+        self.__readingPauseCount -= 1
+        if self.__readingPauseCount == 0 and not self.isClosed:
+            self.__transport.resume_reading()
+
+    def close(self) -> None:
+        if self.__transport is not None:
+            self.__transport.close()
+
+    async def waitClosed(self) -> None:
+        await self.__closedFuture
+
+    @property
+    def isClosed(self) -> bool:
+        return self.__closedFuture.done() or self.__transport is None or self.__transport.is_closing()
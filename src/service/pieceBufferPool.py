@@ -0,0 +1,48 @@
+from typing import List
+
+
+class PieceBufferPool:
+    """
+    A bounded pool of preallocated buffers, each one able to hold a whole piece. Every piece in progress takes a buffer from
+    the pool and gives it back after it was written on disk (or dropped), so the number of buffers is a hard cap on the memory
+    taken by the pieces being downloaded. The buffers are allocated when first needed and then reused
+    """
+    def __init__(self, bufferLength: int, bufferCount: int):
+        self.__bufferLength: int = bufferLength
+        self.__bufferCount: int = bufferCount
+        self.__allocatedBufferCount: int = 0
+        self.__freeBuffers: List[bytearray] = []
+
+    """
+    Takes a buffer out of the pool; its content is whatever the previous user left in it
+    @:return the buffer, or None if all the buffers are in use
+    """
+    def acquire(self) -> bytearray | None:
+        if self.__freeBuffers:
+            return self.__freeBuffers.pop()
+        if self.__allocatedBufferCount == self.__bufferCount:
+            return None
+        self.__allocatedBufferCount += 1
+        return bytearray(self.__bufferLength)
+
+    """
+    Gives a buffer, previously acquired from this pool, back to the pool
+    """
+    def release(self, buffer: bytearray) -> None:
+        self.__freeBuffers.append(buffer)
+
+    @property
+    def hasFreeBuffer(self) -> bool:
+        return bool(self.__freeBuffers) or self.__allocatedBufferCount < self.__bufferCount
+
+    @property
+    def bufferLength(self) -> int:
+        return self.__bufferLength
+
+    @property
+    def bufferCount(self) -> int:
+        return self.__bufferCount
+
+    @property
+    def freeBufferCount(self) -> int:
+        return len(self.__freeBuffers) + self.__bufferCount - self.__allocatedBufferCount
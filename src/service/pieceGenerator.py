@@ -3,47 +3,65 @@ from typing import List
 import utils
 from domain.block import Block
 from domain.piece import Piece
-from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 
 
 class PieceGenerator:
-    def __init__(self, scanner: TorrentMetaInfoScanner):
-        self.__scanner: TorrentMetaInfoScanner = scanner
-
-    """
-    Generates the block list for the specified piece
-    @:param pieceIndex - the index of the piece whose blocks are generated
-    @:param blocksInPiece - the number of blocks inside the specified piece
-    @:param blockLength - the length in bytes of a regular block (i.e. not the last one)
-    @:param finalBlockLength - the length in bytes of the last block in the piece
-    @:return the list of blocks for the current piece
-    """
-    @staticmethod
-    def __generateBlocksForPiece(pieceIndex: int, blocksInPiece: int, blockLength: int, finalBlockLength: int) -> List[Block]:
-        blockList: List[Block] = [Block(pieceIndex, blockIndex * blockLength, blockLength) for blockIndex in range(blocksInPiece - 1)]
-        blockList.append(Block(pieceIndex, (blocksInPiece - 1) * blockLength, finalBlockLength))  # last block in the piece
-        return blockList
-
-    """
-    Generates the pieces (along their respective blocks) for the current torrent file
-    @:return the list of pieces
-    """
-    def generatePiecesWithBlocks(self) -> List[Piece]:
-        pieceCount: int = self.__scanner.pieceCount
-        pieceLength: int = self.__scanner.regularPieceLength
-        finalPieceLength: int = self.__scanner.finalPieceLength
-
-        blockLength: int = utils.BLOCK_REQUEST_SIZE
-        blocksInPiece: int = math.ceil(pieceLength / blockLength)
-        finalBlockLength: int = pieceLength % blockLength
-        if finalBlockLength == 0:
-            finalBlockLength = blockLength
-        blocksInFinalPiece: int = math.ceil(finalPieceLength / blockLength)
-        finalBlockLengthInFinalPiece: int = finalPieceLength % blockLength
-        if finalBlockLengthInFinalPiece == 0:
-            finalBlockLengthInFinalPiece = finalBlockLength
-
-        pieceList: List[Piece] = [Piece(pieceIndex, self.__generateBlocksForPiece(pieceIndex, blocksInPiece, blockLength, finalBlockLength)) for pieceIndex in range(pieceCount - 1)]
-        pieceList.append(Piece(pieceCount - 1, self.__generateBlocksForPiece(pieceCount - 1, blocksInFinalPiece, blockLength, finalBlockLengthInFinalPiece)))
-
-        return pieceList
+    """
+    Computes the geometry of the pieces and blocks of a torrent, and generates the Piece and Block objects on demand
+    (instead of generating all of them up front)
+    """
+    def __init__(self, pieceCount: int, regularPieceLength: int, finalPieceLength: int):
+        self.__pieceCount: int = pieceCount
+        self.__regularPieceLength: int = regularPieceLength
+        self.__finalPieceLength: int = finalPieceLength
+        self.__blocksInRegularPiece: int = math.ceil(regularPieceLength / utils.BLOCK_REQUEST_SIZE)
+
+    def getPieceLength(self, pieceIndex: int) -> int:
+        if pieceIndex == self.__pieceCount - 1:
+            return self.__finalPieceLength
+        return self.__regularPieceLength
+
+    def getBlockCount(self, pieceIndex: int) -> int:
+        return math.ceil(self.getPieceLength(pieceIndex) / utils.BLOCK_REQUEST_SIZE)
+
+    """
+    Computes the length of a block; all the blocks have the same length, except maybe the last one in the piece
+    @:param pieceIndex - the index of the piece which contains the block
+    @:param blockIndex - the index of the block inside its piece
+    @:return the length in bytes of the block
+    """
+    def getBlockLength(self, pieceIndex: int, blockIndex: int) -> int:
+        return min(utils.BLOCK_REQUEST_SIZE, self.getPieceLength(pieceIndex) - blockIndex * utils.BLOCK_REQUEST_SIZE)
+
+    """
+    Generates a piece, along with its blocks
+    @:param pieceIndex - the index of the piece
+    @:param buffer - the buffer in which the blocks of the piece are written; it must be at least as long as the piece
+    @:return the piece, with none of its blocks downloaded
+    """
+    def generatePiece(self, pieceIndex: int, buffer: bytearray) -> Piece:
+        blockList: List[Block] = [Block(pieceIndex, blockIndex * utils.BLOCK_REQUEST_SIZE, self.getBlockLength(pieceIndex, blockIndex))
+                                  for blockIndex in range(self.getBlockCount(pieceIndex))]
+        return Piece(pieceIndex, blockList, buffer)
+
+    """
+    Generates a single block (without data)
+    @:param pieceIndex - the index of the piece which contains the block
+    @:param beginOffset - the offset of the block inside its piece
+    @:return the block, or None if no block starts at the given position
+    """
+    def generateBlock(self, pieceIndex: int, beginOffset: int) -> Block | None:
+        if not 0 <= pieceIndex < self.__pieceCount or beginOffset < 0 or beginOffset % utils.BLOCK_REQUEST_SIZE != 0:
+            return None
+        blockIndex: int = beginOffset // utils.BLOCK_REQUEST_SIZE
+        if blockIndex >= self.getBlockCount(pieceIndex):
+            return None
+        return Block(pieceIndex, beginOffset, self.getBlockLength(pieceIndex, blockIndex))
+
+    @property
+    def pieceCount(self) -> int:
+        return self.__pieceCount
+
+    @property
+    def blocksInRegularPiece(self) -> int:
+        return self.__blocksInRegularPiece
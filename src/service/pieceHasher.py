@@ -0,0 +1,62 @@
+import asyncio
+from asyncio import Future
+from concurrent.futures import ThreadPoolExecutor
+from domain.piece import Piece
+
+
+class PieceHasher:
+    """
+    Computes the SHA-1 of complete pieces on a pool of threads, so that hashing a large piece does not stall the event loop
+    (hashlib releases the GIL while hashing, so the threads really run in parallel with the loop).
+    Submitting a piece never waits, so that the messages of the other peers keep being handled; once a given number of pieces wait
+    for (or are in) hashing, there is no room left, and the session stops reading from the peers which complete more pieces until
+    there is room again
+    """
+    def __init__(self, threadCount: int, maxPendingPieceCount: int):
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=threadCount, thread_name_prefix="PieceHasher")
+        self.__maxPendingPieceCount: int = maxPendingPieceCount
+        self.__pendingPieceCount: int = 0
+        self.__hasRoomEvent: asyncio.Event = asyncio.Event()
+        self.__hasRoomEvent.set()
+
+    """
+    Submits a complete piece for hashing; the piece must not be written to until the hash is computed
+    @:param piece - the piece, with all its blocks downloaded
+    @:return a future which will hold the SHA-1 of the piece
+    """
+    def submitPiece(self, piece: Piece) -> Future[bytes]:
+        self.__pendingPieceCount += 1
+        self.__updateRoomState()
+        infoHash: Future[bytes] = asyncio.get_running_loop().run_in_executor(self.__executor, piece.finishInfoHash)
+        infoHash.add_done_callback(self.__finishPendingPiece)
+        return infoHash
+
+    """
+    Waits while as many pieces as allowed wait for (or are in) hashing
+    """
+    async def waitForRoom(self) -> None:
+        await self.__hasRoomEvent.wait()
+
+    def __finishPendingPiece(self, _: Future[bytes]) -> None:
+        self.__pendingPieceCount -= 1
+        self.__updateRoomState()
+
+    def __updateRoomState(self) -> None:
+        if self.__pendingPieceCount < self.__maxPendingPieceCount:
+            self.__hasRoomEvent.set()
+        else:
+            self.__hasRoomEvent.clear()
+
+    """
+    Stops the threads once the pieces being hashed are done; the pieces which were not started are dropped
+    """
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def pendingPieceCount(self) -> int:
+        return self.__pendingPieceCount
+
+    @property
+    def hasRoom(self) -> bool:
+        return self.__hasRoomEvent.is_set()
@@ -0,0 +1,306 @@
+import random
+from array import array
+from typing import List, Dict, Final, Set, Callable
+from bitarray import bitarray
+import utils
+from domain.block import Block
+from domain.peer import Peer
+from service.torrentState import TorrentState
+
+
+class PiecePicker:
+    """
+    Chooses which block to request next: blocks of pieces which are already in progress come first, then blocks of the rarest
+    pieces among the connected peers, ties being broken randomly.
+    Pieces which have not been started are kept in buckets by availability, so that updating the availability of a piece is O(1),
+    and picking a block only looks at the start of the lowest buckets instead of walking all the pieces.
+    Seeds add the same availability to every piece, so they are only counted.
+    The per-piece state is kept in typed arrays, which take 4 bytes per piece instead of a Python int object
+    """
+    NOT_IN_BUCKET: Final[int] = -1
+    SPARSE_PEER_RATIO: Final[int] = 8  # peers with less than 1/8 of the pieces are searched through their own pieces
+
+    def __init__(self, torrentState: TorrentState):
+        self.__torrentState: TorrentState = torrentState
+        self.__pieceCount: int = torrentState.pieceCount
+        self.__availability: array = array("i", [0]) * self.__pieceCount  # the number of connected peers (seeds excluded) which have each piece
+        self.__seeds: Set[Peer] = set()
+        self.__piecesByAvailability: List[array] = [array("i")]  # pieces we need and have not started, by availability
+        self.__positionInBucket: array = array("i", [self.NOT_IN_BUCKET]) * self.__pieceCount
+        self.__partialPieces: Dict[int, List[int]] = {}  # started pieces -> indices of their blocks which are neither requested nor complete
+        # (started pieces whose blocks are all requested or complete are in neither structure)
+        self.__neededPieces: bitarray = bitarray(self.__pieceCount)
+        self.__neededPieces.setall(False)
+        self.__fastPeerOfPiece: Dict[int, Peer] = {}  # started pieces -> the fast peer which downloads them on its own
+
+    """
+    (Re)initializes the picker with the pieces which still need to be downloaded
+    @:param downloadedPieces - for each piece, True if it is already downloaded
+    """
+    def setDownloadedPieces(self, downloadedPieces: bitarray) -> None:
+        self.__piecesByAvailability = [array("i") for _ in range(max(self.__availability, default=0) + 1)]
+        self.__positionInBucket = array("i", [self.NOT_IN_BUCKET]) * self.__pieceCount
+        self.__partialPieces.clear()
+        self.__fastPeerOfPiece.clear()
+        self.__neededPieces = ~downloadedPieces[: self.__pieceCount]
+        for pieceIndex in self.__neededPieces.search(1):
+            if self.__torrentState.isPieceInProgress(pieceIndex):
+                self.__startPiece(pieceIndex)
+            else:
+                self.__addToBucket(pieceIndex)
+
+    def __isNotStarted(self, pieceIndex: int) -> bool:
+        return self.__positionInBucket[pieceIndex] != self.NOT_IN_BUCKET
+
+    def __addToBucket(self, pieceIndex: int) -> None:
+        bucket: array = self.__piecesByAvailability[self.__availability[pieceIndex]]
+        self.__positionInBucket[pieceIndex] = len(bucket)
+        bucket.append(pieceIndex)
+
+    """
+    Removes a piece from its bucket in O(1), by moving the last piece of the bucket in its place
+    """
+    def __removeFromBucket(self, pieceIndex: int) -> None:
+        bucket: array = self.__piecesByAvailability[self.__availability[pieceIndex]]
+        position: int = self.__positionInBucket[pieceIndex]
+        lastPieceIndex: int = bucket.pop()
+        if lastPieceIndex != pieceIndex:
+            bucket[position] = lastPieceIndex
+            self.__positionInBucket[lastPieceIndex] = position
+        self.__positionInBucket[pieceIndex] = self.NOT_IN_BUCKET
+
+    """
+    Moves a piece from the availability buckets to the partial pieces, with all its incomplete blocks available for requesting
+    """
+    def __startPiece(self, pieceIndex: int) -> None:
+        if self.__isNotStarted(pieceIndex):
+            self.__removeFromBucket(pieceIndex)
+        blocks: List[Block] = self.__torrentState.startPiece(pieceIndex).blocks
+        # the block indices are stored in reverse, so that popping them yields the blocks in order
+        freeBlockIndices: List[int] = [blockIndex for blockIndex in reversed(range(len(blocks))) if not blocks[blockIndex].isComplete]
+        if freeBlockIndices:
+            self.__partialPieces[pieceIndex] = freeBlockIndices
+
+    """
+    Takes the next free block of a started piece
+    """
+    def __takeFreeBlock(self, pieceIndex: int) -> Block:
+        freeBlockIndices: List[int] = self.__partialPieces[pieceIndex]
+        block: Block = self.__torrentState.getPiece(pieceIndex).blocks[freeBlockIndices.pop()]
+        if not freeBlockIndices:
+            del self.__partialPieces[pieceIndex]
+        return block
+
+    def __increaseAvailability(self, pieceIndex: int) -> None:
+        isNotStarted: bool = self.__isNotStarted(pieceIndex)
+        if isNotStarted:
+            self.__removeFromBucket(pieceIndex)
+        self.__availability[pieceIndex] += 1
+        if len(self.__piecesByAvailability) <= self.__availability[pieceIndex]:
+            self.__piecesByAvailability.append(array("i"))
+        if isNotStarted:
+            self.__addToBucket(pieceIndex)
+
+    def __decreaseAvailability(self, pieceIndex: int) -> None:
+        isNotStarted: bool = self.__isNotStarted(pieceIndex)
+        if isNotStarted:
+            self.__removeFromBucket(pieceIndex)
+        self.__availability[pieceIndex] -= 1
+        if isNotStarted:
+            self.__addToBucket(pieceIndex)
+
+    def __isSeed(self, availablePieces: bitarray) -> bool:
+        return len(availablePieces) >= self.__pieceCount and availablePieces.count(1, 0, self.__pieceCount) == self.__pieceCount
+
+    """
+    @:return The indices of the pieces set in a bitfield; the search for set bits is done by bitarray, not bit by bit in Python
+    """
+    def __ownedPieceIndices(self, availablePieces: bitarray) -> List[int]:
+        return [pieceIndex for pieceIndex in availablePieces.search(1) if pieceIndex < self.__pieceCount]
+
+    """
+    Counts all the pieces of a peer (after its bitfield was received)
+    """
+    def addPeerPieces(self, peer: Peer) -> None:
+        if self.__isSeed(peer.availablePieces):
+            self.__seeds.add(peer)
+            return
+        for pieceIndex in self.__ownedPieceIndices(peer.availablePieces):
+            self.__increaseAvailability(pieceIndex)
+
+    """
+    Stops counting the pieces of a peer (before its bitfield is replaced, or after it disconnected)
+    """
+    def removePeerPieces(self, peer: Peer) -> None:
+        self.__fastPeerOfPiece = {pieceIndex: fastPeer for pieceIndex, fastPeer in self.__fastPeerOfPiece.items() if fastPeer != peer}
+        if peer in self.__seeds:
+            self.__seeds.remove(peer)
+            return
+        for pieceIndex in self.__ownedPieceIndices(peer.availablePieces):
+            self.__decreaseAvailability(pieceIndex)
+
+    """
+    Counts a piece announced by a peer through a HAVE message; the piece must already be set in the peer's available pieces
+    """
+    def addPeerPiece(self, peer: Peer, pieceIndex: int) -> None:
+        if peer in self.__seeds:
+            return
+        self.__increaseAvailability(pieceIndex)
+        if self.__isSeed(peer.availablePieces):  # the peer has just completed the torrent, so from now on it is only counted
+            for ownedPieceIndex in range(self.__pieceCount):
+                self.__decreaseAvailability(ownedPieceIndex)
+            self.__seeds.add(peer)
+
+    @staticmethod
+    def __peerHasPiece(availablePieces: bitarray, pieceIndex: int) -> bool:
+        return pieceIndex < len(availablePieces) and availablePieces[pieceIndex]
+
+    """
+    Finds the rarest piece of a peer which owns only a few pieces, by going through its pieces instead of through the buckets
+    """
+    def __pickRarestPieceOfSparsePeer(self, availablePieces: bitarray) -> int | None:
+        rarestPieceIndex: int | None = None
+        equallyRarePieceCount: int = 0
+        for pieceIndex in self.__ownedPieceIndices(availablePieces):
+            if not self.__isNotStarted(pieceIndex):
+                continue
+            if rarestPieceIndex is None or self.__availability[pieceIndex] < self.__availability[rarestPieceIndex]:
+                rarestPieceIndex, equallyRarePieceCount = pieceIndex, 1
+            elif self.__availability[pieceIndex] == self.__availability[rarestPieceIndex]:
+                equallyRarePieceCount += 1
+                if random.randrange(equallyRarePieceCount) == 0:  # keeps the choice uniform among the equally rare pieces
+                    rarestPieceIndex = pieceIndex
+        return rarestPieceIndex
+
+    def __getFirstBucketIndex(self) -> int:
+        return 0 if self.__seeds else 1  # without seeds, nobody has the pieces from bucket 0
+
+    """
+    Finds the rarest piece of a peer by going through the buckets, from the rarest up.
+    Each bucket is searched from a random position, which breaks the ties between equally rare pieces
+    """
+    def __pickRarestPieceByBuckets(self, availablePieces: bitarray) -> int | None:
+        for bucket in self.__piecesByAvailability[self.__getFirstBucketIndex():]:
+            if not bucket:
+                continue
+            startPosition: int = random.randrange(len(bucket))
+            for position in range(len(bucket)):
+                pieceIndex: int = bucket[(startPosition + position) % len(bucket)]
+                if self.__peerHasPiece(availablePieces, pieceIndex):
+                    return pieceIndex
+        return None
+
+    """
+    Starts the rarest piece owned by a peer
+    @:return The index of the piece, or None if the peer has no piece which has not been started, or there is no free buffer for
+    a new piece
+    """
+    def __startRarestPiece(self, availablePieces: bitarray) -> int | None:
+        if not self.__torrentState.canStartPiece:
+            return None
+        rarestPieceIndex: int | None
+        if availablePieces.count(1) * self.SPARSE_PEER_RATIO < self.__pieceCount:
+            rarestPieceIndex = self.__pickRarestPieceOfSparsePeer(availablePieces)
+        else:
+            rarestPieceIndex = self.__pickRarestPieceByBuckets(availablePieces)
+        if rarestPieceIndex is not None:
+            self.__startPiece(rarestPieceIndex)
+        return rarestPieceIndex
+
+    """
+    @:return The first started piece with free blocks which is owned by the peer and whose fast peer passes the filter
+    """
+    def __findPartialPiece(self, availablePieces: bitarray, fastPeerFilter: Callable[[Peer | None], bool]) -> int | None:
+        for pieceIndex in self.__partialPieces:
+            if fastPeerFilter(self.__fastPeerOfPiece.get(pieceIndex)) and self.__peerHasPiece(availablePieces, pieceIndex):
+                return pieceIndex
+        return None
+
+    """
+    Chooses the next block to request from a peer and marks it as requested.
+    A fast peer (one which can download a whole piece within its request pipeline) downloads whole pieces on its own: it continues
+    the pieces it started, then starts new ones, and only helps with the pieces of other peers when nothing else is left.
+    Slow peers share the pieces which were not started by fast peers, so that they do not spread over (and hold up) many pieces
+    @:param availablePieces - the pieces owned by the peer
+    @:param fastPeer - the peer, if it is fast, None otherwise
+    @:return The block, or None if the peer has nothing we still need to request
+    """
+    def pickBlock(self, availablePieces: bitarray, fastPeer: Peer | None = None) -> Block | None:
+        pieceIndex: int | None
+        if fastPeer is not None:
+            pieceIndex = self.__findPartialPiece(availablePieces, lambda pieceFastPeer: pieceFastPeer == fastPeer)
+            if pieceIndex is None:
+                pieceIndex = self.__startRarestPiece(availablePieces)
+                if pieceIndex is not None:
+                    self.__fastPeerOfPiece[pieceIndex] = fastPeer
+        else:
+            pieceIndex = self.__findPartialPiece(availablePieces, lambda pieceFastPeer: pieceFastPeer is None)
+            if pieceIndex is None:
+                pieceIndex = self.__startRarestPiece(availablePieces)
+        if pieceIndex is None:
+            pieceIndex = self.__findPartialPiece(availablePieces, lambda pieceFastPeer: True)
+        if pieceIndex is None or pieceIndex not in self.__partialPieces:
+            return None
+        return self.__takeFreeBlock(pieceIndex)
+
+    @property
+    def blockCountInPiece(self) -> int:
+        return self.__torrentState.blocksInRegularPiece
+
+    """
+    False when every block which is still needed has been requested, i.e. all the remaining blocks are in flight; the pieces which
+    no connected peer has count as unrequested, since they still have to be requested once a peer which has them connects
+    """
+    @property
+    def hasUnrequestedBlocks(self) -> bool:
+        return bool(self.__partialPieces) or any(self.__piecesByAvailability)
+
+    """
+    Makes a requested block available for picking again (e.g. the request timed out or the peer disconnected)
+    """
+    def releaseBlock(self, pieceIndex: int, beginOffset: int) -> None:
+        blockIndex: int = beginOffset // utils.BLOCK_REQUEST_SIZE
+        if not self.__neededPieces[pieceIndex] or self.__isNotStarted(pieceIndex) or self.__torrentState.isBlockComplete(pieceIndex, blockIndex):
+            return
+        freeBlockIndices: List[int] = self.__partialPieces.setdefault(pieceIndex, [])
+        if blockIndex not in freeBlockIndices:
+            freeBlockIndices.append(blockIndex)
+
+    """
+    Takes a block out of the free blocks, in case it arrived after its request had already been released
+    """
+    def markBlockReceived(self, pieceIndex: int, beginOffset: int) -> None:
+        blockIndex: int = beginOffset // utils.BLOCK_REQUEST_SIZE
+        freeBlockIndices: List[int] | None = self.__partialPieces.get(pieceIndex)
+        if freeBlockIndices is None or blockIndex not in freeBlockIndices:
+            return
+        freeBlockIndices.remove(blockIndex)
+        if not freeBlockIndices:
+            del self.__partialPieces[pieceIndex]
+
+    def markPieceAsDownloaded(self, pieceIndex: int) -> None:
+        self.__neededPieces[pieceIndex] = False
+        self.__partialPieces.pop(pieceIndex, None)
+        self.__fastPeerOfPiece.pop(pieceIndex, None)
+        if self.__isNotStarted(pieceIndex):
+            self.__removeFromBucket(pieceIndex)
+
+    """
+    Puts a piece which was downloaded, but then lost (e.g. it could not be written on disk), back among the pieces that have not
+    been started
+    """
+    def markPieceAsMissing(self, pieceIndex: int) -> None:
+        if self.__neededPieces[pieceIndex]:
+            return
+        self.__neededPieces[pieceIndex] = True
+        self.__addToBucket(pieceIndex)
+
+    """
+    Puts a piece which failed its hash check back among the pieces that have not been started
+    """
+    def markPieceAsFailed(self, pieceIndex: int) -> None:
+        if not self.__neededPieces[pieceIndex] or self.__isNotStarted(pieceIndex):
+            return
+        self.__partialPieces.pop(pieceIndex, None)
+        self.__fastPeerOfPiece.pop(pieceIndex, None)
+        self.__addToBucket(pieceIndex)
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+
+class PieceReadCache:
+    """
+    Keeps the data of the most recently uploaded pieces in memory, since peers usually request all the blocks of a piece one after
+    another: the first block read brings in the whole piece, and the following blocks are served from memory.
+    The cached pieces take at most a given number of bytes; when they would take more, the least recently used pieces are dropped
+    """
+    def __init__(self, maxByteCount: int):
+        self.__maxByteCount: int = maxByteCount
+        self.__pieces: OrderedDict[int, bytes | memoryview] = OrderedDict()  # index -> data, from the least to the most recently used
+        self.__cachedByteCount: int = 0
+
+    """
+    @:return the data of the piece, or None if the piece is not cached
+    """
+    def getPiece(self, pieceIndex: int) -> bytes | memoryview | None:
+        pieceData: bytes | memoryview | None = self.__pieces.get(pieceIndex)
+        if pieceData is not None:
+            self.__pieces.move_to_end(pieceIndex)
+        return pieceData
+
+    """
+    Checks whether a piece is cached, without counting as a use of the piece
+    """
+    def containsPiece(self, pieceIndex: int) -> bool:
+        return pieceIndex in self.__pieces
+
+    """
+    Caches the data of a piece (replacing the data cached before, if any); a piece larger than the whole cache is not cached
+    """
+    def addPiece(self, pieceIndex: int, pieceData: bytes | memoryview) -> None:
+        self.removePiece(pieceIndex)
+        if len(pieceData) > self.__maxByteCount:
+            return
+        while self.__cachedByteCount + len(pieceData) > self.__maxByteCount:
+            self.__cachedByteCount -= len(self.__pieces.popitem(last=False)[1])
+        self.__pieces[pieceIndex] = pieceData
+        self.__cachedByteCount += len(pieceData)
+
+    def removePiece(self, pieceIndex: int) -> None:
+        pieceData: bytes | memoryview | None = self.__pieces.pop(pieceIndex, None)
+        if pieceData is not None:
+            self.__cachedByteCount -= len(pieceData)
+
+    def clear(self) -> None:
+        self.__pieces.clear()
+        self.__cachedByteCount = 0
+
+    @property
+    def cachedPieceCount(self) -> int:
+        return len(self.__pieces)
+
+    @property
+    def cachedByteCount(self) -> int:
+        return self.__cachedByteCount
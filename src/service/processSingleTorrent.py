@@ -1,65 +1,83 @@
 import asyncio
-from asyncio import StreamReader, events, AbstractEventLoop
-from typing import List, Final, Coroutine, Tuple
+from asyncio import events, AbstractEventLoop, Task
+from typing import List, Final, Coroutine, Tuple, Dict
+from bitarray import bitarray
 import utils
 from domain.message.handshakeMessage import HandshakeMessage
 from domain.message.interestedMessage import InterestedMessage
-from domain.message.keepAliveMessage import KeepAliveMessage
 from domain.message.messageWithLengthAndID import MessageWithLengthAndID
 from domain.message.unchokeMessage import UnchokeMessage
 from domain.peer import Peer
+from domain.peerTable import PeerTable
+from domain.resumeData import ResumeData
 from domain.validator.handshakeMessageValidator import HandshakeMessageValidator
+from service import settingsProcessor
+from service.announceScheduler import AnnounceScheduler
 from service.downloadSession import DownloadSession
 from service.messageQueue import MessageQueue
 from service.messageWithLengthAndIDFactory import MessageWithLengthAndIDFactory
+from service.peerConnection import PeerConnection
+from service.resumeDataStore import ResumeDataStore
 from service.sessionMetrics import SessionMetrics
+from service.storage import Storage
 from service.torrentDiskIntegrityChecker import TorrentDiskIntegrityChecker
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 from service.trackerConnection import TrackerConnection
 
 
 class ProcessSingleTorrent:
-    def __init__(self, torrentFilePath: str, downloadLocation: str):
+    """
+    @:param storages - the storage of every backend, out of which the torrent uses the one chosen in its settings
+    @:raise ValueError - if the settings choose a backend which does not exist
+    """
+    def __init__(self, torrentFilePath: str, downloadLocation: str, storages: Dict[str, Storage]):
         self.__scanner: TorrentMetaInfoScanner = TorrentMetaInfoScanner(torrentFilePath, downloadLocation)
-        self.__trackerConnection: TrackerConnection = TrackerConnection(self.__scanner)
-        self.__downloadSession: DownloadSession = DownloadSession(self.__scanner)
+        storageBackend: str = settingsProcessor.getStorageBackend(self.__scanner.torrentName)
+        if storageBackend not in storages:
+            raise ValueError(f"Unknown {settingsProcessor.STORAGE_BACKEND_KEY} '{storageBackend}' for {self.__scanner.torrentName}, "
+                             f"expected one of {', '.join(storages)}")
+        self.__storage: Storage = storages[storageBackend]
+        self.__resumeDataStore: ResumeDataStore = ResumeDataStore(self.__scanner, settingsProcessor.getResumeDataLocation())
+        self.__downloadSession: DownloadSession = DownloadSession(self.__scanner, self.__storage, self.__resumeDataStore)
+        self.__trackerConnection: TrackerConnection = TrackerConnection(self.__scanner, self.__getTransferStatistics)
+        self.__announceScheduler: AnnounceScheduler = AnnounceScheduler(self.__trackerConnection, settingsProcessor.getMinConnectedPeerCount(),
+                                                                        self.__getConnectedPeerCount, self.__addAnnouncedPeers)
         self.__messageQueue: MessageQueue = MessageQueue(self.__downloadSession)
         self.__peerList: List[Peer] = []
         self.__peerDownloadingCoroutines: List[Coroutine] = []
         self.__peerUploadingCoroutines: List[Coroutine] = []
         self.__isDownloaded: bool = False
+        self.__isDownloadStarted: bool = False
+        self.__isStopped: bool = False
+        self.__peersAnnounced: asyncio.Event = asyncio.Event()  # set when the trackers give the first peers, if the "started" announce gave none
+        self.__integrityCheckTask: Task | None = None
         # using this instead of the usual asyncio.run(), because of issues when calling create_task from another thread (e.g. from the GUI)
         self.__eventLoop: AbstractEventLoop = asyncio.new_event_loop()
 
     async def __makeTrackerStartedRequest(self) -> None:
-        peerList, port = await self.__trackerConnection.makeTrackerStartedRequest()
-        self.__host: Peer = Peer(utils.convertIPFromStringToInt(self.__trackerConnection.currentIP), port)
-        await self.__addNewPeers(peerList)
-
-    """
-    Attempts to read byteCount bytes. If too many empty messages are read in a row, the reading is aborted
-    @:param reader - where the data is read from
-    @:param byteCount - the number of bytes to be read
-    @:returns The read data, of length byteCount or less
-    """
-    @staticmethod
-    async def __attemptToReadBytes(reader: StreamReader, byteCount: int) -> bytes:
-        MAX_CONSECUTIVE_EMPTY_MESSAGES: Final[int] = 3
-
-        payload: bytes = b""
-        completedLength: int = 0
-        consecutiveEmptyMessages: int = 0
-        while completedLength < byteCount and consecutiveEmptyMessages < MAX_CONSECUTIVE_EMPTY_MESSAGES:
-            newSequence: bytes = await reader.read(byteCount - completedLength)  # throws exception ?
-            payload += newSequence
-            completedLength += len(newSequence)
-            if not newSequence:
-                consecutiveEmptyMessages += 1
-            else:
-                consecutiveEmptyMessages = 0
-        if consecutiveEmptyMessages == MAX_CONSECUTIVE_EMPTY_MESSAGES:
-            raise ConnectionError("Error when trying to read message")
-        return payload
+        peerTable, port = await self.__trackerConnection.makeTrackerStartedRequest()
+        self.__host: Peer = self.__createHost(port)
+        await self.__addNewPeers(peerTable)
+
+    """
+    @:return this client, as a peer; its IP is 0 if the tracker connection could not find it
+    """
+    def __createHost(self, port: int) -> Peer:
+        currentIP: str | None = self.__trackerConnection.currentIP
+        return Peer(utils.convertIPFromStringToInt(currentIP) if currentIP is not None else 0, port)
+
+    """
+    @:return the bytes uploaded and downloaded in this session, and the bytes left to download, as reported to the trackers
+    """
+    def __getTransferStatistics(self) -> Tuple[int, int, int]:
+        sessionMetrics: SessionMetrics = self.__downloadSession.sessionMetrics
+        return sessionMetrics.totalUploadedBytes, sessionMetrics.sessionDownloadedBytes, self.__downloadSession.remainingBytes
+
+    def __getConnectedPeerCount(self) -> int:
+        return sum(1 for peer in self.__peerList if peer.hasActiveConnection())
+
+    def __createPeerConnection(self, otherPeer: Peer) -> PeerConnection:
+        return PeerConnection(lambda messageID, payload: self.__receiveMessage(messageID, payload, otherPeer))
 
     """
     Attempts to initiate a connection with another peer by exchanging handshake messages
@@ -72,9 +90,10 @@ class ProcessSingleTorrent:
 
         for _ in range(ATTEMPTS_TO_CONNECT_TO_PEER):
             try:
-                otherPeer.streamReader, otherPeer.streamWriter = await asyncio.wait_for(asyncio.open_connection(utils.convertIPFromIntToString(otherPeer.IP), otherPeer.port), timeout=OPEN_CONNECTION_TIMEOUT_IN_SECONDS)
+                _, otherPeer.connection = await asyncio.wait_for(self.__eventLoop.create_connection(lambda: self.__createPeerConnection(otherPeer), utils.convertIPFromIntToString(otherPeer.IP, otherPeer.isIPv6), otherPeer.port),
+                                                                 timeout=OPEN_CONNECTION_TIMEOUT_IN_SECONDS)
                 await HandshakeMessage(self.__scanner.infoHash, utils.PEER_ID).send(otherPeer)
-                handshakeResponse: bytes = await self.__attemptToReadBytes(otherPeer.streamReader, utils.HANDSHAKE_MESSAGE_LENGTH)
+                handshakeResponse: bytes = await asyncio.wait_for(otherPeer.connection.receiveHandshake(), timeout=OPEN_CONNECTION_TIMEOUT_IN_SECONDS)
                 if HandshakeMessageValidator(self.__scanner.infoHash, HandshakeMessage.CURRENT_PROTOCOL, handshakeResponse).validate():
                     return True
             except Exception:
@@ -86,38 +105,28 @@ class ProcessSingleTorrent:
         await asyncio.gather(*[peer.closeConnection() for peer in self.__peerList if peer.hasActiveConnection()])
 
     """
-    Reads an entire message from another peer and processes it according to its type
+    Processes a message which has been framed by the connection to another peer, according to its type
+    @:param messageID - the ID of the message
+    @:param payload - the message payload, excluding the length prefix and the message ID
     @:param sender - the peer we receive the message from
-    @:returns True, if the message has been read successfully, False otherwise
     """
-    async def __readMessage(self, sender: Peer) -> bool:
-        LENGTH_PREFIX_LENGTH: Final[int] = 4  # bytes
+    def __receiveMessage(self, messageID: int, payload: bytes | memoryview, sender: Peer) -> None:
         EXTENDED_PROTOCOL_MESSAGE_ID: Final[int] = 20
 
-        try:
-            lengthPrefix: bytes = await self.__attemptToReadBytes(sender.streamReader, LENGTH_PREFIX_LENGTH)
-        except ConnectionError as e:
-            return False  # TODO - log the exception
-
-        if not lengthPrefix or lengthPrefix == utils.convertIntegerTo4ByteBigEndian(KeepAliveMessage.LENGTH_PREFIX):
-            return True
-        messageID: bytes = await self.__attemptToReadBytes(sender.streamReader, utils.MESSAGE_ID_LENGTH)
-        payloadLength: int = utils.convert4ByteBigEndianToInteger(lengthPrefix) - utils.MESSAGE_ID_LENGTH
-        payload: bytes = await self.__attemptToReadBytes(sender.streamReader, payloadLength)
-        if messageID == utils.convertIntegerTo1Byte(EXTENDED_PROTOCOL_MESSAGE_ID):
-            return True
-
+        if messageID == EXTENDED_PROTOCOL_MESSAGE_ID:
+            return
         try:
             message: MessageWithLengthAndID = MessageWithLengthAndIDFactory.getMessageFromIDAndPayload(messageID, payload)
             self.__messageQueue.putMessageInQueue(message, sender)
         except Exception as e:
             pass  # TODO - log the exception
-        return True
 
     async def __exchangeMessagesWithPeer(self, otherPeer: Peer) -> None:
-        while otherPeer.hasActiveConnection():
-            if not await self.__readMessage(otherPeer):
-                await otherPeer.closeConnection()
+        if otherPeer.hasActiveConnection():
+            await otherPeer.connection.waitClosed()
+        await otherPeer.closeConnection()
+        self.__downloadSession.removePeer(otherPeer)  # its outstanding requests can go to other peers
+        self.__announceScheduler.notifyPeerDisconnected()
 
     async def __startConnectionToPeerForDownload(self, otherPeer: Peer) -> None:
         await InterestedMessage().send(otherPeer)
@@ -137,20 +146,44 @@ class ProcessSingleTorrent:
         self.__peerList.clear()
         self.__peerList.extend(connectedPeers)
 
-    async def __addNewPeers(self, newPeers: List[Peer]) -> None:
-        try:
-            newPeers.remove(self.__host)
-        except ValueError:
-            pass
+    """
+    @:param newPeers - the peers given by the trackers, whose Peer objects are created one at a time, as they are connected to
+    """
+    async def __addNewPeers(self, newPeers: PeerTable) -> None:
         for newPeer in newPeers:
-            if newPeer not in self.__peerList:
+            if newPeer != self.__host and newPeer not in self.__peerList:
                 if await self.__attemptToHandshakeWithPeer(newPeer):
                     self.__peerList.append(newPeer)
 
+    """
+    Connects to the new peers among those given by a periodic announce, and starts exchanging messages with them, either for
+    downloading or for uploading; if the download is not started yet, since no peers were known, it starts with them
+    """
+    async def __addAnnouncedPeers(self, announcedPeers: PeerTable) -> None:
+        self.__removeDisconnectedPeers()
+        knownPeerCount: int = len(self.__peerList)
+        await self.__addNewPeers(announcedPeers)
+        newPeers: List[Peer] = self.__peerList[knownPeerCount:]
+        if not newPeers:
+            return
+        if not self.__isDownloaded and not self.__isDownloadStarted:
+            self.__peersAnnounced.set()  # the download starts with all the peers in the list
+            return
+        self.__downloadSession.setPeerList(self.__peerList)
+        for newPeer in newPeers:
+            if self.__isDownloaded:
+                peerCoroutine: Coroutine = self.__startConnectionToPeerForUpload(newPeer)
+                self.__peerUploadingCoroutines.append(peerCoroutine)
+            else:
+                peerCoroutine = self.__startConnectionToPeerForDownload(newPeer)
+                self.__peerDownloadingCoroutines.append(peerCoroutine)
+            asyncio.ensure_future(peerCoroutine)
+
     async def __upload(self) -> None:
-        newPeersAndPort: Tuple[List[Peer], int] = await self.__trackerConnection.makeTrackerFinishedRequest()
+        self.__announceScheduler.start()
+        newPeersAndPort: Tuple[PeerTable, int] = await self.__trackerConnection.makeTrackerFinishedRequest()
         if newPeersAndPort[1] != self.__host.port:
-            self.__host = Peer(utils.convertIPFromStringToInt(self.__trackerConnection.currentIP), newPeersAndPort[1])
+            self.__host = self.__createHost(newPeersAndPort[1])
         self.__removeDisconnectedPeers()
         await self.__addNewPeers(newPeersAndPort[0])
         self.__downloadSession.setPeerList(self.__peerList)
@@ -167,17 +200,24 @@ class ProcessSingleTorrent:
             pass  # just paused
 
     async def __stop(self) -> None:
+        if self.__integrityCheckTask is not None:
+            self.__integrityCheckTask.cancel()
+        self.__isStopped = True
+        self.__peersAnnounced.set()  # the torrent no longer waits for peers
         self.__messageQueue.running = False
         await self.__downloadSession.stop()
         await self.__closeAllActiveConnections()
+        await self.__announceScheduler.stop()  # after the download session, so that the trackers get the final statistics
+        self.__trackerConnection.close()
         # normally I should stop + close the event loop here, but trust me, it can't be done
 
     def stop(self) -> None:
         self.__eventLoop.create_task(self.__stop())
 
     async def __startTorrentDownload(self) -> None:
+        self.__isDownloadStarted = True
         self.__downloadSession.setPeerList(self.__peerList)
-        self.__downloadSession.startDownload()
+        await self.__downloadSession.startDownload()
         self.__messageQueue.start()
         self.__peerDownloadingCoroutines.extend([self.__startConnectionToPeerForDownload(otherPeer) for otherPeer in self.__peerList])
         coroutineList: List[Coroutine] = []
@@ -186,16 +226,41 @@ class ProcessSingleTorrent:
         await asyncio.gather(*coroutineList)
         self.stop()  # "natural" stop
 
+    """
+    Determines what is already downloaded: from the resume data, if there is any (only the downloaded pieces in the files which
+    changed since it was saved have to be checked again), otherwise (or if a recheck is forced) every piece has to be checked on disk
+    @:return for each piece, True if it is known to be written on disk; the pieces which were in progress, as saved in the resume
+    data; and the pieces which have to be checked
+    """
+    def __determineDownloadState(self) -> Tuple[List[bool], List[Tuple[int, bitarray, bytes]], List[int]]:
+        resumeData: ResumeData | None = None if settingsProcessor.isRecheckForced(self.__scanner.torrentName) else self.__resumeDataStore.load()
+        if resumeData is None:
+            return [False] * self.__scanner.pieceCount, [], list(range(self.__scanner.pieceCount))
+        isPieceWrittenOnDisk: List[bool] = [bool(isDownloaded) for isDownloaded in resumeData.downloadedPieces]
+        piecesToRecheck: List[int] = self.__resumeDataStore.getPiecesToRecheck(resumeData)
+        for pieceIndex in piecesToRecheck:
+            isPieceWrittenOnDisk[pieceIndex] = False
+        return isPieceWrittenOnDisk, resumeData.partialPieces, piecesToRecheck
+
     async def __attemptTorrentDownload(self) -> None:
         await self.__makeTrackerStartedRequest()  # need this even if it's already downloaded, because we need the host
-        isPieceWrittenOnDisk: List[bool] = TorrentDiskIntegrityChecker(self.__scanner).getPiecesWrittenOnDisk()
-        self.__downloadSession.downloadedPieces = isPieceWrittenOnDisk
-        if all(isPieceWrittenOnDisk):
+        self.__announceScheduler.start()  # also brings the first peers, if the "started" announce gave none
+        isPieceWrittenOnDisk, partialPieces, piecesToCheck = self.__determineDownloadState()
+        self.__downloadSession.restorePieces(isPieceWrittenOnDisk, partialPieces, piecesToCheck)
+        # the check runs along with the download, which starts with the pieces known to be missing and takes the others as they are checked
+        integrityChecker: TorrentDiskIntegrityChecker = TorrentDiskIntegrityChecker(self.__scanner, self.__storage,
+                                                                                    settingsProcessor.getIntegrityCheckThreadCount())
+        self.__integrityCheckTask = asyncio.create_task(integrityChecker.checkPieces(piecesToCheck, self.__downloadSession.receiveCheckedPieces))
+        if not self.__peerList:
+            await self.__integrityCheckTask  # there is nothing to download meanwhile
+        if self.__downloadSession.downloadedPieces.all():
             self.__isDownloaded = True
             self.__downloadSession.startJustUpload()  # don't call this in self.__upload(), because that point can also be reached after a regular download, therefore it may have already been called
             await self.__upload()
-
-        elif self.__peerList:
+            return
+        if not self.__peerList:
+            await self.__peersAnnounced.wait()
+        if not self.__isStopped:
             await self.__startTorrentDownload()
 
     def run(self) -> None:
@@ -219,9 +284,13 @@ class ProcessSingleTorrent:
     def isDownloaded(self) -> bool:
         return self.__isDownloaded
 
+    def __pauseDownload(self) -> None:
+        self.__downloadSession.isDownloadPaused = True
+
     def pauseDownload(self) -> None:
         if not self.__isDownloaded:
-            self.__downloadSession.isDownloadPaused = True
+            # the download session lives on the event loop of this torrent, while this method is called from the GUI thread
+            self.__eventLoop.call_soon_threadsafe(self.__pauseDownload)
 
     def resumeDownload(self) -> None:
         # no use in resuming an already finished download
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Dict, Set, Tuple, List, Final
+from domain.block import Block
+from domain.peer import Peer
+
+
+class RequestRegistry:
+    """
+    Keeps track of the outstanding block requests made to other peers. The requests are indexed both by block (piece index,
+    begin offset) -> the peers which were asked for it, and by peer -> its requests in the order in which they were made,
+    so that issuing, answering, cancelling and expiring a request are all O(1)
+    """
+    REQUEST_TIME_INDEX_IN_TUPLE: Final[int] = 1
+
+    def __init__(self):
+        self.__peersByBlock: Dict[Tuple[int, int], Set[Peer]] = {}
+        # an OrderedDict (unlike a dict) finds its oldest entry in O(1), even after many entries were removed from the front
+        self.__requestsByPeer: Dict[Peer, OrderedDict[Tuple[int, int], Tuple[Block, float]]] = {}
+
+    def addRequest(self, peer: Peer, block: Block, requestTime: float) -> None:
+        blockKey: Tuple[int, int] = (block.pieceIndex, block.beginOffset)
+        self.__peersByBlock.setdefault(blockKey, set()).add(peer)
+        self.__requestsByPeer.setdefault(peer, OrderedDict())[blockKey] = (block, requestTime)
+
+    def __removeFromBlockIndex(self, blockKey: Tuple[int, int], peer: Peer) -> None:
+        peers: Set[Peer] | None = self.__peersByBlock.get(blockKey)
+        if peers is None:
+            return
+        peers.discard(peer)
+        if not peers:
+            del self.__peersByBlock[blockKey]
+
+    """
+    Removes a request made to a peer (e.g. after it was answered)
+    @:return The moment when the request was made, or None if the block was not requested from the peer
+    """
+    def removeRequest(self, peer: Peer, pieceIndex: int, beginOffset: int) -> float | None:
+        requests: OrderedDict[Tuple[int, int], Tuple[Block, float]] | None = self.__requestsByPeer.get(peer)
+        if requests is None or (pieceIndex, beginOffset) not in requests:
+            return None
+        requestTime: float = requests.pop((pieceIndex, beginOffset))[self.REQUEST_TIME_INDEX_IN_TUPLE]
+        self.__removeFromBlockIndex((pieceIndex, beginOffset), peer)
+        return requestTime
+
+    """
+    Removes all the requests made for a block, no matter the peer
+    @:return The peers which still had the block requested
+    """
+    def removeBlockRequests(self, pieceIndex: int, beginOffset: int) -> Set[Peer]:
+        peers: Set[Peer] = self.__peersByBlock.pop((pieceIndex, beginOffset), set())
+        for peer in peers:
+            self.__requestsByPeer[peer].pop((pieceIndex, beginOffset), None)
+        return peers
+
+    """
+    Removes all the requests made to a peer (e.g. after it disconnected)
+    @:return The blocks which were requested from the peer
+    """
+    def removePeerRequests(self, peer: Peer) -> List[Block]:
+        requests: OrderedDict[Tuple[int, int], Tuple[Block, float]] = self.__requestsByPeer.pop(peer, OrderedDict())
+        for blockKey in requests:
+            self.__removeFromBlockIndex(blockKey, peer)
+        return [block for block, _ in requests.values()]
+
+    """
+    Removes the requests made to a peer before a given moment; only the expired requests are visited
+    @:return The blocks whose requests expired
+    """
+    def removeRequestsMadeBefore(self, peer: Peer, deadline: float) -> List[Block]:
+        requests: OrderedDict[Tuple[int, int], Tuple[Block, float]] | None = self.__requestsByPeer.get(peer)
+        expiredBlocks: List[Block] = []
+        while requests and next(iter(requests.values()))[self.REQUEST_TIME_INDEX_IN_TUPLE] < deadline:
+            blockKey, (block, _) = requests.popitem(last=False)
+            self.__removeFromBlockIndex(blockKey, peer)
+            expiredBlocks.append(block)
+        return expiredBlocks
+
+    def getRequestCount(self, peer: Peer) -> int:
+        return len(self.__requestsByPeer.get(peer, ()))
+
+    def getOldestRequestTime(self, peer: Peer) -> float | None:
+        requests: OrderedDict[Tuple[int, int], Tuple[Block, float]] | None = self.__requestsByPeer.get(peer)
+        if not requests:
+            return None
+        return next(iter(requests.values()))[self.REQUEST_TIME_INDEX_IN_TUPLE]
+
+    """
+    @:return Each requested block, together with the number of peers from which it is requested
+    """
+    def getRequestedBlocks(self) -> List[Tuple[Block, int]]:
+        BLOCK_INDEX_IN_TUPLE: Final[int] = 0
+
+        return [(self.__requestsByPeer[next(iter(peers))][blockKey][BLOCK_INDEX_IN_TUPLE], len(peers)) for blockKey, peers in self.__peersByBlock.items()]
+
+    """
+    @:return The number of peers from which a block is requested
+    """
+    def getBlockRequestCount(self, pieceIndex: int, beginOffset: int) -> int:
+        return len(self.__peersByBlock.get((pieceIndex, beginOffset), ()))
+
+    def getRequestedBlockCount(self) -> int:
+        return len(self.__peersByBlock)
+
+    def isBlockRequested(self, pieceIndex: int, beginOffset: int) -> bool:
+        return (pieceIndex, beginOffset) in self.__peersByBlock
+
+    def isBlockRequestedFromPeer(self, peer: Peer, pieceIndex: int, beginOffset: int) -> bool:
+        return peer in self.__peersByBlock.get((pieceIndex, beginOffset), ())
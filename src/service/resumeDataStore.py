@@ -0,0 +1,88 @@
+import os
+import threading
+from typing import List, Tuple, Set, Final
+from bitarray import bitarray
+from domain.file import File
+from domain.fileLayout import FileLayout
+from domain.resumeData import ResumeData
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+
+
+class ResumeDataStore:
+    """
+    Keeps the resume data of a torrent in its own file, named after the info hash of the torrent.
+    The file is replaced atomically (the new data is written to a temporary file, flushed to disk, then renamed over the old one),
+    so a crash while saving leaves either the old or the new resume data, never a mix of them.
+    The size and modification time of the files are taken when saving, so they must only be saved along with pieces which are
+    already written and flushed to disk (see Storage.flush); a file written after that looks changed on the next start, and only its pieces are checked again
+    """
+    FILE_EXTENSION: Final[str] = ".resume"
+
+    def __init__(self, scanner: TorrentMetaInfoScanner, resumeDataLocation: str):
+        self.__infoHash: bytes = scanner.infoHash
+        self.__pieceCount: int = scanner.pieceCount
+        self.__regularPieceLength: int = scanner.regularPieceLength
+        self.__files: List[File] = scanner.files
+        self.__fileLayout: FileLayout = scanner.fileLayout
+        self.__resumeDataPath: str = os.path.join(resumeDataLocation, scanner.infoHash.hex() + self.FILE_EXTENSION)
+        self.__saveLock: threading.Lock = threading.Lock()  # the periodic and the final save may run at the same time, on different threads
+
+    """
+    @:return the size and the modification time (in nanoseconds) of a file, or a size of -1 if the file does not exist
+    """
+    @staticmethod
+    def __getFileState(path: str) -> Tuple[int, int]:
+        try:
+            fileStatus: os.stat_result = os.stat(path)
+        except FileNotFoundError:
+            return ResumeData.MISSING_FILE_SIZE, 0
+        return fileStatus.st_size, fileStatus.st_mtime_ns
+
+    """
+    @:return the resume data of the torrent, or None if there is none, or it cannot be used (damaged, or saved for other content)
+    """
+    def load(self) -> ResumeData | None:
+        try:
+            with open(self.__resumeDataPath, "rb") as resumeDataFile:
+                resumeData: ResumeData = ResumeData.fromBytes(resumeDataFile.read())
+        except (OSError, ValueError):
+            return None
+        if resumeData.infoHash != self.__infoHash or len(resumeData.downloadedPieces) != self.__pieceCount \
+                or len(resumeData.fileStates) != len(self.__files):
+            return None
+        return resumeData
+
+    """
+    Saves the resume data of the torrent; this does blocking I/O, so it is meant to run on a worker thread
+    @:param downloadedPieces - the pieces which are verified and written on disk
+    @:param partialPieces - the pieces in progress, as described in ResumeData
+    @:raise OSError - if the resume data cannot be written
+    """
+    def save(self, downloadedPieces: bitarray, partialPieces: List[Tuple[int, bitarray, bytes]]) -> None:
+        fileStates: List[Tuple[int, int]] = [self.__getFileState(file.path) for file in self.__files]
+        content: bytes = ResumeData(self.__infoHash, downloadedPieces, fileStates, partialPieces).toBytes()
+        temporaryPath: str = self.__resumeDataPath + ".tmp"
+        with self.__saveLock:
+            os.makedirs(os.path.dirname(self.__resumeDataPath) or ".", exist_ok=True)
+            with open(temporaryPath, "wb") as temporaryFile:
+                temporaryFile.write(content)
+                temporaryFile.flush()
+                os.fsync(temporaryFile.fileno())
+            os.replace(temporaryPath, self.__resumeDataPath)
+
+    """
+    Determines the downloaded pieces which cannot be trusted without a hash check, because they lie (even partly) in a file whose
+    size or modification time is not the one saved in the resume data
+    @:return the indices of the pieces, in order
+    """
+    def getPiecesToRecheck(self, resumeData: ResumeData) -> List[int]:
+        piecesToRecheck: Set[int] = set()
+        for fileIndex, (file, savedFileState) in enumerate(zip(self.__files, resumeData.fileStates)):
+            if file.length == 0 or self.__getFileState(file.path) == savedFileState:
+                continue
+            fileStartOffset, fileLength = self.__fileLayout.getFileRange(fileIndex)
+            firstPieceIndex: int = fileStartOffset // self.__regularPieceLength
+            lastPieceIndex: int = (fileStartOffset + fileLength - 1) // self.__regularPieceLength
+            piecesToRecheck.update(pieceIndex for pieceIndex in range(firstPieceIndex, lastPieceIndex + 1)
+                                   if resumeData.downloadedPieces[pieceIndex])
+        return sorted(piecesToRecheck)
@@ -1,3 +1,4 @@
+import time
 import utils
 from service.timeMetrics import TimeMetrics
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
@@ -7,9 +8,28 @@ class SessionMetrics:
     def __init__(self, scanner: TorrentMetaInfoScanner):
         self.__totalDownloadedBytes: int = 0
         self.__totalUploadedBytes: int = 0
+        self.__bytesAlreadyOnDisk: int = 0  # counted as downloaded, though they were not downloaded in this session
         self.__torrentName: str = scanner.torrentName
         self.__totalSize: int = scanner.getTotalContentSize()
         self.__timeMetrics: TimeMetrics = TimeMetrics()
+        self.__endgameStartTime: float | None = None
+        self.__endgameEndTime: float | None = None
+        self.__endgameRequestCount: int = 0  # duplicate requests made during the endgame
+        self.__wastedBytes: int = 0  # bytes received for blocks which had already been downloaded
+        self.__timedOutRequestCount: int = 0
+        self.__reassignedRequestCount: int = 0  # requests taken back from a peer (timed out, snubbed, choked, disconnected)
+        self.__diskWriteCount: int = 0  # a write covers one or more adjacent pieces
+        self.__writtenBytes: int = 0
+        self.__totalDiskWriteLatency: float = 0.0
+        self.__maxDiskWriteLatency: float = 0.0
+        self.__queuedDiskWritePieceCount: int = 0
+        self.__queuedDiskWriteBytes: int = 0
+        self.__diskWriteErrorCount: int = 0
+        self.__lastDiskWriteError: str | None = None
+        self.__pieceReadCacheHitCount: int = 0  # uploaded blocks whose piece was already in memory
+        self.__pieceReadCacheMissCount: int = 0  # uploaded blocks whose piece was not in memory (including those whose piece was read earlier in the same batch)
+        self.__piecesToCheckCount: int = 0  # the pieces on disk whose hash is checked when the torrent starts
+        self.__checkedPieceCount: int = 0
 
     def start(self) -> None:
         self.__timeMetrics.start()
@@ -18,10 +38,68 @@ class SessionMetrics:
         self.__totalDownloadedBytes += increment
         self.__timeMetrics.downloadedBytesLastInterval += increment
 
+    """
+    Counts as downloaded some bytes which were found on disk (e.g. the whole content, when a torrent starts already downloaded)
+    """
+    def addBytesAlreadyOnDisk(self, increment: int) -> None:
+        self.__totalDownloadedBytes += increment
+        self.__bytesAlreadyOnDisk += increment
+
     def addUploadedBytes(self, increment: int) -> None:
         self.__totalUploadedBytes += increment
         self.__timeMetrics.uploadedBytesLastInterval += increment
 
+    def addWastedBytes(self, increment: int) -> None:
+        self.__wastedBytes += increment
+
+    def markEndgameStarted(self) -> None:
+        if self.__endgameStartTime is None:  # the endgame can be left and started again (e.g. after a piece failed its hash check)
+            self.__endgameStartTime = time.monotonic()
+
+    def markEndgameFinished(self) -> None:
+        if self.__endgameStartTime is not None and self.__endgameEndTime is None:
+            self.__endgameEndTime = time.monotonic()
+
+    def addEndgameRequest(self) -> None:
+        self.__endgameRequestCount += 1
+
+    def addTimedOutRequests(self, increment: int) -> None:
+        self.__timedOutRequestCount += increment
+
+    def addReassignedRequests(self, increment: int) -> None:
+        self.__reassignedRequestCount += increment
+
+    def addDiskWrite(self, byteCount: int, latencyInSeconds: float) -> None:
+        self.__diskWriteCount += 1
+        self.__writtenBytes += byteCount
+        self.__totalDiskWriteLatency += latencyInSeconds
+        self.__maxDiskWriteLatency = max(self.__maxDiskWriteLatency, latencyInSeconds)
+
+    """
+    @:param pieceCount - the verified pieces which no writer has taken yet
+    @:param byteCount - the bytes of the pieces which are not written yet (including those being written)
+    """
+    def setDiskWriteQueueDepth(self, pieceCount: int, byteCount: int) -> None:
+        self.__queuedDiskWritePieceCount = pieceCount
+        self.__queuedDiskWriteBytes = byteCount
+
+    def addDiskWriteError(self, error: OSError) -> None:
+        self.__diskWriteErrorCount += 1
+        self.__lastDiskWriteError = str(error)
+
+    def addPieceReadCacheLookup(self, isHit: bool) -> None:
+        if isHit:
+            self.__pieceReadCacheHitCount += 1
+        else:
+            self.__pieceReadCacheMissCount += 1
+
+    def startIntegrityCheck(self, pieceCount: int) -> None:
+        self.__piecesToCheckCount = pieceCount
+        self.__checkedPieceCount = 0
+
+    def addCheckedPieces(self, increment: int) -> None:
+        self.__checkedPieceCount += increment
+
     def stopTimer(self) -> None:
         self.__timeMetrics.stopTimer()
 
@@ -48,10 +126,108 @@ class SessionMetrics:
     def totalDownloadedBytes(self) -> int:
         return self.__totalDownloadedBytes
 
+    """
+    The bytes received from the peers in this session (as reported to the trackers)
+    """
+    @property
+    def sessionDownloadedBytes(self) -> int:
+        return self.__totalDownloadedBytes - self.__bytesAlreadyOnDisk
+
     @property
     def totalUploadedBytes(self) -> int:
         return self.__totalUploadedBytes
 
+    @property
+    def wastedBytes(self) -> int:
+        return self.__wastedBytes
+
+    """
+    The time spent in the endgame so far, in seconds, or None if the endgame has not started
+    """
+    @property
+    def endgameDuration(self) -> float | None:
+        if self.__endgameStartTime is None:
+            return None
+        endTime: float = self.__endgameEndTime if self.__endgameEndTime is not None else time.monotonic()
+        return endTime - self.__endgameStartTime
+
+    @property
+    def endgameRequestCount(self) -> int:
+        return self.__endgameRequestCount
+
+    @property
+    def timedOutRequestCount(self) -> int:
+        return self.__timedOutRequestCount
+
+    @property
+    def reassignedRequestCount(self) -> int:
+        return self.__reassignedRequestCount
+
+    @property
+    def diskWriteCount(self) -> int:
+        return self.__diskWriteCount
+
+    @property
+    def writtenBytes(self) -> int:
+        return self.__writtenBytes
+
+    @property
+    def averageDiskWriteLatency(self) -> float:
+        if self.__diskWriteCount == 0:
+            return 0.0
+        return self.__totalDiskWriteLatency / self.__diskWriteCount
+
+    @property
+    def maxDiskWriteLatency(self) -> float:
+        return self.__maxDiskWriteLatency
+
+    @property
+    def queuedDiskWritePieceCount(self) -> int:
+        return self.__queuedDiskWritePieceCount
+
+    @property
+    def queuedDiskWriteBytes(self) -> int:
+        return self.__queuedDiskWriteBytes
+
+    @property
+    def diskWriteErrorCount(self) -> int:
+        return self.__diskWriteErrorCount
+
+    @property
+    def lastDiskWriteError(self) -> str | None:
+        return self.__lastDiskWriteError
+
+    @property
+    def pieceReadCacheHitCount(self) -> int:
+        return self.__pieceReadCacheHitCount
+
+    @property
+    def pieceReadCacheMissCount(self) -> int:
+        return self.__pieceReadCacheMissCount
+
+    """
+    The fraction of the uploaded blocks which were served from the piece read cache (0 if no block was uploaded yet)
+    """
+    @property
+    def pieceReadCacheHitRate(self) -> float:
+        lookupCount: int = self.__pieceReadCacheHitCount + self.__pieceReadCacheMissCount
+        if lookupCount == 0:
+            return 0.0
+        return self.__pieceReadCacheHitCount / lookupCount
+
+    @property
+    def checkedPieceCount(self) -> int:
+        return self.__checkedPieceCount
+
+    """
+    The part of the pieces on disk which were checked so far, between 0 and 1 (1 if there is nothing to check)
+    """
+    @property
+    def integrityCheckProgress(self) -> float:
+        if self.__piecesToCheckCount == 0:
+            return 1.0
+        return self.__checkedPieceCount / self.__piecesToCheckCount
+
     @property
     def seedRatio(self) -> float:
         if self.__totalDownloadedBytes == 0:
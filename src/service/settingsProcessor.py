@@ -1,5 +1,6 @@
+import os
 from configparser import ConfigParser
-from typing import Final
+from typing import Final, Tuple
 
 """This file is basically a singleton"""
 SETTINGS_FILE_PATH: Final[str] = "Resources\\settings.ini"
@@ -9,6 +10,23 @@ DEFAULT_SECTION_NAME: Final[str] = "DEFAULT"
 therefore, when it updates the file, it messes-up the key names"""
 INITIAL_DOWNLOAD_LOCATION_KEY: Final[str] = "initial_download_location"
 USER_INTERFACE_REFRESH_RATE_IN_MILLISECONDS_KEY: Final[str] = "user_interface_refresh_rate_in_milliseconds"
+PIECE_BUFFER_MEMORY_IN_MEGABYTES_KEY: Final[str] = "piece_buffer_memory_in_megabytes"
+HASHING_THREAD_COUNT_KEY: Final[str] = "hashing_thread_count"
+HASHING_QUEUE_LENGTH_KEY: Final[str] = "hashing_queue_length"
+MAX_OPEN_FILE_COUNT_KEY: Final[str] = "max_open_file_count"
+DISK_WRITER_THREAD_COUNT_KEY: Final[str] = "disk_writer_thread_count"
+DISK_WRITE_QUEUE_SIZE_IN_MEGABYTES_KEY: Final[str] = "disk_write_queue_size_in_megabytes"
+STORAGE_ALLOCATION_MODE_KEY: Final[str] = "storage_allocation_mode"
+STORAGE_BACKEND_KEY: Final[str] = "storage_backend"
+PIECE_READ_CACHE_SIZE_IN_MEGABYTES_KEY: Final[str] = "piece_read_cache_size_in_megabytes"
+ZERO_COPY_UPLOAD_KEY: Final[str] = "zero_copy_upload"
+RESUME_DATA_LOCATION_KEY: Final[str] = "resume_data_location"
+RESUME_DATA_CHECKPOINT_INTERVAL_IN_SECONDS_KEY: Final[str] = "resume_data_checkpoint_interval_in_seconds"
+FORCE_RECHECK_KEY: Final[str] = "force_recheck"
+INTEGRITY_CHECK_THREAD_COUNT_KEY: Final[str] = "integrity_check_thread_count"
+MIN_CONNECTED_PEER_COUNT_KEY: Final[str] = "min_connected_peer_count"
+
+STORAGE_ALLOCATION_MODES: Final[Tuple[str, ...]] = ("sparse", "full", "none")
 
 configParser: ConfigParser = ConfigParser()
 configParser.read(SETTINGS_FILE_PATH)
@@ -36,3 +54,91 @@ def getUserInterfaceRefreshRate() -> int:
 def setUserInterfaceRefreshRate(newRefreshRate: str) -> None:
     configParser.set(DEFAULT_SECTION_NAME, USER_INTERFACE_REFRESH_RATE_IN_MILLISECONDS_KEY, newRefreshRate)
     updateSettingsFile()
+
+
+"""The memory which the pieces being downloaded by a torrent may take (a hard cap, enforced by its piece buffer pool)"""
+def getPieceBufferMemory() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, PIECE_BUFFER_MEMORY_IN_MEGABYTES_KEY, fallback=128) * 1024 * 1024
+
+
+def getHashingThreadCount() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, HASHING_THREAD_COUNT_KEY, fallback=2)
+
+
+"""The number of complete pieces which may wait for their hash check, before the peers which complete more pieces are no longer read from"""
+def getHashingQueueLength() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, HASHING_QUEUE_LENGTH_KEY, fallback=8)
+
+
+"""The number of files which are kept open between reads and writes, for all the torrents"""
+def getMaxOpenFileCount() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, MAX_OPEN_FILE_COUNT_KEY, fallback=256)
+
+
+def getDiskWriterThreadCount() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, DISK_WRITER_THREAD_COUNT_KEY, fallback=2)
+
+
+"""The bytes of the verified pieces which may wait to be written on disk, before the peers which complete more pieces are no longer read from"""
+def getDiskWriteQueueSize() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, DISK_WRITE_QUEUE_SIZE_IN_MEGABYTES_KEY, fallback=64) * 1024 * 1024
+
+
+"""
+How the files are created before the download starts: sparse, full or none (see TorrentSaver)
+@:raise ValueError - if the setting holds any other value
+"""
+def getStorageAllocationMode() -> str:
+    allocationMode: str = configParser.get(DEFAULT_SECTION_NAME, STORAGE_ALLOCATION_MODE_KEY, fallback="sparse")
+    if allocationMode not in STORAGE_ALLOCATION_MODES:
+        raise ValueError(f"Unknown {STORAGE_ALLOCATION_MODE_KEY} '{allocationMode}', expected one of {', '.join(STORAGE_ALLOCATION_MODES)}")
+    return allocationMode
+
+
+"""
+How the files of a torrent are accessed: file (positional reads and writes) or mmap (memory-mapped files).
+A torrent can have its own backend, in a section named after the torrent; otherwise, the default one is used
+"""
+def getStorageBackend(torrentName: str) -> str:
+    defaultStorageBackend: str = configParser.get(DEFAULT_SECTION_NAME, STORAGE_BACKEND_KEY, fallback="file")
+    return configParser.get(torrentName, STORAGE_BACKEND_KEY, fallback=defaultStorageBackend)
+
+
+"""The memory which the pieces kept in memory for uploading may take, for every torrent"""
+def getPieceReadCacheSize() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, PIECE_READ_CACHE_SIZE_IN_MEGABYTES_KEY, fallback=32) * 1024 * 1024
+
+
+"""Whether the uploaded blocks are sent straight from their files to the sockets, with sendfile (where the storage supports it)"""
+def isZeroCopyUploadEnabled() -> bool:
+    return configParser.getboolean(DEFAULT_SECTION_NAME, ZERO_COPY_UPLOAD_KEY, fallback=True)
+
+
+"""The folder which holds the resume data of the torrents"""
+def getResumeDataLocation() -> str:
+    return configParser.get(DEFAULT_SECTION_NAME, RESUME_DATA_LOCATION_KEY, fallback=os.path.join("Resources", "resume"))
+
+
+"""How often the resume data of a torrent is saved while it is downloading (it is also saved when the torrent stops)"""
+def getResumeDataCheckpointInterval() -> float:
+    return configParser.getfloat(DEFAULT_SECTION_NAME, RESUME_DATA_CHECKPOINT_INTERVAL_IN_SECONDS_KEY, fallback=60.0)
+
+
+"""
+Whether the content of a torrent is hash checked on start, even if its resume data says what is already downloaded.
+Like the storage backend, it can be set for a single torrent, in a section named after the torrent
+"""
+def isRecheckForced(torrentName: str) -> bool:
+    isRecheckForcedByDefault: bool = configParser.getboolean(DEFAULT_SECTION_NAME, FORCE_RECHECK_KEY, fallback=False)
+    return configParser.getboolean(torrentName, FORCE_RECHECK_KEY, fallback=isRecheckForcedByDefault)
+
+
+"""The number of threads which read and hash the pieces on disk, when a torrent is checked; 0 means one for every processor"""
+def getIntegrityCheckThreadCount() -> int:
+    threadCount: int = configParser.getint(DEFAULT_SECTION_NAME, INTEGRITY_CHECK_THREAD_COUNT_KEY, fallback=0)
+    return threadCount if threadCount > 0 else os.cpu_count() or 1
+
+
+"""The number of connected peers under which a torrent announces itself to its trackers early, to get more peers"""
+def getMinConnectedPeerCount() -> int:
+    return configParser.getint(DEFAULT_SECTION_NAME, MIN_CONNECTED_PEER_COUNT_KEY, fallback=10)
@@ -0,0 +1,82 @@
+from abc import ABC, abstractmethod
+from asyncio import Transport
+from typing import Iterable, List
+
+
+class Storage(ABC):  # ABC = abstract base class
+    """
+    The access to the files of the torrents, shared by the pieces being saved, the blocks being uploaded and the integrity checks.
+    A file is identified by its path; files are opened on demand, and closed files are opened again when needed
+    """
+
+    """
+    @:return the data read, which is shorter than requested only if the end of the file was reached
+    @:raise OSError - if the file cannot be opened or read
+    """
+    @abstractmethod
+    def readFileSection(self, path: str, fileOffset: int, length: int) -> bytes | memoryview:
+        pass
+
+    """
+    Writes several buffers one after another, inside a file; the file is created if it does not exist
+    @:param fileLength - the final length of the file, up to which a backend may extend the file ahead of the writes
+    @:raise OSError - if the file cannot be opened or the data cannot be written entirely
+    """
+    @abstractmethod
+    def writeFileSectionVector(self, path: str, fileOffset: int, buffers: List[memoryview], fileLength: int) -> None:
+        pass
+
+    """
+    Creates a file with its final length, before any data is written to it
+    @:param isSparse - True to only set the length of the file, False to also allocate its disk space
+    @:raise OSError - if the file cannot be created or allocated
+    """
+    @abstractmethod
+    def allocateFile(self, path: str, length: int, isSparse: bool) -> None:
+        pass
+
+    """
+    Writes a header to a connection, followed by a section of a file sent straight from the file to the socket, without going
+    through the memory of the process. Nothing is written if the backend cannot do that for this section (the default)
+    @:return True if the header and the section were sent, False if nothing was written
+    @:raise Exception - if the sending fails after the header was written
+    """
+    async def sendFileSection(self, path: str, fileOffset: int, length: int, header: bytes, transport: Transport) -> bool:
+        return False
+
+    """
+    Tells the system that a section of a file is about to be read (e.g. sent with sendFileSection), so that it starts reading the
+    section into its page cache; this is only a hint, which the backends that cannot pass it on ignore (the default)
+    @:raise OSError - if the file cannot be opened
+    """
+    def adviseWillRead(self, path: str, fileOffset: int, length: int) -> None:
+        pass
+
+    """
+    Tells the system that a file is about to be read from start to end (e.g. by an integrity check), so that it reads ahead
+    aggressively; this is only a hint, which the backends that cannot pass it on ignore (the default)
+    @:raise OSError - if the file cannot be opened
+    """
+    def adviseSequentialRead(self, path: str) -> None:
+        pass
+
+    """
+    Waits until the data written to some files is on disk (e.g. before the pieces written to them are recorded in the resume data);
+    this blocks, so it is meant to run on a worker thread. The files which do not exist are skipped
+    @:raise OSError - if the data cannot be flushed
+    """
+    @abstractmethod
+    def flush(self, paths: Iterable[str]) -> None:
+        pass
+
+    """
+    Closes some files (e.g. the files of a torrent which was paused or stopped); the files which are in use are closed as soon as
+    they are no longer used
+    """
+    @abstractmethod
+    def closeFiles(self, paths: Iterable[str]) -> None:
+        pass
+
+    @abstractmethod
+    def closeAllFiles(self) -> None:
+        pass
@@ -1,11 +1,22 @@
 from concurrent.futures import ThreadPoolExecutor
-from typing import List, Tuple
+from typing import List, Tuple, Dict
+from service import settingsProcessor
+from service.fileHandleCache import FileHandleCache
+from service.mmapStorage import MmapStorage
 from service.processSingleTorrent import ProcessSingleTorrent
+from service.storage import Storage
+from service.torrentSaver import TorrentSaver
 
 
 class TorrentClient:
     def __init__(self, torrentFilesPaths: Tuple[str, ...], downloadLocation: str):
-        self.__singleTorrentProcessors: List[ProcessSingleTorrent] = [ProcessSingleTorrent(path, downloadLocation) for path in torrentFilesPaths]
+        maxOpenFileCount: int = settingsProcessor.getMaxOpenFileCount()
+        allocatesDiskSpace: bool = settingsProcessor.getStorageAllocationMode() == TorrentSaver.FULL_ALLOCATION
+        # backend name -> storage, shared by all the torrents which use that backend
+        self.__storages: Dict[str, Storage] = {FileHandleCache.BACKEND_NAME: FileHandleCache(maxOpenFileCount),
+                                               MmapStorage.BACKEND_NAME: MmapStorage(maxOpenFileCount, allocatesDiskSpace)}
+        self.__singleTorrentProcessors: List[ProcessSingleTorrent] = [ProcessSingleTorrent(path, downloadLocation, self.__storages)
+                                                                      for path in torrentFilesPaths]
 
     def start(self) -> None:
         with ThreadPoolExecutor(len(self.__singleTorrentProcessors)) as executor:
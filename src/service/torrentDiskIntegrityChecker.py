@@ -1,19 +1,204 @@
+import asyncio
+import errno
 import hashlib
-from typing import List
-from service.torrentDiskLoader import TorrentDiskLoader
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterable, Dict, Tuple, Callable, Final
+from domain.file import File
+from domain.fileHandle import FileHandle
+from domain.fileLayout import FileLayout
+from service.storage import Storage
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 
 
 class TorrentDiskIntegrityChecker:
-    def __init__(self, scanner: TorrentMetaInfoScanner):
+    """
+    Checks which pieces are written on disk with the right content. The pieces are checked in runs of consecutive pieces, each run
+    being read with one large read for every file it spans (the files are read sequentially, and the system is told so) and then
+    hashed straight from the data read, without copying it. The runs are checked on a pool of threads, which run in parallel, since
+    both the reads and hashlib release the GIL.
+    A piece which lies (even partly) in a file that is missing, past the end of a file, or in a hole of a sparse file (e.g. a file
+    allocated before all its pieces were written) is reported missing; the holes are never read, but the pieces around them are.
+    The results of every run are reported as soon as it is checked, so that the download can start before the check is finished
+    """
+    MAX_RUN_LENGTH: Final[int] = 8 * 1024 * 1024  # the bytes read at once, unless a single piece is longer
+    HAS_SEEK_DATA: Final[bool] = hasattr(os, "SEEK_DATA")
+
+    def __init__(self, scanner: TorrentMetaInfoScanner, storage: Storage, threadCount: int):
         self.__scanner: TorrentMetaInfoScanner = scanner
-        self.__torrentDiskLoader: TorrentDiskLoader = TorrentDiskLoader(scanner)
+        self.__storage: Storage = storage
+        self.__fileLayout: FileLayout = scanner.fileLayout
+        self.__regularPieceLength: int = scanner.regularPieceLength
+        self.__threadCount: int = threadCount
 
     def getPiecesWrittenOnDisk(self) -> List[bool]:
-        piecesWrittenOnDisk: List[bool] = []
-        for pieceIndex in range(self.__scanner.pieceCount):
-            pieceData: bytes = self.__torrentDiskLoader.getDataForPiece(pieceIndex)
-            actualPieceHash: bytes = hashlib.sha1(pieceData).digest()
-            expectedPieceHash: bytes = self.__scanner.getPieceHash(pieceIndex)
-            piecesWrittenOnDisk.append(actualPieceHash == expectedPieceHash)
-        return piecesWrittenOnDisk
+        return self.arePiecesWrittenOnDisk(range(self.__scanner.pieceCount))
+
+    """
+    Checks only some of the pieces (e.g. those of the files which changed since the resume data was saved), without reporting
+    the progress; this blocks until all of them are checked
+    @:return for each of the given pieces, True if it is written on disk with the right content
+    """
+    def arePiecesWrittenOnDisk(self, pieceIndices: Iterable[int]) -> List[bool]:
+        pieceIndices = list(pieceIndices)
+        fileDataRanges: Dict[str, List[Tuple[int, int]]] = self.__getFileDataRanges()
+        runs: List[List[int]] = self.__groupIntoRuns(pieceIndices)
+        isPieceWrittenOnDisk: Dict[int, bool] = {}
+        with ThreadPoolExecutor(max_workers=self.__threadCount, thread_name_prefix="IntegrityChecker") as executor:
+            for run, runResults in zip(runs, executor.map(lambda pieceRun: self.__checkPieceRun(pieceRun, fileDataRanges), runs)):
+                isPieceWrittenOnDisk.update(zip(run, runResults))
+        return [isPieceWrittenOnDisk[pieceIndex] for pieceIndex in pieceIndices]
+
+    """
+    Checks some pieces without blocking the event loop
+    @:param onPiecesChecked - called on the event loop with the results of every run of pieces, as soon as it is checked:
+    the indices of the pieces, and for each of them, True if it is written on disk with the right content
+    """
+    async def checkPieces(self, pieceIndices: Iterable[int], onPiecesChecked: Callable[[List[int], List[bool]], None]) -> None:
+        fileDataRanges: Dict[str, List[Tuple[int, int]]] = await asyncio.to_thread(self.__getFileDataRanges)
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=self.__threadCount, thread_name_prefix="IntegrityChecker")
+        try:
+            runChecks: List[asyncio.Future[Tuple[List[int], List[bool]]]] = [
+                asyncio.get_running_loop().run_in_executor(executor, self.__checkPieceRunWithIndices, run, fileDataRanges)
+                for run in self.__groupIntoRuns(list(pieceIndices))]
+            for runCheck in asyncio.as_completed(runChecks):
+                onPiecesChecked(*await runCheck)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    """
+    @:return the ranges of a file which hold data, as (start offset, end offset), in order: none if the file is missing, and the whole
+    file if the system cannot tell where its holes are
+    """
+    @classmethod
+    def __getDataRanges(cls, path: str) -> List[Tuple[int, int]]:
+        try:
+            fileHandle: FileHandle = FileHandle(path, False)
+        except OSError:
+            return []
+        try:
+            fileSize: int = fileHandle.size
+            if not cls.HAS_SEEK_DATA:
+                return [(0, fileSize)]
+            dataRanges: List[Tuple[int, int]] = []
+            dataStartOffset: int = 0
+            while dataStartOffset < fileSize:
+                try:
+                    dataStartOffset = os.lseek(fileHandle.fileDescriptor, dataStartOffset, os.SEEK_DATA)
+                except OSError as error:
+                    if error.errno == errno.ENXIO:  # there is only a hole after the offset
+                        break
+                    return [(0, fileSize)]
+                dataEndOffset: int = os.lseek(fileHandle.fileDescriptor, dataStartOffset, os.SEEK_HOLE)
+                dataRanges.append((dataStartOffset, dataEndOffset))
+                dataStartOffset = dataEndOffset
+            return dataRanges
+        finally:
+            fileHandle.close()
+
+    """
+    Finds where the data of the files of the torrent is; this is done on every check, since the files may be allocated (with their
+    final length, but no data) at any time before it
+    @:return path -> the ranges of the file which hold data (see __getDataRanges)
+    """
+    def __getFileDataRanges(self) -> Dict[str, List[Tuple[int, int]]]:
+        return {file.path: self.__getDataRanges(file.path) for file in self.__scanner.files}
+
+    """
+    Splits the pieces into runs of consecutive pieces, none of which is longer than the maximum run length (unless it has a single piece)
+    @:param pieceIndices - the pieces, in any order
+    """
+    def __groupIntoRuns(self, pieceIndices: List[int]) -> List[List[int]]:
+        piecesPerRun: int = max(1, self.MAX_RUN_LENGTH // self.__regularPieceLength)
+        runs: List[List[int]] = []
+        for pieceIndex in sorted(pieceIndices):
+            if runs and runs[-1][-1] + 1 == pieceIndex and len(runs[-1]) < piecesPerRun:
+                runs[-1].append(pieceIndex)
+            else:
+                runs.append([pieceIndex])
+        return runs
+
+    def __checkPieceRunWithIndices(self, run: List[int], fileDataRanges: Dict[str, List[Tuple[int, int]]]) -> Tuple[List[int], List[bool]]:
+        return run, self.__checkPieceRun(run, fileDataRanges)
+
+    """
+    Splits a section of a file at the boundaries of the ranges which hold data
+    @:return a list of tuples, in order, each of which contains the position of a part in the file, its length, and whether it holds
+    data (False for a hole, or for a part past the end of the file)
+    """
+    @staticmethod
+    def __splitAtHoles(fileStartOffset: int, sectionLength: int, dataRanges: List[Tuple[int, int]]) -> List[Tuple[int, int, bool]]:
+        sectionEndOffset: int = fileStartOffset + sectionLength
+        parts: List[Tuple[int, int, bool]] = []
+        partStartOffset: int = fileStartOffset
+        dataRangeIndex: int = max(0, bisect_right(dataRanges, fileStartOffset, key=lambda dataRange: dataRange[0]) - 1)  # the last one starting before
+        while partStartOffset < sectionEndOffset:
+            while dataRangeIndex < len(dataRanges) and dataRanges[dataRangeIndex][1] <= partStartOffset:
+                dataRangeIndex += 1
+            if dataRangeIndex == len(dataRanges):
+                parts.append((partStartOffset, sectionEndOffset - partStartOffset, False))
+                break
+            dataStartOffset, dataEndOffset = dataRanges[dataRangeIndex]
+            if partStartOffset < dataStartOffset:  # a hole before the next data
+                partEndOffset: int = min(dataStartOffset, sectionEndOffset)
+                parts.append((partStartOffset, partEndOffset - partStartOffset, False))
+            else:
+                partEndOffset = min(dataEndOffset, sectionEndOffset)
+                parts.append((partStartOffset, partEndOffset - partStartOffset, True))
+            partStartOffset = partEndOffset
+        return parts
+
+    """
+    Reads the file sections which hold a run of pieces; the sections are cut at the holes of their files, which are not read, so that
+    only the pieces which reach into a hole are left unreadable
+    @:return a list of tuples, in order, each of which contains the offset of the section inside the run, its length and its data
+    (None if it was not read, or could not be read entirely)
+    """
+    def __readRun(self, run: List[int], fileDataRanges: Dict[str, List[Tuple[int, int]]]) -> List[Tuple[int, int, memoryview | None]]:
+        runStartOffset: int = run[0] * self.__regularPieceLength
+        runEndOffset: int = min((run[-1] + 1) * self.__regularPieceLength, self.__fileLayout.totalLength)
+        sections: List[Tuple[int, int, memoryview | None]] = []
+        sectionOffset: int = 0
+        for file, fileStartOffset, fileSectionLength in self.__fileLayout.getFileSections(runStartOffset, runEndOffset - runStartOffset):
+            for partStartOffset, partLength, holdsData in self.__splitAtHoles(fileStartOffset, fileSectionLength, fileDataRanges[file.path]):
+                sections.append((sectionOffset, partLength, self.__readFileSection(file, partStartOffset, partLength) if holdsData else None))
+                sectionOffset += partLength
+        return sections
+
+    def __readFileSection(self, file: File, fileStartOffset: int, sectionLength: int) -> memoryview | None:
+        try:
+            if fileStartOffset == 0:
+                self.__storage.adviseSequentialRead(file.path)
+            readData: bytes | memoryview = self.__storage.readFileSection(file.path, fileStartOffset, sectionLength)
+        except OSError:
+            return None
+        return memoryview(readData) if len(readData) == sectionLength else None
+
+    """
+    Checks a run of consecutive pieces; this runs on a checker thread
+    @:return for each piece of the run, True if it is written on disk with the right content
+    """
+    def __checkPieceRun(self, run: List[int], fileDataRanges: Dict[str, List[Tuple[int, int]]]) -> List[bool]:
+        sections: List[Tuple[int, int, memoryview | None]] = self.__readRun(run, fileDataRanges)
+        results: List[bool] = []
+        sectionIndex: int = 0
+        for pieceIndex in run:
+            pieceStartOffset: int = (pieceIndex - run[0]) * self.__regularPieceLength
+            pieceEndOffset: int = pieceStartOffset + min(self.__regularPieceLength, self.__fileLayout.totalLength - pieceIndex * self.__regularPieceLength)
+            hasher: "hashlib._Hash" = hashlib.sha1()  # the type of the hash objects is private
+            isPieceReadable: bool = True
+            while sectionIndex < len(sections):  # the sections which hold the piece
+                sectionOffset, sectionLength, sectionData = sections[sectionIndex]
+                sectionEndOffset: int = sectionOffset + sectionLength
+                if sectionData is None:
+                    isPieceReadable = False
+                elif isPieceReadable:
+                    hasher.update(sectionData[max(pieceStartOffset, sectionOffset) - sectionOffset: min(pieceEndOffset, sectionEndOffset) - sectionOffset])
+                if sectionEndOffset > pieceEndOffset:
+                    break  # the section also holds the next piece
+                sectionIndex += 1
+                if sectionEndOffset == pieceEndOffset:
+                    break
+            results.append(isPieceReadable and hasher.digest() == self.__scanner.getPieceHash(pieceIndex))
+        return results
@@ -4,6 +4,7 @@ import os
 from typing import List, Final
 from bencode3 import bdecode, bencode
 from domain.file import File
+from domain.fileLayout import FileLayout
 
 
 class TorrentMetaInfoScanner:
@@ -64,8 +65,7 @@ class TorrentMetaInfoScanner:
         with open(self.__torrentFilePath, READ_BINARY_MODE) as torrentFile:
             content: dict = bdecode(torrentFile.read())
             self.__announceURL: str = content[ANNOUNCE_KEY]
-            self.__announceURLList: List[str] = content[ANNOUNCE_LIST_KEY]
-            # TODO - consider the case where the announceURL list is not in the .torrent file
+            self.__announceURLList: List[List[str]] = content.get(ANNOUNCE_LIST_KEY, [])  # the tiers of trackers (BEP 12), if any
 
             info: dict = content[INFO_KEY]
             self.__infoHash: bytes = hashlib.sha1(bencode(info)).digest()
@@ -79,15 +79,24 @@ class TorrentMetaInfoScanner:
                     self.__loadInfoAboutFile(file)
             else:
                 self.__files.append(File(self.__rootFolder, info[SINGLE_FILE_MODE_LENGTH_KEY]))
+            self.__fileLayout: FileLayout = FileLayout(self.__files)
 
     @property
     def announceURL(self) -> str:
         return self.__announceURL
 
     @property
-    def announceURLList(self) -> List[str]:
+    def announceURLList(self) -> List[List[str]]:
         return self.__announceURLList
 
+    """
+    The tiers of trackers to announce to: those of the announce list, or only the announce URL if the list is missing or empty
+    """
+    @property
+    def announceTiers(self) -> List[List[str]]:
+        tiers: List[List[str]] = [list(tier) for tier in self.__announceURLList if tier]
+        return tiers if tiers else [[self.__announceURL]]
+
     @property
     def torrentName(self) -> str:
         return self.__torrentName
@@ -112,12 +121,16 @@ class TorrentMetaInfoScanner:
     def files(self) -> List[File]:
         return self.__files
 
+    @property
+    def fileLayout(self) -> FileLayout:
+        return self.__fileLayout
+
     @property
     def infoHash(self) -> bytes:
         return self.__infoHash
 
     def getTotalContentSize(self) -> int:
-        return sum(file.length for file in self.__files)
+        return self.__fileLayout.totalLength
 
     def getPieceHash(self, pieceIndex: int) -> bytes:
         ENCODED_PIECE_LENGTH: Final[int] = 20
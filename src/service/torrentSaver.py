@@ -1,102 +1,244 @@
 import asyncio
+import errno
 import os
-from asyncio import Task
-from typing import List, Tuple
+import shutil
+import time
+from asyncio import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Callable, Dict, Set, Final
 from domain.file import File
+from domain.fileLayout import FileLayout
 from domain.piece import Piece
+from service.pieceBufferPool import PieceBufferPool
+from service.sessionMetrics import SessionMetrics
+from service.storage import Storage
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 
 
 class TorrentSaver:
-    def __init__(self, scanner: TorrentMetaInfoScanner):
-        self.__torrentName: str = scanner.torrentName
-        self.__torrentFiles: List[File] = scanner.files
-        self.__piecesQueue: asyncio.Queue[Piece] = asyncio.Queue()
+    """
+    Writes the verified pieces on disk, straight from their buffers, on a pool of writer threads (so a slow disk does not stall the
+    event loop), then gives the buffers back to the pool.
+    While all the writers are busy, the pieces wait in the queue; when a writer is free, it takes the lowest piece in the queue
+    along with the pieces which follow it, and writes all of them with one pwritev for every file they span.
+    The index of a piece which cannot be written is handed back to the session, along with the error.
+    Before the download starts, the files can be created with their final length (sparse), or with all their disk space allocated
+    (full), so that pieces arriving in random order do not fragment them; with none, the files grow as the pieces are written
+    """
+    MAX_COALESCED_WRITE_LENGTH: Final[int] = 16 * 1024 * 1024
+    MAX_COALESCED_PIECE_COUNT: Final[int] = 1024  # the usual limit of the number of buffers in a single pwritev
+    SPARSE_ALLOCATION: Final[str] = "sparse"
+    FULL_ALLOCATION: Final[str] = "full"
+    NO_ALLOCATION: Final[str] = "none"
+
+    def __init__(self, scanner: TorrentMetaInfoScanner, storage: Storage, pieceBufferPool: PieceBufferPool,
+                 sessionMetrics: SessionMetrics, writerThreadCount: int, maxQueuedByteCount: int, allocationMode: str,
+                 onPieceSaved: Callable[[], None], onPieceWriteFailed: Callable[[int, OSError], None]):
+        self.__files: List[File] = scanner.files
+        self.__allocationMode: str = allocationMode
+        self.__storage: Storage = storage
+        self.__pieceBufferPool: PieceBufferPool = pieceBufferPool
+        self.__sessionMetrics: SessionMetrics = sessionMetrics
+        self.__onPieceSaved: Callable[[], None] = onPieceSaved
+        self.__onPieceWriteFailed: Callable[[int, OSError], None] = onPieceWriteFailed
+        self.__fileLayout: FileLayout = scanner.fileLayout
         self.__regularPieceLength: int = scanner.regularPieceLength
-        self.__finalPieceLength: int = scanner.finalPieceLength
-        self.__pieceCount: int = scanner.pieceCount
-        self.__isDownloadComplete: bool = False
-        self.__forceStop: bool = False
+        self.__writerThreadCount: int = writerThreadCount
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=writerThreadCount, thread_name_prefix="TorrentSaver")
+        self.__queuedPieces: Dict[int, Piece] = {}  # index -> piece, for the pieces which no writer has taken yet
+        self.__piecesBeingWritten: Dict[int, Piece] = {}  # index -> piece, for the pieces which a writer has taken
+        self.__queuedByteCount: int = 0  # of the queued pieces and of the pieces being written
+        self.__maxQueuedByteCount: int = maxQueuedByteCount
+        self.__queueHasRoom: asyncio.Event = asyncio.Event()
+        self.__queueHasRoom.set()
+        self.__allPiecesWritten: asyncio.Event = asyncio.Event()
+        self.__allPiecesWritten.set()
+        self.__busyWriterCount: int = 0
+        self.__running: bool = False
 
     def start(self) -> None:
-        task: Task = asyncio.create_task(self.__run())  # store the var reference to avoid the task disappearing mid-execution
+        self.__running = True
+        self.__startWrites()
+
+    """
+    @:return the disk space taken by a file so far (0 if it does not exist)
+    """
+    @staticmethod
+    def __getAllocatedSize(path: str) -> int:
+        try:
+            fileStatus: os.stat_result = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        if hasattr(fileStatus, "st_blocks"):  # the size of a sparse file is not the space it takes
+            return min(fileStatus.st_size, fileStatus.st_blocks * 512)
+        return fileStatus.st_size
 
-    def stop(self) -> None:
-        self.__forceStop = True
+    """
+    Creates the folders of the files, checks that there is enough free space for the rest of the download, then allocates the
+    files according to the allocation mode; this blocks, so it runs on a worker thread
+    @:raise OSError - if there is not enough free space, or the files cannot be created
+    """
+    def allocateFiles(self) -> None:
+        for file in self.__files:
+            os.makedirs(os.path.dirname(file.path) or ".", exist_ok=True)
+        if self.__files:
+            neededByteCount: int = sum(max(0, file.length - self.__getAllocatedSize(file.path)) for file in self.__files)
+            freeByteCount: int = shutil.disk_usage(os.path.dirname(self.__files[0].path) or ".").free
+            if neededByteCount > freeByteCount:
+                raise OSError(errno.ENOSPC, f"The download needs {neededByteCount} more bytes, but only {freeByteCount} are free")
+        if self.__allocationMode == self.NO_ALLOCATION:
+            return
+        for file in self.__files:
+            self.__storage.allocateFile(file.path, file.length, self.__allocationMode == self.SPARSE_ALLOCATION)
+
+    """
+    Hands all the queued pieces to the writers and waits until they are written (or failed to be written), so that the pieces
+    reported as written are really on disk; then the writer threads end
+    """
+    async def stop(self) -> None:
+        while self.__queuedPieces:
+            self.__submitWrite(self.__takeAdjacentPieces())
+        self.__running = False
+        await self.__allPiecesWritten.wait()
+        self.__executor.shutdown(wait=True)
 
     """
     Puts the current piece in the queue of pieces to be written to disk
     """
     def putPieceInQueue(self, piece: Piece) -> None:
-        self.__piecesQueue.put_nowait(piece)
-
-    def setDownloadComplete(self) -> None:
-        self.__isDownloadComplete = True
-
-    """
-    Computes a list of files which contain the given piece
-    @:param piece - the piece whose files are determined
-    @:return a tuple which contains:
-        file offset - the position at which writing starts in the current file
-        piece start - the position at which the piece starts for the current file
-        piece section length - the length of the piece section associated with the current file
-    """
-    def __determineFilesWhichContainPiece(self, piece: Piece) -> List[Tuple[File, int, int, int]]:
-        # TODO - handle the case where there are empty files
-        fileListWithOffsets: List[Tuple[File, int, int, int]] = []
-
-        pieceLength: int = self.__regularPieceLength
-        if piece.index == self.__pieceCount - 1:
-            pieceLength = self.__finalPieceLength
-        pieceStartOffset: int = piece.index * self.__regularPieceLength
-        pieceEndOffset: int = pieceStartOffset + pieceLength
-        currentFileStartOffset: int = 0
-        for file in self.__torrentFiles:
-            currentFileEndOffset: int = currentFileStartOffset + file.length
-
-            if pieceStartOffset < currentFileStartOffset and currentFileEndOffset <= pieceEndOffset:  # entire file is inside the piece
-                fileListWithOffsets.append((file, 0, currentFileStartOffset - pieceStartOffset, file.length))
-            elif currentFileStartOffset <= pieceStartOffset < currentFileEndOffset:
-                if currentFileStartOffset < pieceEndOffset <= currentFileEndOffset:  # entire piece is inside a file
-                    fileListWithOffsets.append((file, pieceStartOffset - currentFileStartOffset, 0, pieceLength))
-                else:  # just the start is inside file
-                    fileListWithOffsets.append((file, pieceStartOffset - currentFileStartOffset, 0, currentFileEndOffset - pieceStartOffset))
-            elif currentFileStartOffset < pieceEndOffset <= currentFileEndOffset:  # just the end is inside file
-                fileListWithOffsets.append((file, 0, pieceLength + currentFileStartOffset - pieceEndOffset, pieceEndOffset - currentFileStartOffset))
-
-            currentFileStartOffset = currentFileEndOffset
-            
-        return fileListWithOffsets
-
-    """
-    Writes a piece section to disk
-    @:param file - the file this piece section belongs to
-    @:param piece - the piece whose section is written to disk
-    @:param fileStartOffset - the position in which to start writing to the file
-    @:param pieceSectionLength - the length of the section to be written
-    @:return True, if the data is successfully written to disk, False otherwise
-    """
-    def __writePieceSectionToDisk(self, file: File, piece: Piece, fileStartOffset: int, pieceStartOffset: int, pieceSectionLength: int) -> bool:
-        fileDescriptor: int = os.open(file.path, os.O_RDWR | os.O_CREAT | os.O_BINARY)
-        newPosition: int = os.lseek(fileDescriptor, fileStartOffset, os.SEEK_SET)
-        if newPosition != fileStartOffset:
-            os.close(fileDescriptor)
-            return False
-        writtenByteCount: int = os.write(fileDescriptor, piece.data[pieceStartOffset: pieceStartOffset + pieceSectionLength])
-        if writtenByteCount != pieceSectionLength:
-            os.close(fileDescriptor)
-            return False
-        os.close(fileDescriptor)
-        return True
-
-    async def __run(self) -> None:
-        while not self.__forceStop or not (self.__isDownloadComplete and self.__piecesQueue.empty()):
-            piece: Piece = await self.__piecesQueue.get()
-            if not piece:
-                return
-
-            fileListWithOffsets: List[Tuple[File, int, int, int]] = self.__determineFilesWhichContainPiece(piece)
-            for file, fileStartOffset, pieceStartOffset, pieceSectionLength in fileListWithOffsets:
-                while not self.__writePieceSectionToDisk(file, piece, fileStartOffset, pieceStartOffset, pieceSectionLength):
-                    pass
-            piece.clear()
+        self.__queuedPieces[piece.index] = piece
+        self.__queuedByteCount += piece.length
+        self.__updateQueueState()
+        self.__startWrites()
+
+    """
+    Waits while the pieces which are not written yet take more than the allowed number of bytes
+    """
+    async def waitForRoomInQueue(self) -> None:
+        await self.__queueHasRoom.wait()
+
+    def __updateQueueState(self) -> None:
+        if self.__queuedByteCount < self.__maxQueuedByteCount:
+            self.__queueHasRoom.set()
+        else:
+            self.__queueHasRoom.clear()
+        if self.__queuedPieces or self.__piecesBeingWritten:
+            self.__allPiecesWritten.clear()
+        else:
+            self.__allPiecesWritten.set()
+        self.__sessionMetrics.setDiskWriteQueueDepth(len(self.__queuedPieces), self.__queuedByteCount)
+
+    """
+    Takes the lowest queued piece and the queued pieces which follow it (up to a limit)
+    @:return the pieces, in order
+    """
+    def __takeAdjacentPieces(self) -> List[Piece]:
+        pieceIndex: int = min(self.__queuedPieces)
+        pieces: List[Piece] = [self.__queuedPieces.pop(pieceIndex)]
+        writeLength: int = pieces[0].length
+        while pieceIndex + 1 in self.__queuedPieces and len(pieces) < self.MAX_COALESCED_PIECE_COUNT \
+                and writeLength + self.__queuedPieces[pieceIndex + 1].length <= self.MAX_COALESCED_WRITE_LENGTH:
+            pieceIndex += 1
+            pieces.append(self.__queuedPieces.pop(pieceIndex))
+            writeLength += pieces[-1].length
+        return pieces
+
+    def __startWrites(self) -> None:
+        while self.__running and self.__queuedPieces and self.__busyWriterCount < self.__writerThreadCount:
+            self.__submitWrite(self.__takeAdjacentPieces())
+
+    def __submitWrite(self, pieces: List[Piece]) -> None:
+        self.__busyWriterCount += 1
+        self.__piecesBeingWritten.update((piece.index, piece) for piece in pieces)
+        writeLatency: Future[float] = asyncio.get_running_loop().run_in_executor(self.__executor, self.__writePieces, pieces)
+        writeLatency.add_done_callback(lambda result: self.__finishWrite(pieces, result))
+
+    """
+    Computes the file sections which hold consecutive pieces, along with the parts of the piece buffers which go in each section
+    @:param pieces - consecutive pieces, in order
+    @:return a list of tuples, each of which contains:
+        file - the file which holds the section
+        file offset - the position at which the section starts in the file
+        buffers - the parts of the piece buffers which make up the section, in order
+    """
+    def __determineFileSectionsOfPieces(self, pieces: List[Piece]) -> List[Tuple[File, int, List[memoryview]]]:
+        fileSectionsWithBuffers: List[Tuple[File, int, List[memoryview]]] = []
+        pieceIndex: int = 0
+        pieceOffset: int = 0  # the position in the current piece at which the next section starts
+        for file, fileStartOffset, sectionLength in self.__fileLayout.getFileSections(pieces[0].index * self.__regularPieceLength,
+                                                                                      sum(piece.length for piece in pieces)):
+            buffers: List[memoryview] = []
+            while sectionLength > 0:
+                bufferLength: int = min(sectionLength, pieces[pieceIndex].length - pieceOffset)
+                buffers.append(pieces[pieceIndex].data[pieceOffset: pieceOffset + bufferLength])
+                sectionLength -= bufferLength
+                pieceOffset += bufferLength
+                if pieceOffset == pieces[pieceIndex].length:
+                    pieceIndex, pieceOffset = pieceIndex + 1, 0
+            fileSectionsWithBuffers.append((file, fileStartOffset, buffers))
+        return fileSectionsWithBuffers
+
+    """
+    Writes consecutive pieces to disk; this runs on a writer thread
+    @:return the time it took, in seconds
+    @:raise OSError - if the pieces cannot be written
+    """
+    def __writePieces(self, pieces: List[Piece]) -> float:
+        startTime: float = time.perf_counter()
+        for file, fileStartOffset, buffers in self.__determineFileSectionsOfPieces(pieces):
+            self.__storage.writeFileSectionVector(file.path, fileStartOffset, buffers, file.length)
+        return time.perf_counter() - startTime
+
+    def __finishWrite(self, pieces: List[Piece], writeLatency: Future[float]) -> None:
+        self.__busyWriterCount -= 1
+        for piece in pieces:
+            del self.__piecesBeingWritten[piece.index]
+        self.__queuedByteCount -= sum(piece.length for piece in pieces)
+        self.__updateQueueState()
+        if writeLatency.cancelled():
+            for piece in pieces:
+                self.__pieceBufferPool.release(piece.detachBuffer())
+            return
+        error: BaseException | None = writeLatency.exception()
+        if error is None:
+            self.__sessionMetrics.addDiskWrite(sum(piece.length for piece in pieces), writeLatency.result())
+        for piece in pieces:
+            self.__pieceBufferPool.release(piece.detachBuffer())
+            if error is None:
+                self.__onPieceSaved()
+            else:
+                self.__onPieceWriteFailed(piece.index, error if isinstance(error, OSError) else OSError(str(error)))
+        self.__startWrites()
+
+    @property
+    def queuedPieceCount(self) -> int:
+        return len(self.__queuedPieces)
+
+    """
+    Whether the pieces which are not written yet take less than the allowed number of bytes
+    """
+    @property
+    def hasRoomInQueue(self) -> bool:
+        return self.__queueHasRoom.is_set()
+
+    @property
+    def queuedByteCount(self) -> int:
+        return self.__queuedByteCount
+
+    """
+    The pieces which were put in the queue, but are not written on disk yet
+    """
+    @property
+    def unwrittenPieceIndices(self) -> Set[int]:
+        return set(self.__piecesBeingWritten).union(self.__queuedPieces)
+
+    """
+    @:return the data of a piece which was put in the queue but is not written on disk yet, or None if there is no such piece. The data
+    is a view over the buffer of the piece, which goes back to the pool once the piece is written, so it must be copied before the
+    event loop moves on
+    """
+    def getUnwrittenPieceData(self, pieceIndex: int) -> memoryview | None:
+        piece: Piece | None = self.__queuedPieces.get(pieceIndex)
+        if piece is None:
+            piece = self.__piecesBeingWritten.get(pieceIndex)
+        return None if piece is None else piece.data
@@ -0,0 +1,156 @@
+from typing import Dict, List
+from bitarray import bitarray
+from domain.block import Block
+from domain.piece import Piece
+from service.pieceBufferPool import PieceBufferPool
+from service.pieceGenerator import PieceGenerator
+
+
+class TorrentState:
+    """
+    The download state of the pieces of a torrent, kept compact: one bit per piece for the downloaded pieces (with a running count),
+    while Piece and Block objects only exist for the pieces which are in progress. A piece which is neither downloaded nor in progress
+    has none of its blocks downloaded, so it needs no state of its own.
+    Every piece in progress holds a buffer of the pool, so a piece can only be started while the pool has a free buffer
+    """
+    def __init__(self, pieceCount: int, regularPieceLength: int, finalPieceLength: int, pieceBufferPool: PieceBufferPool):
+        self.__pieceGenerator: PieceGenerator = PieceGenerator(pieceCount, regularPieceLength, finalPieceLength)
+        self.__pieceBufferPool: PieceBufferPool = pieceBufferPool
+        self.__downloadedPieces: bitarray = bitarray(pieceCount)
+        self.__downloadedPieces.setall(False)
+        self.__downloadedPieceCount: int = 0
+        self.__activePieces: Dict[int, Piece] = {}
+
+    """
+    (Re)initializes the state with the pieces which are already downloaded; the pieces in progress are discarded
+    @:param downloadedPieces - for each piece, True if it is already downloaded
+    """
+    def setDownloadedPieces(self, downloadedPieces: List[bool]) -> None:
+        self.__downloadedPieces = bitarray(downloadedPieces)
+        self.__downloadedPieceCount = self.__downloadedPieces.count(1)
+        for piece in self.__activePieces.values():
+            self.__pieceBufferPool.release(piece.detachBuffer())
+        self.__activePieces.clear()
+
+    """
+    @:return the piece, if it is in progress, None otherwise
+    """
+    def getPiece(self, pieceIndex: int) -> Piece | None:
+        return self.__activePieces.get(pieceIndex)
+
+    """
+    @:return the piece, with its blocks; the piece is created (with no blocks downloaded) if it was not in progress already,
+    unless there is no free buffer left for it, in which case None is returned
+    """
+    def startPiece(self, pieceIndex: int) -> Piece | None:
+        piece: Piece | None = self.__activePieces.get(pieceIndex)
+        if piece is None:
+            buffer: bytearray | None = self.__pieceBufferPool.acquire()
+            if buffer is None:
+                return None
+            piece = self.__pieceGenerator.generatePiece(pieceIndex, buffer)
+            self.__activePieces[pieceIndex] = piece
+        return piece
+
+    """
+    Starts a piece again with the blocks it had when the download stopped (e.g. from the resume data)
+    @:param completeBlocks - for each block of the piece, True if it was complete
+    @:param data - the data of the complete blocks, one after another
+    @:return False if the piece could not be started (no free buffer, or the blocks do not match a piece in progress), True otherwise
+    """
+    def restorePiece(self, pieceIndex: int, completeBlocks: bitarray, data: bytes) -> bool:
+        if not 0 <= pieceIndex < self.pieceCount or self.__downloadedPieces[pieceIndex] \
+                or len(completeBlocks) != self.getBlockCount(pieceIndex) or completeBlocks.all():
+            return False
+        piece: Piece | None = self.startPiece(pieceIndex)
+        if piece is None:
+            return False
+        dataOffset: int = 0
+        for block, isBlockComplete in zip(piece.blocks, completeBlocks):
+            if isBlockComplete:
+                piece.writeDataToBlock(block.beginOffset, data[dataOffset: dataOffset + block.length])
+                dataOffset += block.length
+        return True
+
+    """
+    @:return the pieces which have some, but not all, of their blocks downloaded
+    """
+    def getPiecesInProgress(self) -> List[Piece]:
+        return [piece for piece in self.__activePieces.values() if piece.isInProgress]
+
+    """
+    Creates a stand-alone block (e.g. for answering a request), without creating its piece
+    @:return the block, or None if the position does not match a block
+    """
+    def createBlock(self, pieceIndex: int, beginOffset: int) -> Block | None:
+        return self.__pieceGenerator.generateBlock(pieceIndex, beginOffset)
+
+    def isPieceDownloaded(self, pieceIndex: int) -> bool:
+        return self.__downloadedPieces[pieceIndex]
+
+    def isPieceInProgress(self, pieceIndex: int) -> bool:
+        piece: Piece | None = self.__activePieces.get(pieceIndex)
+        return piece is not None and piece.isInProgress
+
+    def isBlockComplete(self, pieceIndex: int, blockIndex: int) -> bool:
+        if self.__downloadedPieces[pieceIndex]:
+            return True
+        piece: Piece | None = self.__activePieces.get(pieceIndex)
+        return piece is not None and piece.blocks[blockIndex].isComplete
+
+    """
+    Marks a piece as downloaded; its Piece object is no longer kept (the object itself can still be used, e.g. for writing it on disk,
+    after which its buffer has to be released to the pool)
+    """
+    def markPieceAsDownloaded(self, pieceIndex: int) -> None:
+        if not self.__downloadedPieces[pieceIndex]:
+            self.__downloadedPieces[pieceIndex] = True
+            self.__downloadedPieceCount += 1
+        self.__activePieces.pop(pieceIndex, None)
+
+    """
+    Marks a downloaded piece as missing again (e.g. it could not be written on disk), so that it will be downloaded again
+    """
+    def markPieceAsMissing(self, pieceIndex: int) -> None:
+        if self.__downloadedPieces[pieceIndex]:
+            self.__downloadedPieces[pieceIndex] = False
+            self.__downloadedPieceCount -= 1
+
+    """
+    Discards a piece which failed its hash check, so that it will be downloaded again from scratch; its buffer goes back to the pool
+    """
+    def markPieceAsFailed(self, pieceIndex: int) -> None:
+        piece: Piece | None = self.__activePieces.pop(pieceIndex, None)
+        if piece is not None:
+            self.__pieceBufferPool.release(piece.detachBuffer())
+
+    @property
+    def pieceCount(self) -> int:
+        return self.__pieceGenerator.pieceCount
+
+    @property
+    def blocksInRegularPiece(self) -> int:
+        return self.__pieceGenerator.blocksInRegularPiece
+
+    def getBlockCount(self, pieceIndex: int) -> int:
+        return self.__pieceGenerator.getBlockCount(pieceIndex)
+
+    @property
+    def downloadedPieces(self) -> bitarray:
+        return self.__downloadedPieces
+
+    @property
+    def downloadedPieceCount(self) -> int:
+        return self.__downloadedPieceCount
+
+    @property
+    def canStartPiece(self) -> bool:
+        return self.__pieceBufferPool.hasFreeBuffer
+
+    @property
+    def activePieceCount(self) -> int:
+        return len(self.__activePieces)
+
+    @property
+    def isDownloaded(self) -> bool:
+        return self.__downloadedPieceCount == self.pieceCount
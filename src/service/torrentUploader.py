@@ -1,18 +1,46 @@
 import asyncio
 from asyncio import Task
-from typing import Tuple
+from typing import Tuple, List, Dict, Final, Iterator, Callable
 from domain.block import Block
+from domain.file import File
 from domain.message.pieceMessage import PieceMessage
 from domain.peer import Peer
-from service.torrentDiskLoader import TorrentDiskLoader
+from service.pieceReadCache import PieceReadCache
+from service.sessionMetrics import SessionMetrics
+from service.storage import Storage
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from service.uploadReadScheduler import UploadReadScheduler
 
 
 class TorrentUploader:
-    def __init__(self, scanner: TorrentMetaInfoScanner):
+    """
+    Sends the blocks requested by the other peers. The requests which arrive within a short window are served together, so that
+    their pieces are read from disk in order and with merged reads (see UploadReadScheduler), instead of one random read per request.
+    A batch takes at most a given number of requests from each peer (the rest wait for the next batch), so that a peer which
+    requests many blocks at once does not hold back the other peers.
+    With zero-copy uploads, a block which is not cached and lies inside a single file is sent straight from the file to the socket
+    (with sendfile), if the storage can do that; its piece is then not read, so the page cache of the system serves the next blocks.
+    The other blocks of a batch are read off the event loop, while the ones sent with sendfile are only read ahead off the event loop
+    (sendfile itself runs on it, see FileHandleCache.sendFileSection); then every peer is sent its blocks on its own task, and a peer
+    is put in the next batch only once it was sent its blocks of the previous one.
+    The blocks of the pieces which are not written on disk yet are taken from their buffers instead
+    @:param getUnwrittenPieceData - gives the data of a piece which is not written on disk yet, or None (see TorrentSaver)
+    """
+    BATCH_WINDOW: Final[float] = 0.002  # seconds
+    MAX_BATCHED_REQUESTS_PER_PEER: Final[int] = 16
+
+    def __init__(self, scanner: TorrentMetaInfoScanner, storage: Storage, pieceReadCache: PieceReadCache, sessionMetrics: SessionMetrics,
+                 isZeroCopyEnabled: bool, getUnwrittenPieceData: Callable[[int], memoryview | None]):
         self.__scanner: TorrentMetaInfoScanner = scanner
-        self.__torrentDiskLoader: TorrentDiskLoader = TorrentDiskLoader(scanner)
-        self.__blockAndPeerQueue: asyncio.Queue[Tuple[Block, Peer]] = asyncio.Queue()
+        self.__storage: Storage = storage
+        self.__pieceReadCache: PieceReadCache = pieceReadCache
+        self.__isZeroCopyEnabled: bool = isZeroCopyEnabled
+        self.__getUnwrittenPieceData: Callable[[int], memoryview | None] = getUnwrittenPieceData
+        self.__uploadReadScheduler: UploadReadScheduler = UploadReadScheduler(scanner, storage, pieceReadCache, sessionMetrics,
+                                                                              getUnwrittenPieceData)
+        self.__pendingRequests: List[Tuple[Block, Peer]] = []  # the requests which were not put in a batch yet
+        self.__requestsArrived: asyncio.Event = asyncio.Event()
+        self.__sendingTasks: Dict[Peer, Task] = {}  # peer -> the task which sends it the blocks of the current batch
         self.__running: bool = False
 
     def start(self) -> None:
@@ -22,18 +50,113 @@ class TorrentUploader:
     """This can be called even if the uploader was not started yet"""
     def stop(self) -> None:
         self.__running = False
+        self.__requestsArrived.set()
 
     def putBlockInQueue(self, blockWithoutData: Block, requester: Peer) -> None:
-        self.__blockAndPeerQueue.put_nowait((blockWithoutData, requester))
+        self.__pendingRequests.append((blockWithoutData, requester))
+        self.__requestsArrived.set()
+
+    """
+    Takes the pending requests which were not cancelled, at most a given number from each peer; the requests of the peers which
+    are still being sent the blocks of a previous batch wait for the next batch
+    @:return the requests, in the order of their blocks in the torrent
+    """
+    def __takeBatch(self) -> List[Tuple[Block, Peer]]:
+        batch: List[Tuple[Block, Peer]] = []
+        deferredRequests: List[Tuple[Block, Peer]] = []
+        batchedRequestCounts: Dict[Peer, int] = {}
+        for blockWithoutData, requester in self.__pendingRequests:
+            if blockWithoutData not in requester.blocksRequestedByPeer:  # the peer cancelled the request since making it
+                continue
+            if requester not in self.__sendingTasks and batchedRequestCounts.get(requester, 0) < self.MAX_BATCHED_REQUESTS_PER_PEER:
+                batch.append((blockWithoutData, requester))
+                batchedRequestCounts[requester] = batchedRequestCounts.get(requester, 0) + 1
+            else:
+                deferredRequests.append((blockWithoutData, requester))
+        self.__pendingRequests = deferredRequests
+        batch.sort(key=lambda blockAndPeer: (blockAndPeer[0].pieceIndex, blockAndPeer[0].beginOffset))
+        return batch
+
+    """
+    @:return the file and the position in the file at which the block can be sent without being copied, or None if it has to be
+    read (its piece is in memory, or the block spans several files)
+    """
+    def __getZeroCopyFileSection(self, blockWithoutData: Block) -> Tuple[File, int] | None:
+        if not self.__isZeroCopyEnabled or self.__pieceReadCache.containsPiece(blockWithoutData.pieceIndex) \
+                or self.__getUnwrittenPieceData(blockWithoutData.pieceIndex) is not None:
+            return None
+        fileSections: List[Tuple[File, int, int]] = self.__scanner.fileLayout.getFileSections(
+            blockWithoutData.pieceIndex * self.__scanner.regularPieceLength + blockWithoutData.beginOffset, blockWithoutData.length)
+        if len(fileSections) != 1:
+            return None
+        return fileSections[0][0], fileSections[0][1]
+
+    """
+    Has the system read ahead the file sections which are about to be sent straight from their files, so that sending them on the
+    event loop seldom waits for the disk; this runs on a worker thread
+    @:param fileSections - the sections, as (file, position in the file, length)
+    """
+    def __adviseWillSend(self, fileSections: List[Tuple[File, int, int]]) -> None:
+        for file, fileOffset, length in fileSections:
+            try:
+                self.__storage.adviseWillRead(file.path, fileOffset, length)
+            except OSError:
+                pass  # the section cannot be sent from its file either, so it will be read instead
+
+    """
+    @:return True if the block was sent (or the connection failed while sending it), False if it has to be read and sent instead
+    """
+    async def __sendBlockFromFile(self, blockWithoutData: Block, requester: Peer, file: File, fileOffset: int) -> bool:
+        header: bytes = PieceMessage.createMessageHeader(blockWithoutData.pieceIndex, blockWithoutData.beginOffset, blockWithoutData.length)
+        try:
+            return await requester.connection.sendFileSection(header, self.__storage, file.path, fileOffset, blockWithoutData.length)
+        except OSError:  # including the ConnectionError of a lost connection
+            requester.connection.close()  # part of the message may have been sent, so nothing else can follow it on the connection
+            return True
+
+    """
+    Sends a peer the blocks of a batch which it requested, in order; every peer is sent its blocks on its own task, so that a peer
+    which reads slowly does not hold back the others
+    @:param blocks - the blocks, each with its data (None if it is sent straight from its file, or has to be read) and its file section
+    (None if it cannot be sent straight from its file)
+    """
+    async def __sendBlocks(self, requester: Peer, blocks: List[Tuple[Block, bytes | memoryview | None, Tuple[File, int] | None]]) -> None:
+        for blockWithoutData, blockData, fileSection in blocks:
+            if blockWithoutData not in requester.blocksRequestedByPeer:  # the peer cancelled the request while the batch was sent
+                continue
+            if fileSection is not None and await self.__sendBlockFromFile(blockWithoutData, requester, *fileSection):
+                requester.blocksRequestedByPeer.discard(blockWithoutData)
+                continue
+            if blockData is None:
+                blockData = (await self.__uploadReadScheduler.readBlocks([blockWithoutData]))[0]
+            await PieceMessage(blockWithoutData.pieceIndex, blockWithoutData.beginOffset, blockData).send(requester)
+            requester.blocksRequestedByPeer.discard(blockWithoutData)
+
+    def __finishSending(self, requester: Peer) -> None:
+        del self.__sendingTasks[requester]
+        if self.__pendingRequests:  # some of them may have waited for this peer to be sent its previous blocks
+            self.__requestsArrived.set()
 
     async def __run(self) -> None:
         while self.__running:
-            blockAndPeer: Tuple[Block, Peer] = await self.__blockAndPeerQueue.get()
-            if not blockAndPeer:
+            await self.__requestsArrived.wait()
+            self.__requestsArrived.clear()
+            if not self.__running:
                 return
+            await asyncio.sleep(self.BATCH_WINDOW)  # lets the requests made at about the same time join the batch
 
-            blockWithoutData: Block = blockAndPeer[0]
-            requester: Peer = blockAndPeer[1]
-            if blockWithoutData in requester.blocksRequestedByPeer:  # ensure the peer didn't cancel the request since first making it
-                await PieceMessage(blockWithoutData.pieceIndex, blockWithoutData.beginOffset, self.__torrentDiskLoader.getDataForBlock(blockWithoutData)).send(requester)
-                requester.blocksRequestedByPeer.remove(blockWithoutData)
+            batch: List[Tuple[Block, Peer]] = self.__takeBatch()
+            zeroCopyFileSections: List[Tuple[File, int] | None] = [self.__getZeroCopyFileSection(blockWithoutData) for blockWithoutData, _ in batch]
+            sectionsToAdvise: List[Tuple[File, int, int]] = [(*fileSection, blockWithoutData.length)
+                                                             for (blockWithoutData, _), fileSection in zip(batch, zeroCopyFileSections) if fileSection is not None]
+            if sectionsToAdvise:
+                await asyncio.to_thread(self.__adviseWillSend, sectionsToAdvise)
+            readBlocksData: Iterator[bytes | memoryview] = iter(await self.__uploadReadScheduler.readBlocks(
+                [blockWithoutData for (blockWithoutData, _), fileSection in zip(batch, zeroCopyFileSections) if fileSection is None]))
+            blocksByRequester: Dict[Peer, List[Tuple[Block, bytes | memoryview | None, Tuple[File, int] | None]]] = {}
+            for (blockWithoutData, requester), fileSection in zip(batch, zeroCopyFileSections):
+                blockData: bytes | memoryview | None = next(readBlocksData) if fileSection is None else None
+                blocksByRequester.setdefault(requester, []).append((blockWithoutData, blockData, fileSection))
+            for requester, blocks in blocksByRequester.items():
+                self.__sendingTasks[requester] = asyncio.create_task(self.__sendBlocks(requester, blocks))
+                self.__sendingTasks[requester].add_done_callback(lambda _, requester=requester: self.__finishSending(requester))
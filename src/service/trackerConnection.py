@@ -1,90 +1,268 @@
 import asyncio
+import random
 from typing import List, Final, Dict, Any, Tuple, Callable
-import requests
-from requests import Response
+from urllib.parse import urlsplit
 import utils
-from domain.peer import Peer
+from domain.peerTable import PeerTable
+from service.httpClient import HttpClient
 from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
 from service.trackerResponseScanner import TrackerResponseScanner
+from service.udpTrackerClient import UdpTrackerClient
 
 
 class TrackerConnection:
+    """
+    Announces the torrent to its trackers over UDP (BEP 15) or HTTP, without ever blocking the event loop (and so the traffic with
+    the peers): the HTTP requests go through an asyncio client, which keeps the connection to the tracker alive between the announces
+    and caches its address. An HTTP request which fails (no connection, timeout, malformed response) is made again after a delay which
+    doubles every time, up to a limit; the UDP requests are retransmitted as the UDP tracker protocol specifies.
+    The started and completed announces try the next port only when the trackers answer with no peer but this client; they give up
+    as soon as no tracker answers, and after a while in any case.
+    Every announce reports the transfer statistics of the torrent as they are at that moment
+    """
     FIRST_AVAILABLE_PORT: Final[int] = 6881
     LAST_AVAILABLE_PORT: Final[int] = 6889
     PORT_KEY: Final[str] = "port"
+    UDP_SCHEME: Final[str] = "udp"
+    CURRENT_IP_URL: Final[str] = "https://api.ipify.org"
+    REQUEST_TIMEOUT_IN_SECONDS: Final[float] = 15.0
+    REQUEST_ATTEMPTS: Final[int] = 4
+    MAX_PORT_SEARCH_TIME_IN_SECONDS: Final[float] = 120.0  # for a started or completed announce, on all the ports
+    INITIAL_RETRY_DELAY_IN_SECONDS: Final[float] = 1.0
+    MAX_RETRY_DELAY_IN_SECONDS: Final[float] = 30.0
+    TIER_FALLBACK_DELAY_IN_SECONDS: Final[float] = 5.0
+    PEER_MERGE_DELAY_IN_SECONDS: Final[float] = 1.0
+    DEFAULT_ANNOUNCE_INTERVAL_IN_SECONDS: Final[float] = 1800.0  # until a tracker gives its own
+    DEFAULT_MIN_ANNOUNCE_INTERVAL_IN_SECONDS: Final[float] = 300.0  # for the trackers which do not give one
+    INTERVAL_KEY: Final[str] = "interval"
+    MIN_INTERVAL_KEY: Final[str] = "min interval"
+    FAILURE_REASON_KEY: Final[str] = "failure reason"  # in the response of an HTTP tracker which refuses the announce
 
-    def __init__(self, scanner: TorrentMetaInfoScanner):
-        self.__announceURL: str = scanner.announceURL
+    """
+    @:param getTransferStatistics - gives the bytes uploaded and downloaded so far, and the bytes left to download
+    """
+    def __init__(self, scanner: TorrentMetaInfoScanner, getTransferStatistics: Callable[[], Tuple[int, int, int]]):
+        self.__tiers: List[List[str]] = scanner.announceTiers
+        for tier in self.__tiers:
+            random.shuffle(tier)  # as BEP 12 requires, so that the load is spread over the trackers of a tier
         self.__infoHash: bytes = scanner.infoHash
-        self.__totalSize: int = scanner.getTotalContentSize()
-        self.__currentIP: str = self.__getCurrentIP()
+        self.__getTransferStatistics: Callable[[], Tuple[int, int, int]] = getTransferStatistics
+        self.__port: int = self.FIRST_AVAILABLE_PORT  # the one found by the first announce
+        self.__announceInterval: float = self.DEFAULT_ANNOUNCE_INTERVAL_IN_SECONDS
+        self.__minAnnounceInterval: float = self.DEFAULT_MIN_ANNOUNCE_INTERVAL_IN_SECONDS
+        self.__httpClient: HttpClient = HttpClient()
+        self.__udpTrackerClient: UdpTrackerClient = UdpTrackerClient()
+        self.__currentIP: str | None = None  # found before the first announce
 
-    def __getCurrentIP(self) -> str:
-        URL: Final[str] = 'https://api.ipify.org'
-        return requests.get(URL).content.decode('utf8')
+    """
+    Makes a GET request, again and again (with exponential backoff) while it fails
+    @:return the status code and the body of the response
+    @:raise OSError, ValueError - if the last attempt fails as well
+    """
+    async def __getWithRetries(self, url: str, params: Dict[str, Any]) -> Tuple[int, bytes]:
+        retryDelay: float = self.INITIAL_RETRY_DELAY_IN_SECONDS
+        for _ in range(self.REQUEST_ATTEMPTS - 1):
+            try:
+                return await self.__httpClient.get(url, params, self.REQUEST_TIMEOUT_IN_SECONDS)
+            except (OSError, ValueError):
+                await asyncio.sleep(retryDelay)
+                retryDelay = min(2 * retryDelay, self.MAX_RETRY_DELAY_IN_SECONDS)
+        return await self.__httpClient.get(url, params, self.REQUEST_TIMEOUT_IN_SECONDS)
 
-    async def __getPeers(self, payload: Dict[str, Any]) -> List[Peer] | None:
-        REQUEST_ATTEMPT_TIMEOUT: Final[int] = 30  # seconds
+    """
+    Looks up the public IP of this client, once; if the lookup fails, the IP stays unknown, since the announces do not need it
+    (only the peers of this client cannot be told apart from the others then)
+    """
+    async def __findCurrentIP(self) -> None:
+        if self.__currentIP is not None:
+            return
+        try:
+            _, responseBody = await self.__httpClient.get(self.CURRENT_IP_URL, {}, self.REQUEST_TIMEOUT_IN_SECONDS)
+            self.__currentIP = responseBody.decode("utf8").strip()
+        except (OSError, ValueError):
+            pass  # TODO - log the exception
+
+    """
+    Announces the torrent once to a tracker, over UDP or HTTP depending on its URL
+    @:return the response without the peers, and the peers given by the tracker; None if it refused the announce (with an error
+    status, or with a failure reason in its response)
+    @:raise OSError, ValueError - if the tracker cannot be reached, or its response is not valid
+    """
+    async def __announceToTracker(self, announceURL: str, payload: Dict[str, Any]) -> Tuple[dict, PeerTable] | None:
+        SUCCESS_STATUS_CODE: Final[int] = 200
+
+        if urlsplit(announceURL).scheme == self.UDP_SCHEME:
+            return await self.__udpTrackerClient.announce(announceURL, self.__infoHash, utils.PEER_ID.encode(), payload["port"],
+                                                          payload["downloaded"], payload["left"], payload["uploaded"], payload.get("event", ""))
+        statusCode, responseBody = await self.__getWithRetries(announceURL, payload)
+        if statusCode != SUCCESS_STATUS_CODE:
+            return None
+        response, peerTable = TrackerResponseScanner.scanTrackerResponse(responseBody)
+        if self.FAILURE_REASON_KEY in response:
+            return None  # TODO - log the failure reason
+        return response, peerTable
+
+    async def __announceToTrackerSafely(self, announceURL: str, payload: Dict[str, Any]) -> Tuple[dict, PeerTable] | None:
+        try:
+            return await self.__announceToTracker(announceURL, payload)
+        except (OSError, ValueError):
+            return None  # TODO - log the exception
+
+    """
+    Announces the torrent to its trackers, tier after tier (BEP 12), with all the trackers of a tier being announced to at the same time.
+    The next tier is started when every tracker of the current one failed, or when none of them answered in a while; once a tracker
+    answers, the trackers already announced to get a short while to answer as well, and the others are given up.
+    The trackers which answer are moved to the front of their tier, so that they come first in the next announces; the intervals
+    between the announces are those given by the first tracker which answers
+    @:return the peers given by all the trackers which answered (without duplicates), or None if none of them did
+    """
+    async def __announceToAllTrackers(self, payload: Dict[str, Any]) -> PeerTable | None:
+        announces: Dict[asyncio.Task, Tuple[int, str]] = {}  # announce -> (tier index, tracker URL)
+        promotedTrackerCounts: List[int] = [0] * len(self.__tiers)  # the trackers of every tier which answered this time
+        peerTables: List[PeerTable] = []
+        hasAnyTrackerAnswered: bool = False
+        nextTierIndex: int = 0
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        deadline: float = loop.time()  # until the next tier is started, or, once a tracker answered, until the others are given up
+        try:
+            while True:
+                if not hasAnyTrackerAnswered and nextTierIndex < len(self.__tiers) and (not announces or loop.time() >= deadline):
+                    for announceURL in self.__tiers[nextTierIndex]:
+                        announces[asyncio.create_task(self.__announceToTrackerSafely(announceURL, payload))] = (nextTierIndex, announceURL)
+                    nextTierIndex += 1
+                    deadline = loop.time() + self.TIER_FALLBACK_DELAY_IN_SECONDS
+                if not announces:
+                    break
+                isWaitingForever: bool = not hasAnyTrackerAnswered and nextTierIndex == len(self.__tiers)  # no tier left to start
+                finishedAnnounces, _ = await asyncio.wait(announces, timeout=None if isWaitingForever else max(0.0, deadline - loop.time()),
+                                                          return_when=asyncio.FIRST_COMPLETED)
+                for finishedAnnounce in finishedAnnounces:
+                    tierIndex, announceURL = announces.pop(finishedAnnounce)
+                    response: Tuple[dict, PeerTable] | None = finishedAnnounce.result()
+                    if response is None:
+                        continue
+                    peerTables.append(response[1])
+                    tier: List[str] = self.__tiers[tierIndex]
+                    tier.insert(promotedTrackerCounts[tierIndex], tier.pop(tier.index(announceURL)))
+                    promotedTrackerCounts[tierIndex] += 1
+                    if not hasAnyTrackerAnswered:
+                        hasAnyTrackerAnswered = True
+                        self.__updateAnnounceIntervals(response[0])
+                        deadline = loop.time() + self.PEER_MERGE_DELAY_IN_SECONDS
+                if hasAnyTrackerAnswered and loop.time() >= deadline:
+                    break
+        finally:
+            for announce in announces:
+                announce.cancel()
+        return PeerTable.merge(peerTables) if hasAnyTrackerAnswered else None
+
+    def __updateAnnounceIntervals(self, response: dict) -> None:
+        try:
+            self.__announceInterval = float(response.get(self.INTERVAL_KEY, self.DEFAULT_ANNOUNCE_INTERVAL_IN_SECONDS))
+            self.__minAnnounceInterval = min(float(response.get(self.MIN_INTERVAL_KEY, self.DEFAULT_MIN_ANNOUNCE_INTERVAL_IN_SECONDS)),
+                                             self.__announceInterval)
+        except (TypeError, ValueError):
+            pass  # the previous intervals are kept
+
+    """
+    @:return the peers given by the trackers, or None if they gave no peer but this client
+    @:raise ConnectionError - if none of the trackers answered
+    """
+    async def __getPeers(self, payload: Dict[str, Any]) -> PeerTable | None:
         WAITING_TIME_BETWEEN_GET_PEER_REQUESTS: Final[int] = 1  # seconds
         ATTEMPTS_TO_GET_PEERS: Final[int] = 10
-        SUCCESS_STATUS_CODE: Final[int] = 200
 
         for _ in range(ATTEMPTS_TO_GET_PEERS):
-            response: Response = requests.get(self.__announceURL, params=payload, timeout=REQUEST_ATTEMPT_TIMEOUT)
-            if response.status_code != SUCCESS_STATUS_CODE:
-                return None
-            nonPeersPart, peerList = TrackerResponseScanner.scanTrackerResponse(response.content)
-            response.close()
-            for peer in peerList:
-                if utils.convertIPFromIntToString(peer.IP) != self.__currentIP or (utils.convertIPFromIntToString(peer.IP) == self.__currentIP and not self.FIRST_AVAILABLE_PORT <= peer.port <= self.LAST_AVAILABLE_PORT):
-                    return peerList
+            peerTable: PeerTable | None = await self.__announceToAllTrackers(payload)
+            if peerTable is None:
+                raise ConnectionError("None of the trackers answered")
+            for IP, port, isIPv6 in peerTable.getAddresses():
+                if utils.convertIPFromIntToString(IP, isIPv6) != self.__currentIP or (utils.convertIPFromIntToString(IP, isIPv6) == self.__currentIP and not self.FIRST_AVAILABLE_PORT <= port <= self.LAST_AVAILABLE_PORT):
+                    return peerTable
             await asyncio.sleep(WAITING_TIME_BETWEEN_GET_PEER_REQUESTS)
+        return None
 
-    def __getStartedPayloadForPort(self, port: int) -> Dict[str, bytes | str | int]:
-        return {
+    """
+    @:param event - "started", "completed", "stopped", or "" for a regular announce
+    """
+    def __getPayload(self, port: int, event: str) -> Dict[str, bytes | str | int]:
+        uploaded, downloaded, left = self.__getTransferStatistics()
+        payload: Dict[str, bytes | str | int] = {
             "info_hash": self.__infoHash,
             "peer_id": utils.PEER_ID,
             "port": port,
-            "uploaded": "0",
-            "downloaded": "0",
-            "left": self.__totalSize,
-            "compact": 1,
-            "event": "started"
+            "uploaded": uploaded,
+            "downloaded": downloaded,
+            "left": left,
+            "compact": 1
         }
+        if event:
+            payload["event"] = event
+        return payload
 
-    def __getFinishedPayloadForPort(self, port: int) -> Dict[str, bytes | str | int]:
-        return {
-            "info_hash": self.__infoHash,
-            "peer_id": utils.PEER_ID,
-            "port": port,
-            "uploaded": "0",
-            "downloaded": self.__totalSize,
-            "left": "0",
-            "compact": 1,
-            "event": "finished"
-        }
+    """
+    @:return the peers given by the trackers and the port they were announced on, or None if they gave no peer but this client on
+    any port
+    @:raise ConnectionError - if none of the trackers answered (another port would not help then)
+    """
+    async def __searchPort(self, event: str) -> Tuple[PeerTable, int] | None:
+        await self.__findCurrentIP()
+        for currentPort in range(self.FIRST_AVAILABLE_PORT, self.LAST_AVAILABLE_PORT + 1):
+            peerTable: PeerTable | None = await self.__getPeers(self.__getPayload(currentPort, event))
+            if peerTable is not None:
+                self.__port = currentPort
+                return peerTable, currentPort
+        return None
+
+    """
+    @:return the peers given by the trackers, and the port of this client; no peers (and the port found before) if the trackers
+    could not be reached in time
+    """
+    async def __makeRequest(self, event: str) -> Tuple[PeerTable, int]:
+        try:
+            result: Tuple[PeerTable, int] | None = await asyncio.wait_for(self.__searchPort(event), timeout=self.MAX_PORT_SEARCH_TIME_IN_SECONDS)
+        except (asyncio.TimeoutError, ConnectionError):
+            result = None  # TODO - log the exception
+        return result if result is not None else (PeerTable(), self.__port)
 
-    async def __makeRequest(self, payloadGetter: Callable[[int], Dict[str, bytes | str | int]]) -> Tuple[List[Peer], int]:
-        ATTEMPTS_TO_CONNECT_TO_TRACKER: Final[int] = 3
+    async def makeTrackerStartedRequest(self) -> Tuple[PeerTable, int]:
+        return await self.__makeRequest("started")
 
-        currentPort: int = self.FIRST_AVAILABLE_PORT
-        while currentPort <= self.LAST_AVAILABLE_PORT:
-            for attempt in range(ATTEMPTS_TO_CONNECT_TO_TRACKER):
-                try:
-                    peerList: List[Peer] | None = await self.__getPeers(payloadGetter(currentPort))
-                    if peerList is not None:
-                        return peerList, currentPort
-                except Exception as e:
-                    pass  # TODO - log the exception
-            currentPort += 1
-        # TODO - if the connection cannot be established with the current tracker address, try the others from the announceURL list
+    async def makeTrackerFinishedRequest(self) -> Tuple[PeerTable, int]:
+        return await self.__makeRequest("completed")
 
-    async def makeTrackerStartedRequest(self) -> Tuple[List[Peer], int]:
-        return await self.__makeRequest(lambda currentPort: self.__getStartedPayloadForPort(currentPort))
+    """
+    Announces the torrent to its trackers once, on the port found by the first announce
+    @:param event - "stopped", or "" for a regular announce
+    @:return the peers given by the trackers, or None if none of them answered
+    """
+    async def announce(self, event: str = "") -> PeerTable | None:
+        return await self.__announceToAllTrackers(self.__getPayload(self.__port, event))
 
-    async def makeTrackerFinishedRequest(self) -> Tuple[List[Peer], int]:
-        return await self.__makeRequest(lambda currentPort: self.__getFinishedPayloadForPort(currentPort))
+    """
+    Closes the connections kept alive with the trackers, and their UDP sockets
+    """
+    def close(self) -> None:
+        self.__httpClient.close()
+        self.__udpTrackerClient.close()
 
+    """
+    The public IP of this client, or None if it could not be found
+    """
     @property
-    def currentIP(self) -> str:
+    def currentIP(self) -> str | None:
         return self.__currentIP
+
+    """
+    The time between two regular announces, in seconds, as given by the trackers
+    """
+    @property
+    def announceInterval(self) -> float:
+        return self.__announceInterval
+
+    """
+    The shortest time between two announces, in seconds, as given by the trackers
+    """
+    @property
+    def minAnnounceInterval(self) -> float:
+        return self.__minAnnounceInterval
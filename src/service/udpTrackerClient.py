@@ -0,0 +1,156 @@
+import asyncio
+import random
+import struct
+import time
+from typing import Dict, List, Tuple, Final, Callable, Iterable
+from urllib.parse import urlsplit, SplitResult
+from domain.peerTable import PeerTable
+from service.udpTrackerProtocol import UdpTrackerProtocol
+
+
+class UdpTrackerClient:
+    """
+    Talks to trackers over the UDP tracker protocol (BEP 15): one datagram for the request and one for the response, instead of
+    a TCP connection and an HTTP exchange.
+    The connection ID given by a tracker is kept for as long as it is valid, so that it is only asked for again once it expires.
+    A request which gets no response is sent again after 15 * 2 ^ n seconds, n growing from 0 to 8 with every retransmission.
+    A scrape asks for as many torrents in one packet as the protocol allows
+    """
+    PROTOCOL_ID: Final[int] = 0x41727101980
+    CONNECT_ACTION: Final[int] = 0
+    ANNOUNCE_ACTION: Final[int] = 1
+    SCRAPE_ACTION: Final[int] = 2
+    ERROR_ACTION: Final[int] = 3
+    EVENTS: Final[Dict[str, int]] = {"": 0, "completed": 1, "started": 2, "stopped": 3}
+    BASE_RETRANSMISSION_TIMEOUT_IN_SECONDS: Final[float] = 15.0
+    MAX_RETRANSMISSIONS: Final[int] = 8
+    CONNECTION_ID_LIFETIME_IN_SECONDS: Final[float] = 60.0
+    MAX_INFO_HASHES_PER_SCRAPE: Final[int] = 74  # so that the request and the response fit in a datagram
+    CONNECT_REQUEST_FORMAT: Final[str] = "!QII"  # protocol ID, action, transaction ID
+    CONNECT_RESPONSE_FORMAT: Final[str] = "!IIQ"  # action, transaction ID, connection ID
+    # connection ID, action, transaction ID, info hash, peer ID, downloaded, left, uploaded, event, IP, key, peers wanted, port
+    ANNOUNCE_REQUEST_FORMAT: Final[str] = "!QII20s20sQQQIIIiH"
+    ANNOUNCE_RESPONSE_FORMAT: Final[str] = "!IIIII"  # action, transaction ID, interval, leechers, seeders
+    SCRAPE_REQUEST_HEADER_FORMAT: Final[str] = "!QII"  # connection ID, action, transaction ID
+    SCRAPE_RESPONSE_HEADER_FORMAT: Final[str] = "!II"  # action, transaction ID
+    SCRAPE_ENTRY_FORMAT: Final[str] = "!III"  # seeders, completed, leechers
+    ERROR_MESSAGE_OFFSET: Final[int] = 8
+
+    def __init__(self):
+        self.__endpoints: Dict[Tuple[str, int], UdpTrackerProtocol] = {}  # (host, port) -> endpoint
+        self.__connectionIds: Dict[Tuple[str, int], Tuple[int, float]] = {}  # (host, port) -> (connection ID, expiry time)
+        self.__key: int = random.getrandbits(32)  # lets the tracker recognize this client if its IP changes
+
+    """
+    @:param announceURL - a URL of the form udp://host:port[/path]
+    @:param event - "started", "completed", "stopped", or "" for a regular announce
+    @:return the response without the peers (the interval, and the number of seeders and leechers, under the same keys as in an
+    HTTP response) and the peers (IPv6 ones if the tracker is reached over IPv6, as BEP 15 specifies)
+    @:raise OSError - if the tracker cannot be reached or does not answer (TimeoutError)
+    @:raise ValueError - if the tracker answers with an error, or with a malformed response
+    """
+    async def announce(self, announceURL: str, infoHash: bytes, peerId: bytes, port: int, downloaded: int, left: int, uploaded: int,
+                       event: str) -> Tuple[dict, PeerTable]:
+        PEERS_WANTED: Final[int] = -1  # as many as the tracker gives by default
+
+        buildRequest: Callable[[int, int], bytes] = lambda connectionId, transactionId: struct.pack(
+            self.ANNOUNCE_REQUEST_FORMAT, connectionId, self.ANNOUNCE_ACTION, transactionId, infoHash, peerId, downloaded, left,
+            uploaded, self.EVENTS[event], 0, self.__key, PEERS_WANTED, port)
+        trackerAddress: Tuple[str, int] = self.__getTrackerAddress(announceURL)
+        isTrackerReachedOverIPv6: bool = (await self.__getEndpoint(trackerAddress)).isIPv6
+        response: bytes = await self.__makeRequest(trackerAddress, buildRequest, self.ANNOUNCE_ACTION, struct.calcsize(self.ANNOUNCE_RESPONSE_FORMAT))
+        _, _, interval, leechers, seeders = struct.unpack_from(self.ANNOUNCE_RESPONSE_FORMAT, response)
+        peerTable: PeerTable = PeerTable()
+        if isTrackerReachedOverIPv6:
+            peerTable.addCompactIPv6Peers(response[struct.calcsize(self.ANNOUNCE_RESPONSE_FORMAT):])
+        else:
+            peerTable.addCompactIPv4Peers(response[struct.calcsize(self.ANNOUNCE_RESPONSE_FORMAT):])
+        return {"interval": interval, "incomplete": leechers, "complete": seeders}, peerTable
+
+    """
+    Asks for the statistics of several torrents, with as few requests as possible (which are sent at the same time)
+    @:return for each info hash: the number of seeders, the number of times the torrent was downloaded, and the number of leechers
+    @:raise OSError, ValueError - as for announce
+    """
+    async def scrape(self, scrapeURL: str, infoHashes: Iterable[bytes]) -> Dict[bytes, Tuple[int, int, int]]:
+        infoHashes = list(infoHashes)
+        trackerAddress: Tuple[str, int] = self.__getTrackerAddress(scrapeURL)
+        batches: List[List[bytes]] = [infoHashes[batchStart: batchStart + self.MAX_INFO_HASHES_PER_SCRAPE]
+                                      for batchStart in range(0, len(infoHashes), self.MAX_INFO_HASHES_PER_SCRAPE)]
+        batchResults: List[List[Tuple[int, int, int]]] = await asyncio.gather(*(self.__scrapeBatch(trackerAddress, batch) for batch in batches))
+        return {infoHash: statistics for batch, results in zip(batches, batchResults) for infoHash, statistics in zip(batch, results)}
+
+    async def __scrapeBatch(self, trackerAddress: Tuple[str, int], infoHashes: List[bytes]) -> List[Tuple[int, int, int]]:
+        buildRequest: Callable[[int, int], bytes] = lambda connectionId, transactionId: struct.pack(
+            self.SCRAPE_REQUEST_HEADER_FORMAT, connectionId, self.SCRAPE_ACTION, transactionId) + b"".join(infoHashes)
+        headerLength: int = struct.calcsize(self.SCRAPE_RESPONSE_HEADER_FORMAT)
+        responseLength: int = headerLength + len(infoHashes) * struct.calcsize(self.SCRAPE_ENTRY_FORMAT)
+        response: bytes = await self.__makeRequest(trackerAddress, buildRequest, self.SCRAPE_ACTION, responseLength)
+        return list(struct.iter_unpack(self.SCRAPE_ENTRY_FORMAT, response[headerLength: responseLength]))
+
+    @staticmethod
+    def __getTrackerAddress(url: str) -> Tuple[str, int]:
+        splitURL: SplitResult = urlsplit(url)
+        if splitURL.hostname is None or splitURL.port is None:
+            raise ValueError(f"Invalid UDP tracker URL: {url}")
+        return splitURL.hostname, splitURL.port
+
+    """
+    Makes a request, first asking for a connection ID if there is no valid one; a request (or the connect) which gets no response is
+    sent again, and the connect is made again if the connection ID expires in the meantime
+    @:param buildRequest - builds the request from the connection ID and the transaction ID
+    @:param minResponseLength - the length under which the response is malformed
+    @:return the response
+    """
+    async def __makeRequest(self, trackerAddress: Tuple[str, int], buildRequest: Callable[[int, int], bytes], action: int,
+                            minResponseLength: int) -> bytes:
+        endpoint: UdpTrackerProtocol = await self.__getEndpoint(trackerAddress)
+        for retransmissionCount in range(self.MAX_RETRANSMISSIONS + 1):
+            timeout: float = self.BASE_RETRANSMISSION_TIMEOUT_IN_SECONDS * 2 ** retransmissionCount
+            try:
+                connectionId: int = await self.__getConnectionId(trackerAddress, endpoint, timeout)
+                transactionId: int = random.getrandbits(32)
+                return self.__checkResponse(await endpoint.exchange(buildRequest(connectionId, transactionId), transactionId, timeout),
+                                            action, minResponseLength)
+            except TimeoutError:
+                if retransmissionCount == self.MAX_RETRANSMISSIONS:
+                    raise
+        raise TimeoutError  # not reached
+
+    async def __getConnectionId(self, trackerAddress: Tuple[str, int], endpoint: UdpTrackerProtocol, timeout: float) -> int:
+        cachedConnectionId: Tuple[int, float] | None = self.__connectionIds.get(trackerAddress)
+        if cachedConnectionId is not None and cachedConnectionId[1] > time.monotonic():
+            return cachedConnectionId[0]
+        transactionId: int = random.getrandbits(32)
+        response: bytes = self.__checkResponse(
+            await endpoint.exchange(struct.pack(self.CONNECT_REQUEST_FORMAT, self.PROTOCOL_ID, self.CONNECT_ACTION, transactionId), transactionId, timeout),
+            self.CONNECT_ACTION, struct.calcsize(self.CONNECT_RESPONSE_FORMAT))
+        connectionId: int = struct.unpack_from(self.CONNECT_RESPONSE_FORMAT, response)[2]
+        self.__connectionIds[trackerAddress] = (connectionId, time.monotonic() + self.CONNECTION_ID_LIFETIME_IN_SECONDS)
+        return connectionId
+
+    """
+    @:raise ValueError - if the response is an error, is for another action, or is too short
+    """
+    def __checkResponse(self, response: bytes, action: int, minResponseLength: int) -> bytes:
+        responseAction: int = int.from_bytes(response[:4], "big")
+        if responseAction == self.ERROR_ACTION:
+            raise ValueError(f"The tracker answered with an error: {response[self.ERROR_MESSAGE_OFFSET:].decode('utf8', 'replace')}")
+        if responseAction != action or len(response) < minResponseLength:
+            raise ValueError(f"Malformed response from the tracker (action {responseAction}, {len(response)} bytes)")
+        return response
+
+    async def __getEndpoint(self, trackerAddress: Tuple[str, int]) -> UdpTrackerProtocol:
+        endpoint: UdpTrackerProtocol | None = self.__endpoints.get(trackerAddress)
+        if endpoint is None or endpoint.isClosed:
+            _, endpoint = await asyncio.get_running_loop().create_datagram_endpoint(UdpTrackerProtocol, remote_addr=trackerAddress)
+            self.__endpoints[trackerAddress] = endpoint
+        return endpoint
+
+    """
+    Closes the sockets of all the trackers
+    """
+    def close(self) -> None:
+        for endpoint in self.__endpoints.values():
+            endpoint.close()
+        self.__endpoints.clear()
@@ -0,0 +1,73 @@
+import asyncio
+import socket
+from typing import Dict, Final
+
+
+class UdpTrackerProtocol(asyncio.DatagramProtocol):
+    """
+    The datagram endpoint through which a UDP tracker is talked to: every request waits for the response with the same transaction ID,
+    so that several requests can be in flight on the same socket, and a late response to an abandoned request is dropped
+    """
+    TRANSACTION_ID_OFFSET: Final[int] = 4  # in every response, after the action
+    MIN_RESPONSE_LENGTH: Final[int] = 8  # the action and the transaction ID
+
+    def __init__(self):
+        self.__transport: asyncio.DatagramTransport | None = None
+        self.__isIPv6: bool = False
+        self.__pendingResponses: Dict[int, asyncio.Future[bytes]] = {}  # transaction ID -> response
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.__transport = transport
+        self.__isIPv6 = transport.get_extra_info("socket").family == socket.AF_INET6
+
+    def datagram_received(self, data: bytes, address: tuple) -> None:
+        if len(data) < self.MIN_RESPONSE_LENGTH:
+            return
+        transactionId: int = int.from_bytes(data[self.TRANSACTION_ID_OFFSET: self.TRANSACTION_ID_OFFSET + 4], "big")
+        pendingResponse: asyncio.Future[bytes] | None = self.__pendingResponses.pop(transactionId, None)
+        if pendingResponse is not None and not pendingResponse.done():
+            pendingResponse.set_result(data)
+
+    def error_received(self, error: OSError) -> None:
+        self.__failPendingResponses(error)
+
+    def connection_lost(self, error: Exception | None) -> None:
+        self.__failPendingResponses(error or ConnectionError("The UDP endpoint was closed"))
+
+    def __failPendingResponses(self, error: Exception) -> None:
+        for pendingResponse in self.__pendingResponses.values():
+            if not pendingResponse.done():
+                pendingResponse.set_exception(error)
+        self.__pendingResponses.clear()
+
+    """
+    Sends a request once and waits for its response
+    @:param transactionId - the transaction ID written in the request, which the response must have as well
+    @:raise TimeoutError - if no response arrives in time
+    @:raise OSError - if the request cannot be sent (e.g. the tracker is unreachable)
+    """
+    async def exchange(self, request: bytes, transactionId: int, timeout: float) -> bytes:
+        if self.__transport is None or self.__transport.is_closing():
+            raise ConnectionError("The UDP endpoint is closed")
+        pendingResponse: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+        self.__pendingResponses[transactionId] = pendingResponse
+        try:
+            self.__transport.sendto(request)
+            return await asyncio.wait_for(pendingResponse, timeout)
+        finally:
+            self.__pendingResponses.pop(transactionId, None)
+
+    def close(self) -> None:
+        if self.__transport is not None:
+            self.__transport.close()
+
+    """
+    Whether the tracker is reached over IPv6, in which case it gives IPv6 peers
+    """
+    @property
+    def isIPv6(self) -> bool:
+        return self.__isIPv6
+
+    @property
+    def isClosed(self) -> bool:
+        return self.__transport is None or self.__transport.is_closing()
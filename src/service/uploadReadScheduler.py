@@ -0,0 +1,116 @@
+import asyncio
+from typing import List, Dict, Final, Tuple, Set, Callable, Iterator
+from domain.block import Block
+from service.pieceReadCache import PieceReadCache
+from service.sessionMetrics import SessionMetrics
+from service.storage import Storage
+from service.torrentDiskLoader import TorrentDiskLoader
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+
+
+class UploadReadScheduler:
+    """
+    Reads the blocks of a batch of upload requests with as few disk reads as possible. The blocks are served from the piece read
+    cache; the pieces which are not cached are read in the order of their position in the torrent (which is also their order on
+    disk), and runs of adjacent pieces are merged into a single read, up to a limit. Every piece is read at most once per batch,
+    however many blocks of it were requested, and by however many peers; the pieces read are then cached.
+    The blocks of the verified pieces which are not written on disk yet are copied out of their buffers; those pieces are not cached,
+    so that the pieces being downloaded do not push the pieces being seeded out of the cache
+    @:param getUnwrittenPieceData - gives the data of a piece which is not written on disk yet, or None (see TorrentSaver)
+    """
+    MAX_MERGED_READ_LENGTH: Final[int] = 4 * 1024 * 1024
+
+    def __init__(self, scanner: TorrentMetaInfoScanner, storage: Storage, pieceReadCache: PieceReadCache, sessionMetrics: SessionMetrics,
+                 getUnwrittenPieceData: Callable[[int], memoryview | None]):
+        self.__scanner: TorrentMetaInfoScanner = scanner
+        self.__torrentDiskLoader: TorrentDiskLoader = TorrentDiskLoader(scanner, storage)
+        self.__pieceReadCache: PieceReadCache = pieceReadCache
+        self.__sessionMetrics: SessionMetrics = sessionMetrics
+        self.__getUnwrittenPieceData: Callable[[int], memoryview | None] = getUnwrittenPieceData
+
+    def __getPieceLength(self, pieceIndex: int) -> int:
+        if pieceIndex == self.__scanner.pieceCount - 1:
+            return self.__scanner.finalPieceLength
+        return self.__scanner.regularPieceLength
+
+    """
+    Groups pieces into runs of adjacent pieces, each of which is read at once
+    @:param pieceIndices - distinct piece indices, in ascending order
+    @:return the runs, as (first piece index, piece count)
+    """
+    def __groupAdjacentPieces(self, pieceIndices: List[int]) -> List[Tuple[int, int]]:
+        pieceRuns: List[Tuple[int, int]] = []
+        for pieceIndex in pieceIndices:
+            if pieceRuns:
+                firstPieceIndex, pieceCount = pieceRuns[-1]
+                if firstPieceIndex + pieceCount == pieceIndex and (pieceCount + 1) * self.__scanner.regularPieceLength <= self.MAX_MERGED_READ_LENGTH:
+                    pieceRuns[-1] = (firstPieceIndex, pieceCount + 1)
+                    continue
+            pieceRuns.append((pieceIndex, 1))
+        return pieceRuns
+
+    """
+    Reads runs of adjacent pieces; a run which cannot be read entirely is skipped, so that its blocks are read one by one.
+    This runs on a worker thread
+    @:return index -> data, for the pieces which were read
+    """
+    def __readPieceRuns(self, pieceRuns: List[Tuple[int, int]]) -> Dict[int, bytes | memoryview]:
+        pieces: Dict[int, bytes | memoryview] = {}
+        for firstPieceIndex, pieceCount in pieceRuns:
+            runData: bytes | memoryview = self.__torrentDiskLoader.getDataForPieces(firstPieceIndex, pieceCount)
+            if len(runData) != sum(self.__getPieceLength(firstPieceIndex + pieceOffset) for pieceOffset in range(pieceCount)):
+                continue
+            for pieceIndex in range(firstPieceIndex, firstPieceIndex + pieceCount):
+                runOffset: int = (pieceIndex - firstPieceIndex) * self.__scanner.regularPieceLength
+                # slicing bytes copies the piece out of the run, so that a cached piece does not keep the whole run in memory
+                pieces[pieceIndex] = runData[runOffset: runOffset + self.__getPieceLength(pieceIndex)]
+        return pieces
+
+    """
+    Reads the pieces which are not in memory, then the blocks of the pieces which could not be read whole; this runs on a worker
+    thread, so that the event loop keeps serving the peers while the disk seeks
+    @:return the pieces read, and the data of the blocks read one by one
+    """
+    def __readFromDisk(self, missingPieceIndices: Set[int], blocks: List[Block]) -> Tuple[Dict[int, bytes | memoryview], List[bytes | memoryview]]:
+        pieces: Dict[int, bytes | memoryview] = self.__readPieceRuns(self.__groupAdjacentPieces(sorted(missingPieceIndices)))
+        return pieces, [self.__torrentDiskLoader.getDataForBlock(block) for block in blocks
+                        if block.pieceIndex in missingPieceIndices and block.pieceIndex not in pieces]
+
+    """
+    The blocks whose pieces are in memory are taken on the event loop (the blocks of the pieces which are not written on disk yet
+    are copied right away, since their buffers can be reused as soon as the loop moves on); the rest are read on a worker thread.
+    A block counts as a cache hit only if its piece was in memory before the batch
+    @:param blocks - the requested blocks, in any order
+    @:return the data of every block, in the order of the blocks
+    """
+    async def readBlocks(self, blocks: List[Block]) -> List[bytes | memoryview]:
+        blocksData: List[bytes | memoryview | None] = [None] * len(blocks)
+        missingPieceIndices: Set[int] = set()
+        for blockIndex, block in enumerate(blocks):
+            pieceData: bytes | memoryview | None = None
+            if block.pieceIndex not in missingPieceIndices:
+                pieceData = self.__pieceReadCache.getPiece(block.pieceIndex)
+                if pieceData is None:
+                    unwrittenPieceData: memoryview | None = self.__getUnwrittenPieceData(block.pieceIndex)
+                    if unwrittenPieceData is not None:
+                        pieceData = unwrittenPieceData[block.beginOffset: block.beginOffset + block.length].tobytes()
+                        blocksData[blockIndex] = pieceData
+            self.__sessionMetrics.addPieceReadCacheLookup(pieceData is not None)
+            if pieceData is None:
+                missingPieceIndices.add(block.pieceIndex)
+            elif blocksData[blockIndex] is None:
+                blocksData[blockIndex] = memoryview(pieceData)[block.beginOffset: block.beginOffset + block.length]
+        if not missingPieceIndices:
+            return blocksData
+        pieces, unreadBlocksData = await asyncio.to_thread(self.__readFromDisk, missingPieceIndices, blocks)
+        for pieceIndex, pieceData in pieces.items():
+            self.__pieceReadCache.addPiece(pieceIndex, pieceData)
+        unreadBlocksDataIterator: Iterator[bytes | memoryview] = iter(unreadBlocksData)
+        for blockIndex, block in enumerate(blocks):
+            if blocksData[blockIndex] is not None:
+                continue
+            if block.pieceIndex in pieces:
+                blocksData[blockIndex] = memoryview(pieces[block.pieceIndex])[block.beginOffset: block.beginOffset + block.length]
+            else:
+                blocksData[blockIndex] = next(unreadBlocksDataIterator)
+        return blocksData
@@ -1,6 +1,6 @@
 import datetime
-from asyncio import StreamReader, StreamWriter
-from typing import Tuple, Final
+import ipaddress
+from typing import Final
 
 MESSAGE_ID_LENGTH: Final[int] = 1  # bytes
 HANDSHAKE_MESSAGE_LENGTH: Final[int] = 68  # bytes
@@ -26,7 +26,9 @@ def convertIPFromStringToInt(IP: str) -> int:
     return 256**3 * int(splitBytes[0]) + 256**2 * int(splitBytes[1]) + 256 * int(splitBytes[2]) + int(splitBytes[3])
 
 
-def convertIPFromIntToString(IP: int) -> str:
+def convertIPFromIntToString(IP: int, isIPv6: bool = False) -> str:
+    if isIPv6:
+        return str(ipaddress.IPv6Address(IP))
     firstOctet = (IP // 256 ** 3) % 256
     secondOctet = (IP // 256 ** 2) % 256
     thirdOctet = (IP // 256 ** 1) % 256
@@ -38,11 +40,6 @@ def convert4ByteBigEndianToInteger(byteValue: bytes) -> int:
     return int.from_bytes(byteValue, "big")
 
 
-async def closeConnection(readerWriterTuple: Tuple[StreamReader, StreamWriter]) -> None:
-    readerWriterTuple[1].close()
-    await readerWriterTuple[1].wait_closed()
-
-
 def prettyPrintSize(byteCount: float) -> str:
     RATIO: Final[int] = 1024
 
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import tempfile
+from typing import List, Final
+from bencode3 import bencode
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+
+
+class SyntheticTorrent:
+    """
+    A multi-file torrent with random content, created in a temporary folder, for the tests which work with real files.
+    The files are named file0, file1, ... inside the folder of the torrent; their content is only written on request
+    """
+    TORRENT_NAME: Final[str] = "torrent"
+
+    def __init__(self, pieceLength: int, fileLengths: List[int]):
+        self.__directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.__content: bytes = os.urandom(sum(fileLengths))
+        self.__pieceCount: int = -(-len(self.__content) // pieceLength)
+        info: dict = {"name": self.TORRENT_NAME, "piece length": pieceLength,
+                      "pieces": b"".join(hashlib.sha1(self.__content[pieceIndex * pieceLength: (pieceIndex + 1) * pieceLength]).digest()
+                                         for pieceIndex in range(self.__pieceCount)),
+                      "files": [{"path": [f"file{fileIndex}"], "length": fileLength} for fileIndex, fileLength in enumerate(fileLengths)]}
+        torrentFilePath: str = os.path.join(self.__directory.name, "test.torrent")
+        with open(torrentFilePath, "wb") as torrentFile:
+            torrentFile.write(bencode({"announce": "http://localhost/announce", "announce-list": [], "info": info}))
+        self.__scanner: TorrentMetaInfoScanner = TorrentMetaInfoScanner(torrentFilePath, self.__directory.name)
+
+    """
+    Writes the whole content of the torrent in its files, as if it was downloaded
+    """
+    def writeContent(self) -> None:
+        os.makedirs(os.path.dirname(self.__scanner.files[0].path), exist_ok=True)
+        fileStartOffset: int = 0
+        for file in self.__scanner.files:
+            with open(file.path, "wb") as contentFile:
+                contentFile.write(self.__content[fileStartOffset: fileStartOffset + file.length])
+            fileStartOffset += file.length
+
+    def cleanup(self) -> None:
+        self.__directory.cleanup()
+
+    """
+    The temporary folder, which holds the torrent file and the folder of the torrent
+    """
+    @property
+    def directory(self) -> str:
+        return self.__directory.name
+
+    @property
+    def content(self) -> bytes:
+        return self.__content
+
+    @property
+    def pieceCount(self) -> int:
+        return self.__pieceCount
+
+    @property
+    def scanner(self) -> TorrentMetaInfoScanner:
+        return self.__scanner
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from unittest import mock
+from typing import List, Final
+from domain.peer import Peer
+from domain.peerTable import PeerTable
+from service.announceScheduler import AnnounceScheduler
+
+
+class FakeTrackerConnection:
+    """
+    Records the announces, and answers them with the same peers, after a delay (none by default)
+    """
+    PEERS: Final[List[Peer]] = [Peer(0x0A000002, 6881)]
+
+    def __init__(self, announceInterval: float, minAnnounceInterval: float):
+        self.announceInterval: float = announceInterval
+        self.minAnnounceInterval: float = minAnnounceInterval
+        self.announcedEvents: List[str] = []
+        self.responseDelay: float = 0.0
+
+    async def announce(self, event: str = "") -> PeerTable | None:
+        self.announcedEvents.append(event)
+        await asyncio.sleep(self.responseDelay)
+        peerTable: PeerTable = PeerTable()
+        for peer in self.PEERS:
+            peerTable.addPeer(peer.IP, peer.port, peer.isIPv6)
+        return peerTable
+
+
+class TestAnnounceScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.__connectedPeerCount: int = 10
+        self.__foundPeers: List[List[Peer]] = []
+
+    async def __receivePeers(self, peerTable: PeerTable) -> None:
+        self.__foundPeers.append(list(peerTable))
+
+    def __createScheduler(self, trackerConnection: FakeTrackerConnection) -> AnnounceScheduler:
+        return AnnounceScheduler(trackerConnection, 5, lambda: self.__connectedPeerCount, self.__receivePeers)
+
+    async def test_start_IntervalElapses_AnnouncedAgainWithPeersPassedOn(self) -> None:
+        trackerConnection: FakeTrackerConnection = FakeTrackerConnection(0.05, 0.01)
+        scheduler: AnnounceScheduler = self.__createScheduler(trackerConnection)
+        scheduler.start()
+        await asyncio.sleep(0.13)
+        await scheduler.stop()
+        self.assertEqual(trackerConnection.announcedEvents, ["", "", "stopped"])
+        self.assertEqual(self.__foundPeers, [FakeTrackerConnection.PEERS] * 2)
+
+    async def test_notifyPeerDisconnected_TooFewPeers_AnnouncedAfterMinInterval(self) -> None:
+        trackerConnection: FakeTrackerConnection = FakeTrackerConnection(60.0, 0.05)
+        scheduler: AnnounceScheduler = self.__createScheduler(trackerConnection)
+        scheduler.start()
+        await asyncio.sleep(0.01)
+        self.assertEqual(trackerConnection.announcedEvents, [])
+        self.__connectedPeerCount = 4
+        scheduler.notifyPeerDisconnected()
+        await asyncio.sleep(0.02)
+        self.assertEqual(trackerConnection.announcedEvents, [])  # not before the min interval
+        await asyncio.sleep(0.05)
+        self.assertEqual(trackerConnection.announcedEvents, [""])
+        await scheduler.stop()
+
+    async def test_start_TrackersNotAnswering_AnnounceGivenUpAndMadeAgain(self) -> None:
+        trackerConnection: FakeTrackerConnection = FakeTrackerConnection(0.05, 0.01)
+        trackerConnection.responseDelay = 60.0
+        scheduler: AnnounceScheduler = self.__createScheduler(trackerConnection)
+        with mock.patch.object(AnnounceScheduler, "PERIODIC_ANNOUNCE_TIMEOUT_IN_SECONDS", 0.02):
+            scheduler.start()
+            await asyncio.sleep(0.13)
+        trackerConnection.responseDelay = 0.0
+        await scheduler.stop()
+        self.assertEqual(trackerConnection.announcedEvents, ["", "", "stopped"])
+        self.assertEqual(self.__foundPeers, [])
+
+    async def test_stop_NotStarted_NothingAnnounced(self) -> None:
+        trackerConnection: FakeTrackerConnection = FakeTrackerConnection(60.0, 30.0)
+        await self.__createScheduler(trackerConnection).stop()
+        self.assertEqual(trackerConnection.announcedEvents, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
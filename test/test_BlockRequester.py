@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from typing import Final, List
+from unittest.mock import patch
+from bitarray import bitarray
+import utils
+from domain.message.cancelMessage import CancelMessage
+from domain.peer import Peer
+from service.blockRequester import BlockRequester
+from service.cancelMessageBatcher import CancelMessageBatcher
+from service.pieceBufferPool import PieceBufferPool
+from service.piecePicker import PiecePicker
+from service.requestRegistry import RequestRegistry
+from service.sessionMetrics import SessionMetrics
+from service.torrentState import TorrentState
+
+
+class FakeTorrentMetaInfoScanner:
+    def __init__(self, totalContentSize: int):
+        self.torrentName: str = "torrent"
+        self.__totalContentSize: int = totalContentSize
+
+    def getTotalContentSize(self) -> int:
+        return self.__totalContentSize
+
+
+class FakePeerConnection:
+    """
+    Records what is written to the peer
+    """
+    def __init__(self):
+        self.writtenData: List[bytes] = []
+
+    def write(self, data: bytes) -> None:
+        self.writtenData.append(data)
+
+    async def drain(self) -> None:
+        pass
+
+
+class TestBlockRequester(unittest.IsolatedAsyncioTestCase):
+    PIECE_COUNT: Final[int] = 2
+    PIECE_LENGTH: Final[int] = utils.BLOCK_REQUEST_SIZE  # a single block per piece
+
+    async def asyncSetUp(self) -> None:
+        self.__torrentState: TorrentState = TorrentState(self.PIECE_COUNT, self.PIECE_LENGTH, self.PIECE_LENGTH,
+                                                         PieceBufferPool(self.PIECE_LENGTH, self.PIECE_COUNT))
+        self.__piecePicker: PiecePicker = PiecePicker(self.__torrentState)
+        self.__requestRegistry: RequestRegistry = RequestRegistry()
+        self.__sessionMetrics: SessionMetrics = SessionMetrics(FakeTorrentMetaInfoScanner(self.PIECE_COUNT * self.PIECE_LENGTH))
+        self.__blockRequester: BlockRequester = BlockRequester(self.__torrentState, self.__piecePicker, self.__requestRegistry,
+                                                               self.__sessionMetrics, CancelMessageBatcher())
+        self.__blockRequester.setDownloadedPieces([False] * self.PIECE_COUNT)
+        self.__requestTask: asyncio.Task = asyncio.create_task(self.__blockRequester.requestBlocks())
+
+    async def asyncTearDown(self) -> None:
+        self.__blockRequester.isDownloadPaused = True
+        await self.__requestTask
+
+    def __createPeer(self, port: int, availablePieces: str) -> Peer:
+        peer: Peer = Peer(1, port)
+        peer.availablePieces.extend(bitarray(availablePieces))
+        peer.connection = FakePeerConnection()
+        peer.isChokingMe = False
+        peer.amInterestedInIt = True
+        self.__piecePicker.addPeerPieces(peer)
+        return peer
+
+    @staticmethod
+    async def __runRequester() -> None:
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    async def test_requestBlocks_AllBlocksInFlight_BlocksRequestedFromAnotherPeer(self) -> None:
+        firstPeer: Peer = self.__createPeer(1, "11")
+        self.__blockRequester.setPeerList([firstPeer])
+        await self.__runRequester()
+        secondPeer: Peer = self.__createPeer(2, "11")
+        self.__blockRequester.setPeerList([firstPeer, secondPeer])
+        await self.__runRequester()
+        self.assertEqual(self.__sessionMetrics.endgameRequestCount, self.PIECE_COUNT)
+        self.assertEqual(self.__requestRegistry.getBlockRequestCount(0, 0), 2)
+
+    async def test_requestBlocks_PieceFailedInEndgame_NoMoreDuplicateRequests(self) -> None:
+        firstPeer: Peer = self.__createPeer(1, "11")
+        self.__blockRequester.setPeerList([firstPeer])
+        await self.__runRequester()
+        firstPeer.isChokingMe = True  # so that the failed piece cannot be requested again
+        self.__blockRequester.markPieceAsFailed(0)
+        secondPeer: Peer = self.__createPeer(2, "01")
+        self.__blockRequester.setPeerList([firstPeer, secondPeer])
+        await self.__runRequester()
+        self.assertEqual(self.__sessionMetrics.endgameRequestCount, 0)
+        self.assertEqual(secondPeer.connection.writtenData, [])
+
+    async def test_requestBlocks_SeveralWakeUpsInEndgame_CandidateBlocksCollectedOnce(self) -> None:
+        with patch.object(self.__requestRegistry, "getRequestedBlocks", wraps=self.__requestRegistry.getRequestedBlocks) as getRequestedBlocks:
+            firstPeer: Peer = self.__createPeer(1, "11")
+            self.__blockRequester.setPeerList([firstPeer])
+            await self.__runRequester()
+            secondPeer: Peer = self.__createPeer(2, "11")
+            for _ in range(3):
+                self.__blockRequester.setPeerList([firstPeer, secondPeer])
+                await self.__runRequester()
+        self.assertEqual(getRequestedBlocks.call_count, 1)  # when the endgame started; then, the candidates are kept up to date
+        self.assertEqual(self.__sessionMetrics.endgameRequestCount, self.PIECE_COUNT)
+
+    async def test_requestBlocks_PieceOwnedByNobody_NoEndgame(self) -> None:
+        firstPeer: Peer = self.__createPeer(1, "01")
+        self.__blockRequester.setPeerList([firstPeer])
+        await self.__runRequester()
+        secondPeer: Peer = self.__createPeer(2, "01")
+        self.__blockRequester.setPeerList([firstPeer, secondPeer])
+        await self.__runRequester()
+        self.assertEqual(self.__sessionMetrics.endgameRequestCount, 0)
+
+    async def test_requestBlocks_PeerSnubbing_RequestsCancelledAndMadeToAnotherPeer(self) -> None:
+        fakeTime: SimpleNamespace = SimpleNamespace(monotonic=lambda: 0.0)
+        with patch("service.blockRequester.time", fakeTime):
+            firstPeer: Peer = self.__createPeer(1, "10")
+            self.__blockRequester.setPeerList([firstPeer])
+            await self.__runRequester()
+            secondPeer: Peer = self.__createPeer(2, "10")
+            secondPeer.transferStatistics.registerBlockReceived(self.PIECE_LENGTH, None)  # so that it picks before the snubbed peer
+            fakeTime.monotonic = lambda: BlockRequester.SNUB_TIMEOUT_IN_SECONDS + 1.0
+            self.__blockRequester.setPeerList([firstPeer, secondPeer])
+            await self.__runRequester()
+        self.assertTrue(firstPeer.transferStatistics.isSnubbed)
+        self.assertIn(CancelMessage(0, 0, self.PIECE_LENGTH).getMessageContent(), firstPeer.connection.writtenData)
+        self.assertTrue(self.__requestRegistry.isBlockRequestedFromPeer(secondPeer, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from typing import Final, List
+from service.fileHandleCache import FileHandleCache
+
+
+class TestFileHandleCache(unittest.TestCase):
+    MAX_OPEN_FILE_COUNT: Final[int] = 2
+
+    def setUp(self) -> None:
+        self.__directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.__paths: List[str] = [os.path.join(self.__directory.name, f"file{fileIndex}") for fileIndex in range(3)]
+        self.__fileHandleCache: FileHandleCache = FileHandleCache(self.MAX_OPEN_FILE_COUNT)
+
+    def tearDown(self) -> None:
+        self.__fileHandleCache.closeAllFiles()
+        self.__directory.cleanup()
+
+    def test_writeFileSection_AtOffset_ReadBack(self) -> None:
+        self.assertEqual(self.__fileHandleCache.writeFileSection(self.__paths[0], 5, b"abc"), 3)
+        self.assertEqual(self.__fileHandleCache.readFileSection(self.__paths[0], 4, 10), b"\x00abc")
+
+    def test_writeFileSection_MoreFilesThanLimit_LeastRecentlyUsedClosed(self) -> None:
+        for path in self.__paths:
+            self.__fileHandleCache.writeFileSection(path, 0, path.encode())
+            self.assertLessEqual(self.__fileHandleCache.openFileCount, self.MAX_OPEN_FILE_COUNT)
+        for path in reversed(self.__paths):  # the first file was closed, so it is opened again
+            self.assertEqual(self.__fileHandleCache.readFileSection(path, 0, len(path)), path.encode())
+
+    def test_readFileSection_MissingFile_Error(self) -> None:
+        with self.assertRaises(OSError):
+            self.__fileHandleCache.readFileSection(self.__paths[0], 0, 1)
+        self.assertEqual(self.__fileHandleCache.openFileCount, 0)
+
+    def test_closeFiles_SomeFiles_OnlyThoseClosed(self) -> None:
+        for path in self.__paths[:2]:
+            self.__fileHandleCache.writeFileSection(path, 0, b"a")
+        self.__fileHandleCache.closeFiles([self.__paths[0]])
+        self.assertEqual(self.__fileHandleCache.openFileCount, 1)
+        self.assertEqual(self.__fileHandleCache.readFileSection(self.__paths[0], 0, 1), b"a")
+
+    def test_flush_CachedUncachedAndMissingFiles_OnlyCachedOnesKeptOpen(self) -> None:
+        for path in self.__paths[:2]:
+            self.__fileHandleCache.writeFileSection(path, 0, b"a")
+        self.__fileHandleCache.closeFiles([self.__paths[0]])
+        self.__fileHandleCache.flush(self.__paths)  # the third file does not exist
+        self.assertEqual(self.__fileHandleCache.openFileCount, 1)
+        self.assertFalse(os.path.exists(self.__paths[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
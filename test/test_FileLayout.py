@@ -0,0 +1,24 @@
+import unittest
+from domain.file import File
+from domain.fileLayout import FileLayout
+
+
+class TestFileLayout(unittest.TestCase):
+    def setUp(self) -> None:
+        self.__files = [File("a", 10), File("empty", 0), File("b", 5), File("c", 20)]
+        self.__fileLayout: FileLayout = FileLayout(self.__files)
+
+    def test_getFileSections_RangeInsideFile_OneSection(self) -> None:
+        self.assertEqual(self.__fileLayout.getFileSections(17, 5), [(self.__files[3], 2, 5)])
+
+    def test_getFileSections_RangeOverSeveralFiles_EmptyFileSkipped(self) -> None:
+        self.assertEqual(self.__fileLayout.getFileSections(8, 10), [(self.__files[0], 8, 2), (self.__files[2], 0, 5), (self.__files[3], 0, 3)])
+
+    def test_getFileSections_RangePastEnd_Truncated(self) -> None:
+        self.assertEqual(self.__fileLayout.totalLength, 35)
+        self.assertEqual(self.__fileLayout.getFileSections(30, 16), [(self.__files[3], 15, 5)])
+        self.assertEqual(self.__fileLayout.getFileSections(35, 16), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from typing import Final, List
+from service.mmapStorage import MmapStorage
+
+
+class TestMmapStorage(unittest.TestCase):
+    MAX_MAPPED_FILE_COUNT: Final[int] = 2
+
+    def setUp(self) -> None:
+        self.__directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.__paths: List[str] = [os.path.join(self.__directory.name, f"file{fileIndex}") for fileIndex in range(3)]
+        self.__mmapStorage: MmapStorage = MmapStorage(self.MAX_MAPPED_FILE_COUNT)
+
+    def tearDown(self) -> None:
+        self.__mmapStorage.closeAllFiles()
+        self.__directory.cleanup()
+
+    def test_writeFileSectionVector_SeveralBuffers_ReadBack(self) -> None:
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 2, [memoryview(b"ab"), memoryview(b"cde")], 7)
+        self.assertEqual(bytes(self.__mmapStorage.readFileSection(self.__paths[0], 0, 10)), b"\x00\x00abcde")
+        self.assertEqual(os.path.getsize(self.__paths[0]), 7)
+
+    def test_writeFileSectionVector_PastEndOfMapping_FileExtended(self) -> None:
+        self.__mmapStorage.allocateFile(self.__paths[0], 4, True)
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 0, [memoryview(b"abcd")], 8)
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 6, [memoryview(b"ef")], 8)
+        self.assertEqual(bytes(self.__mmapStorage.readFileSection(self.__paths[0], 0, 8)), b"abcd\x00\x00ef")
+
+    def test_writeFileSectionVector_SeveralWritesPastEnd_FileDoubledUpToFinalLength(self) -> None:
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 0, [memoryview(b"abcd")], 12)
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 4, [memoryview(b"ef")], 12)
+        self.assertEqual(os.path.getsize(self.__paths[0]), 8)
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 8, [memoryview(b"gh")], 12)
+        self.assertEqual(os.path.getsize(self.__paths[0]), 12)
+
+    def test_writeFileSectionVector_SparseFile_DiskSpaceNotAllocated(self) -> None:
+        FILE_LENGTH: Final[int] = 16 * 1024 * 1024
+
+        self.__mmapStorage.allocateFile(self.__paths[0], FILE_LENGTH, True)
+        self.__mmapStorage.writeFileSectionVector(self.__paths[0], 0, [memoryview(b"ab")], FILE_LENGTH)
+        self.__mmapStorage.closeAllFiles()
+        self.assertLess(os.stat(self.__paths[0]).st_blocks * 512, FILE_LENGTH)
+
+    def test_readFileSection_MoreFilesThanLimit_LeastRecentlyUsedUnmapped(self) -> None:
+        for path in self.__paths:
+            self.__mmapStorage.writeFileSectionVector(path, 0, [memoryview(path.encode())], len(path))
+            self.assertLessEqual(self.__mmapStorage.mappedFileCount, self.MAX_MAPPED_FILE_COUNT)
+        self.__mmapStorage.closeAllFiles()
+        for path in self.__paths:
+            self.assertEqual(bytes(self.__mmapStorage.readFileSection(path, 0, len(path))), path.encode())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from typing import List, Tuple, Final
+from domain.message.haveMessage import HaveMessage
+from domain.message.pieceMessage import PieceMessage
+from service.fileHandleCache import FileHandleCache
+from service.peerConnection import PeerConnection
+
+
+class TestPeerConnection(unittest.IsolatedAsyncioTestCase):
+    HANDSHAKE: Final[bytes] = b"\x13BitTorrent protocol" + bytes(48)
+
+    async def asyncSetUp(self) -> None:
+        self.__receivedMessages: List[Tuple[int, bytes | memoryview]] = []
+        self.__connection: PeerConnection = PeerConnection(lambda messageID, payload: self.__receivedMessages.append((messageID, payload)))
+
+    def __feed(self, data: bytes, chunkLength: int) -> None:
+        position: int = 0
+        while position < len(data):
+            buffer: memoryview = self.__connection.get_buffer(-1)
+            receivedLength: int = min(chunkLength, len(buffer), len(data) - position)
+            buffer[: receivedLength] = data[position: position + receivedLength]
+            self.__connection.buffer_updated(receivedLength)
+            position += receivedLength
+
+    async def test_receiveHandshake_HandshakeSplitAcrossReads_CorrectHandshake(self) -> None:
+        self.__feed(self.HANDSHAKE, 7)
+        self.assertEqual(await self.__connection.receiveHandshake(), self.HANDSHAKE)
+
+    async def test_bufferUpdated_ShortMessagesInSingleRead_AllMessagesReceived(self) -> None:
+        self.__feed(self.HANDSHAKE + HaveMessage(3).getMessageContent() + b"\x00\x00\x00\x00" + HaveMessage(5).getMessageContent(), 1000)
+        self.assertEqual(self.__receivedMessages, [(HaveMessage.MESSAGE_ID, b"\x00\x00\x00\x03"), (HaveMessage.MESSAGE_ID, b"\x00\x00\x00\x05")])
+
+    async def test_bufferUpdated_PieceMessageSplitAcrossReads_BlockReceivedAsMemoryView(self) -> None:
+        block: bytes = bytes(range(256)) * 64
+        self.__feed(self.HANDSHAKE + PieceMessage(2, 16384, block).getMessageContent() + HaveMessage(1).getMessageContent(), 1500)
+        self.assertEqual(len(self.__receivedMessages), 2)
+        messageID, payload = self.__receivedMessages[0]
+        self.assertEqual(messageID, PieceMessage.MESSAGE_ID)
+        self.assertIsInstance(payload, memoryview)
+        self.assertEqual(bytes(payload), b"\x00\x00\x00\x02\x00\x00\x40\x00" + block)
+        self.assertEqual(self.__receivedMessages[1], (HaveMessage.MESSAGE_ID, b"\x00\x00\x00\x01"))
+
+    async def test_sendFileSection_FileHandleCache_HeaderFollowedBySection(self) -> None:
+        content: bytes = os.urandom(100000)
+        receivedData: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+
+        async def receiveAll(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            receivedData.set_result(await reader.read())
+            writer.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "file")
+            with open(path, "wb") as file:
+                file.write(content)
+            fileHandleCache: FileHandleCache = FileHandleCache(1)
+            server: asyncio.Server = await asyncio.start_server(receiveAll, "127.0.0.1", 0)
+            _, connection = await asyncio.get_running_loop().create_connection(lambda: PeerConnection(lambda messageID, payload: None),
+                                                                               "127.0.0.1", server.sockets[0].getsockname()[1])
+            self.assertTrue(await connection.sendFileSection(b"header", fileHandleCache, path, 1000, FileHandleCache.MAX_SEND_LENGTH))
+            self.assertFalse(await connection.sendFileSection(b"header", fileHandleCache, path, 90000, 50000))  # past the end of the file
+            # too long to be read on the event loop
+            self.assertFalse(await connection.sendFileSection(b"header", fileHandleCache, path, 0, FileHandleCache.MAX_SEND_LENGTH + 1))
+            connection.close()
+            self.assertEqual(await receivedData, b"header" + content[1000: 1000 + FileHandleCache.MAX_SEND_LENGTH])
+            fileHandleCache.closeAllFiles()
+            server.close()
+            await server.wait_closed()
+
+    async def test_resumeReading_PausedTwice_ReadingResumedOnlyByLastResume(self) -> None:
+        server: asyncio.Server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        transport, connection = await asyncio.get_running_loop().create_connection(lambda: PeerConnection(lambda messageID, payload: None),
+                                                                                   "127.0.0.1", server.sockets[0].getsockname()[1])
+        connection.pauseReading()
+        connection.pauseReading()
+        connection.resumeReading()
+        self.assertFalse(transport.is_reading())
+        connection.resumeReading()
+        self.assertTrue(transport.is_reading())
+        connection.close()
+        server.close()
+        await server.wait_closed()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from domain.peer import Peer
+from domain.peerTable import PeerTable
+
+
+class TestPeerTable(unittest.TestCase):
+    def test_addCompactIPv4Peers_TrailingPartialEntry_Ignored(self) -> None:
+        peerTable: PeerTable = PeerTable()
+        peerTable.addCompactIPv4Peers(b"\x0a\x00\x00\x02\x1a\xe1\xff\xff\xff\xff\xff\xff\x0a\x00")
+        self.assertEqual(list(peerTable), [Peer(0x0A000002, 6881), Peer(0xFFFFFFFF, 65535)])
+
+    def test_merge_SamePeersInSeveralTables_EachPeerOnceInOrder(self) -> None:
+        firstPeerTable: PeerTable = PeerTable()
+        firstPeerTable.addCompactIPv4Peers(b"\x0a\x00\x00\x02\x1a\xe1\x0a\x00\x00\x03\x1a\xe1")
+        secondPeerTable: PeerTable = PeerTable()
+        secondPeerTable.addCompactIPv4Peers(b"\x0a\x00\x00\x03\x1a\xe1\x0a\x00\x00\x02\x1a\xe2")
+        secondPeerTable.addCompactIPv6Peers(bytes(15) + b"\x01\x1a\xe1")
+        self.assertEqual(list(PeerTable.merge([firstPeerTable, secondPeerTable])),
+                         [Peer(0x0A000002, 6881), Peer(0x0A000003, 6881), Peer(0x0A000002, 6882), Peer(1, 6881, True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import utils
+from domain.peerTransferStatistics import PeerTransferStatistics
+
+
+class TestPeerTransferStatistics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.__transferStatistics: PeerTransferStatistics = PeerTransferStatistics()
+
+    def test_requestTimeout_NoRoundTripTimeYet_DefaultTimeout(self) -> None:
+        self.assertEqual(self.__transferStatistics.requestTimeout, PeerTransferStatistics.DEFAULT_REQUEST_TIMEOUT_IN_SECONDS)
+
+    def test_requestTimeout_SteadyRoundTripTime_MinTimeout(self) -> None:
+        for _ in range(50):
+            self.__transferStatistics.registerBlockReceived(utils.BLOCK_REQUEST_SIZE, 0.1)
+        self.assertEqual(self.__transferStatistics.requestTimeout, PeerTransferStatistics.MIN_REQUEST_TIMEOUT_IN_SECONDS)
+
+    def test_requestTimeout_SlowAndVaryingRoundTripTime_LongerTimeout(self) -> None:
+        for roundTripTime in [2.0, 6.0] * 10:
+            self.__transferStatistics.registerBlockReceived(utils.BLOCK_REQUEST_SIZE, roundTripTime)
+        self.assertGreater(self.__transferStatistics.requestTimeout, 6.0)
+
+    def test_registerBlockReceived_SnubbedPeer_NoLongerSnubbed(self) -> None:
+        self.__transferStatistics.markAsSnubbed()
+        self.assertEqual(self.__transferStatistics.requestPipelineDepth, PeerTransferStatistics.SNUBBED_REQUEST_PIPELINE_DEPTH)
+        self.__transferStatistics.registerBlockReceived(utils.BLOCK_REQUEST_SIZE, 0.1)
+        self.assertFalse(self.__transferStatistics.isSnubbed)
+
+
+if __name__ == '__main__':
+    unittest.main()
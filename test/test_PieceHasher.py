@@ -0,0 +1,44 @@
+import asyncio
+import hashlib
+import unittest
+from asyncio import Future
+from typing import Final, List
+import utils
+from domain.piece import Piece
+from service.pieceGenerator import PieceGenerator
+from service.pieceHasher import PieceHasher
+
+
+class TestPieceHasher(unittest.IsolatedAsyncioTestCase):
+    PIECE_COUNT: Final[int] = 3
+    PIECE_LENGTH: Final[int] = 4 * utils.BLOCK_REQUEST_SIZE
+
+    def setUp(self) -> None:
+        self.__pieceHasher: PieceHasher = PieceHasher(1, 1)
+        pieceGenerator: PieceGenerator = PieceGenerator(self.PIECE_COUNT, self.PIECE_LENGTH, self.PIECE_LENGTH)
+        self.__pieces: List[Piece] = [pieceGenerator.generatePiece(pieceIndex, bytearray(self.PIECE_LENGTH)) for pieceIndex in range(self.PIECE_COUNT)]
+        for piece in self.__pieces:
+            for block in reversed(piece.blocks):
+                piece.writeDataToBlock(block.beginOffset, bytes([piece.index]) * block.length)
+
+    def tearDown(self) -> None:
+        self.__pieceHasher.shutdown()
+
+    async def test_submitPiece_CompletePiece_HashOfPiece(self) -> None:
+        infoHash: Future[bytes] = self.__pieceHasher.submitPiece(self.__pieces[1])
+        self.assertEqual(await infoHash, hashlib.sha1(bytes([1]) * self.PIECE_LENGTH).digest())
+
+    async def test_submitPiece_QueueFull_NoRoomUntilPendingPieceHashed(self) -> None:
+        firstInfoHash: Future[bytes] = self.__pieceHasher.submitPiece(self.__pieces[0])
+        self.assertFalse(self.__pieceHasher.hasRoom)
+        roomWait: asyncio.Task = asyncio.create_task(self.__pieceHasher.waitForRoom())
+        await asyncio.sleep(0)
+        self.assertFalse(roomWait.done())
+        await firstInfoHash
+        await asyncio.wait_for(roomWait, 1.0)
+        self.assertTrue(self.__pieceHasher.hasRoom)
+        self.assertEqual(self.__pieceHasher.pendingPieceCount, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
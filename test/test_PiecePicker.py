@@ -0,0 +1,98 @@
+import unittest
+from typing import Final
+from bitarray import bitarray
+import utils
+from domain.block import Block
+from domain.peer import Peer
+from service.pieceBufferPool import PieceBufferPool
+from service.piecePicker import PiecePicker
+from service.torrentState import TorrentState
+
+
+class TestPiecePicker(unittest.TestCase):
+    PIECE_COUNT: Final[int] = 8
+    BLOCKS_IN_PIECE: Final[int] = 2
+
+    def setUp(self) -> None:
+        pieceLength: int = self.BLOCKS_IN_PIECE * utils.BLOCK_REQUEST_SIZE
+        self.__piecePicker: PiecePicker = PiecePicker(TorrentState(self.PIECE_COUNT, pieceLength, pieceLength,
+                                                                   PieceBufferPool(pieceLength, self.PIECE_COUNT)))
+        self.__piecePicker.setDownloadedPieces(bitarray(self.PIECE_COUNT * "0"))
+        self.__seed: Peer = self.__createPeer(1, self.PIECE_COUNT * "1")
+
+    @staticmethod
+    def __createPeer(port: int, availablePieces: str) -> Peer:
+        peer: Peer = Peer(1, port)
+        peer.availablePieces.extend(bitarray(availablePieces))
+        return peer
+
+    def test_pickBlock_OnePieceOwnedBySinglePeer_RarestPieceFirst(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        self.__piecePicker.addPeerPieces(self.__createPeer(2, "11111011"))
+        self.assertEqual(self.__piecePicker.pickBlock(self.__seed.availablePieces).pieceIndex, 5)
+
+    def test_pickBlock_PieceInProgress_RemainingBlocksOfPieceFirst(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        firstBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces)
+        secondBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces)
+        self.assertEqual((firstBlock.pieceIndex, firstBlock.beginOffset), (secondBlock.pieceIndex, 0))
+        self.assertEqual(secondBlock.beginOffset, utils.BLOCK_REQUEST_SIZE)
+
+    def test_pickBlock_PeerWithoutNeededPieces_NoBlock(self) -> None:
+        peer: Peer = self.__createPeer(2, "11110000")
+        self.__piecePicker.addPeerPieces(peer)
+        self.__piecePicker.setDownloadedPieces(bitarray("11110000"))
+        self.assertIsNone(self.__piecePicker.pickBlock(peer.availablePieces))
+
+    def test_releaseBlock_RequestTimedOut_BlockPickedAgain(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        [self.__piecePicker.pickBlock(self.__seed.availablePieces) for _ in range(self.PIECE_COUNT * self.BLOCKS_IN_PIECE)]
+        self.assertIsNone(self.__piecePicker.pickBlock(self.__seed.availablePieces))
+        self.__piecePicker.releaseBlock(3, utils.BLOCK_REQUEST_SIZE)
+        releasedBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces)
+        self.assertEqual((releasedBlock.pieceIndex, releasedBlock.beginOffset), (3, utils.BLOCK_REQUEST_SIZE))
+
+    def test_removePeerPieces_PeerDisconnected_PiecesNoLongerPicked(self) -> None:
+        peer: Peer = self.__createPeer(2, "00000001")
+        self.__piecePicker.addPeerPieces(peer)
+        self.__piecePicker.removePeerPieces(peer)
+        self.assertIsNone(self.__piecePicker.pickBlock(peer.availablePieces))
+
+    def test_addPeerPiece_PeerCompletesTorrent_CountedAsSeed(self) -> None:
+        peer: Peer = self.__createPeer(2, "11111110")
+        self.__piecePicker.addPeerPieces(peer)
+        self.__piecePicker.addPeerPieces(self.__createPeer(3, "01111111"))
+        peer.availablePieces[7] = True
+        self.__piecePicker.addPeerPiece(peer, 7)
+        self.__piecePicker.removePeerPieces(peer)
+        self.assertIsNone(self.__piecePicker.pickBlock(bitarray("10000000")))
+        self.assertEqual(self.__piecePicker.pickBlock(bitarray("01000000")).pieceIndex, 1)
+
+    def test_hasUnrequestedBlocks_AllBlocksPicked_False(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        self.assertTrue(self.__piecePicker.hasUnrequestedBlocks)
+        [self.__piecePicker.pickBlock(self.__seed.availablePieces) for _ in range(self.PIECE_COUNT * self.BLOCKS_IN_PIECE)]
+        self.assertFalse(self.__piecePicker.hasUnrequestedBlocks)
+
+    def test_hasUnrequestedBlocks_PieceOwnedByNobody_True(self) -> None:
+        peer: Peer = self.__createPeer(2, "11111110")
+        self.__piecePicker.addPeerPieces(peer)
+        [self.__piecePicker.pickBlock(peer.availablePieces) for _ in range((self.PIECE_COUNT - 1) * self.BLOCKS_IN_PIECE)]
+        self.assertIsNone(self.__piecePicker.pickBlock(peer.availablePieces))
+        self.assertTrue(self.__piecePicker.hasUnrequestedBlocks)
+
+    def test_pickBlock_FastPeer_NewPieceInsteadOfPieceStartedBySlowPeer(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        slowPeerBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces)
+        fastPeerBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces, self.__seed)
+        self.assertNotEqual(fastPeerBlock.pieceIndex, slowPeerBlock.pieceIndex)
+        self.assertEqual(self.__piecePicker.pickBlock(self.__seed.availablePieces, self.__seed).pieceIndex, fastPeerBlock.pieceIndex)
+
+    def test_pickBlock_SlowPeer_PieceStartedByFastPeerAvoided(self) -> None:
+        self.__piecePicker.addPeerPieces(self.__seed)
+        fastPeerBlock: Block = self.__piecePicker.pickBlock(self.__seed.availablePieces, self.__seed)
+        self.assertNotEqual(self.__piecePicker.pickBlock(self.__seed.availablePieces).pieceIndex, fastPeerBlock.pieceIndex)
+
+
+if __name__ == '__main__':
+    unittest.main()
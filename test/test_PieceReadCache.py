@@ -0,0 +1,37 @@
+import unittest
+from typing import Final
+from service.pieceReadCache import PieceReadCache
+
+
+class TestPieceReadCache(unittest.TestCase):
+    PIECE_LENGTH: Final[int] = 100
+    MAX_PIECE_COUNT: Final[int] = 2
+
+    def setUp(self) -> None:
+        self.__pieceReadCache: PieceReadCache = PieceReadCache(self.MAX_PIECE_COUNT * self.PIECE_LENGTH)
+
+    def test_addPiece_MorePiecesThanBudget_LeastRecentlyUsedDropped(self) -> None:
+        for pieceIndex in range(self.MAX_PIECE_COUNT):
+            self.__pieceReadCache.addPiece(pieceIndex, bytes([pieceIndex]) * self.PIECE_LENGTH)
+        self.assertIsNotNone(self.__pieceReadCache.getPiece(0))  # piece 1 becomes the least recently used
+        self.__pieceReadCache.addPiece(self.MAX_PIECE_COUNT, bytes(self.PIECE_LENGTH))
+        self.assertIsNone(self.__pieceReadCache.getPiece(1))
+        self.assertEqual(self.__pieceReadCache.getPiece(0), bytes([0]) * self.PIECE_LENGTH)
+        self.assertEqual(self.__pieceReadCache.cachedByteCount, self.MAX_PIECE_COUNT * self.PIECE_LENGTH)
+
+    def test_addPiece_SamePieceTwice_Replaced(self) -> None:
+        self.__pieceReadCache.addPiece(0, b"a" * self.PIECE_LENGTH)
+        self.__pieceReadCache.addPiece(0, b"b" * self.PIECE_LENGTH)
+        self.assertEqual(self.__pieceReadCache.getPiece(0), b"b" * self.PIECE_LENGTH)
+        self.assertEqual(self.__pieceReadCache.cachedPieceCount, 1)
+        self.assertEqual(self.__pieceReadCache.cachedByteCount, self.PIECE_LENGTH)
+
+    def test_addPiece_LargerThanBudget_NotCached(self) -> None:
+        self.__pieceReadCache.addPiece(0, bytes(self.PIECE_LENGTH))
+        self.__pieceReadCache.addPiece(1, bytes((self.MAX_PIECE_COUNT + 1) * self.PIECE_LENGTH))
+        self.assertIsNone(self.__pieceReadCache.getPiece(1))
+        self.assertIsNotNone(self.__pieceReadCache.getPiece(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import unittest
+from unittest import mock
+from typing import List, Final
+from domain.peer import Peer
+from domain.peerTable import PeerTable
+from service.fileHandleCache import FileHandleCache
+from service.processSingleTorrent import ProcessSingleTorrent
+from service.trackerConnection import TrackerConnection
+from syntheticTorrent import SyntheticTorrent
+
+
+class TestProcessSingleTorrent(unittest.TestCase):
+    ANNOUNCED_PEER: Final[Peer] = Peer(0x0A000002, 6881)
+
+    def setUp(self) -> None:
+        self.__torrent: SyntheticTorrent = SyntheticTorrent(16384, [50000])
+        self.__fileHandleCache: FileHandleCache = FileHandleCache(4)
+        self.__downloadPeers: List[List[Peer]] = []
+
+    def tearDown(self) -> None:
+        self.__fileHandleCache.closeAllFiles()
+        self.__torrent.cleanup()
+
+    @staticmethod
+    def __createPeerTable(peers: List[Peer]) -> PeerTable:
+        peerTable: PeerTable = PeerTable()
+        for peer in peers:
+            peerTable.addPeer(peer.IP, peer.port, peer.isIPv6)
+        return peerTable
+
+    def test_run_NoPeersOnStartedAnnounce_DownloadStartedWithPeersOfPeriodicAnnounce(self) -> None:
+        processSingleTorrent: ProcessSingleTorrent = ProcessSingleTorrent(os.path.join(self.__torrent.directory, "test.torrent"),
+                                                                          self.__torrent.directory,
+                                                                          {FileHandleCache.BACKEND_NAME: self.__fileHandleCache})
+
+        async def startDownload(processor: ProcessSingleTorrent) -> None:
+            self.__downloadPeers.append(list(processor._ProcessSingleTorrent__peerList))
+            await processor._ProcessSingleTorrent__announceScheduler.stop()
+
+        async def handshakeWithPeer(processor: ProcessSingleTorrent, otherPeer: Peer) -> bool:
+            return True
+
+        with mock.patch.object(TrackerConnection, "makeTrackerStartedRequest", mock.AsyncMock(return_value=(PeerTable(), 6881))), \
+                mock.patch.object(TrackerConnection, "announce", mock.AsyncMock(return_value=self.__createPeerTable([self.ANNOUNCED_PEER]))), \
+                mock.patch.object(TrackerConnection, "minAnnounceInterval", new_callable=mock.PropertyMock, return_value=0.05), \
+                mock.patch.object(ProcessSingleTorrent, "_ProcessSingleTorrent__startTorrentDownload", startDownload), \
+                mock.patch.object(ProcessSingleTorrent, "_ProcessSingleTorrent__attemptToHandshakeWithPeer", handshakeWithPeer), \
+                mock.patch("asyncio.WindowsSelectorEventLoopPolicy", create=True), mock.patch("asyncio.set_event_loop_policy"):
+            processSingleTorrent.run()
+        self.assertEqual(self.__downloadPeers, [[self.ANNOUNCED_PEER]])
+
+
+if __name__ == '__main__':
+    unittest.main()
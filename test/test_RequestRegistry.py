@@ -0,0 +1,47 @@
+import unittest
+from typing import Final
+import utils
+from domain.block import Block
+from domain.peer import Peer
+from service.requestRegistry import RequestRegistry
+
+
+class TestRequestRegistry(unittest.TestCase):
+    PIECE_INDEX: Final[int] = 3
+
+    def setUp(self) -> None:
+        self.__requestRegistry: RequestRegistry = RequestRegistry()
+        self.__firstPeer: Peer = Peer(1, 1)
+        self.__secondPeer: Peer = Peer(1, 2)
+        self.__firstBlock: Block = Block(self.PIECE_INDEX, 0, utils.BLOCK_REQUEST_SIZE)
+        self.__secondBlock: Block = Block(self.PIECE_INDEX, utils.BLOCK_REQUEST_SIZE, utils.BLOCK_REQUEST_SIZE)
+
+    def test_removeRequest_BlockRequestedFromPeer_RequestTimeReturned(self) -> None:
+        self.__requestRegistry.addRequest(self.__firstPeer, self.__firstBlock, 10.0)
+        self.assertEqual(self.__requestRegistry.removeRequest(self.__firstPeer, self.PIECE_INDEX, 0), 10.0)
+        self.assertIsNone(self.__requestRegistry.removeRequest(self.__firstPeer, self.PIECE_INDEX, 0))
+        self.assertFalse(self.__requestRegistry.isBlockRequested(self.PIECE_INDEX, 0))
+
+    def test_removeBlockRequests_BlockRequestedFromTwoPeers_BothPeersReturned(self) -> None:
+        self.__requestRegistry.addRequest(self.__firstPeer, self.__firstBlock, 10.0)
+        self.__requestRegistry.addRequest(self.__secondPeer, self.__firstBlock, 11.0)
+        self.assertEqual(self.__requestRegistry.removeBlockRequests(self.PIECE_INDEX, 0), {self.__firstPeer, self.__secondPeer})
+        self.assertEqual(self.__requestRegistry.getRequestCount(self.__firstPeer), 0)
+        self.assertEqual(self.__requestRegistry.getRequestCount(self.__secondPeer), 0)
+
+    def test_removeRequestsMadeBefore_OneExpiredRequest_OnlyExpiredRequestRemoved(self) -> None:
+        self.__requestRegistry.addRequest(self.__firstPeer, self.__firstBlock, 10.0)
+        self.__requestRegistry.addRequest(self.__firstPeer, self.__secondBlock, 20.0)
+        self.assertEqual(self.__requestRegistry.removeRequestsMadeBefore(self.__firstPeer, 15.0), [self.__firstBlock])
+        self.assertEqual(self.__requestRegistry.getOldestRequestTime(self.__firstPeer), 20.0)
+
+    def test_removePeerRequests_BlockAlsoRequestedFromOtherPeer_BlockStillRequested(self) -> None:
+        self.__requestRegistry.addRequest(self.__firstPeer, self.__firstBlock, 10.0)
+        self.__requestRegistry.addRequest(self.__secondPeer, self.__firstBlock, 11.0)
+        self.assertEqual(self.__requestRegistry.removePeerRequests(self.__firstPeer), [self.__firstBlock])
+        self.assertTrue(self.__requestRegistry.isBlockRequestedFromPeer(self.__secondPeer, self.PIECE_INDEX, 0))
+        self.assertFalse(self.__requestRegistry.isBlockRequestedFromPeer(self.__firstPeer, self.PIECE_INDEX, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+from typing import Final, List
+from bitarray import bitarray
+import utils
+from domain.resumeData import ResumeData
+from service.resumeDataStore import ResumeDataStore
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from syntheticTorrent import SyntheticTorrent
+
+
+class TestResumeDataStore(unittest.TestCase):
+    PIECE_LENGTH: Final[int] = 2 * utils.BLOCK_REQUEST_SIZE
+    FILE_LENGTHS: Final[List[int]] = [PIECE_LENGTH + 100, 2 * PIECE_LENGTH - 200]  # the second piece spans both files
+
+    def setUp(self) -> None:
+        self.__torrent: SyntheticTorrent = SyntheticTorrent(self.PIECE_LENGTH, self.FILE_LENGTHS)
+        self.__torrent.writeContent()
+        self.__scanner: TorrentMetaInfoScanner = self.__torrent.scanner
+        self.__resumeDataStore: ResumeDataStore = ResumeDataStore(self.__scanner, os.path.join(self.__torrent.directory, "resume"))
+
+    def tearDown(self) -> None:
+        self.__torrent.cleanup()
+
+    def test_load_SavedState_SameStateAndNothingToRecheck(self) -> None:
+        partialPieces: List = [(2, bitarray("01"), bytes([7]) * utils.BLOCK_REQUEST_SIZE)]
+        self.__resumeDataStore.save(bitarray("110"), partialPieces)
+        resumeData: ResumeData = self.__resumeDataStore.load()
+        self.assertEqual(resumeData.infoHash, self.__scanner.infoHash)
+        self.assertEqual(resumeData.downloadedPieces, bitarray("110"))
+        self.assertEqual(resumeData.partialPieces, partialPieces)
+        self.assertEqual(self.__resumeDataStore.getPiecesToRecheck(resumeData), [])
+
+    def test_getPiecesToRecheck_SecondFileModified_ItsDownloadedPiecesRechecked(self) -> None:
+        self.__resumeDataStore.save(bitarray("111"), [])
+        secondFileStatus: os.stat_result = os.stat(self.__scanner.files[1].path)
+        os.utime(self.__scanner.files[1].path, ns=(secondFileStatus.st_atime_ns, secondFileStatus.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(self.__resumeDataStore.getPiecesToRecheck(self.__resumeDataStore.load()), [1, 2])
+
+    def test_load_DamagedResumeData_NoResumeData(self) -> None:
+        self.__resumeDataStore.save(bitarray("111"), [])
+        resumeDataPath: str = os.path.join(self.__torrent.directory, "resume", self.__scanner.infoHash.hex() + ResumeDataStore.FILE_EXTENSION)
+        with open(resumeDataPath, "r+b") as resumeDataFile:
+            resumeDataFile.seek(30)
+            resumeDataFile.write(b"\xff")
+        self.assertIsNone(self.__resumeDataStore.load())
+
+
+if __name__ == '__main__':
+    unittest.main()
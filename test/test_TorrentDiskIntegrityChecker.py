@@ -0,0 +1,59 @@
+import os
+import unittest
+from typing import Final, List
+from unittest.mock import patch
+import utils
+from domain.file import File
+from service.fileHandleCache import FileHandleCache
+from service.torrentDiskIntegrityChecker import TorrentDiskIntegrityChecker
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from syntheticTorrent import SyntheticTorrent
+
+
+class TestTorrentDiskIntegrityChecker(unittest.IsolatedAsyncioTestCase):
+    PIECE_LENGTH: Final[int] = 2 * utils.BLOCK_REQUEST_SIZE
+    FILE_LENGTHS: Final[List[int]] = [3 * PIECE_LENGTH + 100, PIECE_LENGTH, 2 * PIECE_LENGTH - 200]  # pieces 3 and 4 span two files
+
+    async def asyncSetUp(self) -> None:
+        self.__torrent: SyntheticTorrent = SyntheticTorrent(self.PIECE_LENGTH, self.FILE_LENGTHS)
+        self.__torrent.writeContent()
+        self.__scanner: TorrentMetaInfoScanner = self.__torrent.scanner
+        self.__fileHandleCache: FileHandleCache = FileHandleCache(4)
+        self.__integrityChecker: TorrentDiskIntegrityChecker = TorrentDiskIntegrityChecker(self.__scanner, self.__fileHandleCache, 2)
+
+    async def asyncTearDown(self) -> None:
+        self.__fileHandleCache.closeAllFiles()
+        self.__torrent.cleanup()
+
+    async def test_getPiecesWrittenOnDisk_SecondFileMissingAndPieceCorrupted_OnlyIntactPieces(self) -> None:
+        os.remove(self.__scanner.files[1].path)
+        with open(self.__scanner.files[0].path, "r+b") as contentFile:
+            contentFile.write(b"\x00" * 10)
+        self.assertEqual(self.__integrityChecker.getPiecesWrittenOnDisk(), [False, True, True, False, False, True])
+
+    async def test_checkPieces_AllPiecesOnDisk_EveryPieceReportedOnce(self) -> None:
+        checkedPieces: dict = {}
+        await self.__integrityChecker.checkPieces([5, 0, 3, 4], lambda pieceIndices, results: checkedPieces.update(zip(pieceIndices, results)))
+        self.assertEqual(checkedPieces, {0: True, 3: True, 4: True, 5: True})
+
+    async def test_getPiecesWrittenOnDisk_HoleBetweenWrittenPiecesOfRun_OnlyPieceInHoleMissing(self) -> None:
+        firstFile: File = self.__scanner.files[0]
+        os.remove(firstFile.path)
+        with open(firstFile.path, "wb") as contentFile:
+            contentFile.truncate(firstFile.length)  # allocated, then pieces 0 and 2 written, piece 1 not yet
+            contentFile.write(self.__torrent.content[: self.PIECE_LENGTH])
+            contentFile.seek(2 * self.PIECE_LENGTH)
+            contentFile.write(self.__torrent.content[2 * self.PIECE_LENGTH: firstFile.length])
+        self.assertEqual(self.__integrityChecker.getPiecesWrittenOnDisk(), [True, False, True, True, True, True])
+
+    async def test_getPiecesWrittenOnDisk_SparseFileNotWritten_FileNotRead(self) -> None:
+        os.remove(self.__scanner.files[2].path)
+        with open(self.__scanner.files[2].path, "wb") as contentFile:
+            contentFile.truncate(self.FILE_LENGTHS[2])  # allocated with its final length, but nothing written yet
+        with patch.object(self.__fileHandleCache, "readFileSection", wraps=self.__fileHandleCache.readFileSection) as readFileSection:
+            self.assertEqual(self.__integrityChecker.getPiecesWrittenOnDisk(), [True, True, True, True, False, False])
+        self.assertNotIn(self.__scanner.files[2].path, [call.args[0] for call in readFileSection.call_args_list])
+
+
+if __name__ == '__main__':
+    unittest.main()
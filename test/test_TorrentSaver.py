@@ -0,0 +1,123 @@
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+from typing import Final, List, Tuple
+from unittest.mock import patch
+import utils
+from domain.piece import Piece
+from service.fileHandleCache import FileHandleCache
+from service.pieceBufferPool import PieceBufferPool
+from service.pieceGenerator import PieceGenerator
+from service.sessionMetrics import SessionMetrics
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from service.torrentSaver import TorrentSaver
+from syntheticTorrent import SyntheticTorrent
+
+
+class TestTorrentSaver(unittest.IsolatedAsyncioTestCase):
+    PIECE_LENGTH: Final[int] = 2 * utils.BLOCK_REQUEST_SIZE
+    FILE_LENGTHS: Final[List[int]] = [PIECE_LENGTH + 100, 2 * PIECE_LENGTH - 200]  # the second piece spans both files
+
+    async def asyncSetUp(self) -> None:
+        self.__torrent: SyntheticTorrent = SyntheticTorrent(self.PIECE_LENGTH, self.FILE_LENGTHS)
+        self.__scanner: TorrentMetaInfoScanner = self.__torrent.scanner
+        pieceCount: int = self.__torrent.pieceCount
+        self.__pieceGenerator: PieceGenerator = PieceGenerator(pieceCount, self.PIECE_LENGTH, self.__scanner.finalPieceLength)
+        self.__pieceBufferPool: PieceBufferPool = PieceBufferPool(self.PIECE_LENGTH, pieceCount)
+        self.__fileHandleCache: FileHandleCache = FileHandleCache(4)
+        self.__sessionMetrics: SessionMetrics = SessionMetrics(self.__scanner)
+        self.__savedPieceCount: int = 0
+        self.__failedPieces: List[Tuple[int, OSError]] = []
+        self.__torrentSaver: TorrentSaver = self.__createTorrentSaver(TorrentSaver.SPARSE_ALLOCATION)
+
+    async def asyncTearDown(self) -> None:
+        await self.__torrentSaver.stop()
+        self.__fileHandleCache.closeAllFiles()
+        self.__torrent.cleanup()
+
+    def __createTorrentSaver(self, allocationMode: str) -> TorrentSaver:
+        return TorrentSaver(self.__scanner, self.__fileHandleCache, self.__pieceBufferPool, self.__sessionMetrics, 1, self.PIECE_LENGTH,
+                            allocationMode, self.__countSavedPiece, lambda pieceIndex, error: self.__failedPieces.append((pieceIndex, error)))
+
+    def __countSavedPiece(self) -> None:
+        self.__savedPieceCount += 1
+
+    def __createCompletePiece(self, pieceIndex: int) -> Piece:
+        piece: Piece = self.__pieceGenerator.generatePiece(pieceIndex, self.__pieceBufferPool.acquire())
+        for block in piece.blocks:
+            blockStartOffset: int = pieceIndex * self.PIECE_LENGTH + block.beginOffset
+            piece.writeDataToBlock(block.beginOffset, self.__torrent.content[blockStartOffset: blockStartOffset + block.length])
+        return piece
+
+    async def __waitForWrites(self, pieceCount: int) -> None:
+        while self.__savedPieceCount + len(self.__failedPieces) < pieceCount:
+            await asyncio.sleep(0.01)
+
+    async def test_putPieceInQueue_PiecesOverTwoFiles_ContentWritten(self) -> None:
+        self.__torrentSaver.start()
+        for pieceIndex in [2, 0, 1]:
+            self.__torrentSaver.putPieceInQueue(self.__createCompletePiece(pieceIndex))
+        await self.__torrentSaver.waitForRoomInQueue()
+        await self.__waitForWrites(3)
+        self.assertEqual(self.__failedPieces, [])
+        self.assertLess(self.__sessionMetrics.diskWriteCount, 3)  # the adjacent pieces which waited for the writer were coalesced
+        self.assertEqual(self.__pieceBufferPool.freeBufferCount, 3)
+        writtenContent: bytes = b""
+        for file in self.__scanner.files:
+            with open(file.path, "rb") as writtenFile:
+                writtenContent += writtenFile.read()
+        self.assertEqual(writtenContent, self.__torrent.content)
+
+    async def test_hasRoomInQueue_QueueFull_RoomOnceWritten(self) -> None:
+        self.__torrentSaver.start()
+        self.__torrentSaver.putPieceInQueue(self.__createCompletePiece(0))
+        self.assertFalse(self.__torrentSaver.hasRoomInQueue)
+        await self.__waitForWrites(1)
+        self.assertTrue(self.__torrentSaver.hasRoomInQueue)
+
+    async def test_stop_PieceBeingWritten_WaitsUntilWritten(self) -> None:
+        self.__torrentSaver.start()
+        self.__torrentSaver.putPieceInQueue(self.__createCompletePiece(0))
+        self.__torrentSaver.putPieceInQueue(self.__createCompletePiece(2))
+        await self.__torrentSaver.stop()
+        self.assertEqual(self.__savedPieceCount, 2)
+        self.assertEqual(self.__torrentSaver.unwrittenPieceIndices, set())
+        self.assertEqual(self.__pieceBufferPool.freeBufferCount, 3)
+
+    async def test_allocateFiles_SparseMode_FilesHaveFinalLength(self) -> None:
+        self.__torrentSaver.allocateFiles()
+        self.assertEqual([os.path.getsize(file.path) for file in self.__scanner.files], self.FILE_LENGTHS)
+
+    async def test_allocateFiles_FullMode_DiskSpaceAllocated(self) -> None:
+        self.__torrentSaver = self.__createTorrentSaver(TorrentSaver.FULL_ALLOCATION)
+        self.__torrentSaver.allocateFiles()
+        self.__fileHandleCache.closeAllFiles()
+        self.assertEqual([os.path.getsize(file.path) for file in self.__scanner.files], self.FILE_LENGTHS)
+        for file in self.__scanner.files:
+            self.assertGreaterEqual(os.stat(file.path).st_blocks * 512, file.length)
+
+    async def test_allocateFiles_NoAllocation_FilesNotCreated(self) -> None:
+        self.__torrentSaver = self.__createTorrentSaver(TorrentSaver.NO_ALLOCATION)
+        self.__torrentSaver.allocateFiles()
+        self.assertFalse(any(os.path.exists(file.path) for file in self.__scanner.files))
+
+    async def test_allocateFiles_NotEnoughFreeSpace_ErrorRaised(self) -> None:
+        with patch("service.torrentSaver.shutil.disk_usage", return_value=SimpleNamespace(total=0, used=0, free=0)):
+            with self.assertRaises(OSError):
+                self.__torrentSaver.allocateFiles()
+        self.assertFalse(any(os.path.exists(file.path) for file in self.__scanner.files))
+
+    async def test_putPieceInQueue_FileCannotBeOpened_PieceFailed(self) -> None:
+        os.mkdir(self.__scanner.files[0].path)
+        self.__torrentSaver.start()
+        self.__torrentSaver.putPieceInQueue(self.__createCompletePiece(0))
+        await self.__waitForWrites(1)
+        self.assertEqual([pieceIndex for pieceIndex, _ in self.__failedPieces], [0])
+        self.assertIsInstance(self.__failedPieces[0][1], OSError)
+        self.assertEqual(self.__pieceBufferPool.freeBufferCount, 3)
+        self.assertEqual(self.__torrentSaver.queuedByteCount, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import hashlib
+import unittest
+from typing import Final, List
+from bitarray import bitarray
+import utils
+from domain.block import Block
+from domain.piece import Piece
+from service.pieceBufferPool import PieceBufferPool
+from service.torrentState import TorrentState
+
+
+class TestTorrentState(unittest.TestCase):
+    PIECE_COUNT: Final[int] = 4
+    PIECE_LENGTH: Final[int] = 3 * utils.BLOCK_REQUEST_SIZE
+    FINAL_PIECE_LENGTH: Final[int] = utils.BLOCK_REQUEST_SIZE + 100
+    BUFFER_COUNT: Final[int] = 2
+
+    def setUp(self) -> None:
+        self.__pieceBufferPool: PieceBufferPool = PieceBufferPool(self.PIECE_LENGTH, self.BUFFER_COUNT)
+        self.__torrentState: TorrentState = TorrentState(self.PIECE_COUNT, self.PIECE_LENGTH, self.FINAL_PIECE_LENGTH, self.__pieceBufferPool)
+        self.__torrentState.setDownloadedPieces([False] * self.PIECE_COUNT)
+
+    def test_startPiece_FinalPiece_ShorterFinalBlock(self) -> None:
+        finalPiece: Piece = self.__torrentState.startPiece(self.PIECE_COUNT - 1)
+        self.assertEqual([block.length for block in finalPiece.blocks], [utils.BLOCK_REQUEST_SIZE, 100])
+
+    def test_createBlock_OffsetNotAtBlockStart_NoBlock(self) -> None:
+        self.assertIsNone(self.__torrentState.createBlock(0, 100))
+        self.assertIsNone(self.__torrentState.createBlock(0, self.PIECE_LENGTH))
+        block: Block = self.__torrentState.createBlock(self.PIECE_COUNT - 1, utils.BLOCK_REQUEST_SIZE)
+        self.assertEqual(block.length, 100)
+
+    def test_markPieceAsDownloaded_AllPieces_Downloaded(self) -> None:
+        self.__torrentState.startPiece(0)
+        for pieceIndex in range(self.PIECE_COUNT):
+            self.assertFalse(self.__torrentState.isDownloaded)
+            self.__torrentState.markPieceAsDownloaded(pieceIndex)
+        self.assertTrue(self.__torrentState.isDownloaded)
+        self.assertEqual(self.__torrentState.activePieceCount, 0)
+        self.assertTrue(self.__torrentState.isBlockComplete(0, 0))
+
+    def test_isPieceInProgress_OneBlockWritten_InProgress(self) -> None:
+        self.__torrentState.startPiece(1).writeDataToBlock(0, bytes(utils.BLOCK_REQUEST_SIZE))
+        self.assertTrue(self.__torrentState.isPieceInProgress(1))
+        self.assertTrue(self.__torrentState.isBlockComplete(1, 0))
+        self.assertFalse(self.__torrentState.isBlockComplete(1, 1))
+
+    def test_restorePiece_TwoOfThreeBlocks_BlocksWrittenAtTheirOffsets(self) -> None:
+        firstBlockData, thirdBlockData = bytes([1]) * utils.BLOCK_REQUEST_SIZE, bytes([3]) * utils.BLOCK_REQUEST_SIZE
+        self.assertTrue(self.__torrentState.restorePiece(1, bitarray("101"), firstBlockData + thirdBlockData))
+        self.assertEqual(self.__torrentState.getPiecesInProgress()[0].index, 1)
+        self.assertEqual([self.__torrentState.isBlockComplete(1, blockIndex) for blockIndex in range(3)], [True, False, True])
+        self.assertEqual(bytes(self.__torrentState.getPiece(1).data[2 * utils.BLOCK_REQUEST_SIZE:]), thirdBlockData)
+        self.assertFalse(self.__torrentState.restorePiece(2, bitarray("11"), bytes(2 * utils.BLOCK_REQUEST_SIZE)))  # the piece has 3 blocks
+
+    def test_startPiece_NoFreeBuffer_NotStarted(self) -> None:
+        for pieceIndex in range(self.BUFFER_COUNT):
+            self.assertIsNotNone(self.__torrentState.startPiece(pieceIndex))
+        self.assertFalse(self.__torrentState.canStartPiece)
+        self.assertIsNone(self.__torrentState.startPiece(self.BUFFER_COUNT))
+        self.assertIsNotNone(self.__torrentState.startPiece(0))  # already started, so it needs no new buffer
+        self.__torrentState.markPieceAsFailed(0)
+        self.assertTrue(self.__torrentState.canStartPiece)
+        self.assertIsNotNone(self.__torrentState.startPiece(self.BUFFER_COUNT))
+
+    def test_writeDataToBlock_BlocksOutOfOrder_HashOfWholePiece(self) -> None:
+        piece: Piece = self.__torrentState.startPiece(0)
+        blockContents: List[bytes] = [bytes([blockIndex + 1]) * utils.BLOCK_REQUEST_SIZE for blockIndex in range(len(piece.blocks))]
+        for blockIndex in [2, 0, 1]:
+            self.assertFalse(piece.isDownloadComplete)
+            piece.writeDataToBlock(blockIndex * utils.BLOCK_REQUEST_SIZE, blockContents[blockIndex])
+        self.assertTrue(piece.isDownloadComplete)
+        self.assertEqual(bytes(piece.data), b"".join(blockContents))
+        self.assertEqual(piece.finishInfoHash(), hashlib.sha1(b"".join(blockContents)).digest())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import socket
+import tempfile
+import unittest
+from asyncio import StreamReader, StreamWriter
+from typing import Final, List, Tuple
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+from bencode3 import bencode
+from domain.peer import Peer
+from domain.peerTable import PeerTable
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from service.trackerConnection import TrackerConnection
+
+
+class StandInHttpTracker:
+    """
+    Answers announces with a fixed list of peers (and the current IP lookups), keeping the connections alive; it can answer late,
+    drop requests by closing their connection, or refuse the announces with a failure reason
+    """
+    CURRENT_IP: Final[str] = "10.0.0.1"
+
+    def __init__(self, peers: List[Peer], responseDelay: float = 0.0):
+        self.__peers: List[Peer] = peers
+        self.__responseDelay: float = responseDelay
+        self.__server: asyncio.Server | None = None
+        self.connectionCount: int = 0
+        self.announceQueries: List[dict] = []
+        self.requestsToDrop: int = 0
+        self.failureReason: str | None = None
+
+    async def start(self) -> None:
+        self.__server = await asyncio.start_server(self.__serveConnection, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        self.__server.close()
+        await self.__server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.__server.sockets[0].getsockname()[1]}"
+
+    async def __serveConnection(self, reader: StreamReader, writer: StreamWriter) -> None:
+        self.connectionCount += 1
+        try:
+            while True:
+                requestLine: str = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")[0]
+                if self.requestsToDrop > 0:
+                    self.requestsToDrop -= 1
+                    break
+                target: str = requestLine.split(" ")[1]
+                if target == "/ip":
+                    body: bytes = self.CURRENT_IP.encode()
+                else:
+                    self.announceQueries.append(parse_qs(urlsplit(target).query, encoding="latin-1"))
+                    await asyncio.sleep(self.__responseDelay)
+                    if self.failureReason is not None:
+                        body = bencode({"failure reason": self.failureReason})
+                    else:
+                        body = bencode({"interval": 1800, "min interval": 60, "peers": b"".join(peer.IP.to_bytes(4, "big") + peer.port.to_bytes(2, "big")
+                                                                            for peer in self.__peers)})
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+
+class TestTrackerConnection(unittest.IsolatedAsyncioTestCase):
+    PEERS: Final[List[Peer]] = [Peer(0x0A000002, 6881), Peer(0x0A000003, 51413)]
+    OTHER_PEERS: Final[List[Peer]] = [Peer(0x0A000003, 51413), Peer(0x0A000004, 6889)]
+
+    async def asyncSetUp(self) -> None:
+        self.__trackers: List[StandInHttpTracker] = []
+        self.__tracker: StandInHttpTracker = await self.__startTracker(self.PEERS)
+        self.__directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.__ipURLPatch = mock.patch.object(TrackerConnection, "CURRENT_IP_URL", self.__tracker.url + "/ip")
+        self.__ipURLPatch.start()
+
+    async def asyncTearDown(self) -> None:
+        self.__ipURLPatch.stop()
+        for tracker in self.__trackers:
+            await tracker.stop()
+        self.__directory.cleanup()
+
+    async def __startTracker(self, peers: List[Peer], responseDelay: float = 0.0) -> StandInHttpTracker:
+        tracker: StandInHttpTracker = StandInHttpTracker(peers, responseDelay)
+        await tracker.start()
+        self.__trackers.append(tracker)
+        return tracker
+
+    def __createScanner(self, announceTiers: List[List[str]]) -> TorrentMetaInfoScanner:
+        torrentFilePath: str = os.path.join(self.__directory.name, "test.torrent")
+        with open(torrentFilePath, "wb") as torrentFile:
+            torrentFile.write(bencode({"announce": announceTiers[0][0], "announce-list": announceTiers,
+                                       "info": {"name": "torrent", "piece length": 16384, "length": 100,
+                                                "pieces": hashlib.sha1(bytes(100)).digest()}}))
+        return TorrentMetaInfoScanner(torrentFilePath, self.__directory.name)
+
+    def __assertAnnounceResult(self, announceResult: Tuple[PeerTable, int], expectedPeers: List[Peer]) -> None:
+        self.assertEqual((list(announceResult[0]), announceResult[1]), (expectedPeers, TrackerConnection.FIRST_AVAILABLE_PORT))
+
+    @staticmethod
+    def __getTransferStatistics() -> Tuple[int, int, int]:
+        return 1000, 3000, 100
+
+    @staticmethod
+    def __getUnreachableURL() -> str:
+        with socket.socket() as unusedSocket:
+            unusedSocket.bind(("127.0.0.1", 0))
+            return f"http://127.0.0.1:{unusedSocket.getsockname()[1]}/announce"  # nothing listens there once the socket is closed
+
+    async def test_makeTrackerStartedRequest_TwoAnnounces_PeersReturnedOverOneConnection(self) -> None:
+        scanner: TorrentMetaInfoScanner = self.__createScanner([[self.__tracker.url + "/announce"]])
+        trackerConnection: TrackerConnection = TrackerConnection(scanner, self.__getTransferStatistics)
+        self.__assertAnnounceResult(await trackerConnection.makeTrackerStartedRequest(), self.PEERS)
+        self.__assertAnnounceResult(await trackerConnection.makeTrackerFinishedRequest(), self.PEERS)
+        trackerConnection.close()
+        self.assertEqual(trackerConnection.currentIP, StandInHttpTracker.CURRENT_IP)
+        self.assertEqual(self.__tracker.connectionCount, 1)  # the connection was kept alive for the IP lookup and both announces
+        self.assertEqual([query["event"] for query in self.__tracker.announceQueries], [["started"], ["completed"]])
+        self.assertEqual(self.__tracker.announceQueries[0]["info_hash"][0].encode("latin-1"), scanner.infoHash)
+
+    async def test_makeTrackerStartedRequest_FirstRequestsDropped_RetriedWithBackoff(self) -> None:
+        self.__tracker.requestsToDrop = 2
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[self.__tracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "INITIAL_RETRY_DELAY_IN_SECONDS", 0.01):
+            self.__assertAnnounceResult(await trackerConnection.makeTrackerStartedRequest(), self.PEERS)
+        trackerConnection.close()
+        self.assertEqual(self.__tracker.connectionCount, 3)
+
+    async def test_makeTrackerStartedRequest_EventLoopNotBlocked_OtherTasksRunDuringAnnounce(self) -> None:
+        tickCount: int = 0
+
+        async def tick() -> None:
+            nonlocal tickCount
+            while True:
+                tickCount += 1
+                await asyncio.sleep(0)
+
+        ticker: asyncio.Task = asyncio.create_task(tick())
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[self.__tracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        await trackerConnection.makeTrackerStartedRequest()
+        trackerConnection.close()
+        ticker.cancel()
+        self.assertGreater(tickCount, 1)
+
+    async def test_makeTrackerStartedRequest_TwoTrackersInTier_PeersMergedWithoutDuplicates(self) -> None:
+        otherTracker: StandInHttpTracker = await self.__startTracker(self.OTHER_PEERS)
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner(
+            [[self.__tracker.url + "/announce", otherTracker.url + "/announce"]]), self.__getTransferStatistics)
+        peerTable, _ = await trackerConnection.makeTrackerStartedRequest()
+        trackerConnection.close()
+        self.assertCountEqual(list(peerTable), [self.PEERS[0], self.PEERS[1], self.OTHER_PEERS[1]])
+
+    async def test_makeTrackerStartedRequest_FirstTierUnreachable_NextTierUsed(self) -> None:
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner(
+            [[self.__getUnreachableURL(), self.__getUnreachableURL()], [self.__tracker.url + "/announce"]]), self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "INITIAL_RETRY_DELAY_IN_SECONDS", 0.01):
+            self.__assertAnnounceResult(await trackerConnection.makeTrackerStartedRequest(), self.PEERS)
+        trackerConnection.close()
+
+    async def test_makeTrackerStartedRequest_FirstTierRefusesAnnounce_NextTierUsed(self) -> None:
+        refusingTracker: StandInHttpTracker = await self.__startTracker(self.OTHER_PEERS)
+        refusingTracker.failureReason = "unregistered torrent"
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner(
+            [[refusingTracker.url + "/announce"], [self.__tracker.url + "/announce"]]), self.__getTransferStatistics)
+        self.__assertAnnounceResult(await asyncio.wait_for(trackerConnection.makeTrackerStartedRequest(), 5.0), self.PEERS)
+        trackerConnection.close()
+        self.assertEqual(len(refusingTracker.announceQueries), 1)
+
+    async def test_makeTrackerStartedRequest_SlowTrackerInTier_NotWaitedFor(self) -> None:
+        slowTracker: StandInHttpTracker = await self.__startTracker(self.OTHER_PEERS, responseDelay=30.0)
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner(
+            [[slowTracker.url + "/announce", self.__tracker.url + "/announce"]]), self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "PEER_MERGE_DELAY_IN_SECONDS", 0.05):
+            # not delayed by the slow tracker
+            self.__assertAnnounceResult(await asyncio.wait_for(trackerConnection.makeTrackerStartedRequest(), 5.0), self.PEERS)
+            await trackerConnection.makeTrackerFinishedRequest()
+        trackerConnection.close()
+        self.assertEqual(len(self.__tracker.announceQueries), 2)
+        self.assertEqual(len(slowTracker.announceQueries), 2)  # still announced to, since it is in the same tier
+
+    async def test_makeTrackerStartedRequest_CurrentIPNotFound_AnnouncedWithoutIt(self) -> None:
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[self.__tracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "CURRENT_IP_URL", self.__getUnreachableURL()):
+            self.__assertAnnounceResult(await trackerConnection.makeTrackerStartedRequest(), self.PEERS)
+        trackerConnection.close()
+        self.assertIsNone(trackerConnection.currentIP)
+
+    async def test_makeTrackerStartedRequest_TrackerDropsEveryRequest_OtherPortsNotTried(self) -> None:
+        self.__tracker.requestsToDrop = 1000
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[self.__tracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "INITIAL_RETRY_DELAY_IN_SECONDS", 0.01):
+            peerTable, port = await trackerConnection.makeTrackerStartedRequest()
+        trackerConnection.close()
+        self.assertEqual((list(peerTable), port), ([], TrackerConnection.FIRST_AVAILABLE_PORT))
+        self.assertEqual(self.__tracker.connectionCount, 1 + TrackerConnection.REQUEST_ATTEMPTS)  # the IP lookup, then a single announce
+
+    async def test_makeTrackerStartedRequest_TrackerTooSlow_GivenUpAfterMaxTime(self) -> None:
+        slowTracker: StandInHttpTracker = await self.__startTracker(self.OTHER_PEERS, responseDelay=30.0)
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[slowTracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        with mock.patch.object(TrackerConnection, "MAX_PORT_SEARCH_TIME_IN_SECONDS", 0.1):
+            peerTable, _ = await asyncio.wait_for(trackerConnection.makeTrackerStartedRequest(), 5.0)
+        trackerConnection.close()
+        self.assertEqual(list(peerTable), [])
+
+    async def test_announce_AfterStartedRequest_TransferStatisticsAndIntervalsReported(self) -> None:
+        trackerConnection: TrackerConnection = TrackerConnection(self.__createScanner([[self.__tracker.url + "/announce"]]),
+                                                                 self.__getTransferStatistics)
+        await trackerConnection.makeTrackerStartedRequest()
+        self.assertEqual(list(await trackerConnection.announce("stopped")), self.PEERS)
+        trackerConnection.close()
+        self.assertEqual((trackerConnection.announceInterval, trackerConnection.minAnnounceInterval), (1800, 60))
+        stoppedQuery: dict = self.__tracker.announceQueries[-1]
+        self.assertEqual([stoppedQuery[key][0] for key in ["event", "port", "uploaded", "downloaded", "left"]],
+                         ["stopped", str(TrackerConnection.FIRST_AVAILABLE_PORT), "1000", "3000", "100"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,8 +9,24 @@ class TestTrackerResponseScanner(unittest.TestCase):
         self.assertEqual(nonPeersPart, {"complete": 0, "downloaded": 0, "incomplete": 1, "interval": 1634, "min interval": 817})
 
     def test_scanTrackerResponse_ValidContentBinaryModel_CorrectPeerList(self) -> None:
-        _, peerList = TrackerResponseScanner.scanTrackerResponse(b'd8:completei0e10:downloadedi0e10:incompletei1e8:intervali1634e12:min intervali817e5:peers6:\xbc\x1b\x84\x08\x1a\xe1e')
-        self.assertEqual(peerList, [Peer(3155919880, 6881)])
+        _, peerTable = TrackerResponseScanner.scanTrackerResponse(b'd8:completei0e10:downloadedi0e10:incompletei1e8:intervali1634e12:min intervali817e5:peers6:\xbc\x1b\x84\x08\x1a\xe1e')
+        self.assertEqual(list(peerTable), [Peer(3155919880, 6881)])
+
+    def test_scanTrackerResponse_IPv4AndIPv6CompactPeers_AllPeersInTable(self) -> None:
+        IPv6Address: bytes = bytes.fromhex("20010db8000000000000000000000001")
+        nonPeersPart, peerTable = TrackerResponseScanner.scanTrackerResponse(
+            b'd8:intervali1800e5:peers12:\xbc\x1b\x84\x08\x1a\xe1\x0a\x00\x00\x02\x00\x506:peers618:' + IPv6Address + b'\xc8\xd5e')
+        self.assertEqual(nonPeersPart, {"interval": 1800})
+        self.assertEqual(list(peerTable), [Peer(3155919880, 6881), Peer(0x0A000002, 80), Peer(int.from_bytes(IPv6Address, "big"), 51413, True)])
+
+    def test_scanTrackerResponse_CompactPeersValidUTF8_SameBytesDecoded(self) -> None:
+        _, peerTable = TrackerResponseScanner.scanTrackerResponse(b'd5:peers6:abcd\x00\x50e')  # decoded as str by bdecode
+        self.assertEqual(list(peerTable), [Peer(0x61626364, 80)])
+
+    def test_scanTrackerResponse_ValidContentDictionaryModel_HostNamesLeftOut(self) -> None:
+        _, peerTable = TrackerResponseScanner.scanTrackerResponse(
+            b'd5:peersld2:ip8:10.0.0.24:porti6881eed2:ip11:2001:db8::14:porti6882eed2:ip11:example.org4:porti6883eeee')
+        self.assertEqual(list(peerTable), [Peer(0x0A000002, 6881), Peer(0x20010DB8000000000000000000000001, 6882, True)])
 
 
 if __name__ == '__main__':
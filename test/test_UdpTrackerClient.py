@@ -0,0 +1,100 @@
+import asyncio
+import struct
+import unittest
+from typing import Final, List, Tuple
+from unittest import mock
+from domain.peer import Peer
+from service.udpTrackerClient import UdpTrackerClient
+
+
+class StandInUdpTracker(asyncio.DatagramProtocol):
+    """
+    Answers the connects, announces and scrapes as a UDP tracker would; it can drop the first requests of some actions, to make the client
+    retransmit them
+    """
+    CONNECTION_ID: Final[int] = 0x1122334455667788
+    PEERS: Final[List[Peer]] = [Peer(0x0A000002, 6881), Peer(0x0A000003, 51413)]
+
+    def __init__(self):
+        self.transport: asyncio.DatagramTransport | None = None
+        self.receivedActions: List[int] = []
+        self.announcedEvents: List[int] = []
+        self.actionsToDrop: List[int] = []  # each action in the list drops one request
+        self.errorMessage: bytes | None = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, address: Tuple[str, int]) -> None:
+        connectionId, action, transactionId = struct.unpack_from("!QII", data)
+        self.receivedActions.append(action)
+        if action in self.actionsToDrop:
+            self.actionsToDrop.remove(action)
+        elif self.errorMessage is not None:
+            self.transport.sendto(struct.pack("!II", UdpTrackerClient.ERROR_ACTION, transactionId) + self.errorMessage, address)
+        elif action == UdpTrackerClient.CONNECT_ACTION:
+            self.transport.sendto(struct.pack("!IIQ", action, transactionId, self.CONNECTION_ID), address)
+        elif connectionId != self.CONNECTION_ID:
+            self.transport.sendto(struct.pack("!II", UdpTrackerClient.ERROR_ACTION, transactionId) + b"Invalid connection ID", address)
+        elif action == UdpTrackerClient.ANNOUNCE_ACTION:
+            self.announcedEvents.append(struct.unpack_from("!I", data, 80)[0])
+            self.transport.sendto(struct.pack("!IIIII", action, transactionId, 1800, 3, 5)
+                                  + b"".join(struct.pack("!IH", peer.IP, peer.port) for peer in self.PEERS), address)
+        elif action == UdpTrackerClient.SCRAPE_ACTION:
+            infoHashes: List[bytes] = [data[offset: offset + 20] for offset in range(16, len(data), 20)]
+            self.transport.sendto(struct.pack("!II", action, transactionId)
+                                  + b"".join(struct.pack("!III", infoHash[0], infoHash[1], infoHash[2]) for infoHash in infoHashes), address)
+
+
+class TestUdpTrackerClient(unittest.IsolatedAsyncioTestCase):
+    INFO_HASH: Final[bytes] = bytes(range(20))
+    PEER_ID: Final[bytes] = b"ABCDEFGHIJKLMNOPQRST"
+
+    async def asyncSetUp(self) -> None:
+        self.__transport, self.__tracker = await asyncio.get_running_loop().create_datagram_endpoint(StandInUdpTracker, local_addr=("127.0.0.1", 0))
+        self.__url: str = f"udp://127.0.0.1:{self.__transport.get_extra_info('sockname')[1]}/announce"
+        self.__client: UdpTrackerClient = UdpTrackerClient()
+
+    async def asyncTearDown(self) -> None:
+        self.__client.close()
+        self.__transport.close()
+
+    async def test_announce_TwoAnnounces_PeersReturnedWithOneConnect(self) -> None:
+        response, peers = await self.__client.announce(self.__url, self.INFO_HASH, self.PEER_ID, 6881, 0, 100, 0, "started")
+        self.assertEqual(response, {"interval": 1800, "incomplete": 3, "complete": 5})
+        self.assertEqual(list(peers), StandInUdpTracker.PEERS)
+        await self.__client.announce(self.__url, self.INFO_HASH, self.PEER_ID, 6881, 100, 0, 0, "completed")
+        self.assertEqual(self.__tracker.receivedActions, [UdpTrackerClient.CONNECT_ACTION, UdpTrackerClient.ANNOUNCE_ACTION,
+                                                          UdpTrackerClient.ANNOUNCE_ACTION])  # the connection ID was reused
+        self.assertEqual(self.__tracker.announcedEvents, [UdpTrackerClient.EVENTS["started"], UdpTrackerClient.EVENTS["completed"]])
+
+    async def test_announce_RequestsDropped_Retransmitted(self) -> None:
+        self.__tracker.actionsToDrop = [UdpTrackerClient.CONNECT_ACTION, UdpTrackerClient.ANNOUNCE_ACTION]
+        with mock.patch.object(UdpTrackerClient, "BASE_RETRANSMISSION_TIMEOUT_IN_SECONDS", 0.05):
+            _, peers = await self.__client.announce(self.__url, self.INFO_HASH, self.PEER_ID, 6881, 0, 100, 0, "started")
+        self.assertEqual(list(peers), StandInUdpTracker.PEERS)
+        self.assertEqual(self.__tracker.receivedActions, [UdpTrackerClient.CONNECT_ACTION, UdpTrackerClient.CONNECT_ACTION,
+                                                          UdpTrackerClient.ANNOUNCE_ACTION, UdpTrackerClient.ANNOUNCE_ACTION])
+
+    async def test_announce_NoResponse_TimeoutErrorAfterLastRetransmission(self) -> None:
+        self.__tracker.actionsToDrop = [UdpTrackerClient.CONNECT_ACTION] * 100
+        with mock.patch.object(UdpTrackerClient, "BASE_RETRANSMISSION_TIMEOUT_IN_SECONDS", 0.001), \
+                mock.patch.object(UdpTrackerClient, "MAX_RETRANSMISSIONS", 3):
+            with self.assertRaises(TimeoutError):
+                await self.__client.announce(self.__url, self.INFO_HASH, self.PEER_ID, 6881, 0, 100, 0, "started")
+        self.assertEqual(len(self.__tracker.receivedActions), 4)
+
+    async def test_announce_ErrorResponse_ValueError(self) -> None:
+        self.__tracker.errorMessage = b"Torrent not registered"
+        with self.assertRaisesRegex(ValueError, "Torrent not registered"):
+            await self.__client.announce(self.__url, self.INFO_HASH, self.PEER_ID, 6881, 0, 100, 0, "started")
+
+    async def test_scrape_ManyInfoHashes_BatchedIntoFewPackets(self) -> None:
+        infoHashes: List[bytes] = [bytes([index % 256, index // 256, 7]) + bytes(17) for index in range(100)]
+        statistics = await self.__client.scrape(self.__url, infoHashes)
+        self.assertEqual(statistics, {infoHash: (infoHash[0], infoHash[1], 7) for infoHash in infoHashes})
+        self.assertEqual(self.__tracker.receivedActions.count(UdpTrackerClient.SCRAPE_ACTION), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+from typing import Final, List, Tuple, Dict
+import utils
+from domain.block import Block
+from service.fileHandleCache import FileHandleCache
+from service.pieceReadCache import PieceReadCache
+from service.sessionMetrics import SessionMetrics
+from service.torrentMetaInfoScanner import TorrentMetaInfoScanner
+from service.uploadReadScheduler import UploadReadScheduler
+from syntheticTorrent import SyntheticTorrent
+
+
+class ReadCountingFileHandleCache(FileHandleCache):
+    def __init__(self, maxOpenFileCount: int):
+        super().__init__(maxOpenFileCount)
+        self.readSections: List[Tuple[str, int, int]] = []
+
+    def readFileSection(self, path: str, fileOffset: int, length: int) -> bytes:
+        self.readSections.append((os.path.basename(path), fileOffset, length))
+        return super().readFileSection(path, fileOffset, length)
+
+
+class TestUploadReadScheduler(unittest.IsolatedAsyncioTestCase):
+    PIECE_LENGTH: Final[int] = 2 * utils.BLOCK_REQUEST_SIZE
+    FILE_LENGTHS: Final[List[int]] = [PIECE_LENGTH + 100, 3 * PIECE_LENGTH - 200]  # the second piece spans both files
+
+    def setUp(self) -> None:
+        self.__torrent: SyntheticTorrent = SyntheticTorrent(self.PIECE_LENGTH, self.FILE_LENGTHS)
+        self.__torrent.writeContent()
+        scanner: TorrentMetaInfoScanner = self.__torrent.scanner
+        self.__storage: ReadCountingFileHandleCache = ReadCountingFileHandleCache(4)
+        self.__sessionMetrics: SessionMetrics = SessionMetrics(scanner)
+        self.__unwrittenPieces: Dict[int, memoryview] = {}
+        self.__uploadReadScheduler: UploadReadScheduler = UploadReadScheduler(scanner, self.__storage, PieceReadCache(4 * self.PIECE_LENGTH),
+                                                                              self.__sessionMetrics, self.__unwrittenPieces.get)
+
+    def tearDown(self) -> None:
+        self.__storage.closeAllFiles()
+        self.__torrent.cleanup()
+
+    def __getBlockContent(self, block: Block) -> bytes:
+        blockStartOffset: int = block.pieceIndex * self.PIECE_LENGTH + block.beginOffset
+        return self.__torrent.content[blockStartOffset: blockStartOffset + block.length]
+
+    async def test_readBlocks_AdjacentPiecesOutOfOrder_OneReadPerFile(self) -> None:
+        blocks: List[Block] = [Block(2, 0, utils.BLOCK_REQUEST_SIZE), Block(0, utils.BLOCK_REQUEST_SIZE, utils.BLOCK_REQUEST_SIZE),
+                               Block(1, 0, utils.BLOCK_REQUEST_SIZE), Block(0, 0, utils.BLOCK_REQUEST_SIZE)]
+        blocksData: List[bytes | memoryview] = await self.__uploadReadScheduler.readBlocks(blocks)
+        self.assertEqual([bytes(blockData) for blockData in blocksData], [self.__getBlockContent(block) for block in blocks])
+        self.assertEqual(self.__storage.readSections, [("file0", 0, self.FILE_LENGTHS[0]), ("file1", 0, 2 * self.PIECE_LENGTH - 100)])
+        self.assertEqual(self.__sessionMetrics.pieceReadCacheMissCount, 4)  # the second block of piece 0 was not in memory either
+
+    async def test_readBlocks_PiecesReadBefore_ServedFromCache(self) -> None:
+        blocks: List[Block] = [Block(3, 0, utils.BLOCK_REQUEST_SIZE), Block(1, utils.BLOCK_REQUEST_SIZE, utils.BLOCK_REQUEST_SIZE)]
+        await self.__uploadReadScheduler.readBlocks(blocks)
+        readCount: int = len(self.__storage.readSections)
+        blocksData: List[bytes | memoryview] = await self.__uploadReadScheduler.readBlocks(blocks)
+        self.assertEqual([bytes(blockData) for blockData in blocksData], [self.__getBlockContent(block) for block in blocks])
+        self.assertEqual(len(self.__storage.readSections), readCount)
+        self.assertEqual(self.__sessionMetrics.pieceReadCacheHitRate, 0.5)
+
+    async def test_readBlocks_PieceNotWrittenYet_CopiedFromItsBuffer(self) -> None:
+        pieceBuffer: bytearray = bytearray(self.__torrent.content[self.PIECE_LENGTH: 2 * self.PIECE_LENGTH])
+        self.__unwrittenPieces[1] = memoryview(pieceBuffer)
+        block: Block = Block(1, utils.BLOCK_REQUEST_SIZE, utils.BLOCK_REQUEST_SIZE)
+        blockData: bytes | memoryview = (await self.__uploadReadScheduler.readBlocks([block]))[0]
+        pieceBuffer[:] = bytes(len(pieceBuffer))  # the buffer is reused once the piece is written
+        self.assertEqual(bytes(blockData), self.__getBlockContent(block))
+        self.assertEqual(self.__storage.readSections, [])
+        del self.__unwrittenPieces[1]
+        await self.__uploadReadScheduler.readBlocks([block])
+        self.assertNotEqual(self.__storage.readSections, [])  # the piece was not cached
+
+
+if __name__ == '__main__':
+    unittest.main()